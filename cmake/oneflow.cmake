@@ -131,6 +131,10 @@ foreach(oneflow_single_file ${oneflow_all_src})
        "^${PROJECT_SOURCE_DIR}/oneflow/(core|user|xrt|maybe)/.*_test\\.cpp$")
       # test file
       list(APPEND of_all_test_cc ${oneflow_single_file})
+    elseif("${oneflow_single_file}" MATCHES
+           "^${PROJECT_SOURCE_DIR}/oneflow/(core|user|xrt|maybe)/.*_benchmark\\.cpp$")
+      # benchmark file
+      list(APPEND of_all_benchmark_cc ${oneflow_single_file})
     elseif(APPLE AND "${oneflow_single_file}" MATCHES
                      "^${PROJECT_SOURCE_DIR}/oneflow/core/comm_network/(epoll|ibverbs)/.*")
       # skip if macOS
@@ -429,6 +433,18 @@ if(BUILD_TESTING)
                           ${oneflow_test_libs})
   endif()
 
+  # benchmarks are built with the tests, but are not run by ctest
+  if(of_all_benchmark_cc)
+    oneflow_add_executable(oneflow_benchmarkexe ${of_all_benchmark_cc})
+    if(BUILD_CUDA)
+      target_link_libraries(oneflow_benchmarkexe CUDA::cudart_static)
+    endif()
+    set_target_properties(oneflow_benchmarkexe PROPERTIES RUNTIME_OUTPUT_DIRECTORY
+                                                          "${PROJECT_BINARY_DIR}/bin")
+    target_link_libraries(oneflow_benchmarkexe ${of_libs} ${oneflow_third_party_libs} glog::glog
+                          ${oneflow_test_libs})
+  endif()
+
   if(BUILD_CPP_API)
     file(GLOB_RECURSE cpp_api_test_files ${PROJECT_SOURCE_DIR}/oneflow/api/cpp/tests/*.cpp)
     oneflow_add_test(
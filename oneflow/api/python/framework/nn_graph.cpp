@@ -75,8 +75,11 @@ ONEFLOW_API_PYBIND11_MODULE("nn.graph.", m) {
            })
       .def_property_readonly("additional_var_names", &APINNGraphAdditionalVarNames)
       .def_property_readonly("additional_var_tensors", &APINNGraphAdditionalVarTensors)
+      .def("set_plan_cache_path", &NNGraph::set_plan_cache_path)
+      .def_property_readonly("plan_cache_hit", &NNGraph::plan_cache_hit)
       .def("complie_and_init_runtime",
-           [](NNGraph& graph) { return graph.CompileAndInitRuntime().GetOrThrow(); });
+           [](NNGraph& graph) { return graph.CompileAndInitRuntime().GetOrThrow(); })
+      .def("close", [](NNGraph& graph) { return graph.Close().GetOrThrow(); });
 
   m.def("RunLazyNNGraph",
         [](const one::TensorTuple& inputs, const one::TensorTuple& outputs,
@@ -15,12 +15,46 @@ limitations under the License.
 */
 #include <pybind11/pybind11.h>
 #include <pybind11/operators.h>
+#include <pybind11/stl.h>
 #include "oneflow/api/python/of_api_registry.h"
 #include "oneflow/core/embedding/embedding_manager.h"
+#include "oneflow/core/embedding/persistent_table.h"
+#include "oneflow/core/embedding/hash_functions.cuh"
 namespace py = pybind11;
 
 namespace oneflow {
 
+namespace {
+
+// The same as the persistent tables of the embeddings
+constexpr uint64_t kTargetChunkSizeMb = 4 * 1024;
+
+embedding::PersistentTableOptions MakePersistentTableOptions(const std::string& path,
+                                                             uint32_t key_size, uint32_t value_size,
+                                                             uint16_t physical_block_size) {
+  embedding::PersistentTableOptions options;
+  options.path = path;
+  options.key_size = key_size;
+  options.value_size = value_size;
+  options.target_chunk_size_mb = kTargetChunkSizeMb;
+  options.physical_block_size = physical_block_size;
+  return options;
+}
+
+// Checks that the rows of the buffer are contiguous, and returns the number of rows
+size_t NumContiguousRows(const py::buffer_info& info, size_t row_size) {
+  CHECK_GE(info.ndim, 1);
+  ssize_t stride = info.itemsize;
+  for (ssize_t i = info.ndim - 1; i >= 0; --i) {
+    if (info.shape.at(i) > 1) { CHECK_EQ(info.strides.at(i), stride) << "not contiguous"; }
+    stride *= info.shape.at(i);
+  }
+  CHECK_EQ(stride % row_size, 0);
+  return stride / row_size;
+}
+
+}  // namespace
+
 class OneEmbeddingHandler final {
  public:
   OneEmbeddingHandler(const std::string& key_value_store_option_string, int64_t local_rank_id,
@@ -32,31 +66,54 @@ class OneEmbeddingHandler final {
   }
 
   void LoadSnapshot(const std::string& snapshot_name) {
-#ifdef WITH_CUDA
     Global<embedding::EmbeddingManager>::Get()->LoadSnapshot(embedding_name_, local_rank_id_,
                                                              rank_id_, snapshot_name);
-#else
-    UNIMPLEMENTED() << "Only Support with CUDA";
-#endif
   }
 
   void SaveSnapshot(const std::string& snapshot_name) {
-#ifdef WITH_CUDA
     Global<embedding::EmbeddingManager>::Get()->SaveSnapshot(embedding_name_, local_rank_id_,
                                                              rank_id_, snapshot_name);
-#else
-    UNIMPLEMENTED() << "Only Support with CUDA";
-#endif
+  }
+
+  void SaveDeltaSnapshot(const std::string& snapshot_name) {
+    Global<embedding::EmbeddingManager>::Get()->SaveDeltaSnapshot(embedding_name_, rank_id_,
+                                                                  snapshot_name);
+  }
+
+  void CompactSnapshot(const std::string& snapshot_name) {
+    Global<embedding::EmbeddingManager>::Get()->CompactSnapshot(embedding_name_, rank_id_,
+                                                                snapshot_name);
+  }
+
+  void Prefetch(const py::buffer& ids) {
+    const py::buffer_info ids_info = ids.request();
+    embedding::KeyValueStore* store =
+        Global<embedding::EmbeddingManager>::Get()->GetKeyValueStore(embedding_name_, rank_id_);
+    CHECK_EQ(ids_info.itemsize, store->KeySize());
+    CHECK_EQ(ids_info.ndim, 1);
+    CHECK_EQ(ids_info.strides.at(0), ids_info.itemsize);
+    store->Prefetch(ids_info.size, ids_info.ptr);
+  }
+
+  py::list CacheStats() {
+    py::list stats_list;
+    for (const auto& stats :
+         Global<embedding::EmbeddingManager>::Get()->GetCacheStats(embedding_name_, rank_id_)) {
+      py::dict stats_dict;
+      stats_dict["num_queries"] = stats.num_queries;
+      stats_dict["num_hits"] = stats.num_hits;
+      stats_dict["num_evictions"] = stats.num_evictions;
+      stats_dict["size"] = stats.size;
+      stats_dict["capacity"] = stats.capacity;
+      stats_list.append(stats_dict);
+    }
+    return stats_list;
   }
 
  private:
   void CreateKeyValueStore(const embedding::KeyValueStoreOptions& key_value_store_options) {
-#ifdef WITH_CUDA
     Global<embedding::EmbeddingManager>::Get()->CreateKeyValueStore(
         key_value_store_options, local_rank_id_, rank_id_, world_size_);
-#else
-    UNIMPLEMENTED() << "Only Support with CUDA";
-#endif
   }
 
   std::string embedding_name_;
@@ -65,6 +122,102 @@ class OneEmbeddingHandler final {
   int64_t world_size_;
 };
 
+class PersistentTableReader final {
+ public:
+  PersistentTableReader(const std::string& path, const std::string& snapshot_name,
+                        uint32_t key_size, uint32_t value_size, uint16_t physical_block_size) {
+    embedding::PersistentTableOptions options =
+        MakePersistentTableOptions(path, key_size, value_size, physical_block_size);
+    options.read_only = true;
+    table_ = embedding::NewPersistentTable(options);
+    iter_ = table_->ReadSnapshot(snapshot_name);
+  }
+
+  // Reads the next rows into keys and values, and returns the number of rows read
+  uint32_t Next(const py::buffer& keys, const py::buffer& values) {
+    const py::buffer_info keys_info = keys.request(true);
+    const py::buffer_info values_info = values.request(true);
+    const size_t num_keys = NumContiguousRows(keys_info, table_->KeySize());
+    CHECK_EQ(NumContiguousRows(values_info, table_->ValueSize()), num_keys);
+    uint32_t n_result = 0;
+    py::gil_scoped_release release;
+    iter_->Next(num_keys, &n_result, keys_info.ptr, values_info.ptr);
+    return n_result;
+  }
+
+ private:
+  std::unique_ptr<embedding::PersistentTable> table_;
+  std::unique_ptr<embedding::PersistentTable::Iterator> iter_;
+};
+
+class PersistentTableWriter final {
+ public:
+  PersistentTableWriter(const std::vector<std::string>& paths, const std::string& snapshot_name,
+                        uint32_t key_size, uint32_t value_size, uint16_t physical_block_size)
+      : snapshot_name_(snapshot_name), key_size_(key_size), value_size_(value_size) {
+    CHECK(key_size_ == sizeof(int32_t) || key_size_ == sizeof(int64_t));
+    for (const std::string& path : paths) {
+      tables_.emplace_back(embedding::NewPersistentTable(
+          MakePersistentTableOptions(path, key_size, value_size, physical_block_size)));
+    }
+  }
+  ~PersistentTableWriter() { Close(); }
+
+  // Puts the rows into the tables, which shard the keys as the embeddings do
+  void Write(const py::buffer& keys, const py::buffer& values) {
+    CHECK(!tables_.empty()) << "The writer is closed";
+    const py::buffer_info keys_info = keys.request();
+    const py::buffer_info values_info = values.request();
+    const size_t num_keys = NumContiguousRows(keys_info, key_size_);
+    CHECK_EQ(NumContiguousRows(values_info, value_size_), num_keys);
+    CHECK_LE(num_keys, std::numeric_limits<uint32_t>::max());
+    py::gil_scoped_release release;
+    if (tables_.size() == 1) {
+      tables_.front()->Put(num_keys, keys_info.ptr, values_info.ptr);
+    } else if (key_size_ == sizeof(int32_t)) {
+      ShardAndPut<int32_t>(num_keys, keys_info.ptr, values_info.ptr);
+    } else {
+      ShardAndPut<int64_t>(num_keys, keys_info.ptr, values_info.ptr);
+    }
+  }
+
+  // Saves the rows written as the snapshot of every table
+  void Close() {
+    for (auto& table : tables_) { table->SaveSnapshot(snapshot_name_); }
+    tables_.clear();
+  }
+
+ private:
+  template<typename Key>
+  void ShardAndPut(size_t num_keys, const void* keys, const void* values) {
+    const size_t num_shards = tables_.size();
+    std::vector<std::vector<Key>> shard_keys(num_shards);
+    std::vector<std::vector<char>> shard_values(num_shards);
+    for (size_t i = 0; i < num_shards; ++i) {
+      shard_keys.at(i).reserve(num_keys / num_shards * 2);
+      shard_values.at(i).reserve(num_keys / num_shards * 2 * value_size_);
+    }
+    const Key* key_ptr = static_cast<const Key*>(keys);
+    const char* value_ptr = static_cast<const char*>(values);
+    for (size_t i = 0; i < num_keys; ++i) {
+      const size_t shard = embedding::ShardingHash()(key_ptr[i]) % num_shards;
+      shard_keys.at(shard).push_back(key_ptr[i]);
+      shard_values.at(shard).insert(shard_values.at(shard).end(), value_ptr + i * value_size_,
+                                    value_ptr + (i + 1) * value_size_);
+    }
+    for (size_t i = 0; i < num_shards; ++i) {
+      if (shard_keys.at(i).empty()) { continue; }
+      tables_.at(i)->Put(shard_keys.at(i).size(), shard_keys.at(i).data(),
+                         shard_values.at(i).data());
+    }
+  }
+
+  std::string snapshot_name_;
+  uint32_t key_size_;
+  uint32_t value_size_;
+  std::vector<std::unique_ptr<embedding::PersistentTable>> tables_;
+};
+
 ONEFLOW_API_PYBIND11_MODULE("", m) {
   py::class_<OneEmbeddingHandler, std::shared_ptr<OneEmbeddingHandler>>(m, "OneEmbeddingHandler")
       .def(py::init([](const std::string& key_value_store_option_str, const int64_t local_rank_id,
@@ -73,7 +226,23 @@ ONEFLOW_API_PYBIND11_MODULE("", m) {
                                                      rank_id, world_size);
       }))
       .def("SaveSnapshot", &OneEmbeddingHandler::SaveSnapshot)
-      .def("LoadSnapshot", &OneEmbeddingHandler::LoadSnapshot);
+      .def("LoadSnapshot", &OneEmbeddingHandler::LoadSnapshot)
+      .def("SaveDeltaSnapshot", &OneEmbeddingHandler::SaveDeltaSnapshot)
+      .def("CompactSnapshot", &OneEmbeddingHandler::CompactSnapshot)
+      .def("Prefetch", &OneEmbeddingHandler::Prefetch)
+      .def("CacheStats", &OneEmbeddingHandler::CacheStats);
+
+  py::class_<PersistentTableReader, std::shared_ptr<PersistentTableReader>>(
+      m, "PersistentTableReader")
+      .def(py::init<const std::string&, const std::string&, uint32_t, uint32_t, uint16_t>())
+      .def("Next", &PersistentTableReader::Next);
+
+  py::class_<PersistentTableWriter, std::shared_ptr<PersistentTableWriter>>(
+      m, "PersistentTableWriter")
+      .def(py::init<const std::vector<std::string>&, const std::string&, uint32_t, uint32_t,
+                    uint16_t>())
+      .def("Write", &PersistentTableWriter::Write)
+      .def("Close", &PersistentTableWriter::Close);
 }
 
 }  // namespace oneflow
@@ -60,6 +60,12 @@ inline Maybe<void> CurJobBuildAndInferCtx_SetTrainConf(const cfg::TrainConf& cfg
 }
 
 inline Maybe<void> CurJobBuildAndInferCtx_Complete() { return JUST(GetCurInferCtx())->Complete(); }
+inline Maybe<void> CurJobBuildAndInferCtx_CompleteFromCachedJob(
+    const std::string& serialized_job) {
+  Job completed_job;
+  CHECK_OR_RETURN(completed_job.ParseFromString(serialized_job)) << "cached job parse failed";
+  return JUST(GetCurInferCtx())->CompleteFromCachedJob(completed_job);
+}
 inline Maybe<void> CurJobBuildAndInferCtx_Rebuild() { return JUST(GetCurInferCtx())->Rebuild(); }
 
 inline Maybe<bool> CurJobBuildAndInferCtx_HasJobConf() {
@@ -54,6 +54,10 @@ inline void CurJobBuildAndInferCtx_Complete() {
   return oneflow::CurJobBuildAndInferCtx_Complete().GetOrThrow();
 }
 
+inline void CurJobBuildAndInferCtx_CompleteFromCachedJob(const std::string& serialized_job) {
+  return oneflow::CurJobBuildAndInferCtx_CompleteFromCachedJob(serialized_job).GetOrThrow();
+}
+
 inline void CurJobBuildAndInferCtx_Rebuild() {
   return oneflow::CurJobBuildAndInferCtx_Rebuild().GetOrThrow();
 }
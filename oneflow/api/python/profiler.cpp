@@ -17,6 +17,7 @@ limitations under the License.
 #include "oneflow/api/python/of_api_registry.h"
 
 #include "oneflow/core/profiler/profiler.h"
+#include "oneflow/core/profiler/host_profiler.h"
 
 namespace py = pybind11;
 
@@ -30,6 +31,32 @@ ONEFLOW_API_PYBIND11_MODULE("profiler", m) {
   m.def("ProfilerStart", []() { profiler::ProfilerStart(); });
 
   m.def("ProfilerStop", []() { profiler::ProfilerStop(); });
+
+  m.def("EnableHostProfiler", []() { profiler::HostProfiler::Get()->Enable(); });
+
+  m.def("DisableHostProfiler", []() {
+    py::list events;
+    for (const auto& event : profiler::HostProfiler::Get()->Disable()) {
+      events.append(py::make_tuple(event.name, event.op_name, event.category, event.thread_id,
+                                   event.start_ns, event.end_ns, event.queue_delay_ns,
+                                   event.allocated_bytes, event.input_shapes));
+    }
+    return events;
+  });
+
+  m.def("RecordHostEvent", [](const std::string& name, const std::string& category,
+                              int64_t start_ns, int64_t end_ns) {
+    if (!profiler::IsHostProfilerEnabled()) { return; }
+    profiler::HostEvent event;
+    event.name = name;
+    event.category = category;
+    event.thread_id = profiler::HostProfiler::CurrentThreadId();
+    event.start_ns = start_ns;
+    event.end_ns = end_ns;
+    profiler::HostProfiler::Get()->RecordEvent(std::move(event));
+  });
+
+  m.def("HostProfilerNowNs", []() { return profiler::HostProfiler::NowNs(); });
 }
 
 }  // namespace oneflow
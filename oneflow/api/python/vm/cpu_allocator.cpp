@@ -0,0 +1,47 @@
+/*
+Copyright 2020 The OneFlow Authors. All rights reserved.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+*/
+#include <pybind11/pybind11.h>
+#include "oneflow/api/python/of_api_registry.h"
+#include "oneflow/core/common/global.h"
+#include "oneflow/core/vm/cpu_allocator.h"
+
+namespace oneflow {
+namespace vm {
+
+namespace py = pybind11;
+
+ONEFLOW_API_PYBIND11_MODULE("vm", m) {
+  m.def("GetCpuAllocatorStats", []() {
+    const CpuAllocator::Stats stats = Global<CpuAllocator>::Get()->GetStats();
+    py::dict stats_dict;
+    stats_dict["allocated_bytes"] = stats.allocated_bytes;
+    stats_dict["in_use_bytes"] = stats.in_use_bytes;
+    stats_dict["peak_in_use_bytes"] = stats.peak_in_use_bytes;
+    stats_dict["cached_bytes"] = stats.cached_bytes;
+    stats_dict["cache_limit_bytes"] = stats.cache_limit_bytes;
+    stats_dict["num_allocs"] = stats.num_allocs;
+    stats_dict["num_cache_hits"] = stats.num_cache_hits;
+    return stats_dict;
+  });
+  m.def("EmptyCpuAllocatorCache", []() { Global<CpuAllocator>::Get()->EmptyCache(); });
+  m.def("SetCpuAllocatorCacheLimit", [](size_t cache_limit_bytes) {
+    Global<CpuAllocator>::Get()->SetCacheLimit(cache_limit_bytes);
+  });
+  m.def("ResetCpuAllocatorPeakStats", []() { Global<CpuAllocator>::Get()->ResetPeakStats(); });
+}
+
+}  // namespace vm
+}  // namespace oneflow
@@ -35,6 +35,7 @@ DEFINE_ENV_INTEGER(ONEFLOW_CHECK_TIMEOUT_SLEEP_SECONDS, EnvInteger<ONEFLOW_TIMEO
 
 DEFINE_ENV_INTEGER(ONEFLOW_VM_BLOCKING_DEBUG_INSTRUCTIONS_DISPLAY_LIMIT, 100);
 DEFINE_ENV_INTEGER(ONEFLOW_DELETE_OUTDATED_SHM_NAMES_INTERVAL, 1000);
+DEFINE_ENV_INTEGER(ONEFLOW_VM_CPU_ALLOCATOR_CACHE_LIMIT_MB, 1024);
 
 template<typename env_var>
 int64_t ThreadLocalEnvInteger();
@@ -21,6 +21,7 @@ limitations under the License.
 #include "oneflow/core/eager/eager_blob_object.h"
 #include "oneflow/core/framework/attr_map.h"
 #include "oneflow/core/framework/op_interpreter.h"
+#include "oneflow/core/profiler/host_profiler.h"
 
 namespace oneflow {
 namespace one {
@@ -89,6 +90,9 @@ class LocalCallOpKernelPhyInstrOperand final : public vm::PhyInstrOperand {
     return consistent_tensor_infer_result_;
   }
 
+  // the time the instruction is issued, -1 if the host profiler is disabled
+  int64_t profiler_issue_time_ns() const { return profiler_issue_time_ns_; }
+
  private:
   LocalCallOpKernelPhyInstrOperand(
       const std::shared_ptr<one::StatefulLocalOpKernel>& opkernel,
@@ -103,7 +107,9 @@ class LocalCallOpKernelPhyInstrOperand final : public vm::PhyInstrOperand {
         op_interp_ctx_(op_interp_ctx_),
         dev_vm_dep_object_consume_mode_(dev_vm_dep_object_consume_mode),
         input_dependences_(),
-        output_dependences_() {
+        output_dependences_(),
+        profiler_issue_time_ns_(profiler::IsHostProfilerEnabled() ? profiler::HostProfiler::NowNs()
+                                                                  : -1) {
     ForEachConstMirroredObject(SetInserter(&input_dependences_));
     ForEachMutMirroredObject(SetInserter(&output_dependences_));
     ForEachMut2MirroredObject(SetInserter(&output_dependences_));
@@ -123,6 +129,7 @@ class LocalCallOpKernelPhyInstrOperand final : public vm::PhyInstrOperand {
   const one::DevVmDepObjectConsumeMode dev_vm_dep_object_consume_mode_;
   DependenceVector input_dependences_;
   DependenceVector output_dependences_;
+  int64_t profiler_issue_time_ns_;
 };
 
 }  // namespace vm
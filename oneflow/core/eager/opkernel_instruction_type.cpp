@@ -35,6 +35,7 @@ limitations under the License.
 #include "oneflow/core/operator/op_conf_symbol.h"
 #include "oneflow/user/kernels/stateful_local_opkernel.h"
 #include "oneflow/core/profiler/profiler.h"
+#include "oneflow/core/profiler/host_profiler.h"
 #include "oneflow/core/common/cpp_attribute.h"
 
 namespace oneflow {
@@ -42,13 +43,17 @@ namespace vm {
 
 struct LocalCallOpKernelUtil final {
   static inline Maybe<void> Compute(const vm::InstructionMsg& instr_msg) {
+    const bool is_host_profiler_enabled = unlikely(profiler::IsHostProfilerEnabled());
+    const int64_t start_ns = is_host_profiler_enabled ? profiler::HostProfiler::NowNs() : 0;
+    int64_t allocated_bytes = 0;
     OF_PROFILER_RANGE_PUSH("ResetPrior");
     auto* operand = LocalCallOpKernelUtil::GetLocalCallOpKernelPhyInstrOperand(instr_msg);
     operand->mut_opkernel()->composed_attrs_for_scheduler_thread()->ResetPrior(operand->attrs());
     DeviceCtx* device_ctx = instr_msg.phy_instr_stream()->device_ctx().get();
     OF_PROFILER_RANGE_POP();
     OF_PROFILER_RANGE_PUSH("AllocateOutputBlobsMemory");
-    JUST(AllocateOutputBlobsMemory(operand, device_ctx));
+    JUST(AllocateOutputBlobsMemory(operand, device_ctx,
+                                   is_host_profiler_enabled ? &allocated_bytes : nullptr));
     OF_PROFILER_RANGE_POP();
     if (unlikely(operand->need_temp_storage())) {
       OF_PROFILER_RANGE_PUSH("TryAllocateTempStorageBlobMemory");
@@ -56,6 +61,10 @@ struct LocalCallOpKernelUtil final {
       JUST(ResetTempStorageBlob(operand));
       JUST(TryAllocateTempStorageBlobMemory(operand, device_ctx));
       OF_PROFILER_RANGE_POP();
+      if (is_host_profiler_enabled) {
+        allocated_bytes +=
+            operand->mut_opkernel()->mut_temp_blob_object()->blob_desc().shape().elem_cnt();
+      }
     }
     user_op::OpKernelState* state = nullptr;
     user_op::OpKernelCache* cache = nullptr;
@@ -70,6 +79,7 @@ struct LocalCallOpKernelUtil final {
       JUST(DeallocateTempStorageBlobMemory(operand, device_ctx));
       OF_PROFILER_RANGE_POP();
     }
+    if (is_host_profiler_enabled) { RecordHostEvent(operand, start_ns, allocated_bytes); }
     return Maybe<void>::Ok();
   }
 
@@ -113,15 +123,44 @@ struct LocalCallOpKernelUtil final {
         operand->consistent_tensor_infer_result().get(), state, cache);
   }
 
+  // Adds the bytes newly allocated to allocated_bytes if it is not nullptr
   static inline Maybe<void> AllocateOutputBlobsMemory(LocalCallOpKernelPhyInstrOperand* operand,
-                                                      DeviceCtx* device_ctx) {
+                                                      DeviceCtx* device_ctx,
+                                                      int64_t* allocated_bytes) {
     for (const auto& blob_object : *operand->outputs()) {
       JUST(blob_object->TryInitBlob());
-      JUST(blob_object->TryAllocateBlobBodyMemory(device_ctx));
+      if (unlikely(allocated_bytes != nullptr)) {
+        const bool is_allocated = blob_object->tensor_storage()->blob_dptr() != nullptr;
+        JUST(blob_object->TryAllocateBlobBodyMemory(device_ctx));
+        if (!is_allocated) { *allocated_bytes += blob_object->tensor_storage()->blob_bytes(); }
+      } else {
+        JUST(blob_object->TryAllocateBlobBodyMemory(device_ctx));
+      }
     }
     return Maybe<void>::Ok();
   }
 
+  static inline void RecordHostEvent(LocalCallOpKernelPhyInstrOperand* operand, int64_t start_ns,
+                                     int64_t allocated_bytes) {
+    profiler::HostEvent event;
+    event.name = operand->opkernel().op_type_name();
+    event.category = "eager";
+    event.thread_id = profiler::HostProfiler::CurrentThreadId();
+    event.start_ns = start_ns;
+    event.end_ns = profiler::HostProfiler::NowNs();
+    if (operand->profiler_issue_time_ns() >= 0) {
+      event.queue_delay_ns = start_ns - operand->profiler_issue_time_ns();
+    }
+    event.allocated_bytes = allocated_bytes;
+    event.input_shapes = "[";
+    for (const auto& blob_object : *operand->inputs()) {
+      if (event.input_shapes.size() > 1) { event.input_shapes += ", "; }
+      event.input_shapes += blob_object->blob_desc().shape().ToString();
+    }
+    event.input_shapes += "]";
+    profiler::HostProfiler::Get()->RecordEvent(std::move(event));
+  }
+
   static inline Maybe<void> TryAllocateTempStorageBlobMemory(
       LocalCallOpKernelPhyInstrOperand* operand, DeviceCtx* device_ctx) {
     return operand->mut_opkernel()->mut_temp_blob_object()->TryAllocateBlobBodyMemory(device_ctx);
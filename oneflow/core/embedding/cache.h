@@ -28,6 +28,7 @@ struct CacheOptions {
   enum class Policy {
     kLRU,
     kFull,
+    kClock,
   };
   enum class MemoryKind {
     kDevice,
@@ -41,6 +42,14 @@ struct CacheOptions {
   float load_factor = 0.75;
 };
 
+struct CacheStats {
+  uint64_t num_queries = 0;
+  uint64_t num_hits = 0;
+  uint64_t num_evictions = 0;
+  uint64_t size = 0;
+  uint64_t capacity = 0;
+};
+
 class Cache {
  public:
   OF_DISALLOW_COPY_AND_MOVE(Cache);
@@ -63,6 +72,12 @@ class Cache {
   virtual void Dump(ep::Stream* stream, uint64_t start_key_index, uint64_t end_key_index,
                     uint32_t* n_dumped, void* keys, void* values) = 0;
   virtual void Clear() = 0;
+  // Only the host caches count queries, hits and evictions
+  virtual CacheStats Stats() const {
+    CacheStats stats;
+    stats.capacity = Capacity();
+    return stats;
+  }
 };
 
 std::unique_ptr<Cache> NewCache(const CacheOptions& options);
@@ -14,6 +14,7 @@ See the License for the specific language governing permissions and
 limitations under the License.
 */
 #include "oneflow/core/embedding/cache.h"
+#include "oneflow/core/embedding/host_cache.h"
 #include "oneflow/core/device/cuda_util.h"
 #include <gtest/gtest.h>
 #include "oneflow/core/ep/include/device_manager_registry.h"
@@ -238,6 +239,157 @@ TEST(Cache, LruCache) {
 
 #endif  // WITH_CUDA
 
+void TestHostCache(Cache* cache, uint32_t line_size) {
+  std::unordered_set<int64_t> in_cache;
+  const size_t n_iter = 32;
+  const uint32_t n_keys = 1024;
+  std::vector<int64_t> keys(n_keys);
+  std::vector<int64_t> missing_keys(n_keys);
+  std::vector<uint32_t> missing_indices(n_keys);
+  std::vector<float> values(n_keys * line_size);
+  std::vector<int64_t> evicted_keys(n_keys);
+  std::vector<float> evicted_values(n_keys * line_size);
+  uint32_t n_missing = 0;
+  uint32_t n_evicted = 0;
+  std::vector<int64_t> random_keys(n_keys * 32);
+  std::iota(random_keys.begin(), random_keys.end(), 1);
+  std::mt19937 g(0);
+  for (size_t iter = 0; iter < n_iter; ++iter) {
+    std::shuffle(random_keys.begin(), random_keys.end(), g);
+    std::copy(random_keys.begin(), random_keys.begin() + n_keys, keys.begin());
+    std::unordered_set<int64_t> expect_missing_keys_set;
+    std::unordered_set<int64_t> keys_set;
+    for (size_t i = 0; i < n_keys; ++i) {
+      keys_set.emplace(keys[i]);
+      if (in_cache.count(keys[i]) == 0) { expect_missing_keys_set.emplace(keys[i]); }
+    }
+    // test
+    cache->Test(nullptr, n_keys, keys.data(), &n_missing, missing_keys.data(),
+                missing_indices.data());
+    ASSERT_EQ(n_missing, expect_missing_keys_set.size());
+    std::unordered_set<int64_t> test_missing_keys_set;
+    for (size_t i = 0; i < n_missing; ++i) {
+      test_missing_keys_set.emplace(missing_keys[i]);
+      ASSERT_EQ(keys[missing_indices[i]], missing_keys[i]);
+    }
+    ASSERT_EQ(test_missing_keys_set, expect_missing_keys_set);
+
+    // get
+    cache->Get(nullptr, n_keys, keys.data(), values.data(), &n_missing, missing_keys.data(),
+               missing_indices.data());
+    ASSERT_EQ(n_missing, expect_missing_keys_set.size());
+    std::unordered_set<int64_t> get_missing_keys_set;
+    for (size_t i = 0; i < n_missing; ++i) {
+      get_missing_keys_set.emplace(missing_keys[i]);
+      ASSERT_EQ(keys[missing_indices[i]], missing_keys[i]);
+    }
+    ASSERT_EQ(get_missing_keys_set, expect_missing_keys_set);
+    for (size_t i = 0; i < n_keys; ++i) {
+      if (get_missing_keys_set.count(keys[i]) == 0) {
+        for (size_t j = 0; j < line_size; ++j) {
+          ASSERT_EQ(values[i * line_size + j], static_cast<float>(keys[i] * line_size + j));
+        }
+      }
+    }
+
+    // put
+    for (size_t i = 0; i < n_keys; ++i) {
+      for (size_t j = 0; j < line_size; ++j) {
+        values[i * line_size + j] = static_cast<float>(keys[i] * line_size + j);
+      }
+    }
+    cache->Put(nullptr, n_keys, keys.data(), values.data(), &n_evicted, evicted_keys.data(),
+               evicted_values.data());
+    for (size_t i = 0; i < n_evicted; ++i) {
+      ASSERT_TRUE(in_cache.count(evicted_keys[i]) > 0 || keys_set.count(evicted_keys[i]) > 0);
+      for (size_t j = 0; j < line_size; ++j) {
+        ASSERT_EQ(evicted_values[i * line_size + j],
+                  static_cast<float>(evicted_keys[i] * line_size + j));
+      }
+    }
+    for (size_t i = 0; i < n_keys; ++i) { in_cache.emplace(keys[i]); }
+    for (size_t i = 0; i < n_evicted; ++i) { in_cache.erase(evicted_keys[i]); }
+    ASSERT_LE(in_cache.size(), cache->Capacity());
+  }
+  const CacheStats stats = cache->Stats();
+  ASSERT_EQ(stats.num_queries, n_iter * n_keys);
+  ASSERT_EQ(stats.size, in_cache.size());
+  const uint64_t dump_capacity = cache->DumpCapacity();
+  for (size_t start_key_index = 0; start_key_index < dump_capacity; start_key_index += n_keys) {
+    cache->Dump(nullptr, start_key_index, std::min(start_key_index + n_keys, dump_capacity),
+                &n_evicted, evicted_keys.data(), evicted_values.data());
+    for (size_t i = 0; i < n_evicted; ++i) {
+      ASSERT_TRUE(in_cache.count(evicted_keys[i]) > 0);
+      in_cache.erase(evicted_keys[i]);
+      for (size_t j = 0; j < line_size; ++j) {
+        ASSERT_EQ(evicted_values[i * line_size + j],
+                  static_cast<float>(evicted_keys[i] * line_size + j));
+      }
+    }
+  }
+  CHECK_EQ(in_cache.size(), 0);
+}
+
+TEST(Cache, HostLruCache) {
+  CacheOptions options{};
+  options.policy = CacheOptions::Policy::kLRU;
+  const uint32_t line_size = 16;
+  options.value_size = 64;
+  options.capacity = 4096;
+  options.key_size = 8;
+  options.value_memory_kind = CacheOptions::MemoryKind::kHost;
+  std::unique_ptr<Cache> cache(NewHostCache(options));
+  cache->ReserveQueryLength(1024);
+  TestHostCache(cache.get(), line_size);
+}
+
+TEST(Cache, HostClockCache) {
+  CacheOptions options{};
+  options.policy = CacheOptions::Policy::kClock;
+  const uint32_t line_size = 16;
+  options.value_size = 64;
+  options.capacity = 4096;
+  options.key_size = 8;
+  options.value_memory_kind = CacheOptions::MemoryKind::kHost;
+  std::unique_ptr<Cache> cache(NewHostCache(options));
+  cache->ReserveQueryLength(1024);
+  TestHostCache(cache.get(), line_size);
+}
+
+TEST(Cache, HostLruCacheEvictsLeastRecentlyUsed) {
+  CacheOptions options{};
+  options.policy = CacheOptions::Policy::kLRU;
+  options.value_size = sizeof(float);
+  options.capacity = 3;
+  options.key_size = sizeof(int64_t);
+  options.value_memory_kind = CacheOptions::MemoryKind::kHost;
+  std::unique_ptr<Cache> cache(NewHostCache(options));
+  int64_t keys[3] = {1, 2, 3};
+  float values[3] = {1, 2, 3};
+  int64_t missing_keys[3];
+  uint32_t missing_indices[3];
+  int64_t evicted_keys[3];
+  float evicted_values[3];
+  uint32_t n_missing = 0;
+  uint32_t n_evicted = 0;
+  cache->Put(nullptr, 3, keys, values, &n_evicted, evicted_keys, evicted_values);
+  ASSERT_EQ(n_evicted, 0);
+  // 2 becomes the least recently used
+  cache->Get(nullptr, 1, keys, values, &n_missing, missing_keys, missing_indices);
+  ASSERT_EQ(n_missing, 0);
+  int64_t new_key = 4;
+  float new_value = 4;
+  cache->Put(nullptr, 1, &new_key, &new_value, &n_evicted, evicted_keys, evicted_values);
+  ASSERT_EQ(n_evicted, 1);
+  ASSERT_EQ(evicted_keys[0], 2);
+  ASSERT_EQ(evicted_values[0], 2);
+  const CacheStats stats = cache->Stats();
+  ASSERT_EQ(stats.num_queries, 1);
+  ASSERT_EQ(stats.num_hits, 1);
+  ASSERT_EQ(stats.num_evictions, 1);
+  ASSERT_EQ(stats.size, 3);
+}
+
 }  // namespace
 
 }  // namespace embedding
@@ -0,0 +1,203 @@
+/*
+Copyright 2020 The OneFlow Authors. All rights reserved.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+*/
+#include "oneflow/core/embedding/cached_key_value_store.h"
+
+#include <shared_mutex>
+
+namespace oneflow {
+
+namespace embedding {
+
+namespace {
+
+// the query length to dump the cache with, if no query has been reserved
+constexpr uint32_t kMinDumpQueryLength = 4096;
+
+// Get and Put use buffers of their own and rely on the shard locks of the cache, so concurrent
+// queries are not serialized on the cache. mutex_ only orders the store against the cache: Put
+// holds it exclusively from the eviction of keys until they are written to the store, and Get
+// holds it shared to read the keys missing in the cache from the store, so a key evicted by a
+// concurrent Put is never read from the store before it has been written.
+class HostCacheKeyValueStoreImpl : public KeyValueStore {
+ public:
+  OF_DISALLOW_COPY_AND_MOVE(HostCacheKeyValueStoreImpl);
+  HostCacheKeyValueStoreImpl(std::unique_ptr<KeyValueStore>&& store,
+                             std::unique_ptr<Cache>&& cache)
+      : store_(std::move(store)), cache_(std::move(cache)), synced_(true), max_query_length_(0) {
+    CHECK_EQ(store_->KeySize(), cache_->KeySize());
+    CHECK_EQ(store_->ValueSize(), cache_->ValueSize());
+  }
+  ~HostCacheKeyValueStoreImpl() override {
+    {
+      std::unique_lock<std::shared_timed_mutex> lock(mutex_);
+      SyncCacheToStore();
+    }
+    cache_.reset();
+    store_.reset();
+  }
+
+  uint32_t KeySize() const override { return store_->KeySize(); }
+  uint32_t ValueSize() const override { return store_->ValueSize(); }
+  uint32_t MaxQueryLength() const override { return max_query_length_; }
+
+  void ReserveQueryLength(uint32_t query_length) override {
+    std::unique_lock<std::shared_timed_mutex> lock(mutex_);
+    if (query_length <= max_query_length_) { return; }
+    if (query_length > cache_->MaxQueryLength()) { cache_->ReserveQueryLength(query_length); }
+    if (query_length > store_->MaxQueryLength()) { store_->ReserveQueryLength(query_length); }
+    max_query_length_ = query_length;
+  }
+
+  void Get(ep::Stream* stream, uint32_t num_keys, const void* keys, void* values,
+           uint32_t* n_missing, uint32_t* missing_indices) override;
+  void Put(ep::Stream* stream, uint32_t num_keys, const void* keys, const void* values) override;
+  void Prefetch(uint32_t num_keys, const void* host_keys) override;
+  bool SnapshotExists(const std::string& name) override { return store_->SnapshotExists(name); }
+  void LoadSnapshot(const std::string& name) override { LoadSnapshot(name, nullptr); }
+  void LoadSnapshot(const std::string& name,
+                    const std::function<void(KVIterator* iter)>& Hook) override;
+  void SaveSnapshot(const std::string& name) override;
+  void SaveDeltaSnapshot(const std::string& name) override;
+  void CompactSnapshot(const std::string& name) override { store_->CompactSnapshot(name); }
+  void GetCacheStats(std::vector<CacheStats>* stats) const override {
+    stats->push_back(cache_->Stats());
+    store_->GetCacheStats(stats);
+  }
+
+ private:
+  // Requires the exclusive lock of mutex_.
+  void SyncCacheToStore();
+
+  std::unique_ptr<KeyValueStore> store_;
+  std::unique_ptr<Cache> cache_;
+
+  std::shared_timed_mutex mutex_;
+  bool synced_;
+  uint32_t max_query_length_;
+};
+
+void HostCacheKeyValueStoreImpl::Get(ep::Stream* stream, uint32_t num_keys, const void* keys,
+                                     void* values, uint32_t* n_missing,
+                                     uint32_t* missing_indices) {
+  CHECK_LE(num_keys, max_query_length_);
+  if (num_keys == 0) {
+    *n_missing = 0;
+    return;
+  }
+  std::vector<char> cache_missing_keys(static_cast<size_t>(num_keys) * KeySize());
+  std::vector<uint32_t> cache_missing_indices(num_keys);
+  uint32_t num_cache_missing = 0;
+  cache_->Get(stream, num_keys, keys, values, &num_cache_missing, cache_missing_keys.data(),
+              cache_missing_indices.data());
+  if (num_cache_missing == 0) {
+    *n_missing = 0;
+    return;
+  }
+  const size_t value_size = ValueSize();
+  std::vector<char> store_values(num_cache_missing * value_size);
+  std::vector<uint32_t> store_missing_indices(num_cache_missing);
+  {
+    std::shared_lock<std::shared_timed_mutex> lock(mutex_);
+    store_->Get(stream, num_cache_missing, cache_missing_keys.data(), store_values.data(),
+                n_missing, store_missing_indices.data());
+  }
+  char* out_values = static_cast<char*>(values);
+  for (uint32_t i = 0; i < num_cache_missing; ++i) {
+    std::memcpy(out_values + cache_missing_indices[i] * value_size,
+                store_values.data() + i * value_size, value_size);
+  }
+  for (uint32_t i = 0; i < *n_missing; ++i) {
+    missing_indices[i] = cache_missing_indices[store_missing_indices[i]];
+  }
+}
+
+void HostCacheKeyValueStoreImpl::Put(ep::Stream* stream, uint32_t num_keys, const void* keys,
+                                     const void* values) {
+  CHECK_LE(num_keys, max_query_length_);
+  if (num_keys == 0) { return; }
+  std::vector<char> evicted_keys(static_cast<size_t>(num_keys) * KeySize());
+  std::vector<char> evicted_values(static_cast<size_t>(num_keys) * ValueSize());
+  uint32_t num_evicted = 0;
+  std::unique_lock<std::shared_timed_mutex> lock(mutex_);
+  synced_ = false;
+  cache_->Put(stream, num_keys, keys, values, &num_evicted, evicted_keys.data(),
+              evicted_values.data());
+  store_->Put(stream, num_evicted, evicted_keys.data(), evicted_values.data());
+}
+
+void HostCacheKeyValueStoreImpl::Prefetch(uint32_t num_keys, const void* host_keys) {
+  if (num_keys == 0) { return; }
+  // Only the keys missing in the cache are prefetched from the store.
+  std::vector<char> missing_keys(static_cast<size_t>(num_keys) * KeySize());
+  std::vector<uint32_t> missing_indices(num_keys);
+  uint32_t num_missing = 0;
+  cache_->Test(nullptr, num_keys, host_keys, &num_missing, missing_keys.data(),
+               missing_indices.data());
+  store_->Prefetch(num_missing, missing_keys.data());
+}
+
+void HostCacheKeyValueStoreImpl::LoadSnapshot(const std::string& name,
+                                              const std::function<void(KVIterator* iter)>& Hook) {
+  std::unique_lock<std::shared_timed_mutex> lock(mutex_);
+  cache_->Clear();
+  synced_ = true;
+  store_->LoadSnapshot(name, Hook);
+}
+
+void HostCacheKeyValueStoreImpl::SaveSnapshot(const std::string& name) {
+  std::unique_lock<std::shared_timed_mutex> lock(mutex_);
+  SyncCacheToStore();
+  store_->SaveSnapshot(name);
+}
+
+void HostCacheKeyValueStoreImpl::SaveDeltaSnapshot(const std::string& name) {
+  std::unique_lock<std::shared_timed_mutex> lock(mutex_);
+  SyncCacheToStore();
+  store_->SaveDeltaSnapshot(name);
+}
+
+void HostCacheKeyValueStoreImpl::SyncCacheToStore() {
+  if (synced_) { return; }
+  const uint32_t dump_query_length = std::max(max_query_length_, kMinDumpQueryLength);
+  if (dump_query_length > store_->MaxQueryLength()) {
+    store_->ReserveQueryLength(dump_query_length);
+  }
+  std::vector<char> keys(static_cast<size_t>(dump_query_length) * KeySize());
+  std::vector<char> values(static_cast<size_t>(dump_query_length) * ValueSize());
+  const uint64_t dump_capacity = cache_->DumpCapacity();
+  for (uint64_t start_key_index = 0; start_key_index < dump_capacity;
+       start_key_index += dump_query_length) {
+    uint32_t num_dumped = 0;
+    cache_->Dump(nullptr, start_key_index,
+                 std::min(start_key_index + dump_query_length, dump_capacity), &num_dumped,
+                 keys.data(), values.data());
+    if (num_dumped == 0) { continue; }
+    store_->Put(nullptr, num_dumped, keys.data(), values.data());
+  }
+  synced_ = true;
+}
+
+}  // namespace
+
+std::unique_ptr<KeyValueStore> NewHostCachedKeyValueStore(std::unique_ptr<KeyValueStore>&& store,
+                                                          std::unique_ptr<Cache>&& cache) {
+  return std::unique_ptr<KeyValueStore>(
+      new HostCacheKeyValueStoreImpl(std::move(store), std::move(cache)));
+}
+
+}  // namespace embedding
+
+}  // namespace oneflow
@@ -92,11 +92,22 @@ class CacheKeyValueStoreImpl : public KeyValueStore {
   void Get(ep::Stream* stream, uint32_t num_keys, const void* keys, void* values,
            uint32_t* n_missing, uint32_t* missing_indices) override;
   void Put(ep::Stream* stream, uint32_t num_keys, const void* keys, const void* values) override;
+  // The cache is tested with device keys only, so all the keys are prefetched from the store. The
+  // staged values of the keys hit in the cache are dropped once the staging area fills up.
+  void Prefetch(uint32_t num_keys, const void* host_keys) override {
+    store_->Prefetch(num_keys, host_keys);
+  }
   bool SnapshotExists(const std::string& name) override;
   void LoadSnapshot(const std::string& name) override;
   void SaveSnapshot(const std::string& name) override;
+  void SaveDeltaSnapshot(const std::string& name) override;
+  void CompactSnapshot(const std::string& name) override { store_->CompactSnapshot(name); }
   void LoadSnapshot(const std::string& name,
                     const std::function<void(KVIterator* iter)>& Hook) override;
+  void GetCacheStats(std::vector<CacheStats>* stats) const override {
+    stats->push_back(cache_->Stats());
+    store_->GetCacheStats(stats);
+  }
 
  private:
   void SyncCacheToStore();
@@ -217,6 +228,14 @@ void CacheKeyValueStoreImpl<Key, Elem>::SaveSnapshot(const std::string& name) {
   store_->SaveSnapshot(name);
 }
 
+template<typename Key, typename Elem>
+void CacheKeyValueStoreImpl<Key, Elem>::SaveDeltaSnapshot(const std::string& name) {
+  CudaCurrentDeviceGuard guard(device_index_);
+  std::lock_guard<std::recursive_mutex> lock(mutex_);
+  SyncCacheToStore();
+  store_->SaveDeltaSnapshot(name);
+}
+
 template<typename Key, typename Elem>
 void CacheKeyValueStoreImpl<Key, Elem>::SyncCacheToStore() {
   if (synced_) { return; }
@@ -26,6 +26,10 @@ namespace embedding {
 std::unique_ptr<KeyValueStore> NewCachedKeyValueStore(std::unique_ptr<KeyValueStore>&& store,
                                                       std::unique_ptr<Cache>&& cache);
 
+// Puts a host cache in front of a host store
+std::unique_ptr<KeyValueStore> NewHostCachedKeyValueStore(std::unique_ptr<KeyValueStore>&& store,
+                                                          std::unique_ptr<Cache>&& cache);
+
 }  // namespace embedding
 
 }  // namespace oneflow
@@ -17,12 +17,32 @@ limitations under the License.
 #include "oneflow/core/embedding/persistent_table_key_value_store.h"
 #include "oneflow/core/ep/include/device_manager_registry.h"
 #include "oneflow/core/embedding/cached_key_value_store.h"
+#include "oneflow/core/embedding/host_cache.h"
+#include "oneflow/core/embedding/quantized_key_value_store.h"
 
 namespace oneflow {
 
 namespace embedding {
 
-#ifdef WITH_CUDA
+namespace {
+
+std::unique_ptr<KeyValueStore> NewHostKeyValueStore(
+    const KeyValueStoreOptions& key_value_store_options,
+    const PersistentTableKeyValueStoreOptions& options) {
+  std::unique_ptr<KeyValueStore> store = NewHostPersistentTableKeyValueStore(options);
+  const std::vector<CacheOptions>& cache_options = key_value_store_options.GetCachesOptions();
+  for (int i = cache_options.size() - 1; i >= 0; --i) {
+    std::unique_ptr<Cache> cache = NewHostCache(cache_options.at(i));
+    store = NewHostCachedKeyValueStore(std::move(store), std::move(cache));
+  }
+  if (key_value_store_options.IsQuantized()) {
+    store = NewHostQuantizedKeyValueStore(std::move(store),
+                                          key_value_store_options.QuantizedOptions());
+  }
+  return store;
+}
+
+}  // namespace
 
 KeyValueStore* EmbeddingManager::GetKeyValueStore(const std::string& embedding_name,
                                                   int64_t rank_id) {
@@ -34,12 +54,17 @@ KeyValueStore* EmbeddingManager::GetKeyValueStore(const std::string& embedding_n
   return it->second.get();
 }
 
+std::vector<CacheStats> EmbeddingManager::GetCacheStats(const std::string& embedding_name,
+                                                        int64_t rank_id) {
+  std::vector<CacheStats> stats;
+  GetKeyValueStore(embedding_name, rank_id)->GetCacheStats(&stats);
+  return stats;
+}
+
 void EmbeddingManager::CreateKeyValueStore(const KeyValueStoreOptions& key_value_store_options,
                                            int64_t local_rank_id, int64_t rank_id,
                                            int64_t world_size) {
-  CudaCurrentDeviceGuard guard(local_rank_id);
   const std::string& name = key_value_store_options.Name();
-  const uint32_t line_size = key_value_store_options.LineSize();
   std::pair<std::string, int64_t> map_key = std::make_pair(name, rank_id);
   std::unique_lock<std::mutex> lock(mutex_);
 
@@ -49,24 +74,37 @@ void EmbeddingManager::CreateKeyValueStore(const KeyValueStoreOptions& key_value
       key_value_store_options.PersistentTablePaths();
   CHECK_EQ(persistent_table_paths.size(), world_size);
   options.table_options.path = persistent_table_paths.at(rank_id);
-  options.table_options.value_size = line_size * key_value_store_options.ValueTypeSize();
+  options.table_options.value_size = key_value_store_options.StoredValueSize();
   options.table_options.key_size = key_value_store_options.KeyTypeSize();
   options.table_options.physical_block_size =
       key_value_store_options.PersistentTablePhysicalBlockSize();
   options.table_options.target_chunk_size_mb = 4 * 1024;
   options.table_options.capacity_hint = key_value_store_options.PersistentTableCapacityHint();
-  store = NewPersistentTableKeyValueStore(options);
-  const std::vector<CacheOptions>& cache_options = key_value_store_options.GetCachesOptions();
-  for (int i = cache_options.size() - 1; i >= 0; --i) {
-    std::unique_ptr<Cache> cache = NewCache(cache_options.at(i));
-    store = NewCachedKeyValueStore(std::move(store), std::move(cache));
+  if (key_value_store_options.GetDeviceType() == DeviceType::kCPU) {
+    store = NewHostKeyValueStore(key_value_store_options, options);
+  } else {
+#ifdef WITH_CUDA
+    CudaCurrentDeviceGuard guard(local_rank_id);
+    store = NewPersistentTableKeyValueStore(options);
+    const std::vector<CacheOptions>& cache_options = key_value_store_options.GetCachesOptions();
+    for (int i = cache_options.size() - 1; i >= 0; --i) {
+      std::unique_ptr<Cache> cache = NewCache(cache_options.at(i));
+      store = NewCachedKeyValueStore(std::move(store), std::move(cache));
+    }
+    if (key_value_store_options.IsQuantized()) {
+      store =
+          NewQuantizedKeyValueStore(std::move(store), key_value_store_options.QuantizedOptions());
+    }
+#else
+    UNIMPLEMENTED() << "The cuda key value store requires WITH_CUDA, use device_type cpu instead";
+#endif  // WITH_CUDA
   }
   key_value_store_map_.emplace(map_key, std::move(store));
 }
 
 void EmbeddingManager::SaveSnapshot(const std::string& embedding_name, int64_t local_rank_id,
                                     int64_t rank_id, const std::string& snapshot_name) {
-  CudaCurrentDeviceGuard guard(local_rank_id);
+  // the cuda stores guard their own devices
   std::pair<std::string, int64_t> map_key = std::make_pair(embedding_name, rank_id);
   std::unique_lock<std::mutex> lock(mutex_);
 
@@ -76,9 +114,19 @@ void EmbeddingManager::SaveSnapshot(const std::string& embedding_name, int64_t l
   it->second->SaveSnapshot(snapshot_name);
 }
 
+void EmbeddingManager::SaveDeltaSnapshot(const std::string& embedding_name, int64_t rank_id,
+                                         const std::string& snapshot_name) {
+  GetKeyValueStore(embedding_name, rank_id)->SaveDeltaSnapshot(snapshot_name);
+}
+
+void EmbeddingManager::CompactSnapshot(const std::string& embedding_name, int64_t rank_id,
+                                       const std::string& snapshot_name) {
+  GetKeyValueStore(embedding_name, rank_id)->CompactSnapshot(snapshot_name);
+}
+
 void EmbeddingManager::LoadSnapshot(const std::string& embedding_name, int64_t local_rank_id,
                                     int64_t rank_id, const std::string& snapshot_name) {
-  CudaCurrentDeviceGuard guard(local_rank_id);
+  // the cuda stores guard their own devices
   std::pair<std::string, int64_t> map_key = std::make_pair(embedding_name, rank_id);
   auto it = key_value_store_map_.find(map_key);
   CHECK(it != key_value_store_map_.end())
@@ -91,8 +139,6 @@ void EmbeddingManager::LoadSnapshot(const std::string& embedding_name, int64_t l
   }
 }
 
-#endif  // WITH_CUDA
-
 }  // namespace embedding
 
 }  // namespace oneflow
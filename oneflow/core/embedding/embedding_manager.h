@@ -25,8 +25,6 @@ namespace oneflow {
 
 namespace embedding {
 
-#ifdef WITH_CUDA
-
 class EmbeddingManager final {
  public:
   EmbeddingManager() = default;
@@ -36,9 +34,15 @@ class EmbeddingManager final {
                     const std::string& snapshot_name);
   void LoadSnapshot(const std::string& embedding_name, int64_t local_rank_id, int64_t rank_id,
                     const std::string& snapshot_name);
+  void SaveDeltaSnapshot(const std::string& embedding_name, int64_t rank_id,
+                         const std::string& snapshot_name);
+  void CompactSnapshot(const std::string& embedding_name, int64_t rank_id,
+                       const std::string& snapshot_name);
 
   KeyValueStore* GetKeyValueStore(const std::string& embedding_name, int64_t rank_id);
 
+  std::vector<CacheStats> GetCacheStats(const std::string& embedding_name, int64_t rank_id);
+
   void CreateKeyValueStore(const KeyValueStoreOptions& options, int64_t local_rank_id,
                            int64_t rank_id, int64_t world_size);
 
@@ -47,8 +51,6 @@ class EmbeddingManager final {
   std::mutex mutex_;
 };
 
-#endif  // WITH_CUDA
-
 }  // namespace embedding
 }  // namespace oneflow
 
@@ -0,0 +1,377 @@
+/*
+Copyright 2020 The OneFlow Authors. All rights reserved.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+*/
+#include "oneflow/core/embedding/host_cache.h"
+#include "oneflow/core/common/util.h"
+
+namespace oneflow {
+
+namespace embedding {
+
+namespace {
+
+constexpr uint32_t kMaxNumShards = 64;
+// the eviction is exact within a shard, so small caches are not split
+constexpr uint64_t kMinShardCapacity = 1024;
+constexpr uint32_t kInvalidSlot = std::numeric_limits<uint32_t>::max();
+
+template<typename Key>
+uint32_t ShardIndex(Key key, uint32_t num_shards) {
+  // fibonacci hashing, so that consecutive keys spread over the shards
+  const uint64_t hash = static_cast<uint64_t>(key) * 0x9E3779B97F4A7C15ULL;
+  return static_cast<uint32_t>((hash >> 32) % num_shards);
+}
+
+// A shard holds at most `capacity` entries in the slots [0, size). The slots are only freed by
+// Clear, a new key takes an empty slot or the slot of the evicted key.
+template<typename Key>
+struct Shard {
+  Shard(uint32_t capacity, uint32_t value_size)
+      : keys(capacity),
+        values(static_cast<size_t>(capacity) * value_size),
+        prev(capacity, kInvalidSlot),
+        next(capacity, kInvalidSlot),
+        referenced(capacity, 0),
+        head(kInvalidSlot),
+        tail(kInvalidSlot),
+        hand(0),
+        size(0) {}
+
+  std::mutex mutex;
+  HashMap<Key, uint32_t> key2slot;
+  std::vector<Key> keys;
+  std::vector<char> values;
+  // the lru list, from the most recently used slot at head to the least at tail
+  std::vector<uint32_t> prev;
+  std::vector<uint32_t> next;
+  // the reference bits of clock
+  std::vector<uint8_t> referenced;
+  uint32_t head;
+  uint32_t tail;
+  uint32_t hand;
+  uint32_t size;
+};
+
+template<typename Key>
+class HostCacheImpl : public Cache {
+ public:
+  OF_DISALLOW_COPY_AND_MOVE(HostCacheImpl);
+  explicit HostCacheImpl(const CacheOptions& options)
+      : value_size_(options.value_size),
+        policy_(options.policy),
+        max_query_length_(0),
+        num_queries_(0),
+        num_hits_(0),
+        num_evictions_(0) {
+    num_shards_ = static_cast<uint32_t>(
+        std::max<uint64_t>(std::min<uint64_t>(options.capacity / kMinShardCapacity, kMaxNumShards),
+                           1));
+    shard_capacity_ = static_cast<uint32_t>(RoundUp(options.capacity, num_shards_) / num_shards_);
+    for (uint32_t i = 0; i < num_shards_; ++i) {
+      shards_.emplace_back(new Shard<Key>(shard_capacity_, value_size_));
+    }
+  }
+  ~HostCacheImpl() override = default;
+
+  uint32_t KeySize() const override { return sizeof(Key); }
+  uint32_t ValueSize() const override { return value_size_; }
+  uint32_t MaxQueryLength() const override { return max_query_length_; }
+  void ReserveQueryLength(uint32_t query_length) override {
+    max_query_length_ = std::max(max_query_length_, query_length);
+  }
+  uint64_t Capacity() const override {
+    return static_cast<uint64_t>(shard_capacity_) * num_shards_;
+  }
+  CacheOptions::Policy Policy() const override { return policy_; }
+
+  void Test(ep::Stream* stream, uint32_t n_keys, const void* keys, uint32_t* n_missing,
+            void* missing_keys, uint32_t* missing_indices) override;
+  void Get(ep::Stream* stream, uint32_t n_keys, const void* keys, void* values,
+           uint32_t* n_missing, void* missing_keys, uint32_t* missing_indices) override;
+  void Put(ep::Stream* stream, uint32_t n_keys, const void* keys, const void* values,
+           uint32_t* n_evicted, void* evicted_keys, void* evicted_values) override;
+  void Dump(ep::Stream* stream, uint64_t start_key_index, uint64_t end_key_index,
+            uint32_t* n_dumped, void* keys, void* values) override;
+  void Clear() override;
+  CacheStats Stats() const override;
+
+ private:
+  // Groups the indices of keys by shard, so that every shard is locked once per query
+  void GroupByShard(uint32_t n_keys, const Key* keys, std::vector<uint32_t>* offsets,
+                    std::vector<uint32_t>* indices) const;
+  void Touch(Shard<Key>* shard, uint32_t slot) const;
+  uint32_t Evict(Shard<Key>* shard) const;
+
+  uint32_t value_size_;
+  CacheOptions::Policy policy_;
+  uint32_t max_query_length_;
+  uint32_t num_shards_;
+  uint32_t shard_capacity_;
+  std::vector<std::unique_ptr<Shard<Key>>> shards_;
+  std::atomic<uint64_t> num_queries_;
+  std::atomic<uint64_t> num_hits_;
+  std::atomic<uint64_t> num_evictions_;
+};
+
+template<typename Key>
+void HostCacheImpl<Key>::GroupByShard(uint32_t n_keys, const Key* keys,
+                                      std::vector<uint32_t>* offsets,
+                                      std::vector<uint32_t>* indices) const {
+  std::vector<uint32_t> shard_indices(n_keys);
+  offsets->assign(num_shards_ + 1, 0);
+  for (uint32_t i = 0; i < n_keys; ++i) {
+    shard_indices[i] = ShardIndex(keys[i], num_shards_);
+    offsets->at(shard_indices[i] + 1) += 1;
+  }
+  for (uint32_t i = 0; i < num_shards_; ++i) { offsets->at(i + 1) += offsets->at(i); }
+  std::vector<uint32_t> cursors(offsets->begin(), offsets->end() - 1);
+  indices->resize(n_keys);
+  for (uint32_t i = 0; i < n_keys; ++i) { indices->at(cursors[shard_indices[i]]++) = i; }
+}
+
+template<typename Key>
+void HostCacheImpl<Key>::Touch(Shard<Key>* shard, uint32_t slot) const {
+  if (policy_ == CacheOptions::Policy::kClock) {
+    shard->referenced[slot] = 1;
+    return;
+  }
+  if (shard->head == slot) { return; }
+  // unlink
+  if (shard->prev[slot] != kInvalidSlot) { shard->next[shard->prev[slot]] = shard->next[slot]; }
+  if (shard->next[slot] != kInvalidSlot) { shard->prev[shard->next[slot]] = shard->prev[slot]; }
+  if (shard->tail == slot) { shard->tail = shard->prev[slot]; }
+  // push front
+  shard->prev[slot] = kInvalidSlot;
+  shard->next[slot] = shard->head;
+  if (shard->head != kInvalidSlot) { shard->prev[shard->head] = slot; }
+  shard->head = slot;
+  if (shard->tail == kInvalidSlot) { shard->tail = slot; }
+}
+
+template<typename Key>
+uint32_t HostCacheImpl<Key>::Evict(Shard<Key>* shard) const {
+  if (policy_ == CacheOptions::Policy::kClock) {
+    while (shard->referenced[shard->hand] != 0) {
+      shard->referenced[shard->hand] = 0;
+      shard->hand = (shard->hand + 1) % shard_capacity_;
+    }
+    const uint32_t slot = shard->hand;
+    shard->hand = (shard->hand + 1) % shard_capacity_;
+    return slot;
+  }
+  return shard->tail;
+}
+
+template<typename Key>
+void HostCacheImpl<Key>::Test(ep::Stream* stream, uint32_t n_keys, const void* keys,
+                              uint32_t* n_missing, void* missing_keys,
+                              uint32_t* missing_indices) {
+  const Key* query_keys = static_cast<const Key*>(keys);
+  Key* query_missing_keys = static_cast<Key*>(missing_keys);
+  std::vector<uint32_t> offsets;
+  std::vector<uint32_t> indices;
+  GroupByShard(n_keys, query_keys, &offsets, &indices);
+  uint32_t num_missing = 0;
+  for (uint32_t shard_id = 0; shard_id < num_shards_; ++shard_id) {
+    if (offsets[shard_id] == offsets[shard_id + 1]) { continue; }
+    Shard<Key>* shard = shards_[shard_id].get();
+    std::lock_guard<std::mutex> lock(shard->mutex);
+    for (uint32_t i = offsets[shard_id]; i < offsets[shard_id + 1]; ++i) {
+      const uint32_t index = indices[i];
+      if (shard->key2slot.find(query_keys[index]) == shard->key2slot.end()) {
+        query_missing_keys[num_missing] = query_keys[index];
+        missing_indices[num_missing] = index;
+        num_missing += 1;
+      }
+    }
+  }
+  *n_missing = num_missing;
+}
+
+template<typename Key>
+void HostCacheImpl<Key>::Get(ep::Stream* stream, uint32_t n_keys, const void* keys, void* values,
+                             uint32_t* n_missing, void* missing_keys,
+                             uint32_t* missing_indices) {
+  const Key* query_keys = static_cast<const Key*>(keys);
+  Key* query_missing_keys = static_cast<Key*>(missing_keys);
+  char* query_values = static_cast<char*>(values);
+  std::vector<uint32_t> offsets;
+  std::vector<uint32_t> indices;
+  GroupByShard(n_keys, query_keys, &offsets, &indices);
+  uint32_t num_missing = 0;
+  for (uint32_t shard_id = 0; shard_id < num_shards_; ++shard_id) {
+    if (offsets[shard_id] == offsets[shard_id + 1]) { continue; }
+    Shard<Key>* shard = shards_[shard_id].get();
+    std::lock_guard<std::mutex> lock(shard->mutex);
+    for (uint32_t i = offsets[shard_id]; i < offsets[shard_id + 1]; ++i) {
+      const uint32_t index = indices[i];
+      auto it = shard->key2slot.find(query_keys[index]);
+      if (it == shard->key2slot.end()) {
+        query_missing_keys[num_missing] = query_keys[index];
+        missing_indices[num_missing] = index;
+        num_missing += 1;
+      } else {
+        std::memcpy(query_values + static_cast<size_t>(index) * value_size_,
+                    shard->values.data() + static_cast<size_t>(it->second) * value_size_,
+                    value_size_);
+        Touch(shard, it->second);
+      }
+    }
+  }
+  *n_missing = num_missing;
+  num_queries_.fetch_add(n_keys, std::memory_order_relaxed);
+  num_hits_.fetch_add(n_keys - num_missing, std::memory_order_relaxed);
+}
+
+template<typename Key>
+void HostCacheImpl<Key>::Put(ep::Stream* stream, uint32_t n_keys, const void* keys,
+                             const void* values, uint32_t* n_evicted, void* evicted_keys,
+                             void* evicted_values) {
+  const Key* put_keys = static_cast<const Key*>(keys);
+  const char* put_values = static_cast<const char*>(values);
+  Key* out_evicted_keys = static_cast<Key*>(evicted_keys);
+  char* out_evicted_values = static_cast<char*>(evicted_values);
+  std::vector<uint32_t> offsets;
+  std::vector<uint32_t> indices;
+  GroupByShard(n_keys, put_keys, &offsets, &indices);
+  uint32_t num_evicted = 0;
+  for (uint32_t shard_id = 0; shard_id < num_shards_; ++shard_id) {
+    if (offsets[shard_id] == offsets[shard_id + 1]) { continue; }
+    Shard<Key>* shard = shards_[shard_id].get();
+    std::lock_guard<std::mutex> lock(shard->mutex);
+    // update the keys in the cache first, so that they are not evicted by the new keys
+    std::vector<uint32_t> new_key_indices;
+    for (uint32_t i = offsets[shard_id]; i < offsets[shard_id + 1]; ++i) {
+      const uint32_t index = indices[i];
+      auto it = shard->key2slot.find(put_keys[index]);
+      if (it == shard->key2slot.end()) {
+        new_key_indices.push_back(index);
+        continue;
+      }
+      std::memcpy(shard->values.data() + static_cast<size_t>(it->second) * value_size_,
+                  put_values + static_cast<size_t>(index) * value_size_, value_size_);
+      Touch(shard, it->second);
+    }
+    for (const uint32_t index : new_key_indices) {
+      const Key key = put_keys[index];
+      uint32_t slot = kInvalidSlot;
+      auto it = shard->key2slot.find(key);
+      if (it != shard->key2slot.end()) {
+        // duplicated new keys
+        slot = it->second;
+      } else if (shard->size < shard_capacity_) {
+        slot = shard->size;
+        shard->size += 1;
+        shard->key2slot.emplace(key, slot);
+        shard->keys[slot] = key;
+      } else {
+        slot = Evict(shard);
+        const Key evicted_key = shard->keys[slot];
+        CHECK(out_evicted_keys != nullptr) << "the cache is full";
+        out_evicted_keys[num_evicted] = evicted_key;
+        std::memcpy(out_evicted_values + static_cast<size_t>(num_evicted) * value_size_,
+                    shard->values.data() + static_cast<size_t>(slot) * value_size_, value_size_);
+        num_evicted += 1;
+        shard->key2slot.erase(evicted_key);
+        shard->key2slot.emplace(key, slot);
+        shard->keys[slot] = key;
+      }
+      std::memcpy(shard->values.data() + static_cast<size_t>(slot) * value_size_,
+                  put_values + static_cast<size_t>(index) * value_size_, value_size_);
+      Touch(shard, slot);
+    }
+  }
+  *n_evicted = num_evicted;
+  num_evictions_.fetch_add(num_evicted, std::memory_order_relaxed);
+}
+
+template<typename Key>
+void HostCacheImpl<Key>::Dump(ep::Stream* stream, uint64_t start_key_index,
+                              uint64_t end_key_index, uint32_t* n_dumped, void* keys,
+                              void* values) {
+  Key* dump_keys = static_cast<Key*>(keys);
+  char* dump_values = static_cast<char*>(values);
+  uint32_t num_dumped = 0;
+  uint64_t key_index = start_key_index;
+  while (key_index < end_key_index) {
+    const uint32_t shard_id = key_index / shard_capacity_;
+    const uint64_t shard_start = static_cast<uint64_t>(shard_id) * shard_capacity_;
+    const uint64_t shard_end = std::min(shard_start + shard_capacity_, end_key_index);
+    Shard<Key>* shard = shards_[shard_id].get();
+    std::lock_guard<std::mutex> lock(shard->mutex);
+    const uint64_t end_slot = std::min<uint64_t>(shard_end - shard_start, shard->size);
+    for (uint64_t slot = key_index - shard_start; slot < end_slot; ++slot) {
+      dump_keys[num_dumped] = shard->keys[slot];
+      std::memcpy(dump_values + static_cast<size_t>(num_dumped) * value_size_,
+                  shard->values.data() + slot * value_size_, value_size_);
+      num_dumped += 1;
+    }
+    key_index = shard_end;
+  }
+  *n_dumped = num_dumped;
+}
+
+template<typename Key>
+void HostCacheImpl<Key>::Clear() {
+  for (auto& shard : shards_) {
+    std::lock_guard<std::mutex> lock(shard->mutex);
+    shard->key2slot.clear();
+    std::fill(shard->prev.begin(), shard->prev.end(), kInvalidSlot);
+    std::fill(shard->next.begin(), shard->next.end(), kInvalidSlot);
+    std::fill(shard->referenced.begin(), shard->referenced.end(), 0);
+    shard->head = kInvalidSlot;
+    shard->tail = kInvalidSlot;
+    shard->hand = 0;
+    shard->size = 0;
+  }
+}
+
+template<typename Key>
+CacheStats HostCacheImpl<Key>::Stats() const {
+  CacheStats stats;
+  stats.num_queries = num_queries_.load(std::memory_order_relaxed);
+  stats.num_hits = num_hits_.load(std::memory_order_relaxed);
+  stats.num_evictions = num_evictions_.load(std::memory_order_relaxed);
+  stats.capacity = Capacity();
+  for (const auto& shard : shards_) {
+    std::lock_guard<std::mutex> lock(shard->mutex);
+    stats.size += shard->size;
+  }
+  return stats;
+}
+
+}  // namespace
+
+std::unique_ptr<Cache> NewHostCache(const CacheOptions& options) {
+  CHECK_GT(options.value_size, 0);
+  CHECK_GT(options.capacity, 0);
+  CHECK(options.value_memory_kind == CacheOptions::MemoryKind::kHost)
+      << "The value_memory_kind of cpu caches must be host";
+  CHECK(options.policy == CacheOptions::Policy::kLRU
+        || options.policy == CacheOptions::Policy::kClock)
+      << "Only lru and clock caches are supported on cpu";
+  if (options.key_size == sizeof(uint32_t)) {
+    return std::unique_ptr<Cache>(new HostCacheImpl<uint32_t>(options));
+  } else if (options.key_size == sizeof(uint64_t)) {
+    return std::unique_ptr<Cache>(new HostCacheImpl<uint64_t>(options));
+  } else {
+    UNIMPLEMENTED();
+    return nullptr;
+  }
+}
+
+}  // namespace embedding
+
+}  // namespace oneflow
@@ -17,6 +17,7 @@ limitations under the License.
 #define ONEFLOW_CORE_EMBEDDING_KEY_VALUE_STORE_H_
 
 #include "oneflow/core/embedding/kv_iterator.h"
+#include "oneflow/core/embedding/cache.h"
 #include "oneflow/core/common/util.h"
 #include "oneflow/core/ep/include/stream.h"
 
@@ -38,11 +39,18 @@ class KeyValueStore {
   virtual void Get(ep::Stream* stream, uint32_t num_keys, const void* keys, void* values,
                    uint32_t* n_missing, uint32_t* missing_indices) = 0;
   virtual void Put(ep::Stream* stream, uint32_t num_keys, const void* keys, const void* values) = 0;
+  // Starts reading the values of the keys, which are in host memory, for the next Get of them
+  virtual void Prefetch(uint32_t num_keys, const void* host_keys) {}
   virtual bool SnapshotExists(const std::string& name) = 0;
   virtual void LoadSnapshot(const std::string& name) = 0;
   virtual void LoadSnapshot(const std::string& name,
                             const std::function<void(KVIterator* iter)>& Hook) = 0;
   virtual void SaveSnapshot(const std::string& name) = 0;
+  // Saves only the chunks changed since the snapshot saved or loaded last, see PersistentTable
+  virtual void SaveDeltaSnapshot(const std::string& name) = 0;
+  virtual void CompactSnapshot(const std::string& name) = 0;
+  // Appends the stats of the caches from the outermost to the innermost
+  virtual void GetCacheStats(std::vector<CacheStats>* stats) const {}
 };
 
 }  // namespace embedding
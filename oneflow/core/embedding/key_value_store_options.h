@@ -17,7 +17,9 @@ limitations under the License.
 #define ONEFLOW_EMBEDDING_KEY_VALUE_STORE_OPTIONS_H_
 #include "nlohmann/json.hpp"
 #include "oneflow/core/job/resource_desc.h"
+#include "oneflow/core/common/device_type.h"
 #include "oneflow/core/embedding/cache.h"
+#include "oneflow/core/embedding/quantized_key_value_store.h"
 
 namespace oneflow {
 namespace embedding {
@@ -34,6 +36,8 @@ void ParseCacheOptions(const nlohmann::json& cache_obj, CacheOptions* cache_opti
     cache_options->policy = CacheOptions::Policy::kLRU;
   } else if (policy == "full") {
     cache_options->policy = CacheOptions::Policy::kFull;
+  } else if (policy == "clock") {
+    cache_options->policy = CacheOptions::Policy::kClock;
   } else {
     UNIMPLEMENTED() << "Unsupported cache policy";
   }
@@ -66,6 +70,19 @@ void ParseCacheOptions(const nlohmann::json& cache_obj, CacheOptions* cache_opti
   }
 }
 
+StorageType ParseStorageType(const std::string& storage_type) {
+  if (storage_type == "float") {
+    return StorageType::kFloat;
+  } else if (storage_type == "float16") {
+    return StorageType::kFloat16;
+  } else if (storage_type == "int8") {
+    return StorageType::kInt8;
+  } else {
+    UNIMPLEMENTED() << "Unsupported storage_type";
+    return StorageType::kFloat;
+  }
+}
+
 }  // namespace
 
 class KeyValueStoreOptions final {
@@ -94,6 +111,44 @@ class KeyValueStoreOptions final {
     CHECK(json_object["storage_dim"].is_number());
     line_size_ = json_object["storage_dim"].get<int64_t>();
 
+    quantized_options_.line_size = line_size_;
+    quantized_options_.embedding_dim = line_size_;
+    if (json_object.contains("embedding_dim")) {
+      CHECK(json_object["embedding_dim"].is_number());
+      quantized_options_.embedding_dim = json_object["embedding_dim"].get<int64_t>();
+      CHECK_GT(quantized_options_.embedding_dim, 0);
+      CHECK_EQ(line_size_ % quantized_options_.embedding_dim, 0);
+    }
+    if (json_object.contains("storage_type")) {
+      CHECK(json_object["storage_type"].is_string());
+      quantized_options_.values_type =
+          ParseStorageType(json_object["storage_type"].get<std::string>());
+    }
+    if (json_object.contains("quantize_states")) {
+      CHECK(json_object["quantize_states"].is_boolean());
+      if (json_object["quantize_states"].get<bool>()) {
+        quantized_options_.states_type = quantized_options_.values_type;
+      }
+    }
+    if (IsQuantized()) {
+      CHECK_EQ(value_type_size_, static_cast<int64_t>(sizeof(float)))
+          << "Only float embeddings can be stored quantized";
+    }
+
+    if (json_object.contains("device_type")) {
+      CHECK(json_object["device_type"].is_string());
+      const std::string device_type = json_object["device_type"].get<std::string>();
+      if (device_type == "cuda") {
+        device_type_ = DeviceType::kCUDA;
+      } else if (device_type == "cpu") {
+        device_type_ = DeviceType::kCPU;
+      } else {
+        UNIMPLEMENTED() << "Unsupported device_type";
+      }
+    } else {
+      device_type_ = DeviceType::kCUDA;
+    }
+
     CHECK(json_object.contains("kv_store"));
     auto kv_store = json_object["kv_store"];
 
@@ -103,7 +158,7 @@ class KeyValueStoreOptions final {
       cache_options_.resize(caches.size());
       for (int i = 0; i < caches.size(); ++i) {
         cache_options_.at(i).key_size = key_type_size_;
-        cache_options_.at(i).value_size = value_type_size_ * line_size_;
+        cache_options_.at(i).value_size = StoredValueSize();
         ParseCacheOptions(caches.at(i), &cache_options_.at(i));
       }
     }
@@ -146,6 +201,17 @@ class KeyValueStoreOptions final {
   int64_t ValueTypeSize() const { return value_type_size_; }
   const std::string& Name() const { return name_; }
   int64_t LineSize() const { return line_size_; }
+  bool IsQuantized() const {
+    return quantized_options_.values_type != StorageType::kFloat
+           || quantized_options_.states_type != StorageType::kFloat;
+  }
+  const QuantizedKeyValueStoreOptions& QuantizedOptions() const { return quantized_options_; }
+  // The size in bytes of a line in the caches and the persistent table
+  int64_t StoredValueSize() const {
+    if (IsQuantized()) { return QuantizedValueSize(quantized_options_); }
+    return value_type_size_ * line_size_;
+  }
+  DeviceType GetDeviceType() const { return device_type_; }
   const std::vector<CacheOptions>& GetCachesOptions() const { return cache_options_; }
   const std::vector<std::string>& PersistentTablePaths() const { return persistent_table_paths_; }
   int64_t PersistentTablePhysicalBlockSize() const { return persistent_table_phisical_block_size_; }
@@ -162,6 +228,8 @@ class KeyValueStoreOptions final {
   int64_t value_type_size_;
   std::string name_;
   int64_t line_size_;
+  QuantizedKeyValueStoreOptions quantized_options_;
+  DeviceType device_type_;
   std::vector<std::string> persistent_table_paths_;
   int64_t persistent_table_phisical_block_size_;
   int64_t persistent_table_capacity_hint_;
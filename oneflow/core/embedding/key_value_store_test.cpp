@@ -16,10 +16,13 @@ limitations under the License.
 #include "oneflow/core/embedding/persistent_table_key_value_store.h"
 #include "oneflow/core/embedding/cached_key_value_store.h"
 #include "oneflow/core/embedding/cache.h"
+#include "oneflow/core/embedding/host_cache.h"
+#include "oneflow/core/embedding/quantized_key_value_store.h"
 #include "oneflow/core/device/cuda_util.h"
 #include <gtest/gtest.h>
 #include "oneflow/core/ep/include/device_manager_registry.h"
 #include "oneflow/core/embedding/posix_file.h"
+#include <thread>
 
 namespace oneflow {
 
@@ -27,8 +30,6 @@ namespace embedding {
 
 namespace {
 
-#ifdef WITH_CUDA
-
 std::string CreateTempDirectory() {
   const char* tmp_env = getenv("TMPDIR");
   const char* tmp_dir = tmp_env == nullptr ? "/tmp" : tmp_env;
@@ -38,6 +39,8 @@ std::string CreateTempDirectory() {
   return std::string(path);
 }
 
+#ifdef WITH_CUDA
+
 bool HasCudaDevice() {
   int device_count = 0;
   if (cudaGetDeviceCount(&device_count) != cudaSuccess) { return false; }
@@ -246,6 +249,211 @@ TEST(CachedKeyValueStore, Full) {
 
 #endif  // WITH_CUDA
 
+void TestHostKeyValueStore(KeyValueStore* store, size_t num_embeddings, size_t embedding_vec_size) {
+  store->SaveSnapshot("init");
+
+  const size_t batch_size = 128;
+  std::vector<uint64_t> keys(num_embeddings);
+  std::vector<float> values(num_embeddings * embedding_vec_size);
+  std::vector<float> values1(num_embeddings * embedding_vec_size);
+  std::vector<uint32_t> missing_indices(batch_size);
+  uint32_t n_missing = 0;
+  for (size_t i = 0; i < num_embeddings; ++i) {
+    keys[i] = i + 1;
+    for (size_t j = 0; j < embedding_vec_size; j++) { values[i * embedding_vec_size + j] = i + 1; }
+  }
+
+  for (size_t offset = 0; offset < num_embeddings; offset += batch_size) {
+    const size_t num_keys = std::min(batch_size, num_embeddings - offset);
+    store->Get(nullptr, num_keys, keys.data() + offset,
+               values1.data() + offset * embedding_vec_size, &n_missing, missing_indices.data());
+    ASSERT_EQ(n_missing, num_keys);
+    store->Put(nullptr, num_keys, keys.data() + offset,
+               values.data() + offset * embedding_vec_size);
+  }
+
+  store->SaveSnapshot("final");
+
+  std::fill(values1.begin(), values1.end(), 0);
+  for (size_t offset = 0; offset < num_embeddings; offset += batch_size) {
+    const size_t num_keys = std::min(batch_size, num_embeddings - offset);
+    store->Get(nullptr, num_keys, keys.data() + offset,
+               values1.data() + offset * embedding_vec_size, &n_missing, missing_indices.data());
+    ASSERT_EQ(n_missing, 0);
+  }
+  ASSERT_EQ(values1, values);
+
+  store->LoadSnapshot("init");
+
+  for (size_t offset = 0; offset < num_embeddings; offset += batch_size) {
+    const size_t num_keys = std::min(batch_size, num_embeddings - offset);
+    store->Get(nullptr, num_keys, keys.data() + offset,
+               values1.data() + offset * embedding_vec_size, &n_missing, missing_indices.data());
+    ASSERT_EQ(n_missing, num_keys);
+  }
+
+  store->LoadSnapshot("final");
+
+  std::fill(values1.begin(), values1.end(), 0);
+  for (size_t offset = 0; offset < num_embeddings; offset += batch_size) {
+    const size_t num_keys = std::min(batch_size, num_embeddings - offset);
+    store->Get(nullptr, num_keys, keys.data() + offset,
+               values1.data() + offset * embedding_vec_size, &n_missing, missing_indices.data());
+    ASSERT_EQ(n_missing, 0);
+  }
+  ASSERT_EQ(values1, values);
+}
+
+std::unique_ptr<KeyValueStore> NewHostStoreForTest(const std::string& path,
+                                                   uint32_t value_length) {
+  PersistentTableKeyValueStoreOptions store_options{};
+  store_options.table_options.path = path;
+  store_options.table_options.value_size = value_length * sizeof(float);
+  store_options.table_options.key_size = GetSizeOfDataType(DataType::kUInt64);
+  store_options.table_options.physical_block_size = 512;
+  return NewHostPersistentTableKeyValueStore(store_options);
+}
+
+TEST(PersistentTableKeyValueStore, Host) {
+  std::string path = CreateTempDirectory();
+  uint32_t value_length = 128;
+  std::unique_ptr<KeyValueStore> store = NewHostStoreForTest(path, value_length);
+  store->ReserveQueryLength(128);
+  TestHostKeyValueStore(store.get(), 1024, value_length);
+  store.reset();
+  PosixFile::RecursiveDelete(path);
+}
+
+void TestHostCachedKeyValueStore(CacheOptions::Policy policy) {
+  std::string path = CreateTempDirectory();
+  uint32_t value_length = 128;
+  std::unique_ptr<KeyValueStore> store = NewHostStoreForTest(path, value_length);
+  CacheOptions cache_options{};
+  cache_options.policy = policy;
+  cache_options.value_memory_kind = CacheOptions::MemoryKind::kHost;
+  cache_options.value_size = value_length * sizeof(float);
+  cache_options.capacity = 512;
+  cache_options.key_size = 8;
+  std::unique_ptr<KeyValueStore> cached_store =
+      NewHostCachedKeyValueStore(std::move(store), NewHostCache(cache_options));
+  cached_store->ReserveQueryLength(128);
+  TestHostKeyValueStore(cached_store.get(), 1024, value_length);
+  std::vector<CacheStats> stats;
+  cached_store->GetCacheStats(&stats);
+  ASSERT_EQ(stats.size(), 1);
+  ASSERT_EQ(stats.at(0).capacity, 512);
+  ASSERT_GT(stats.at(0).num_evictions, 0);
+  ASSERT_GT(stats.at(0).num_hits, 0);
+  cached_store.reset();
+  PosixFile::RecursiveDelete(path);
+}
+
+TEST(CachedKeyValueStore, HostLRU) { TestHostCachedKeyValueStore(CacheOptions::Policy::kLRU); }
+
+TEST(CachedKeyValueStore, HostClock) { TestHostCachedKeyValueStore(CacheOptions::Policy::kClock); }
+
+TEST(CachedKeyValueStore, HostConcurrentGetPut) {
+  std::string path = CreateTempDirectory();
+  const uint32_t value_length = 16;
+  CacheOptions cache_options{};
+  cache_options.policy = CacheOptions::Policy::kLRU;
+  cache_options.value_memory_kind = CacheOptions::MemoryKind::kHost;
+  cache_options.value_size = value_length * sizeof(float);
+  cache_options.capacity = 256;
+  cache_options.key_size = 8;
+  std::unique_ptr<KeyValueStore> cached_store = NewHostCachedKeyValueStore(
+      NewHostStoreForTest(path, value_length), NewHostCache(cache_options));
+  const uint32_t batch_size = 64;
+  cached_store->ReserveQueryLength(batch_size);
+  // Each thread puts and gets keys of its own. The keys are evicted by the puts of the other
+  // threads, so the gets read them back from the store.
+  const uint32_t num_threads = 4;
+  const uint32_t num_keys_per_thread = 512;
+  std::vector<std::thread> threads;
+  for (uint32_t t = 0; t < num_threads; ++t) {
+    threads.emplace_back([&, t]() {
+      std::vector<uint64_t> keys(batch_size);
+      std::vector<float> values(batch_size * value_length);
+      std::vector<float> values1(batch_size * value_length);
+      std::vector<uint32_t> missing_indices(batch_size);
+      uint32_t n_missing = 0;
+      for (uint32_t step = 1; step <= 4; ++step) {
+        for (uint32_t offset = 0; offset < num_keys_per_thread; offset += batch_size) {
+          for (uint32_t i = 0; i < batch_size; ++i) {
+            keys[i] = t * num_keys_per_thread + offset + i + 1;
+            std::fill(values.begin() + i * value_length, values.begin() + (i + 1) * value_length,
+                      keys[i] * 10 + step);
+          }
+          cached_store->Put(nullptr, batch_size, keys.data(), values.data());
+          cached_store->Get(nullptr, batch_size, keys.data(), values1.data(), &n_missing,
+                            missing_indices.data());
+          ASSERT_EQ(n_missing, 0);
+          ASSERT_EQ(values1, values);
+        }
+      }
+    });
+  }
+  for (auto& thread : threads) { thread.join(); }
+  std::vector<CacheStats> stats;
+  cached_store->GetCacheStats(&stats);
+  ASSERT_GT(stats.at(0).num_evictions, 0);
+  cached_store.reset();
+  PosixFile::RecursiveDelete(path);
+}
+
+void TestHostQuantizedKeyValueStore(StorageType storage_type, float tolerance) {
+  std::string path = CreateTempDirectory();
+  QuantizedKeyValueStoreOptions options{};
+  options.embedding_dim = 64;
+  options.line_size = 128;
+  options.values_type = storage_type;
+  options.states_type = storage_type;
+  PersistentTableKeyValueStoreOptions store_options{};
+  store_options.table_options.path = path;
+  store_options.table_options.value_size = QuantizedValueSize(options);
+  store_options.table_options.key_size = GetSizeOfDataType(DataType::kUInt64);
+  store_options.table_options.physical_block_size = 512;
+  ASSERT_LE(QuantizedValueSize(options) * 2, options.line_size * sizeof(float));
+  std::unique_ptr<KeyValueStore> store = NewHostQuantizedKeyValueStore(
+      NewHostPersistentTableKeyValueStore(store_options), options);
+  ASSERT_EQ(store->ValueSize(), options.line_size * sizeof(float));
+  store->ReserveQueryLength(128);
+
+  const size_t num_embeddings = 1024;
+  const size_t batch_size = 128;
+  std::vector<uint64_t> keys(num_embeddings);
+  std::vector<float> values(num_embeddings * options.line_size);
+  std::vector<float> values1(num_embeddings * options.line_size);
+  std::vector<uint32_t> missing_indices(batch_size);
+  uint32_t n_missing = 0;
+  std::mt19937 rng(0);
+  std::uniform_real_distribution<float> dist(-1, 1);
+  for (size_t i = 0; i < num_embeddings; ++i) { keys[i] = i + 1; }
+  for (float& value : values) { value = dist(rng); }
+  for (size_t offset = 0; offset < num_embeddings; offset += batch_size) {
+    store->Put(nullptr, batch_size, keys.data() + offset,
+               values.data() + offset * options.line_size);
+  }
+  store->SaveSnapshot("final");
+  store->LoadSnapshot("final");
+  for (size_t offset = 0; offset < num_embeddings; offset += batch_size) {
+    store->Get(nullptr, batch_size, keys.data() + offset,
+               values1.data() + offset * options.line_size, &n_missing, missing_indices.data());
+    ASSERT_EQ(n_missing, 0);
+  }
+  for (size_t i = 0; i < values.size(); ++i) { ASSERT_NEAR(values1[i], values[i], tolerance); }
+  store.reset();
+  PosixFile::RecursiveDelete(path);
+}
+
+TEST(QuantizedKeyValueStore, HostFloat16) {
+  TestHostQuantizedKeyValueStore(StorageType::kFloat16, 1e-3);
+}
+
+TEST(QuantizedKeyValueStore, HostInt8) {
+  TestHostQuantizedKeyValueStore(StorageType::kInt8, 1.0 / 254 + 1e-6);
+}
+
 }  // namespace
 
 }  // namespace embedding
@@ -22,6 +22,7 @@ limitations under the License.
 #include "oneflow/core/embedding/posix_file.h"
 #include "oneflow/core/common/blocking_counter.h"
 #include <robin_hood.h>
+#include <shared_mutex>
 #include <fcntl.h>
 #include <sys/mman.h>
 #include <dirent.h>
@@ -59,7 +60,10 @@ constexpr char const* kKeysDirName = "keys";
 constexpr char const* kValuesDirName = "values";
 constexpr char const* kSnapshotsDirName = "snapshots";
 constexpr char const* kSnapshotListFileName = "LIST";
+constexpr char const* kSnapshotParentFileName = "PARENT";
 constexpr size_t kParallelForStride = 256;
+constexpr uint64_t kDefaultPrefetchStagingSizeMb = 256;
+constexpr size_t kPrefetchChunkSize = 1024;
 
 template<typename T>
 T* BytesOffset(T* ptr, size_t bytes) {
@@ -145,6 +149,39 @@ class AlignedBuffer final {
   std::unique_ptr<char> ptr_;
 };
 
+class AlignedBufferPool final {
+ public:
+  OF_DISALLOW_COPY_AND_MOVE(AlignedBufferPool);
+  explicit AlignedBufferPool(size_t alignment) : alignment_(alignment) {}
+  ~AlignedBufferPool() = default;
+
+  size_t alignment() const { return alignment_; }
+
+  std::unique_ptr<AlignedBuffer> Acquire(size_t size) {
+    std::unique_ptr<AlignedBuffer> buffer;
+    {
+      std::lock_guard<std::mutex> lock(mutex_);
+      if (!free_buffers_.empty()) {
+        buffer = std::move(free_buffers_.back());
+        free_buffers_.pop_back();
+      }
+    }
+    if (!buffer) { buffer.reset(new AlignedBuffer(alignment_)); }
+    buffer->Resize(size);
+    return buffer;
+  }
+
+  void Release(std::unique_ptr<AlignedBuffer>&& buffer) {
+    std::lock_guard<std::mutex> lock(mutex_);
+    free_buffers_.push_back(std::move(buffer));
+  }
+
+ private:
+  size_t alignment_;
+  std::mutex mutex_;
+  std::vector<std::unique_ptr<AlignedBuffer>> free_buffers_;
+};
+
 template<typename Key>
 class ChunkIteratorImpl : public PersistentTable::Iterator {
  public:
@@ -196,6 +233,91 @@ class ChunkIteratorImpl : public PersistentTable::Iterator {
   uint64_t chunk_index_offset_;
 };
 
+template<typename Key>
+class SnapshotIteratorImpl : public PersistentTable::Iterator {
+ public:
+  OF_DISALLOW_COPY_AND_MOVE(SnapshotIteratorImpl);
+  struct ChunkFiles {
+    uint64_t chunk_id;
+    std::string index_file_path;
+    std::string key_file_path;
+    std::string value_file_path;
+  };
+  SnapshotIteratorImpl(uint32_t value_size, uint32_t logical_block_size,
+                       uint32_t num_values_per_block, uint64_t num_values_per_chunk,
+                       std::vector<ChunkFiles>&& chunks)
+      : pos_(0),
+        value_size_(value_size),
+        logical_block_size_(logical_block_size),
+        num_values_per_block_(num_values_per_block),
+        num_values_per_chunk_(num_values_per_chunk),
+        chunks_(std::move(chunks)) {}
+  ~SnapshotIteratorImpl() override = default;
+
+  void Next(uint32_t num_keys, uint32_t* return_keys, void* keys, void* values) override {
+    uint32_t count = 0;
+    while (count < num_keys && pos_ != chunks_.size()) {
+      if (!chunk_iterator_ && !OpenChunk(chunks_.at(pos_))) {
+        pos_ += 1;
+        continue;
+      }
+      const uint32_t n_request = num_keys - count;
+      uint32_t n_result = 0;
+      chunk_iterator_->Next(n_request, &n_result, BytesOffset(keys, count * sizeof(Key)),
+                            BytesOffset(values, count * value_size_));
+      count += n_result;
+      if (n_result < n_request) {
+        CloseChunk();
+        pos_ += 1;
+      }
+    }
+    *return_keys = count;
+  }
+
+  void Reset() override {
+    CloseChunk();
+    pos_ = 0;
+  }
+
+ private:
+  // Maps the files of one chunk at a time, returns false if the chunk has no rows
+  bool OpenChunk(const ChunkFiles& chunk) {
+    PosixFile index_file(chunk.index_file_path, O_RDONLY, 0644);
+    const size_t index_file_size = index_file.Size();
+    CHECK_EQ(index_file_size % sizeof(uint64_t), 0);
+    if (index_file_size == 0) { return false; }
+    mapped_index_ = PosixMappedFile(std::move(index_file), index_file_size, PROT_READ);
+    PosixFile key_file(chunk.key_file_path, O_RDONLY, 0644);
+    mapped_key_ = PosixMappedFile(std::move(key_file), key_file.Size(), PROT_READ);
+    PosixFile value_file(chunk.value_file_path, O_RDONLY, 0644);
+    mapped_value_ = PosixMappedFile(std::move(value_file), value_file.Size(), PROT_READ);
+    chunk_iterator_.reset(new ChunkIteratorImpl<Key>(
+        value_size_, logical_block_size_, num_values_per_block_, num_values_per_chunk_,
+        chunk.chunk_id, index_file_size / sizeof(uint64_t),
+        static_cast<const Key*>(mapped_key_.ptr()),
+        static_cast<const uint64_t*>(mapped_index_.ptr()), mapped_value_.ptr()));
+    return true;
+  }
+
+  void CloseChunk() {
+    chunk_iterator_.reset();
+    mapped_index_ = PosixMappedFile();
+    mapped_key_ = PosixMappedFile();
+    mapped_value_ = PosixMappedFile();
+  }
+
+  size_t pos_;
+  uint32_t value_size_;
+  uint32_t logical_block_size_;
+  uint32_t num_values_per_block_;
+  uint64_t num_values_per_chunk_;
+  std::vector<ChunkFiles> chunks_;
+  PosixMappedFile mapped_index_;
+  PosixMappedFile mapped_key_;
+  PosixMappedFile mapped_value_;
+  std::unique_ptr<ChunkIteratorImpl<Key>> chunk_iterator_;
+};
+
 #ifdef WITH_LIBURING
 
 class RingEngine final {
@@ -366,11 +488,15 @@ class PersistentTableImpl : public PersistentTable {
            uint32_t* missing_indices) override;
   void PutBlocks(uint32_t num_keys, const void* keys, const void* blocks) override;
   void Put(uint32_t num_keys, const void* keys, const void* values) override;
+  void Prefetch(uint32_t num_keys, const void* keys) override;
   bool SnapshotExists(const std::string& name) override;
   void LoadSnapshot(const std::string& name) override;
   void LoadSnapshot(const std::string& name,
                     const std::function<void(Iterator* iter)>& Hook) override;
   void SaveSnapshot(const std::string& name) override;
+  void SaveDeltaSnapshot(const std::string& name) override;
+  void CompactSnapshot(const std::string& name) override;
+  std::unique_ptr<Iterator> ReadSnapshot(const std::string& name) override;
 
  private:
   std::string KeyFilePath(uint64_t chunk_id) const;
@@ -378,14 +504,33 @@ class PersistentTableImpl : public PersistentTable {
   std::string IndexFilePath(const std::string& name, uint64_t chunk_id) const;
   std::string SnapshotDirPath(const std::string& name) const;
   std::string SnapshotListFilePath(const std::string& name) const;
-  void LoadSnapshotImpl(const std::string& name);
-  void SaveSnapshotImpl(const std::string& name);
+  std::string SnapshotParentFilePath(const std::string& name) const;
+  std::vector<std::string> SnapshotChain(const std::string& name) const;
+  std::vector<std::string> ChildSnapshots(const std::string& name) const;
+  std::string ResolveIndexFilePath(const std::vector<std::string>& chain,
+                                   const std::string& index_filename) const;
+  void MarkChunkDirty(uint64_t chunk_id);
+  void LoadSnapshotImpl(const std::string& name, const std::function<void(Iterator* iter)>& Hook);
+  void SaveSnapshotImpl(const std::string& name, bool delta);
+  void CompactSnapshotImpl(const std::string& name);
   void ParallelFor(size_t total, const ForRange<Engine>& for_range);
+  void GetBlocksImpl(uint32_t num_keys, const Key* keys, void* blocks, uint32_t* offsets);
+  uint32_t ReadValues(uint32_t num_keys, const Key* keys, void* values, uint32_t* missing_indices);
+  void PutBlocksImpl(uint32_t num_keys, const Key* keys, const void* blocks);
+  uint32_t TakeStagedValues(uint32_t num_keys, const Key* keys, void* values,
+                            std::vector<uint32_t>* unstaged_indices);
+  void StageValues(uint32_t num_keys, const Key* keys);
+  void InvalidateStagedValues(uint32_t num_keys, const Key* keys);
+  void ClearStagedValues();
+  void PrefetchLoop();
+  std::shared_lock<std::shared_timed_mutex> SharedLock();
+  std::unique_lock<std::shared_timed_mutex> UniqueLock();
 
   std::string root_dir_;
   std::string keys_dir_;
   std::string values_dir_;
   std::string snapshots_dir_;
+  bool read_only_;
   uint32_t key_size_;
   uint32_t value_size_;
   uint64_t num_logical_blocks_per_chunk_;
@@ -395,33 +540,58 @@ class PersistentTableImpl : public PersistentTable {
 
   std::vector<std::unique_ptr<Worker<Engine>>> workers_;
 
-  std::vector<uint32_t> offsets_buffer_;
-  AlignedBuffer blocks_buffer_;
+  AlignedBufferPool blocks_buffer_pool_;
 
-  std::recursive_mutex mutex_;
+  // Readers share mutex_ while looking up row_id_mapping_ and reading the value files. A writer
+  // holds write_mutex_ throughout, appends its blocks without mutex_, since no reader can reach
+  // them yet, and only takes mutex_ exclusively to publish them in row_id_mapping_. The readers
+  // pass through turnstile_mutex_, which a writer holds while waiting for mutex_, so that a
+  // stream of overlapping readers does not starve the writers.
+  std::shared_timed_mutex mutex_;
+  std::mutex turnstile_mutex_;
+  std::mutex write_mutex_;
   uint64_t physical_table_size_;
   robin_hood::unordered_flat_map<Key, uint64_t> row_id_mapping_;
   std::vector<PosixFile> value_files_;
   PosixFile writable_key_file_;
   uint64_t writable_key_file_chunk_id_;
   PosixFileLockGuard lock_;
+  // The snapshot saved or loaded last, and the chunks whose rows have changed since then, both
+  // guarded by write_mutex_
+  std::string parent_snapshot_;
+  std::vector<bool> dirty_chunks_;
+
+  // The staged values are read under the shared mutex_ and dropped by the writers under the
+  // exclusive one, so a staged value is never older than the value in the table.
+  std::mutex staging_mutex_;
+  robin_hood::unordered_flat_map<Key, uint64_t> staged_offsets_;
+  std::vector<char> staged_values_;
+  uint64_t staging_size_;
+  Channel<std::vector<Key>> prefetch_requests_;
+  std::thread prefetch_thread_;
 };
 
 template<typename Key, typename Engine>
 PersistentTableImpl<Key, Engine>::PersistentTableImpl(const PersistentTableOptions& options)
     : root_dir_(options.path),
+      read_only_(options.read_only),
       key_size_(options.key_size),
       value_size_(options.value_size),
       logical_block_size_(GetLogicalBlockSize(options.physical_block_size, value_size_)),
-      blocks_buffer_(options.physical_block_size),
+      blocks_buffer_pool_(options.physical_block_size),
       writable_key_file_chunk_id_(-1) {
   const uint64_t capacity_hint = ParseIntegerFromEnv(
       "ONEFLOW_ONE_EMBEDDING_PERSISTENT_TABLE_CAPACITY_HINT", options.capacity_hint);
   if (capacity_hint > 0) { row_id_mapping_.reserve(capacity_hint); }
-  PosixFile::RecursiveCreateDirectory(options.path, 0755);
   const std::string lock_filename = PosixFile::JoinPath(options.path, kLockFileName);
-  const bool init = !PosixFile::FileExists(lock_filename);
-  lock_ = PosixFileLockGuard(PosixFile(lock_filename, O_CREAT | O_RDWR, 0644));
+  bool init = false;
+  if (read_only_) {
+    CHECK(PosixFile::FileExists(lock_filename)) << "Can not find persistent table " << options.path;
+  } else {
+    PosixFile::RecursiveCreateDirectory(options.path, 0755);
+    init = !PosixFile::FileExists(lock_filename);
+    lock_ = PosixFileLockGuard(PosixFile(lock_filename, O_CREAT | O_RDWR, 0644));
+  }
   const uint64_t target_chunk_size = options.target_chunk_size_mb * 1024 * 1024;
   CHECK_GE(target_chunk_size, logical_block_size_);
   num_logical_blocks_per_chunk_ = target_chunk_size / logical_block_size_,
@@ -451,7 +621,7 @@ PersistentTableImpl<Key, Engine>::PersistentTableImpl(const PersistentTableOptio
   for (auto& chunk : chunks) {
     if (value_files_.size() <= chunk.first) { value_files_.resize(chunk.first + 1); }
     CHECK_EQ(value_files_.at(chunk.first).fd(), -1);
-    PosixFile value_file(chunk.second, O_RDWR | O_DIRECT, 0644);
+    PosixFile value_file(chunk.second, (read_only_ ? O_RDONLY : O_RDWR) | O_DIRECT, 0644);
     value_files_.at(chunk.first) = std::move(value_file);
   }
   if (!value_files_.empty()) {
@@ -461,10 +631,16 @@ PersistentTableImpl<Key, Engine>::PersistentTableImpl(const PersistentTableOptio
   } else {
     physical_table_size_ = 0;
   }
+  staging_size_ = ParseIntegerFromEnv("ONEFLOW_ONE_EMBEDDING_PERSISTENT_TABLE_PREFETCH_STAGING_MB",
+                                      kDefaultPrefetchStagingSizeMb)
+                  * 1024 * 1024;
+  prefetch_thread_ = std::thread(&PersistentTableImpl<Key, Engine>::PrefetchLoop, this);
 }
 
 template<typename Key, typename Engine>
 PersistentTableImpl<Key, Engine>::~PersistentTableImpl() {
+  prefetch_requests_.Close();
+  prefetch_thread_.join();
   for (uint32_t tid = 0; tid < workers_.size(); ++tid) { workers_.at(tid)->Shutdown(); }
 }
 
@@ -476,10 +652,16 @@ uint32_t PersistentTableImpl<Key, Engine>::LogicalBlockSize() const {
 template<typename Key, typename Engine>
 void PersistentTableImpl<Key, Engine>::GetBlocks(uint32_t num_keys, const void* keys, void* blocks,
                                                  uint32_t* offsets) {
-  std::lock_guard<std::recursive_mutex> lock(mutex_);
+  std::shared_lock<std::shared_timed_mutex> shared_lock = SharedLock();
+  GetBlocksImpl(num_keys, static_cast<const Key*>(keys), blocks, offsets);
+}
+
+template<typename Key, typename Engine>
+void PersistentTableImpl<Key, Engine>::GetBlocksImpl(uint32_t num_keys, const Key* keys,
+                                                     void* blocks, uint32_t* offsets) {
   ParallelFor(num_keys, [&](Engine* engine, size_t start, size_t end) {
     for (uint64_t i = start; i < end; ++i) {
-      const Key key = static_cast<const Key*>(keys)[i];
+      const Key key = keys[i];
       auto it = row_id_mapping_.find(key);
       if (it == row_id_mapping_.end()) {
         offsets[i] = logical_block_size_;
@@ -501,28 +683,67 @@ void PersistentTableImpl<Key, Engine>::GetBlocks(uint32_t num_keys, const void*
 }
 
 template<typename Key, typename Engine>
-void PersistentTableImpl<Key, Engine>::Get(uint32_t num_keys, const void* keys, void* values,
-                                           uint32_t* n_missing, uint32_t* missing_indices) {
-  std::lock_guard<std::recursive_mutex> lock(mutex_);
-  offsets_buffer_.resize(num_keys);
+uint32_t PersistentTableImpl<Key, Engine>::ReadValues(uint32_t num_keys, const Key* keys,
+                                                      void* values, uint32_t* missing_indices) {
+  std::vector<uint32_t> offsets(num_keys);
+  std::unique_ptr<AlignedBuffer> blocks_buffer;
   void* blocks_ptr = nullptr;
-  if (value_size_ == logical_block_size_) {
+  // The blocks are read with O_DIRECT, which requires aligned buffers
+  const bool read_into_values =
+      value_size_ == logical_block_size_
+      && reinterpret_cast<uintptr_t>(values) % blocks_buffer_pool_.alignment() == 0;
+  if (read_into_values) {
     blocks_ptr = values;
   } else {
-    blocks_buffer_.Resize(num_keys * logical_block_size_);
-    blocks_ptr = blocks_buffer_.ptr();
+    blocks_buffer = blocks_buffer_pool_.Acquire(num_keys * logical_block_size_);
+    blocks_ptr = blocks_buffer->ptr();
   }
-  GetBlocks(num_keys, keys, blocks_ptr, offsets_buffer_.data());
+  GetBlocksImpl(num_keys, keys, blocks_ptr, offsets.data());
   uint32_t missing_count = 0;
   for (uint32_t i = 0; i < num_keys; ++i) {
-    if (offsets_buffer_.at(i) == logical_block_size_) {
+    if (offsets.at(i) == logical_block_size_) {
       missing_indices[missing_count] = i;
       missing_count += 1;
+    } else if (!read_into_values) {
+      MemcpyOffset(values, i * value_size_, blocks_ptr, (i * logical_block_size_) + offsets[i],
+                   value_size_);
+    }
+  }
+  if (blocks_buffer) { blocks_buffer_pool_.Release(std::move(blocks_buffer)); }
+  return missing_count;
+}
+
+template<typename Key, typename Engine>
+void PersistentTableImpl<Key, Engine>::Get(uint32_t num_keys, const void* keys, void* values,
+                                           uint32_t* n_missing, uint32_t* missing_indices) {
+  std::shared_lock<std::shared_timed_mutex> shared_lock = SharedLock();
+  const Key* query_keys = static_cast<const Key*>(keys);
+  std::vector<uint32_t> unstaged_indices;
+  if (TakeStagedValues(num_keys, query_keys, values, &unstaged_indices) == 0) {
+    *n_missing = ReadValues(num_keys, query_keys, values, missing_indices);
+    return;
+  }
+  const uint32_t num_unstaged = unstaged_indices.size();
+  if (num_unstaged == 0) {
+    *n_missing = 0;
+    return;
+  }
+  std::vector<Key> unstaged_keys(num_unstaged);
+  for (uint32_t i = 0; i < num_unstaged; ++i) {
+    unstaged_keys[i] = query_keys[unstaged_indices.at(i)];
+  }
+  std::vector<char> unstaged_values(num_unstaged * value_size_);
+  std::vector<uint32_t> unstaged_missing_indices(num_unstaged);
+  const uint32_t num_unstaged_missing = ReadValues(
+      num_unstaged, unstaged_keys.data(), unstaged_values.data(), unstaged_missing_indices.data());
+  uint32_t missing_count = 0;
+  for (uint32_t i = 0; i < num_unstaged; ++i) {
+    if (missing_count < num_unstaged_missing && unstaged_missing_indices[missing_count] == i) {
+      missing_indices[missing_count] = unstaged_indices[i];
+      missing_count += 1;
     } else {
-      if (value_size_ != logical_block_size_) {
-        MemcpyOffset(values, i * value_size_, blocks_ptr,
-                     (i * logical_block_size_) + offsets_buffer_[i], value_size_);
-      }
+      MemcpyOffset(values, unstaged_indices[i] * value_size_, unstaged_values.data(),
+                   i * value_size_, value_size_);
     }
   }
   *n_missing = missing_count;
@@ -531,23 +752,29 @@ void PersistentTableImpl<Key, Engine>::Get(uint32_t num_keys, const void* keys,
 template<typename Key, typename Engine>
 void PersistentTableImpl<Key, Engine>::PutBlocks(uint32_t num_keys, const void* keys,
                                                  const void* blocks) {
-  std::lock_guard<std::recursive_mutex> lock(mutex_);
-  const uint32_t num_blocks = RoundUp(num_keys, num_values_per_block_);
+  CHECK(!read_only_);
+  std::lock_guard<std::mutex> write_lock(write_mutex_);
+  PutBlocksImpl(num_keys, static_cast<const Key*>(keys), blocks);
+}
+
+template<typename Key, typename Engine>
+void PersistentTableImpl<Key, Engine>::PutBlocksImpl(uint32_t num_keys, const Key* keys,
+                                                     const void* blocks) {
+  const uint32_t num_blocks = RoundUp(num_keys, num_values_per_block_) / num_values_per_block_;
   const uint32_t num_padded_keys = num_blocks * num_values_per_block_;
   const uint64_t start_index = physical_table_size_;
   physical_table_size_ += num_padded_keys;
   CHECK_EQ(start_index % num_values_per_block_, 0);
   const uint64_t start_block_id = start_index / num_values_per_block_;
-  for (uint64_t i = 0; i < num_keys; ++i) {
-    row_id_mapping_[static_cast<const Key*>(keys)[i]] = start_index + i;
-  }
   uint64_t written_blocks = 0;
   const uint64_t block_keys_size = num_values_per_block_ * sizeof(Key);
   while (written_blocks < num_blocks) {
     const uint64_t batch_start_block_id = start_block_id + written_blocks;
     const uint64_t batch_chunk_id = batch_start_block_id / num_logical_blocks_per_chunk_;
     if (batch_chunk_id == value_files_.size()) {
-      value_files_.emplace_back(ValueFilePath(batch_chunk_id), O_CREAT | O_RDWR | O_DIRECT, 0644);
+      PosixFile value_file(ValueFilePath(batch_chunk_id), O_CREAT | O_RDWR | O_DIRECT, 0644);
+      std::unique_lock<std::shared_timed_mutex> unique_lock = UniqueLock();
+      value_files_.emplace_back(std::move(value_file));
     } else {
       CHECK_LE(batch_chunk_id, value_files_.size());
     }
@@ -577,29 +804,153 @@ void PersistentTableImpl<Key, Engine>::PutBlocks(uint32_t num_keys, const void*
            == keys_bytes);
     written_blocks += blocks_to_write;
   }
+  for (uint64_t chunk_id = start_index / num_values_per_chunk_;
+       chunk_id * num_values_per_chunk_ < start_index + num_keys; ++chunk_id) {
+    MarkChunkDirty(chunk_id);
+  }
+  std::unique_lock<std::shared_timed_mutex> unique_lock = UniqueLock();
+  for (uint64_t i = 0; i < num_keys; ++i) {
+    auto it = row_id_mapping_.find(keys[i]);
+    if (it == row_id_mapping_.end()) {
+      row_id_mapping_.emplace(keys[i], start_index + i);
+    } else {
+      // the old row of the key is dropped from its chunk
+      MarkChunkDirty(it->second / num_values_per_chunk_);
+      it->second = start_index + i;
+    }
+  }
+  InvalidateStagedValues(num_keys, keys);
 }
 
 template<typename Key, typename Engine>
 void PersistentTableImpl<Key, Engine>::Put(uint32_t num_keys, const void* keys,
                                            const void* values) {
-  std::lock_guard<std::recursive_mutex> lock(mutex_);
+  CHECK(!read_only_);
+  std::lock_guard<std::mutex> write_lock(write_mutex_);
   const void* blocks_ptr = nullptr;
-  if (value_size_ == logical_block_size_) {
+  std::unique_ptr<AlignedBuffer> blocks_buffer;
+  // The values are written with O_DIRECT, which requires aligned buffers
+  if (value_size_ == logical_block_size_
+      && reinterpret_cast<uintptr_t>(values) % blocks_buffer_pool_.alignment() == 0) {
     blocks_ptr = values;
   } else {
-    const uint32_t num_blocks = RoundUp(num_keys, num_values_per_block_);
-    blocks_buffer_.Resize(num_blocks * logical_block_size_);
+    const uint32_t num_blocks = RoundUp(num_keys, num_values_per_block_) / num_values_per_block_;
+    blocks_buffer = blocks_buffer_pool_.Acquire(num_blocks * logical_block_size_);
     for (uint32_t i = 0; i < num_keys; i += num_values_per_block_) {
       const uint32_t block_id = i / num_values_per_block_;
       const uint32_t copy_size = (num_keys - i) < num_values_per_block_
                                      ? (num_keys - i) * value_size_
                                      : logical_block_size_;
-      MemcpyOffset(blocks_buffer_.ptr(), block_id * logical_block_size_, values, i * value_size_,
+      MemcpyOffset(blocks_buffer->ptr(), block_id * logical_block_size_, values, i * value_size_,
                    copy_size);
     }
-    blocks_ptr = blocks_buffer_.ptr();
+    blocks_ptr = blocks_buffer->ptr();
+  }
+  PutBlocksImpl(num_keys, static_cast<const Key*>(keys), blocks_ptr);
+  if (blocks_buffer) { blocks_buffer_pool_.Release(std::move(blocks_buffer)); }
+}
+
+template<typename Key, typename Engine>
+void PersistentTableImpl<Key, Engine>::Prefetch(uint32_t num_keys, const void* keys) {
+  if (num_keys == 0) { return; }
+  const Key* prefetch_keys = static_cast<const Key*>(keys);
+  CHECK_EQ(prefetch_requests_.Send(std::vector<Key>(prefetch_keys, prefetch_keys + num_keys)),
+           kChannelStatusSuccess);
+}
+
+template<typename Key, typename Engine>
+uint32_t PersistentTableImpl<Key, Engine>::TakeStagedValues(
+    uint32_t num_keys, const Key* keys, void* values, std::vector<uint32_t>* unstaged_indices) {
+  std::lock_guard<std::mutex> lock(staging_mutex_);
+  if (staged_offsets_.empty()) { return 0; }
+  uint32_t num_staged = 0;
+  unstaged_indices->reserve(num_keys);
+  for (uint32_t i = 0; i < num_keys; ++i) {
+    auto it = staged_offsets_.find(keys[i]);
+    if (it == staged_offsets_.end()) {
+      unstaged_indices->push_back(i);
+    } else {
+      MemcpyOffset(values, i * value_size_, staged_values_.data(), it->second, value_size_);
+      num_staged += 1;
+    }
+  }
+  // The taken values are dropped after the lookups, so that the duplicated keys all hit
+  if (num_staged > 0) {
+    for (uint32_t i = 0; i < num_keys; ++i) { staged_offsets_.erase(keys[i]); }
+  }
+  if (staged_offsets_.empty()) { staged_values_.clear(); }
+  return num_staged;
+}
+
+template<typename Key, typename Engine>
+void PersistentTableImpl<Key, Engine>::StageValues(uint32_t num_keys, const Key* keys) {
+  std::shared_lock<std::shared_timed_mutex> shared_lock = SharedLock();
+  std::vector<Key> keys_to_read;
+  {
+    robin_hood::unordered_flat_set<Key> unique_keys;
+    std::lock_guard<std::mutex> lock(staging_mutex_);
+    const uint64_t max_num_to_read = (staging_size_ - staged_values_.size()) / value_size_;
+    for (uint32_t i = 0; i < num_keys && keys_to_read.size() < max_num_to_read; ++i) {
+      const Key key = keys[i];
+      if (row_id_mapping_.find(key) == row_id_mapping_.end()) { continue; }
+      if (staged_offsets_.find(key) != staged_offsets_.end()) { continue; }
+      if (unique_keys.insert(key).second) { keys_to_read.push_back(key); }
+    }
+  }
+  if (keys_to_read.empty()) { return; }
+  std::vector<char> values(keys_to_read.size() * value_size_);
+  std::vector<uint32_t> missing_indices(keys_to_read.size());
+  CHECK_EQ(ReadValues(keys_to_read.size(), keys_to_read.data(), values.data(),
+                      missing_indices.data()),
+           0);
+  std::lock_guard<std::mutex> lock(staging_mutex_);
+  for (size_t i = 0; i < keys_to_read.size(); ++i) {
+    if (staged_values_.size() + value_size_ > staging_size_) { break; }
+    if (!staged_offsets_.emplace(keys_to_read[i], staged_values_.size()).second) { continue; }
+    staged_values_.insert(staged_values_.end(), values.begin() + i * value_size_,
+                          values.begin() + (i + 1) * value_size_);
+  }
+}
+
+template<typename Key, typename Engine>
+void PersistentTableImpl<Key, Engine>::InvalidateStagedValues(uint32_t num_keys, const Key* keys) {
+  std::lock_guard<std::mutex> lock(staging_mutex_);
+  if (staged_offsets_.empty()) { return; }
+  for (uint32_t i = 0; i < num_keys; ++i) { staged_offsets_.erase(keys[i]); }
+  if (staged_offsets_.empty()) { staged_values_.clear(); }
+}
+
+template<typename Key, typename Engine>
+void PersistentTableImpl<Key, Engine>::ClearStagedValues() {
+  std::lock_guard<std::mutex> lock(staging_mutex_);
+  staged_offsets_.clear();
+  staged_values_.clear();
+}
+
+template<typename Key, typename Engine>
+void PersistentTableImpl<Key, Engine>::PrefetchLoop() {
+  while (true) {
+    std::queue<std::vector<Key>> requests;
+    if (prefetch_requests_.ReceiveMany(&requests) == kChannelStatusErrorClosed) { break; }
+    // The requests queued up while the last one was being staged are read together
+    std::vector<Key> keys;
+    while (!requests.empty()) {
+      keys.insert(keys.end(), requests.front().begin(), requests.front().end());
+      requests.pop();
+    }
+    {
+      // The staged values of the earlier requests are dropped to bound the staging area
+      std::lock_guard<std::mutex> lock(staging_mutex_);
+      if (staged_values_.size() + keys.size() * value_size_ > staging_size_) {
+        staged_offsets_.clear();
+        staged_values_.clear();
+      }
+    }
+    // The keys are staged in chunks, between which the Get and Put of the current batch can run
+    for (size_t start = 0; start < keys.size(); start += kPrefetchChunkSize) {
+      StageValues(std::min(kPrefetchChunkSize, keys.size() - start), keys.data() + start);
+    }
   }
-  PutBlocks(num_keys, keys, blocks_ptr);
 }
 
 template<typename Key, typename Engine>
@@ -629,19 +980,81 @@ std::string PersistentTableImpl<Key, Engine>::SnapshotListFilePath(const std::st
 }
 
 template<typename Key, typename Engine>
-void PersistentTableImpl<Key, Engine>::LoadSnapshotImpl(const std::string& name) {
-  std::lock_guard<std::recursive_mutex> lock(mutex_);
-  const std::string snapshot_base = SnapshotDirPath(name);
+std::string PersistentTableImpl<Key, Engine>::SnapshotParentFilePath(
+    const std::string& name) const {
+  return PosixFile::JoinPath(SnapshotDirPath(name), kSnapshotParentFileName);
+}
+
+template<typename Key, typename Engine>
+std::vector<std::string> PersistentTableImpl<Key, Engine>::SnapshotChain(
+    const std::string& name) const {
+  std::vector<std::string> chain{name};
+  while (PosixFile::FileExists(SnapshotParentFilePath(chain.back()))) {
+    std::ifstream parent_if(SnapshotParentFilePath(chain.back()));
+    std::string parent;
+    CHECK(std::getline(parent_if, parent));
+    CHECK(std::find(chain.begin(), chain.end(), parent) == chain.end())
+        << "Cyclic snapshot chain of " << name;
+    CHECK(PosixFile::FileExists(SnapshotListFilePath(parent)))
+        << "Can not find snapshot " << parent << ", the parent of " << chain.back();
+    chain.push_back(parent);
+  }
+  return chain;
+}
+
+template<typename Key, typename Engine>
+std::vector<std::string> PersistentTableImpl<Key, Engine>::ChildSnapshots(
+    const std::string& name) const {
+  std::vector<std::string> children;
+  DIR* dir = opendir(snapshots_dir_.c_str());
+  PCHECK(dir != nullptr);
+  struct dirent* ent = nullptr;
+  while ((ent = readdir(dir)) != nullptr) {
+    if (strcmp(ent->d_name, ".") == 0 || strcmp(ent->d_name, "..") == 0) { continue; }
+    const std::string parent_file = SnapshotParentFilePath(ent->d_name);
+    if (!PosixFile::FileExists(parent_file)) { continue; }
+    std::ifstream parent_if(parent_file);
+    std::string parent;
+    if (std::getline(parent_if, parent) && parent == name) { children.emplace_back(ent->d_name); }
+  }
+  PCHECK(closedir(dir) == 0);
+  return children;
+}
+
+template<typename Key, typename Engine>
+std::string PersistentTableImpl<Key, Engine>::ResolveIndexFilePath(
+    const std::vector<std::string>& chain, const std::string& index_filename) const {
+  for (const std::string& name : chain) {
+    const std::string pathname = PosixFile::JoinPath(SnapshotDirPath(name), index_filename);
+    if (PosixFile::FileExists(pathname)) { return pathname; }
+  }
+  LOG(FATAL) << "Can not find " << index_filename << " of snapshot " << chain.front();
+  return "";
+}
+
+template<typename Key, typename Engine>
+void PersistentTableImpl<Key, Engine>::MarkChunkDirty(uint64_t chunk_id) {
+  if (dirty_chunks_.size() <= chunk_id) { dirty_chunks_.resize(chunk_id + 1, false); }
+  dirty_chunks_[chunk_id] = true;
+}
+
+template<typename Key, typename Engine>
+void PersistentTableImpl<Key, Engine>::LoadSnapshotImpl(
+    const std::string& name, const std::function<void(Iterator* iter)>& Hook) {
+  std::lock_guard<std::mutex> write_lock(write_mutex_);
+  std::unique_lock<std::shared_timed_mutex> unique_lock = UniqueLock();
+  const std::vector<std::string> chain = SnapshotChain(name);
   const std::string snapshot_list = SnapshotListFilePath(name);
   row_id_mapping_.clear();
+  ClearStagedValues();
   std::ifstream list_if(snapshot_list);
   std::string index_filename;
   while (std::getline(list_if, index_filename)) {
     const uint64_t chunk_id = GetChunkId(index_filename, kIndexFileNamePrefix);
-    PosixFile index_file(PosixFile::JoinPath(snapshot_base, index_filename), O_RDONLY, 0644);
+    PosixFile index_file(ResolveIndexFilePath(chain, index_filename), O_RDONLY, 0644);
     const size_t index_file_size = index_file.Size();
     CHECK_EQ(index_file_size % sizeof(uint64_t), 0);
-    if (index_file_size == 0) { return; }
+    if (index_file_size == 0) { continue; }
     const size_t n_entries = index_file_size / sizeof(uint64_t);
     PosixMappedFile mapped_index(std::move(index_file), index_file_size, PROT_READ);
     PosixFile key_file(KeyFilePath(chunk_id), O_RDONLY, 0644);
@@ -653,95 +1066,162 @@ void PersistentTableImpl<Key, Engine>::LoadSnapshotImpl(const std::string& name)
     for (size_t i = 0; i < n_entries; ++i) {
       CHECK(row_id_mapping_.emplace(keys[indices[i] - chunk_start_index], indices[i]).second);
     }
+    if (Hook) {
+      PosixFile value_file(ValueFilePath(chunk_id), O_RDONLY, 0644);
+      PosixMappedFile mapped_value(std::move(value_file), value_file.Size(), PROT_READ);
+      ChunkIteratorImpl<Key> chunk_iterator(value_size_, logical_block_size_, num_values_per_block_,
+                                            num_values_per_chunk_, chunk_id, n_entries, keys,
+                                            indices, mapped_value.ptr());
+      Hook(&chunk_iterator);
+    }
   }
+  parent_snapshot_ = name;
+  dirty_chunks_.clear();
 }
 
 template<typename Key, typename Engine>
-void PersistentTableImpl<Key, Engine>::SaveSnapshotImpl(const std::string& name) {
-  std::lock_guard<std::recursive_mutex> lock(mutex_);
-  PosixFile::RecursiveCreateDirectory(SnapshotDirPath(name), 0755);
-  std::ofstream list_ofs(SnapshotListFilePath(name));
-  if (row_id_mapping_.empty()) { return; }
+void PersistentTableImpl<Key, Engine>::SaveSnapshotImpl(const std::string& name, bool delta) {
+  CHECK(!read_only_);
+  std::lock_guard<std::mutex> write_lock(write_mutex_);
+  std::shared_lock<std::shared_timed_mutex> shared_lock = SharedLock();
+  // A snapshot can not be the parent of itself, nor of one of its ancestors
+  if (delta
+      && (parent_snapshot_.empty() || !PosixFile::FileExists(SnapshotListFilePath(parent_snapshot_))
+          || name == parent_snapshot_)) {
+    delta = false;
+  }
+  if (delta) {
+    const std::vector<std::string> parent_chain = SnapshotChain(parent_snapshot_);
+    delta = std::find(parent_chain.begin(), parent_chain.end(), name) == parent_chain.end();
+  }
+  const std::string snapshot_dir = SnapshotDirPath(name);
+  if (PosixFile::FileExists(snapshot_dir)) {
+    // The delta snapshots whose parent is the old snapshot take its index files first
+    for (const std::string& child : ChildSnapshots(name)) { CompactSnapshotImpl(child); }
+    PosixFile::RecursiveDelete(snapshot_dir);
+  }
+  PosixFile::RecursiveCreateDirectory(snapshot_dir, 0755);
+  if (delta) {
+    std::ofstream parent_ofs(SnapshotParentFilePath(name));
+    parent_ofs << parent_snapshot_ << std::endl;
+  }
+  // The index file of a clean chunk is the same as that of the parent, so it is not written
+  auto IsChunkWritten = [&](uint64_t chunk_id) {
+    return !delta || (chunk_id < dirty_chunks_.size() && dirty_chunks_[chunk_id]);
+  };
   std::vector<PosixMappedFile> index_files(value_files_.size());
   std::vector<uint64_t> counters(value_files_.size());
   const uint64_t max_index_file_size = num_values_per_chunk_ * sizeof(uint64_t);
   for (const auto& pair : row_id_mapping_) {
     const uint64_t chunk_id = pair.second / num_values_per_chunk_;
     CHECK(chunk_id < value_files_.size());
-    if (index_files[chunk_id].ptr() == nullptr) {
-      PosixFile snapshot_file(IndexFilePath(name, chunk_id), O_CREAT | O_RDWR, 0644);
-      snapshot_file.Truncate(max_index_file_size);
-      index_files[chunk_id] =
-          PosixMappedFile(std::move(snapshot_file), max_index_file_size, PROT_READ | PROT_WRITE);
-    }
-    uint64_t* indices = static_cast<uint64_t*>(index_files[chunk_id].ptr());
     uint64_t& count = counters[chunk_id];
     CHECK_LT(count, num_values_per_chunk_);
-    indices[count] = pair.second;
+    if (IsChunkWritten(chunk_id)) {
+      if (index_files[chunk_id].ptr() == nullptr) {
+        PosixFile snapshot_file(IndexFilePath(name, chunk_id), O_CREAT | O_RDWR, 0644);
+        snapshot_file.Truncate(max_index_file_size);
+        index_files[chunk_id] =
+            PosixMappedFile(std::move(snapshot_file), max_index_file_size, PROT_READ | PROT_WRITE);
+      }
+      uint64_t* indices = static_cast<uint64_t*>(index_files[chunk_id].ptr());
+      indices[count] = pair.second;
+    }
     count += 1;
   }
+  std::ofstream list_ofs(SnapshotListFilePath(name));
   for (size_t i = 0; i < value_files_.size(); ++i) {
     const uint64_t count = counters[i];
     if (count > 0) {
-      index_files[i].file().Truncate(count * sizeof(uint64_t));
+      if (IsChunkWritten(i)) { index_files[i].file().Truncate(count * sizeof(uint64_t)); }
       list_ofs << kIndexFileNamePrefix + GetChunkName(i) << std::endl;
     } else {
       CHECK(index_files[i].ptr() == nullptr);
     }
   }
+  parent_snapshot_ = name;
+  dirty_chunks_.clear();
 }
 
 template<typename Key, typename Engine>
 bool PersistentTableImpl<Key, Engine>::SnapshotExists(const std::string& name) {
-  std::lock_guard<std::recursive_mutex> lock(mutex_);
+  std::shared_lock<std::shared_timed_mutex> shared_lock = SharedLock();
   return PosixFile::FileExists(SnapshotListFilePath(name));
 }
 
 template<typename Key, typename Engine>
 void PersistentTableImpl<Key, Engine>::LoadSnapshot(const std::string& name) {
-  LoadSnapshotImpl(name);
+  LoadSnapshotImpl(name, nullptr);
 }
 
 template<typename Key, typename Engine>
 void PersistentTableImpl<Key, Engine>::LoadSnapshot(
     const std::string& name, const std::function<void(Iterator* iter)>& Hook) {
-  std::lock_guard<std::recursive_mutex> lock(mutex_);
-  const std::string snapshot_base = SnapshotDirPath(name);
-  const std::string snapshot_list = SnapshotListFilePath(name);
-  row_id_mapping_.clear();
-  std::ifstream list_if(snapshot_list);
+  LoadSnapshotImpl(name, Hook);
+}
+
+template<typename Key, typename Engine>
+void PersistentTableImpl<Key, Engine>::SaveSnapshot(const std::string& name) {
+  SaveSnapshotImpl(name, false);
+}
+
+template<typename Key, typename Engine>
+void PersistentTableImpl<Key, Engine>::SaveDeltaSnapshot(const std::string& name) {
+  SaveSnapshotImpl(name, true);
+}
+
+template<typename Key, typename Engine>
+void PersistentTableImpl<Key, Engine>::CompactSnapshot(const std::string& name) {
+  CHECK(!read_only_);
+  std::lock_guard<std::mutex> write_lock(write_mutex_);
+  CompactSnapshotImpl(name);
+}
+
+template<typename Key, typename Engine>
+void PersistentTableImpl<Key, Engine>::CompactSnapshotImpl(const std::string& name) {
+  const std::vector<std::string> chain = SnapshotChain(name);
+  if (chain.size() == 1) { return; }
+  // The index files inherited from the ancestors are hard linked, which takes no extra space
+  std::ifstream list_if(SnapshotListFilePath(name));
+  std::string index_filename;
+  while (std::getline(list_if, index_filename)) {
+    const std::string pathname = PosixFile::JoinPath(SnapshotDirPath(name), index_filename);
+    if (PosixFile::FileExists(pathname)) { continue; }
+    PCHECK(link(ResolveIndexFilePath(chain, index_filename).c_str(), pathname.c_str()) == 0);
+  }
+  PCHECK(unlink(SnapshotParentFilePath(name).c_str()) == 0);
+}
+
+template<typename Key, typename Engine>
+std::unique_ptr<PersistentTable::Iterator> PersistentTableImpl<Key, Engine>::ReadSnapshot(
+    const std::string& name) {
+  // Resolves the files of the snapshot at once, so that it is not torn by a concurrent save
+  std::lock_guard<std::mutex> write_lock(write_mutex_);
+  CHECK(PosixFile::FileExists(SnapshotListFilePath(name))) << "Can not find snapshot " << name;
+  const std::vector<std::string> chain = SnapshotChain(name);
+  std::vector<typename SnapshotIteratorImpl<Key>::ChunkFiles> chunks;
+  std::ifstream list_if(SnapshotListFilePath(name));
   std::string index_filename;
   while (std::getline(list_if, index_filename)) {
     const uint64_t chunk_id = GetChunkId(index_filename, kIndexFileNamePrefix);
-    PosixFile index_file(PosixFile::JoinPath(snapshot_base, index_filename), O_RDONLY, 0644);
-    const size_t index_file_size = index_file.Size();
-    CHECK_EQ(index_file_size % sizeof(uint64_t), 0);
-    if (index_file_size == 0) { return; }
-    const size_t n_entries = index_file_size / sizeof(uint64_t);
-    PosixMappedFile mapped_index(std::move(index_file), index_file_size, PROT_READ);
-    PosixFile key_file(KeyFilePath(chunk_id), O_RDONLY, 0644);
-    PosixMappedFile mapped_key(std::move(key_file), key_file.Size(), PROT_READ);
-    const uint64_t* indices = static_cast<const uint64_t*>(mapped_index.ptr());
-    const Key* keys = static_cast<const Key*>(mapped_key.ptr());
-    const uint64_t chunk_start_index = chunk_id * num_values_per_chunk_;
-    row_id_mapping_.reserve(row_id_mapping_.size() + n_entries);
-    for (size_t i = 0; i < n_entries; ++i) {
-      CHECK(row_id_mapping_.emplace(keys[indices[i] - chunk_start_index], indices[i]).second);
-    }
-    if (Hook) {
-      PosixFile value_file(ValueFilePath(chunk_id), O_RDONLY, 0644);
-      PosixMappedFile mapped_value(std::move(value_file), value_file.Size(), PROT_READ);
-      ChunkIteratorImpl<Key> chunk_iterator(value_size_, logical_block_size_, num_values_per_block_,
-                                            num_values_per_chunk_, chunk_id, n_entries, keys,
-                                            indices, mapped_value.ptr());
-      Hook(&chunk_iterator);
-    }
+    chunks.push_back({chunk_id, ResolveIndexFilePath(chain, index_filename), KeyFilePath(chunk_id),
+                      ValueFilePath(chunk_id)});
   }
+  return std::unique_ptr<Iterator>(new SnapshotIteratorImpl<Key>(
+      value_size_, logical_block_size_, num_values_per_block_, num_values_per_chunk_,
+      std::move(chunks)));
 }
 
 template<typename Key, typename Engine>
-void PersistentTableImpl<Key, Engine>::SaveSnapshot(const std::string& name) {
-  SaveSnapshotImpl(name);
+std::shared_lock<std::shared_timed_mutex> PersistentTableImpl<Key, Engine>::SharedLock() {
+  { std::lock_guard<std::mutex> turnstile(turnstile_mutex_); }
+  return std::shared_lock<std::shared_timed_mutex>(mutex_);
+}
+
+template<typename Key, typename Engine>
+std::unique_lock<std::shared_timed_mutex> PersistentTableImpl<Key, Engine>::UniqueLock() {
+  std::lock_guard<std::mutex> turnstile(turnstile_mutex_);
+  return std::unique_lock<std::shared_timed_mutex>(mutex_);
 }
 
 template<typename Key, typename Engine>
@@ -29,6 +29,8 @@ struct PersistentTableOptions {
   uint64_t target_chunk_size_mb = 4 * 1024;
   uint16_t physical_block_size = 4096;
   uint64_t capacity_hint = 0;
+  // Opens an existing table without locking it, e.g. to read the snapshots of a table in use
+  bool read_only = false;
 };
 
 class PersistentTable {
@@ -55,11 +57,22 @@ class PersistentTable {
                    uint32_t* missing_indices) = 0;
   virtual void PutBlocks(uint32_t num_keys, const void* keys, const void* blocks) = 0;
   virtual void Put(uint32_t num_keys, const void* keys, const void* values) = 0;
+  // Reads the values of the keys in the background into a staging area, from which the next Get
+  // of them is served. The keys are copied, so they can be released once it returns.
+  virtual void Prefetch(uint32_t num_keys, const void* keys) = 0;
   virtual bool SnapshotExists(const std::string& name) = 0;
   virtual void LoadSnapshot(const std::string& name) = 0;
   virtual void LoadSnapshot(const std::string& name,
                             const std::function<void(Iterator* iter)>& Hook) = 0;
   virtual void SaveSnapshot(const std::string& name) = 0;
+  // Saves only the chunks changed since the snapshot saved or loaded last, which becomes the
+  // parent of this one. It saves a full snapshot if there is no such snapshot.
+  virtual void SaveDeltaSnapshot(const std::string& name) = 0;
+  // Makes a delta snapshot self-contained, so that its ancestors can be deleted
+  virtual void CompactSnapshot(const std::string& name) = 0;
+  // Iterates over the rows of a snapshot chunk by chunk, without loading it into the table. The
+  // snapshot must not be overwritten or deleted before the iterator is released.
+  virtual std::unique_ptr<Iterator> ReadSnapshot(const std::string& name) = 0;
 };
 
 std::unique_ptr<PersistentTable> NewPersistentTable(const PersistentTableOptions& options);
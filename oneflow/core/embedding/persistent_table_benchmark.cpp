@@ -0,0 +1,130 @@
+/*
+Copyright 2020 The OneFlow Authors. All rights reserved.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+*/
+// Measures the throughput and the latency of PersistentTable::Get, with and without prefetching
+// and concurrent writes. Built into oneflow_benchmarkexe, which is not run by ctest.
+#include "oneflow/core/embedding/persistent_table.h"
+#include <gtest/gtest.h>
+#include "oneflow/core/embedding/posix_file.h"
+#include <algorithm>
+#include <iostream>
+#include <numeric>
+#include <random>
+#include <thread>
+
+namespace oneflow {
+
+namespace embedding {
+
+namespace {
+
+constexpr uint32_t kEmbeddingSize = 64;
+
+std::string CreateTempDirectory() {
+  const char* tmp_env = getenv("TMPDIR");
+  const char* tmp_dir = tmp_env == nullptr ? "/tmp" : tmp_env;
+  std::string tpl = std::string(tmp_dir) + "/benchmark_pt_XXXXXX";
+  char* path = mkdtemp(const_cast<char*>(tpl.c_str()));
+  PCHECK(path != nullptr);
+  return std::string(path);
+}
+
+std::unique_ptr<PersistentTable> NewTableForBenchmark(const std::string& path) {
+  PersistentTableOptions options;
+  options.path = path;
+  options.key_size = sizeof(uint64_t);
+  options.value_size = kEmbeddingSize * sizeof(float);
+  options.physical_block_size = 512;
+  return NewPersistentTable(options);
+}
+
+void PutKeys(PersistentTable* table, const std::vector<uint64_t>& keys) {
+  std::vector<float> values(keys.size() * kEmbeddingSize);
+  for (size_t i = 0; i < keys.size(); ++i) {
+    std::fill_n(values.data() + i * kEmbeddingSize, kEmbeddingSize, static_cast<float>(keys[i]));
+  }
+  table->Put(keys.size(), keys.data(), values.data());
+}
+
+void BenchmarkGet(const std::string& name, bool prefetch, bool concurrent_put) {
+  std::string path = CreateTempDirectory();
+  std::unique_ptr<PersistentTable> table = NewTableForBenchmark(path);
+  const uint64_t num_keys = 1 << 18;
+  const uint32_t batch_size = 4096;
+  const int num_batches = 32;
+  std::vector<uint64_t> keys(batch_size);
+  for (uint64_t start = 0; start < num_keys; start += batch_size) {
+    std::iota(keys.begin(), keys.end(), start);
+    PutKeys(table.get(), keys);
+  }
+  std::mt19937 gen(0);
+  std::vector<std::vector<uint64_t>> batches(num_batches + 1);
+  for (auto& batch : batches) {
+    batch.resize(batch_size);
+    for (auto& key : batch) { key = gen() % num_keys; }
+  }
+  std::atomic<bool> done(false);
+  std::thread writer;
+  if (concurrent_put) {
+    // writes back the rows evicted by a cache, which are not in the batches looked up
+    writer = std::thread([&]() {
+      std::mt19937 writer_gen(1);
+      std::vector<uint64_t> keys(batch_size);
+      while (!done) {
+        for (auto& key : keys) { key = num_keys + writer_gen() % num_keys; }
+        PutKeys(table.get(), keys);
+      }
+    });
+  }
+  std::vector<float> values(batch_size * kEmbeddingSize);
+  std::vector<uint32_t> missing_indices(batch_size);
+  std::vector<double> latencies;
+  if (prefetch) { table->Prefetch(batch_size, batches[0].data()); }
+  const auto start_time = std::chrono::steady_clock::now();
+  for (int i = 0; i < num_batches; ++i) {
+    if (prefetch) { table->Prefetch(batch_size, batches[i + 1].data()); }
+    const auto batch_start_time = std::chrono::steady_clock::now();
+    uint32_t n_missing = 0;
+    table->Get(batch_size, batches[i].data(), values.data(), &n_missing, missing_indices.data());
+    latencies.push_back(std::chrono::duration<double, std::milli>(
+                            std::chrono::steady_clock::now() - batch_start_time)
+                            .count());
+    // the compute of the batch, which the prefetch of the next batch overlaps with
+    std::this_thread::sleep_for(std::chrono::milliseconds(100));
+  }
+  const double elapsed =
+      std::chrono::duration<double>(std::chrono::steady_clock::now() - start_time).count();
+  done = true;
+  if (writer.joinable()) { writer.join(); }
+  std::sort(latencies.begin(), latencies.end());
+  std::cout << name << ": " << num_batches * batch_size / elapsed << " keys/s, p50 "
+            << latencies[latencies.size() / 2] << " ms, p99 "
+            << latencies[latencies.size() * 99 / 100] << " ms" << std::endl;
+  table.reset();
+  PosixFile::RecursiveDelete(path);
+}
+
+TEST(PersistentTableBenchmark, Get) {
+  BenchmarkGet("Get", false, false);
+  BenchmarkGet("Get with prefetch", true, false);
+  BenchmarkGet("Get with concurrent Put", false, true);
+  BenchmarkGet("Get with prefetch and concurrent Put", true, true);
+}
+
+}  // namespace
+
+}  // namespace embedding
+
+}  // namespace oneflow
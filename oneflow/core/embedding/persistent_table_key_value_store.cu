@@ -130,11 +130,16 @@ class KeyValueStoreImpl : public KeyValueStore {
   void Get(ep::Stream* stream, uint32_t num_keys, const void* keys, void* values,
            uint32_t* n_missing, uint32_t* missing_indices) override;
   void Put(ep::Stream* stream, uint32_t num_keys, const void* keys, const void* values) override;
+  void Prefetch(uint32_t num_keys, const void* host_keys) override {
+    table_->Prefetch(num_keys, host_keys);
+  }
   bool SnapshotExists(const std::string& name) override;
   void LoadSnapshot(const std::string& name) override;
   void LoadSnapshot(const std::string& name,
                     const std::function<void(KVIterator* iter)>& Hook) override;
   void SaveSnapshot(const std::string& name) override;
+  void SaveDeltaSnapshot(const std::string& name) override;
+  void CompactSnapshot(const std::string& name) override;
 
  private:
   int device_index_;
@@ -224,6 +229,17 @@ void KeyValueStoreImpl<Key>::SaveSnapshot(const std::string& name) {
   table_->SaveSnapshot(name);
 }
 
+template<typename Key>
+void KeyValueStoreImpl<Key>::SaveDeltaSnapshot(const std::string& name) {
+  CudaCurrentDeviceGuard guard(device_index_);
+  table_->SaveDeltaSnapshot(name);
+}
+
+template<typename Key>
+void KeyValueStoreImpl<Key>::CompactSnapshot(const std::string& name) {
+  table_->CompactSnapshot(name);
+}
+
 }  // namespace
 
 std::unique_ptr<KeyValueStore> NewPersistentTableKeyValueStore(
@@ -23,17 +23,21 @@ namespace oneflow {
 
 namespace embedding {
 
-#ifdef WITH_CUDA
-
 struct PersistentTableKeyValueStoreOptions {
   PersistentTableOptions table_options{};
 };
 
+#ifdef WITH_CUDA
+
 std::unique_ptr<KeyValueStore> NewPersistentTableKeyValueStore(
     const PersistentTableKeyValueStoreOptions& options);
 
 #endif  // WITH_CUDA
 
+// The store whose Get/Put take host pointers, in front of which are the host caches
+std::unique_ptr<KeyValueStore> NewHostPersistentTableKeyValueStore(
+    const PersistentTableKeyValueStoreOptions& options);
+
 }  // namespace embedding
 
 }  // namespace oneflow
@@ -0,0 +1,345 @@
+/*
+Copyright 2020 The OneFlow Authors. All rights reserved.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+*/
+#include "oneflow/core/embedding/persistent_table.h"
+#include <gtest/gtest.h>
+#include "oneflow/core/embedding/posix_file.h"
+#include <dirent.h>
+#include <algorithm>
+#include <random>
+
+namespace oneflow {
+
+namespace embedding {
+
+namespace {
+
+constexpr uint32_t kEmbeddingSize = 64;
+
+std::string CreateTempDirectory() {
+  const char* tmp_env = getenv("TMPDIR");
+  const char* tmp_dir = tmp_env == nullptr ? "/tmp" : tmp_env;
+  std::string tpl = std::string(tmp_dir) + "/test_pt_XXXXXX";
+  char* path = mkdtemp(const_cast<char*>(tpl.c_str()));
+  PCHECK(path != nullptr);
+  return std::string(path);
+}
+
+std::unique_ptr<PersistentTable> NewTableForTest(const std::string& path,
+                                                 uint64_t target_chunk_size_mb = 4 * 1024,
+                                                 bool read_only = false) {
+  PersistentTableOptions options;
+  options.path = path;
+  options.target_chunk_size_mb = target_chunk_size_mb;
+  options.read_only = read_only;
+  options.key_size = sizeof(uint64_t);
+  options.value_size = kEmbeddingSize * sizeof(float);
+  options.physical_block_size = 512;
+  return NewPersistentTable(options);
+}
+
+// Every element of the value of key in version is the same, so that a torn value is detected
+float ValueOf(uint64_t key, uint64_t version) { return static_cast<float>(key * 1000 + version); }
+
+void PutVersion(PersistentTable* table, const std::vector<uint64_t>& keys, uint64_t version) {
+  std::vector<float> values(keys.size() * kEmbeddingSize);
+  for (size_t i = 0; i < keys.size(); ++i) {
+    std::fill_n(values.data() + i * kEmbeddingSize, kEmbeddingSize, ValueOf(keys[i], version));
+  }
+  table->Put(keys.size(), keys.data(), values.data());
+}
+
+void CheckVersion(PersistentTable* table, const std::vector<uint64_t>& keys, uint64_t version) {
+  std::vector<float> values(keys.size() * kEmbeddingSize);
+  std::vector<uint32_t> missing_indices(keys.size());
+  uint32_t n_missing = 0;
+  table->Get(keys.size(), keys.data(), values.data(), &n_missing, missing_indices.data());
+  ASSERT_EQ(n_missing, 0);
+  for (size_t i = 0; i < keys.size(); ++i) {
+    for (uint32_t j = 0; j < kEmbeddingSize; ++j) {
+      ASSERT_EQ(values[i * kEmbeddingSize + j], ValueOf(keys[i], version));
+    }
+  }
+}
+
+std::vector<uint64_t> Range(uint64_t start, uint64_t end) {
+  std::vector<uint64_t> keys(end - start);
+  std::iota(keys.begin(), keys.end(), start);
+  return keys;
+}
+
+TEST(PersistentTable, Prefetch) {
+  std::string path = CreateTempDirectory();
+  std::unique_ptr<PersistentTable> table = NewTableForTest(path);
+  PutVersion(table.get(), Range(0, 1024), 0);
+
+  // 1024 to 1279 are not in the table
+  std::vector<uint64_t> keys = Range(512, 1280);
+  table->Prefetch(keys.size(), keys.data());
+  std::this_thread::sleep_for(std::chrono::milliseconds(100));
+  std::vector<float> values(keys.size() * kEmbeddingSize);
+  std::vector<uint32_t> missing_indices(keys.size());
+  uint32_t n_missing = 0;
+  table->Get(keys.size(), keys.data(), values.data(), &n_missing, missing_indices.data());
+  ASSERT_EQ(n_missing, 256);
+  for (uint32_t i = 0; i < n_missing; ++i) { ASSERT_EQ(missing_indices[i], 512 + i); }
+  for (uint32_t i = 0; i < 512; ++i) { ASSERT_EQ(values[i * kEmbeddingSize], ValueOf(keys[i], 0)); }
+
+  // a Put after the prefetch drops the staged values of its keys
+  keys = Range(0, 1024);
+  table->Prefetch(keys.size(), keys.data());
+  std::this_thread::sleep_for(std::chrono::milliseconds(100));
+  PutVersion(table.get(), Range(0, 512), 1);
+  CheckVersion(table.get(), Range(0, 512), 1);
+  CheckVersion(table.get(), Range(512, 1024), 0);
+
+  // so does loading a snapshot
+  table->SaveSnapshot("v1");
+  table->Prefetch(keys.size(), keys.data());
+  std::this_thread::sleep_for(std::chrono::milliseconds(100));
+  PutVersion(table.get(), Range(0, 1024), 2);
+  table->Prefetch(keys.size(), keys.data());
+  std::this_thread::sleep_for(std::chrono::milliseconds(100));
+  table->LoadSnapshot("v1");
+  CheckVersion(table.get(), Range(0, 512), 1);
+  CheckVersion(table.get(), Range(512, 1024), 0);
+  table.reset();
+  PosixFile::RecursiveDelete(path);
+}
+
+TEST(PersistentTable, ConcurrentGetPut) {
+  std::string path = CreateTempDirectory();
+  std::unique_ptr<PersistentTable> table = NewTableForTest(path);
+  const uint64_t num_keys = 4096;
+  PutVersion(table.get(), Range(0, num_keys), 0);
+  std::atomic<bool> done(false);
+  std::thread writer([&]() {
+    std::mt19937 gen(0);
+    for (uint64_t version = 1; version < 64; ++version) {
+      const uint64_t start = gen() % (num_keys - 256);
+      PutVersion(table.get(), Range(start, start + 256), version);
+    }
+    done = true;
+  });
+  std::vector<std::thread> readers;
+  for (int tid = 0; tid < 4; ++tid) {
+    readers.emplace_back([&, tid]() {
+      std::mt19937 gen(tid + 1);
+      std::vector<uint64_t> keys(512);
+      std::vector<float> values(keys.size() * kEmbeddingSize);
+      std::vector<uint32_t> missing_indices(keys.size());
+      while (!done) {
+        for (auto& key : keys) { key = gen() % num_keys; }
+        table->Prefetch(keys.size(), keys.data());
+        for (auto& key : keys) { key = gen() % num_keys; }
+        uint32_t n_missing = 0;
+        table->Get(keys.size(), keys.data(), values.data(), &n_missing, missing_indices.data());
+        ASSERT_EQ(n_missing, 0);
+        for (size_t i = 0; i < keys.size(); ++i) {
+          const float* value = values.data() + i * kEmbeddingSize;
+          ASSERT_EQ(static_cast<uint64_t>(value[0]) / 1000, keys[i]);
+          for (uint32_t j = 1; j < kEmbeddingSize; ++j) { ASSERT_EQ(value[j], value[0]); }
+        }
+      }
+    });
+  }
+  writer.join();
+  for (auto& reader : readers) { reader.join(); }
+  table.reset();
+  PosixFile::RecursiveDelete(path);
+}
+
+TEST(PersistentTable, BlockSizedValues) {
+  std::string path = CreateTempDirectory();
+  // each value takes a whole block, which is read into the output of Get when aligned
+  const uint32_t value_length = 128;
+  PersistentTableOptions options;
+  options.path = path;
+  options.key_size = sizeof(uint64_t);
+  options.value_size = value_length * sizeof(float);
+  options.physical_block_size = 512;
+  std::unique_ptr<PersistentTable> table = NewPersistentTable(options);
+  ASSERT_EQ(table->LogicalBlockSize(), options.value_size);
+  const uint32_t num_keys = 1024;
+  std::vector<uint64_t> keys = Range(0, num_keys);
+  // one more value, so that the values can be put and got at unaligned addresses
+  std::vector<float> values((num_keys + 1) * value_length);
+  for (uint32_t i = 0; i < num_keys * value_length; ++i) { values[i + 1] = i; }
+  table->Put(num_keys, keys.data(), values.data() + 1);
+
+  std::vector<float> values1((num_keys + 1) * value_length);
+  std::vector<uint32_t> missing_indices(num_keys);
+  uint32_t n_missing = 0;
+  for (const uint32_t offset : {0, 1}) {
+    std::fill(values1.begin(), values1.end(), -1);
+    table->Get(num_keys, keys.data(), values1.data() + offset, &n_missing,
+               missing_indices.data());
+    ASSERT_EQ(n_missing, 0);
+    ASSERT_TRUE(std::equal(values.begin() + 1, values.begin() + 1 + num_keys * value_length,
+                           values1.begin() + offset));
+  }
+
+  // the staged values of half of the keys are taken, the other half is read
+  table->Prefetch(num_keys / 2, keys.data());
+  std::this_thread::sleep_for(std::chrono::milliseconds(100));
+  std::fill(values1.begin(), values1.end(), -1);
+  table->Get(num_keys, keys.data(), values1.data() + 1, &n_missing, missing_indices.data());
+  ASSERT_EQ(n_missing, 0);
+  ASSERT_TRUE(std::equal(values.begin() + 1, values.begin() + 1 + num_keys * value_length,
+                         values1.begin() + 1));
+  table.reset();
+  PosixFile::RecursiveDelete(path);
+}
+
+// Returns the number and the total size of the index files of a snapshot
+std::pair<size_t, size_t> IndexFilesOf(const std::string& path, const std::string& name) {
+  const std::string dir = path + "/snapshots/" + name;
+  DIR* dir_ptr = opendir(dir.c_str());
+  PCHECK(dir_ptr != nullptr);
+  size_t num_files = 0;
+  size_t num_bytes = 0;
+  while (struct dirent* entry = readdir(dir_ptr)) {
+    const std::string filename(entry->d_name);
+    if (filename.find("index-") != 0) { continue; }
+    PosixFile file(dir + "/" + filename, O_RDONLY, 0644);
+    num_files += 1;
+    num_bytes += file.Size();
+  }
+  PCHECK(closedir(dir_ptr) == 0);
+  return std::make_pair(num_files, num_bytes);
+}
+
+TEST(PersistentTable, DeltaSnapshot) {
+  std::string path = CreateTempDirectory();
+  // 4096 values per chunk
+  std::unique_ptr<PersistentTable> table = NewTableForTest(path, 1);
+  const uint64_t num_keys = 8 * 4096;
+  PutVersion(table.get(), Range(0, num_keys), 0);
+  table->SaveSnapshot("s0");
+  const auto full = IndexFilesOf(path, "s0");
+  ASSERT_EQ(full.first, 8u);
+  ASSERT_EQ(full.second, num_keys * sizeof(uint64_t));
+
+  // updates the rows of the first chunk, and appends them to a new one
+  PutVersion(table.get(), Range(0, 256), 1);
+  table->SaveDeltaSnapshot("s1");
+  const auto delta = IndexFilesOf(path, "s1");
+  ASSERT_EQ(delta.first, 2u);
+  ASSERT_EQ(delta.second, 4096 * sizeof(uint64_t));
+
+  PutVersion(table.get(), Range(num_keys - 256, num_keys), 2);
+  table->SaveDeltaSnapshot("s2");
+  PutVersion(table.get(), Range(0, num_keys), 3);
+  table->LoadSnapshot("s1");
+  CheckVersion(table.get(), Range(0, 256), 1);
+  CheckVersion(table.get(), Range(256, num_keys), 0);
+
+  // s2 still loads after its ancestors are deleted once it is compacted
+  table->CompactSnapshot("s2");
+  table.reset();
+  PosixFile::RecursiveDelete(path + "/snapshots/s0");
+  PosixFile::RecursiveDelete(path + "/snapshots/s1");
+  table = NewTableForTest(path, 1);
+  table->LoadSnapshot("s2");
+  CheckVersion(table.get(), Range(0, 256), 1);
+  CheckVersion(table.get(), Range(256, num_keys - 256), 0);
+  CheckVersion(table.get(), Range(num_keys - 256, num_keys), 2);
+  table.reset();
+  PosixFile::RecursiveDelete(path);
+}
+
+TEST(PersistentTable, ResaveParentSnapshot) {
+  std::string path = CreateTempDirectory();
+  std::unique_ptr<PersistentTable> table = NewTableForTest(path, 1);
+  const uint64_t num_keys = 8 * 4096;
+  PutVersion(table.get(), Range(0, num_keys), 0);
+  table->SaveSnapshot("s0");
+  PutVersion(table.get(), Range(0, 256), 1);
+  table->SaveDeltaSnapshot("s1");
+  PutVersion(table.get(), Range(num_keys - 256, num_keys), 2);
+  table->SaveDeltaSnapshot("s2");
+
+  // s0 is the parent of s1 and an ancestor of s2, s1 takes its index files first
+  PutVersion(table.get(), Range(0, num_keys), 3);
+  table->SaveSnapshot("s0");
+  ASSERT_FALSE(PosixFile::FileExists(path + "/snapshots/s1/PARENT"));
+  // s1 is the parent of s2 and is saved again as a delta of the new s0
+  PutVersion(table.get(), Range(0, 128), 4);
+  table->SaveDeltaSnapshot("s1");
+  ASSERT_FALSE(PosixFile::FileExists(path + "/snapshots/s2/PARENT"));
+
+  table->LoadSnapshot("s2");
+  CheckVersion(table.get(), Range(0, 256), 1);
+  CheckVersion(table.get(), Range(256, num_keys - 256), 0);
+  CheckVersion(table.get(), Range(num_keys - 256, num_keys), 2);
+  table->LoadSnapshot("s1");
+  CheckVersion(table.get(), Range(0, 128), 4);
+  CheckVersion(table.get(), Range(128, num_keys), 3);
+  table.reset();
+  PosixFile::RecursiveDelete(path);
+}
+
+TEST(PersistentTable, ReadSnapshot) {
+  std::string path = CreateTempDirectory();
+  std::unique_ptr<PersistentTable> table = NewTableForTest(path, 1);
+  const uint64_t num_keys = 8 * 4096;
+  PutVersion(table.get(), Range(0, num_keys), 0);
+  PutVersion(table.get(), Range(0, 256), 1);
+  table->SaveSnapshot("s0");
+  PutVersion(table.get(), Range(128, 384), 2);
+  table->SaveDeltaSnapshot("s1");
+  PutVersion(table.get(), Range(0, num_keys), 3);
+
+  // the table in use is read through another one opened read only
+  std::unique_ptr<PersistentTable> reader = NewTableForTest(path, 1, true);
+  std::unique_ptr<PersistentTable::Iterator> iter = reader->ReadSnapshot("s1");
+  const uint32_t batch_size = 1000;
+  std::vector<uint64_t> keys(batch_size);
+  std::vector<float> values(batch_size * kEmbeddingSize);
+  for (int pass = 0; pass < 2; ++pass) {
+    std::vector<bool> found(num_keys);
+    uint64_t count = 0;
+    while (true) {
+      uint32_t n_result = 0;
+      iter->Next(batch_size, &n_result, keys.data(), values.data());
+      if (n_result == 0) { break; }
+      for (uint32_t i = 0; i < n_result; ++i) {
+        const uint64_t key = keys[i];
+        ASSERT_LT(key, num_keys);
+        ASSERT_FALSE(found[key]);
+        found[key] = true;
+        const uint64_t version = key < 128 ? 1 : key < 384 ? 2 : 0;
+        for (uint32_t j = 0; j < kEmbeddingSize; ++j) {
+          ASSERT_EQ(values[i * kEmbeddingSize + j], ValueOf(key, version));
+        }
+      }
+      count += n_result;
+    }
+    // every row of the snapshot is read once in each pass
+    ASSERT_EQ(count, num_keys);
+    ASSERT_TRUE(std::all_of(found.begin(), found.end(), [](bool f) { return f; }));
+    iter->Reset();
+  }
+  iter.reset();
+  reader.reset();
+  table.reset();
+  PosixFile::RecursiveDelete(path);
+}
+
+}  // namespace
+
+}  // namespace embedding
+
+}  // namespace oneflow
@@ -0,0 +1,186 @@
+/*
+Copyright 2020 The OneFlow Authors. All rights reserved.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+*/
+#include "oneflow/core/embedding/quantized_key_value_store.h"
+
+namespace oneflow {
+
+namespace embedding {
+
+namespace {
+
+void QuantizeLine(const QuantizedKeyValueStoreOptions& options, const float* line, char* stored) {
+  const uint32_t dim = options.embedding_dim;
+  for (uint32_t s = 0; s < options.line_size / dim; ++s) {
+    const float* src = line + s * dim;
+    char* dst = stored + QuantizedSegmentOffset(options, s);
+    const StorageType storage_type = QuantizedSegmentType(options, s);
+    if (storage_type == StorageType::kFloat16) {
+      float16* half_dst = reinterpret_cast<float16*>(dst);
+      for (uint32_t i = 0; i < dim; ++i) { half_dst[i] = static_cast<float16>(src[i]); }
+    } else if (storage_type == StorageType::kInt8) {
+      float max_abs = 0;
+      for (uint32_t i = 0; i < dim; ++i) { max_abs = std::max(max_abs, std::abs(src[i])); }
+      const float scale = max_abs / 127;
+      const float inv_scale = max_abs == 0 ? 0 : 127 / max_abs;
+      std::memcpy(dst, &scale, sizeof(float));
+      int8_t* int8_dst = reinterpret_cast<int8_t*>(dst + sizeof(float));
+      for (uint32_t i = 0; i < dim; ++i) {
+        const float q = std::nearbyint(src[i] * inv_scale);
+        int8_dst[i] = static_cast<int8_t>(std::min(std::max(q, -127.0f), 127.0f));
+      }
+    } else {
+      std::memcpy(dst, src, dim * sizeof(float));
+    }
+  }
+}
+
+void DequantizeLine(const QuantizedKeyValueStoreOptions& options, const char* stored,
+                    float* line) {
+  const uint32_t dim = options.embedding_dim;
+  for (uint32_t s = 0; s < options.line_size / dim; ++s) {
+    const char* src = stored + QuantizedSegmentOffset(options, s);
+    float* dst = line + s * dim;
+    const StorageType storage_type = QuantizedSegmentType(options, s);
+    if (storage_type == StorageType::kFloat16) {
+      const float16* half_src = reinterpret_cast<const float16*>(src);
+      for (uint32_t i = 0; i < dim; ++i) { dst[i] = static_cast<float>(half_src[i]); }
+    } else if (storage_type == StorageType::kInt8) {
+      float scale = 0;
+      std::memcpy(&scale, src, sizeof(float));
+      const int8_t* int8_src = reinterpret_cast<const int8_t*>(src + sizeof(float));
+      for (uint32_t i = 0; i < dim; ++i) { dst[i] = int8_src[i] * scale; }
+    } else {
+      std::memcpy(dst, src, dim * sizeof(float));
+    }
+  }
+}
+
+void DequantizeLines(const QuantizedKeyValueStoreOptions& options, uint32_t num_lines,
+                     const char* stored, float* lines) {
+  const uint32_t stored_size = QuantizedValueSize(options);
+  for (uint32_t i = 0; i < num_lines; ++i) {
+    DequantizeLine(options, stored + i * stored_size, lines + i * options.line_size);
+  }
+}
+
+class HostDequantizedKVIterator : public KVIterator {
+ public:
+  OF_DISALLOW_COPY_AND_MOVE(HostDequantizedKVIterator);
+  HostDequantizedKVIterator(KVIterator* base_iter, const QuantizedKeyValueStoreOptions& options)
+      : base_iter_(base_iter), options_(options) {}
+  ~HostDequantizedKVIterator() override = default;
+
+  void NextN(ep::Stream* stream, uint32_t n_request, uint32_t* n_result, void* keys,
+             void* values) override {
+    buffer_.resize(static_cast<size_t>(n_request) * QuantizedValueSize(options_));
+    base_iter_->NextN(stream, n_request, n_result, keys, buffer_.data());
+    DequantizeLines(options_, *n_result, buffer_.data(), static_cast<float*>(values));
+  }
+
+  void Reset() override { base_iter_->Reset(); }
+
+ private:
+  KVIterator* base_iter_;
+  QuantizedKeyValueStoreOptions options_;
+  std::vector<char> buffer_;
+};
+
+class HostQuantizedKeyValueStoreImpl : public KeyValueStore {
+ public:
+  OF_DISALLOW_COPY_AND_MOVE(HostQuantizedKeyValueStoreImpl);
+  HostQuantizedKeyValueStoreImpl(std::unique_ptr<KeyValueStore>&& store,
+                                 const QuantizedKeyValueStoreOptions& options)
+      : store_(std::move(store)), options_(options), max_query_length_(0) {
+    CHECK_GT(options_.embedding_dim, 0);
+    CHECK_EQ(options_.line_size % options_.embedding_dim, 0);
+    CHECK_EQ(store_->ValueSize(), QuantizedValueSize(options_));
+  }
+  ~HostQuantizedKeyValueStoreImpl() override = default;
+
+  uint32_t KeySize() const override { return store_->KeySize(); }
+  uint32_t ValueSize() const override { return options_.line_size * sizeof(float); }
+  uint32_t MaxQueryLength() const override { return max_query_length_; }
+
+  void ReserveQueryLength(uint32_t query_length) override {
+    std::lock_guard<std::mutex> lock(mutex_);
+    if (query_length <= max_query_length_) { return; }
+    if (query_length > store_->MaxQueryLength()) { store_->ReserveQueryLength(query_length); }
+    values_buffer_.resize(static_cast<size_t>(query_length) * store_->ValueSize());
+    max_query_length_ = query_length;
+  }
+
+  void Get(ep::Stream* stream, uint32_t num_keys, const void* keys, void* values,
+           uint32_t* n_missing, uint32_t* missing_indices) override {
+    std::lock_guard<std::mutex> lock(mutex_);
+    CHECK_LE(num_keys, max_query_length_);
+    store_->Get(stream, num_keys, keys, values_buffer_.data(), n_missing, missing_indices);
+    // the lines of the missing keys are dequantized too, they are initialized by the caller
+    DequantizeLines(options_, num_keys, values_buffer_.data(), static_cast<float*>(values));
+  }
+
+  void Put(ep::Stream* stream, uint32_t num_keys, const void* keys, const void* values) override {
+    std::lock_guard<std::mutex> lock(mutex_);
+    CHECK_LE(num_keys, max_query_length_);
+    const uint32_t stored_size = store_->ValueSize();
+    for (uint32_t i = 0; i < num_keys; ++i) {
+      QuantizeLine(options_, static_cast<const float*>(values) + i * options_.line_size,
+                   values_buffer_.data() + i * stored_size);
+    }
+    store_->Put(stream, num_keys, keys, values_buffer_.data());
+  }
+
+  void Prefetch(uint32_t num_keys, const void* host_keys) override {
+    store_->Prefetch(num_keys, host_keys);
+  }
+  bool SnapshotExists(const std::string& name) override { return store_->SnapshotExists(name); }
+  void LoadSnapshot(const std::string& name) override { store_->LoadSnapshot(name); }
+  void LoadSnapshot(const std::string& name,
+                    const std::function<void(KVIterator* iter)>& Hook) override {
+    if (!Hook) {
+      store_->LoadSnapshot(name);
+      return;
+    }
+    store_->LoadSnapshot(name, [&](KVIterator* iter) {
+      HostDequantizedKVIterator dequantized_iter(iter, options_);
+      Hook(&dequantized_iter);
+    });
+  }
+  void SaveSnapshot(const std::string& name) override { store_->SaveSnapshot(name); }
+  void SaveDeltaSnapshot(const std::string& name) override { store_->SaveDeltaSnapshot(name); }
+  void CompactSnapshot(const std::string& name) override { store_->CompactSnapshot(name); }
+  void GetCacheStats(std::vector<CacheStats>* stats) const override {
+    store_->GetCacheStats(stats);
+  }
+
+ private:
+  std::unique_ptr<KeyValueStore> store_;
+  QuantizedKeyValueStoreOptions options_;
+  std::vector<char> values_buffer_;
+  std::mutex mutex_;
+  uint32_t max_query_length_;
+};
+
+}  // namespace
+
+std::unique_ptr<KeyValueStore> NewHostQuantizedKeyValueStore(
+    std::unique_ptr<KeyValueStore>&& store, const QuantizedKeyValueStoreOptions& options) {
+  return std::unique_ptr<KeyValueStore>(
+      new HostQuantizedKeyValueStoreImpl(std::move(store), options));
+}
+
+}  // namespace embedding
+
+}  // namespace oneflow
@@ -0,0 +1,229 @@
+/*
+Copyright 2020 The OneFlow Authors. All rights reserved.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+*/
+#include "oneflow/core/embedding/quantized_key_value_store.h"
+#include "oneflow/core/device/cuda_util.h"
+#include "oneflow/core/ep/cuda/cuda_stream.h"
+#include <cuda_fp16.h>
+
+namespace oneflow {
+
+namespace embedding {
+
+namespace {
+
+__device__ float WarpReduceMax(float val) {
+  for (int mask = kCudaWarpSize / 2; mask > 0; mask /= 2) {
+    val = max(val, __shfl_xor_sync(0xffffffff, val, mask));
+  }
+  return val;
+}
+
+// Each segment is quantized by a warp, which reduces the max absolute value of an int8 segment
+__global__ void QuantizeKernel(QuantizedKeyValueStoreOptions options, uint32_t num_lines,
+                               const float* lines, char* stored) {
+  const uint32_t dim = options.embedding_dim;
+  const uint32_t num_segments = options.line_size / dim;
+  const uint32_t stored_size = QuantizedValueSize(options);
+  const uint32_t lane = threadIdx.x % kCudaWarpSize;
+  const uint32_t num_warps = gridDim.x * blockDim.x / kCudaWarpSize;
+  const uint32_t num_segments_total = num_lines * num_segments;
+  for (uint32_t w = (blockIdx.x * blockDim.x + threadIdx.x) / kCudaWarpSize; w < num_segments_total;
+       w += num_warps) {
+    const uint32_t line = w / num_segments;
+    const uint32_t s = w - line * num_segments;
+    const float* src = lines + line * options.line_size + s * dim;
+    char* dst = stored + line * stored_size + QuantizedSegmentOffset(options, s);
+    const StorageType storage_type = QuantizedSegmentType(options, s);
+    if (storage_type == StorageType::kFloat16) {
+      half* half_dst = reinterpret_cast<half*>(dst);
+      for (uint32_t i = lane; i < dim; i += kCudaWarpSize) { half_dst[i] = __float2half(src[i]); }
+    } else if (storage_type == StorageType::kInt8) {
+      float max_abs = 0;
+      for (uint32_t i = lane; i < dim; i += kCudaWarpSize) {
+        max_abs = max(max_abs, fabsf(src[i]));
+      }
+      max_abs = WarpReduceMax(max_abs);
+      const float inv_scale = max_abs == 0 ? 0 : 127 / max_abs;
+      if (lane == 0) { *reinterpret_cast<float*>(dst) = max_abs / 127; }
+      int8_t* int8_dst = reinterpret_cast<int8_t*>(dst + sizeof(float));
+      for (uint32_t i = lane; i < dim; i += kCudaWarpSize) {
+        const int q = __float2int_rn(src[i] * inv_scale);
+        int8_dst[i] = static_cast<int8_t>(min(max(q, -127), 127));
+      }
+    } else {
+      float* float_dst = reinterpret_cast<float*>(dst);
+      for (uint32_t i = lane; i < dim; i += kCudaWarpSize) { float_dst[i] = src[i]; }
+    }
+  }
+}
+
+__global__ void DequantizeKernel(QuantizedKeyValueStoreOptions options, uint32_t num_lines,
+                                 const char* stored, float* lines) {
+  const uint32_t dim = options.embedding_dim;
+  const uint32_t stored_size = QuantizedValueSize(options);
+  CUDA_1D_KERNEL_LOOP_T(uint32_t, i, num_lines * options.line_size) {
+    const uint32_t line = i / options.line_size;
+    const uint32_t col = i - line * options.line_size;
+    const uint32_t s = col / dim;
+    const uint32_t j = col - s * dim;
+    const char* src = stored + line * stored_size + QuantizedSegmentOffset(options, s);
+    const StorageType storage_type = QuantizedSegmentType(options, s);
+    if (storage_type == StorageType::kFloat16) {
+      lines[i] = __half2float(reinterpret_cast<const half*>(src)[j]);
+    } else if (storage_type == StorageType::kInt8) {
+      const float scale = *reinterpret_cast<const float*>(src);
+      lines[i] = reinterpret_cast<const int8_t*>(src + sizeof(float))[j] * scale;
+    } else {
+      lines[i] = reinterpret_cast<const float*>(src)[j];
+    }
+  }
+}
+
+void Dequantize(ep::Stream* stream, const QuantizedKeyValueStoreOptions& options,
+                uint32_t num_lines, const char* stored, float* lines) {
+  if (num_lines == 0) { return; }
+  RUN_CUDA_KERNEL(DequantizeKernel, stream, num_lines * options.line_size, options, num_lines,
+                  stored, lines);
+}
+
+void Quantize(ep::Stream* stream, const QuantizedKeyValueStoreOptions& options, uint32_t num_lines,
+              const float* lines, char* stored) {
+  if (num_lines == 0) { return; }
+  const uint32_t num_segments = options.line_size / options.embedding_dim;
+  RUN_CUDA_KERNEL(QuantizeKernel, stream, num_lines * num_segments * kCudaWarpSize, options,
+                  num_lines, lines, stored);
+}
+
+class DequantizedKVIterator : public KVIterator {
+ public:
+  OF_DISALLOW_COPY_AND_MOVE(DequantizedKVIterator);
+  DequantizedKVIterator(KVIterator* base_iter, const QuantizedKeyValueStoreOptions& options)
+      : base_iter_(base_iter), options_(options), buffer_(nullptr), buffer_length_(0) {}
+  ~DequantizedKVIterator() override {
+    if (buffer_ != nullptr) { OF_CUDA_CHECK(cudaFree(buffer_)); }
+  }
+
+  // n_result is in device memory, so all the n_request lines are dequantized
+  void NextN(ep::Stream* stream, uint32_t n_request, uint32_t* n_result, void* keys,
+             void* values) override {
+    if (n_request > buffer_length_) {
+      if (buffer_ != nullptr) { OF_CUDA_CHECK(cudaFree(buffer_)); }
+      OF_CUDA_CHECK(cudaMalloc(&buffer_, n_request * QuantizedValueSize(options_)));
+      buffer_length_ = n_request;
+    }
+    base_iter_->NextN(stream, n_request, n_result, keys, buffer_);
+    Dequantize(stream, options_, n_request, buffer_, static_cast<float*>(values));
+  }
+
+  void Reset() override { base_iter_->Reset(); }
+
+ private:
+  KVIterator* base_iter_;
+  QuantizedKeyValueStoreOptions options_;
+  char* buffer_;
+  uint32_t buffer_length_;
+};
+
+class QuantizedKeyValueStoreImpl : public KeyValueStore {
+ public:
+  OF_DISALLOW_COPY_AND_MOVE(QuantizedKeyValueStoreImpl);
+  QuantizedKeyValueStoreImpl(std::unique_ptr<KeyValueStore>&& store,
+                             const QuantizedKeyValueStoreOptions& options)
+      : store_(std::move(store)), options_(options), max_query_length_(0) {
+    OF_CUDA_CHECK(cudaGetDevice(&device_index_));
+    CHECK_GT(options_.embedding_dim, 0);
+    CHECK_EQ(options_.line_size % options_.embedding_dim, 0);
+    CHECK_EQ(store_->ValueSize(), QuantizedValueSize(options_));
+  }
+  ~QuantizedKeyValueStoreImpl() override {
+    CudaCurrentDeviceGuard guard(device_index_);
+    if (max_query_length_ != 0) { OF_CUDA_CHECK(cudaFree(values_buffer_)); }
+    store_.reset();
+  }
+
+  uint32_t KeySize() const override { return store_->KeySize(); }
+  uint32_t ValueSize() const override { return options_.line_size * sizeof(float); }
+  uint32_t MaxQueryLength() const override { return max_query_length_; }
+
+  void ReserveQueryLength(uint32_t query_length) override {
+    CudaCurrentDeviceGuard guard(device_index_);
+    std::lock_guard<std::mutex> lock(mutex_);
+    if (query_length <= max_query_length_) { return; }
+    if (query_length > store_->MaxQueryLength()) { store_->ReserveQueryLength(query_length); }
+    if (max_query_length_ != 0) { OF_CUDA_CHECK(cudaFree(values_buffer_)); }
+    OF_CUDA_CHECK(cudaMalloc(&values_buffer_, query_length * store_->ValueSize()));
+    max_query_length_ = query_length;
+  }
+
+  void Get(ep::Stream* stream, uint32_t num_keys, const void* keys, void* values,
+           uint32_t* n_missing, uint32_t* missing_indices) override {
+    std::lock_guard<std::mutex> lock(mutex_);
+    CHECK_LE(num_keys, max_query_length_);
+    store_->Get(stream, num_keys, keys, values_buffer_, n_missing, missing_indices);
+    // the lines of the missing keys are dequantized too, they are initialized by the caller
+    Dequantize(stream, options_, num_keys, values_buffer_, static_cast<float*>(values));
+  }
+
+  void Put(ep::Stream* stream, uint32_t num_keys, const void* keys, const void* values) override {
+    std::lock_guard<std::mutex> lock(mutex_);
+    CHECK_LE(num_keys, max_query_length_);
+    Quantize(stream, options_, num_keys, static_cast<const float*>(values), values_buffer_);
+    store_->Put(stream, num_keys, keys, values_buffer_);
+  }
+
+  void Prefetch(uint32_t num_keys, const void* host_keys) override {
+    store_->Prefetch(num_keys, host_keys);
+  }
+  bool SnapshotExists(const std::string& name) override { return store_->SnapshotExists(name); }
+  void LoadSnapshot(const std::string& name) override { store_->LoadSnapshot(name); }
+  void LoadSnapshot(const std::string& name,
+                    const std::function<void(KVIterator* iter)>& Hook) override {
+    if (!Hook) {
+      store_->LoadSnapshot(name);
+      return;
+    }
+    store_->LoadSnapshot(name, [&](KVIterator* iter) {
+      CudaCurrentDeviceGuard guard(device_index_);
+      DequantizedKVIterator dequantized_iter(iter, options_);
+      Hook(&dequantized_iter);
+    });
+  }
+  void SaveSnapshot(const std::string& name) override { store_->SaveSnapshot(name); }
+  void SaveDeltaSnapshot(const std::string& name) override { store_->SaveDeltaSnapshot(name); }
+  void CompactSnapshot(const std::string& name) override { store_->CompactSnapshot(name); }
+  void GetCacheStats(std::vector<CacheStats>* stats) const override {
+    store_->GetCacheStats(stats);
+  }
+
+ private:
+  std::unique_ptr<KeyValueStore> store_;
+  QuantizedKeyValueStoreOptions options_;
+  char* values_buffer_{};
+  int device_index_{};
+  std::mutex mutex_;
+  uint32_t max_query_length_;
+};
+
+}  // namespace
+
+std::unique_ptr<KeyValueStore> NewQuantizedKeyValueStore(
+    std::unique_ptr<KeyValueStore>&& store, const QuantizedKeyValueStoreOptions& options) {
+  return std::unique_ptr<KeyValueStore>(new QuantizedKeyValueStoreImpl(std::move(store), options));
+}
+
+}  // namespace embedding
+
+}  // namespace oneflow
@@ -0,0 +1,78 @@
+/*
+Copyright 2020 The OneFlow Authors. All rights reserved.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+*/
+#ifndef ONEFLOW_CORE_EMBEDDING_QUANTIZED_KEY_VALUE_STORE_H_
+#define ONEFLOW_CORE_EMBEDDING_QUANTIZED_KEY_VALUE_STORE_H_
+
+#include "oneflow/core/embedding/key_value_store.h"
+#include "oneflow/core/common/data_type.h"
+
+namespace oneflow {
+
+namespace embedding {
+
+enum class StorageType { kFloat = 0, kFloat16 = 1, kInt8 = 2 };
+
+// A line of `line_size` float values is stored as `line_size / embedding_dim` segments. The first
+// segment holds the embedding and is stored as `values_type`, the others hold the optimizer states
+// and are stored as `states_type`. An int8 segment is prefixed with its float scale, which is the
+// max absolute value of the segment divided by 127.
+struct QuantizedKeyValueStoreOptions {
+  uint32_t embedding_dim = 0;
+  uint32_t line_size = 0;
+  StorageType values_type = StorageType::kFloat;
+  StorageType states_type = StorageType::kFloat;
+};
+
+OF_DEVICE_FUNC uint32_t StorageSegmentSize(StorageType storage_type, uint32_t num_elems) {
+  if (storage_type == StorageType::kFloat16) {
+    return (num_elems * 2 + 3) / 4 * 4;
+  } else if (storage_type == StorageType::kInt8) {
+    return 4 + (num_elems + 3) / 4 * 4;
+  } else {
+    return num_elems * 4;
+  }
+}
+
+OF_DEVICE_FUNC StorageType QuantizedSegmentType(const QuantizedKeyValueStoreOptions& options,
+                                                uint32_t segment) {
+  return segment == 0 ? options.values_type : options.states_type;
+}
+
+OF_DEVICE_FUNC uint32_t QuantizedSegmentOffset(const QuantizedKeyValueStoreOptions& options,
+                                               uint32_t segment) {
+  if (segment == 0) { return 0; }
+  return StorageSegmentSize(options.values_type, options.embedding_dim)
+         + (segment - 1) * StorageSegmentSize(options.states_type, options.embedding_dim);
+}
+
+// The size in bytes of a stored line
+OF_DEVICE_FUNC uint32_t QuantizedValueSize(const QuantizedKeyValueStoreOptions& options) {
+  return QuantizedSegmentOffset(options, options.line_size / options.embedding_dim);
+}
+
+// Stores the float values of `store` quantized as `options`. The returned store takes and returns
+// float values, and must be the outermost one, since the caches below it hold the quantized lines.
+std::unique_ptr<KeyValueStore> NewQuantizedKeyValueStore(
+    std::unique_ptr<KeyValueStore>&& store, const QuantizedKeyValueStoreOptions& options);
+
+std::unique_ptr<KeyValueStore> NewHostQuantizedKeyValueStore(
+    std::unique_ptr<KeyValueStore>&& store, const QuantizedKeyValueStoreOptions& options);
+
+}  // namespace embedding
+
+}  // namespace oneflow
+
+#endif  // ONEFLOW_CORE_EMBEDDING_QUANTIZED_KEY_VALUE_STORE_H_
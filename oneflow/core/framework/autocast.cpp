@@ -0,0 +1,145 @@
+/*
+Copyright 2020 The OneFlow Authors. All rights reserved.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+*/
+#include "oneflow/core/framework/autocast.h"
+#include <map>
+#include "oneflow/core/autograd/autograd_mode.h"
+#include "oneflow/core/framework/dtype.h"
+#include "oneflow/core/framework/device.h"
+#include "oneflow/core/framework/tensor.h"
+#include "oneflow/core/functional/functional.h"
+#include "oneflow/core/job/parallel_desc.h"
+#include "oneflow/core/job_rewriter/auto_mixed_precision_lists.h"
+
+namespace oneflow {
+namespace autocast {
+
+namespace {
+
+struct AutoCastState {
+  bool enabled = false;
+  DeviceType device_type = DeviceType::kCUDA;
+  DataType dtype = DataType::kFloat16;
+};
+
+AutoCastState* GetThreadLocalAutoCastState() {
+  static thread_local AutoCastState state;
+  return &state;
+}
+
+// The source tensors are held by the cache, so that their addresses are not reused
+using CastCache = std::map<std::pair<const one::Tensor*, DataType>,
+                           std::pair<std::shared_ptr<one::Tensor>, std::shared_ptr<one::Tensor>>>;
+
+CastCache* GetThreadLocalCastCache() {
+  static thread_local CastCache cache;
+  return &cache;
+}
+
+enum class CastPolicy { kNone, kLowPrecision, kFloat, kPromote };
+
+CastPolicy GetCastPolicy(const std::string& op_type_name) {
+  if (AutoMixedPrecisionLists::WhiteList().count(op_type_name) > 0) {
+    return CastPolicy::kLowPrecision;
+  } else if (AutoMixedPrecisionLists::BlackList().count(op_type_name) > 0) {
+    return CastPolicy::kFloat;
+  } else if (AutoMixedPrecisionLists::GrayList().count(op_type_name) > 0
+             || AutoMixedPrecisionLists::ClearList().count(op_type_name) > 0) {
+    return CastPolicy::kPromote;
+  } else {
+    return CastPolicy::kNone;
+  }
+}
+
+Maybe<DeviceType> GetDeviceType(const std::shared_ptr<one::Tensor>& tensor) {
+  if (tensor->is_consistent()) { return JUST(tensor->parallel_desc())->device_type(); }
+  return JUST(tensor->device())->enum_type();
+}
+
+Maybe<one::Tensor> CachedCast(const std::shared_ptr<one::Tensor>& tensor, DataType data_type) {
+  const Symbol<DType>& dtype = JUST(DType::Get(data_type));
+  // Only the casts of the parameters are reused, which are the leaves requiring grad
+  if (!(tensor->is_leaf() && tensor->requires_grad() && autograd::GradMode::is_enabled())) {
+    return one::functional::Cast(tensor, dtype);
+  }
+  CastCache* cache = GetThreadLocalCastCache();
+  const auto key = std::make_pair(tensor.get(), data_type);
+  auto it = cache->find(key);
+  if (it != cache->end()) { return it->second.second; }
+  std::shared_ptr<one::Tensor> casted = JUST(one::functional::Cast(tensor, dtype));
+  cache->emplace(key, std::make_pair(tensor, casted));
+  return casted;
+}
+
+}  // namespace
+
+bool AutoCastMode::is_enabled() { return GetThreadLocalAutoCastState()->enabled; }
+
+void AutoCastMode::set_enabled(bool enabled) { GetThreadLocalAutoCastState()->enabled = enabled; }
+
+DeviceType AutoCastMode::device_type() { return GetThreadLocalAutoCastState()->device_type; }
+
+void AutoCastMode::set_device_type(DeviceType device_type) {
+  GetThreadLocalAutoCastState()->device_type = device_type;
+}
+
+DataType AutoCastMode::dtype() { return GetThreadLocalAutoCastState()->dtype; }
+
+void AutoCastMode::set_dtype(DataType dtype) { GetThreadLocalAutoCastState()->dtype = dtype; }
+
+void ClearCastCache() { GetThreadLocalCastCache()->clear(); }
+
+Maybe<bool> AutoCastInputs(const std::string& op_type_name, const one::TensorTuple& inputs,
+                           const one::TensorTuple& outputs, one::TensorTuple* casted_inputs) {
+  const CastPolicy policy = GetCastPolicy(op_type_name);
+  if (policy == CastPolicy::kNone) { return false; }
+  const AutoCastState& state = *GetThreadLocalAutoCastState();
+  std::vector<bool> castable(inputs.size(), false);
+  bool has_float = false;
+  bool has_low_precision = false;
+  for (int i = 0; i < inputs.size(); ++i) {
+    const DataType data_type = inputs.at(i)->dtype()->data_type();
+    if (data_type != DataType::kFloat && data_type != state.dtype) { continue; }
+    if (JUST(GetDeviceType(inputs.at(i))) != state.device_type) { continue; }
+    castable[i] = true;
+    has_float = has_float || data_type == DataType::kFloat;
+    has_low_precision = has_low_precision || data_type == state.dtype;
+  }
+  DataType target_data_type = DataType::kFloat;
+  const auto inplace_output =
+      std::find_if(outputs.begin(), outputs.end(),
+                   [](const std::shared_ptr<one::Tensor>& tensor) { return tensor != nullptr; });
+  if (inplace_output != outputs.end()) {
+    target_data_type = (*inplace_output)->dtype()->data_type();
+    if (target_data_type != DataType::kFloat && target_data_type != state.dtype) { return false; }
+    if (!(has_float && has_low_precision)) { return false; }
+  } else if (policy == CastPolicy::kLowPrecision) {
+    if (!has_float) { return false; }
+    target_data_type = state.dtype;
+  } else if (policy == CastPolicy::kFloat) {
+    if (!has_low_precision) { return false; }
+  } else {
+    if (!(has_float && has_low_precision)) { return false; }
+  }
+  *casted_inputs = inputs;
+  for (int i = 0; i < inputs.size(); ++i) {
+    if (!castable[i] || inputs.at(i)->dtype()->data_type() == target_data_type) { continue; }
+    casted_inputs->at(i) = JUST(CachedCast(inputs.at(i), target_data_type));
+  }
+  return true;
+}
+
+}  // namespace autocast
+}  // namespace oneflow
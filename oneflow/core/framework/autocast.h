@@ -0,0 +1,51 @@
+/*
+Copyright 2020 The OneFlow Authors. All rights reserved.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+*/
+#ifndef ONEFLOW_CORE_FRAMEWORK_AUTOCAST_H_
+#define ONEFLOW_CORE_FRAMEWORK_AUTOCAST_H_
+
+#include "oneflow/core/common/maybe.h"
+#include "oneflow/core/common/data_type.pb.h"
+#include "oneflow/core/common/device_type.pb.h"
+#include "oneflow/core/framework/tensor_tuple.h"
+
+namespace oneflow {
+namespace autocast {
+
+// The thread local autocast state of the eager mode. When it is enabled, the floating inputs on
+// `device_type` of the ops in the AutoMixedPrecisionLists are cast by the list of the op: to
+// `dtype` for the white list, to float for the black list, and to float if they are mixed for the
+// gray and clear lists.
+struct AutoCastMode {
+  static bool is_enabled();
+  static void set_enabled(bool enabled);
+  static DeviceType device_type();
+  static void set_device_type(DeviceType device_type);
+  static DataType dtype();
+  static void set_dtype(DataType dtype);
+};
+
+// Drops the casts of the parameters, which are reused until the outermost autocast exits
+void ClearCastCache();
+
+// Returns false if no input of the op needs to be cast, otherwise sets `casted_inputs`. The inputs
+// of an inplace op, whose outputs are given, are cast to the type of its output.
+Maybe<bool> AutoCastInputs(const std::string& op_type_name, const one::TensorTuple& inputs,
+                           const one::TensorTuple& outputs, one::TensorTuple* casted_inputs);
+
+}  // namespace autocast
+}  // namespace oneflow
+
+#endif  // ONEFLOW_CORE_FRAMEWORK_AUTOCAST_H_
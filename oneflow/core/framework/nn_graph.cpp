@@ -14,6 +14,9 @@ See the License for the specific language governing permissions and
 limitations under the License.
 */
 #include "oneflow/core/framework/nn_graph.h"
+#include <unistd.h>
+#include <cstdio>
+#include <fstream>
 #include "oneflow/core/common/buffer_manager.h"
 #include "oneflow/core/common/maybe.h"
 #include "oneflow/core/common/scalar.h"
@@ -33,6 +36,7 @@ limitations under the License.
 #include "oneflow/core/job/job_desc.h"
 #include "oneflow/core/job/job_instance.h"
 #include "oneflow/core/job/critical_section_instance.h"
+#include "oneflow/core/job/id_manager.h"
 #include "oneflow/core/job/lazy_mode.h"
 #include "oneflow/core/job/plan_util.h"
 #include "oneflow/core/persistence/tee_persistent_log_stream.h"
@@ -256,7 +260,10 @@ Maybe<void> NNGraph::CompileAndInitRuntime() {
   if (Global<JobDesc>::Get() != nullptr) { Global<JobDesc>::Delete(); }
 
   auto scope = std::make_unique<GlobalJobDescScope>(job_.job_conf(), job_ctx->job_id());
-  if (GlobalProcessCtx::IsThisProcessMaster()) {
+  if (GlobalProcessCtx::IsThisProcessMaster() && JUST(TryLoadPlanFromCache(job_ctx->job_id()))) {
+    VLOG(1) << "Graph name: " << name_ << " load plan from cache: " << plan_cache_path_;
+  } else if (GlobalProcessCtx::IsThisProcessMaster()) {
+    const std::string id_state_before_compile = Global<IDMgr>::Get()->DumpState();
     double start = GetCurTime();
     // TODO(chengcheng): new memory reused by chunk
     Compiler().Compile(&job_, &plan_, /* need_job_complete */ true);
@@ -274,6 +281,7 @@ Maybe<void> NNGraph::CompileAndInitRuntime() {
     // PlanUtil::SetForceInplaceMemBlock(&plan_); NOTE(chengcheng): only for ssp.
     PlanUtil::DumpCtrlRegstInfoToPlan(&plan_);
     PlanUtil::PlanMemoryLog(&plan_, name_);
+    JUST(SavePlanToCache(id_state_before_compile));
   }
   if (GlobalProcessCtx::WorldSize() > 1) {
     std::string plan_name = "plan:" + job_name();
@@ -299,6 +307,76 @@ Maybe<void> NNGraph::CompileAndInitRuntime() {
   return Maybe<void>::Ok();
 }
 
+namespace {
+
+std::string PlanCacheIdStatePath(const std::string& plan_cache_path) {
+  return plan_cache_path + ".ids";
+}
+
+Maybe<void> WriteFileAtomically(const std::string& path, const std::string& content) {
+  // NOTE: Write to a temp file then rename it, so a concurrent reader never sees a partial file.
+  const std::string tmp_path = path + ".tmp." + std::to_string(getpid());
+  {
+    std::ofstream out_stream(tmp_path, std::ios::out | std::ios::trunc | std::ios::binary);
+    CHECK_OR_RETURN(out_stream.is_open()) << "can not open plan cache file: " << tmp_path;
+    CHECK_OR_RETURN(out_stream.write(content.data(), content.size()))
+        << "failed to write plan cache file: " << tmp_path;
+  }
+  CHECK_EQ_OR_RETURN(std::rename(tmp_path.c_str(), path.c_str()), 0)
+      << "failed to rename plan cache file to: " << path;
+  return Maybe<void>::Ok();
+}
+
+}  // namespace
+
+Maybe<bool> NNGraph::TryLoadPlanFromCache(int64_t job_id) {
+  if (plan_cache_path_.empty()) { return false; }
+  // The first line is the state of the id counters the plan was compiled from, and the second one
+  // is the state after compiling it.
+  std::ifstream id_state_stream(PlanCacheIdStatePath(plan_cache_path_));
+  std::string id_state_before_compile;
+  std::string id_state_after_compile;
+  if (!std::getline(id_state_stream, id_state_before_compile)
+      || !std::getline(id_state_stream, id_state_after_compile)) {
+    return false;
+  }
+  if (id_state_before_compile != Global<IDMgr>::Get()->DumpState()) {
+    LOG(WARNING) << "Graph name: " << name_
+                 << " ignore plan cache compiled with other ids: " << plan_cache_path_;
+    return false;
+  }
+  std::ifstream in_stream(plan_cache_path_, std::ios::in | std::ios::binary);
+  if (!in_stream.is_open()) { return false; }
+  Plan cached_plan;
+  if (!cached_plan.ParseFromIstream(&in_stream)) {
+    LOG(WARNING) << "Graph name: " << name_ << " ignore broken plan cache: " << plan_cache_path_;
+    return false;
+  }
+  if (cached_plan.job_id2op_attribute_ref_table().count(job_id) == 0) {
+    LOG(WARNING) << "Graph name: " << name_
+                 << " ignore plan cache compiled with another job id: " << plan_cache_path_;
+    return false;
+  }
+  plan_ = std::move(cached_plan);
+  // The ids used by the plan are not allocated again by the plans compiled later.
+  Global<IDMgr>::Get()->LoadState(id_state_after_compile);
+  plan_cache_hit_ = true;
+  return true;
+}
+
+Maybe<void> NNGraph::SavePlanToCache(const std::string& id_state_before_compile) const {
+  if (plan_cache_path_.empty()) { return Maybe<void>::Ok(); }
+  std::string serialized_plan;
+  CHECK_OR_RETURN(plan_.SerializeToString(&serialized_plan))
+      << "failed to serialize plan of graph: " << name_;
+  JUST(WriteFileAtomically(plan_cache_path_, serialized_plan));
+  // The id state is written last, as a plan cache without it is never loaded.
+  JUST(WriteFileAtomically(PlanCacheIdStatePath(plan_cache_path_),
+                           id_state_before_compile + "\n" + Global<IDMgr>::Get()->DumpState()
+                               + "\n"));
+  return Maybe<void>::Ok();
+}
+
 Maybe<void> NNGraph::GetVariableRealBlobAfterSyncPlan() {
   CHECK_OR_RETURN(variable_op_name2eager_blob_.empty());
   JUST(vm::CurrentRankSync());
@@ -30,7 +30,7 @@ class Blob;
 class NNGraph final : public NNGraphIf {
  public:
   explicit NNGraph(const std::string& name)
-      : name_(name), runtime_inited_(false), is_closed_(false) {}
+      : name_(name), runtime_inited_(false), is_closed_(false), plan_cache_hit_(false) {}
   ~NNGraph();
 
   const std::string& job_name() const override { return name_; }
@@ -57,12 +57,22 @@ class NNGraph final : public NNGraphIf {
   Maybe<std::vector<std::string>> GetAdditionalVarOpNames() const;
   Maybe<std::vector<std::shared_ptr<one::Tensor>>> GetAdditionalVarOpTensors() const;
   Maybe<void> CompileAndInitRuntime();
+  // If plan cache path is set, the plan is loaded from the path instead of being compiled, or is
+  // saved to the path after being compiled. A cached plan is only loaded when the id counters are
+  // in the state it was compiled from, so that its job, regst, mem block, chunk and task ids are
+  // the same as those of a compiled one.
+  void set_plan_cache_path(const std::string& plan_cache_path) {
+    plan_cache_path_ = plan_cache_path;
+  }
+  bool plan_cache_hit() const { return plan_cache_hit_; }
   Maybe<void> Close();
 
  private:
   Maybe<void> RegisterFreeEagerTensorsToVariableOpNames();
   Maybe<void> RegisterNewVariableOpInJobPass();
   Maybe<void> GetVariableRealBlobAfterSyncPlan();
+  Maybe<bool> TryLoadPlanFromCache(int64_t job_id);
+  Maybe<void> SavePlanToCache(const std::string& id_state_before_compile) const;
 
   void NewRuntimeBuffers();
   void CloseRuntimeBuffers();
@@ -90,6 +100,8 @@ class NNGraph final : public NNGraphIf {
   std::unique_ptr<Runtime> runtime_;
   bool runtime_inited_;
   bool is_closed_;
+  std::string plan_cache_path_;
+  bool plan_cache_hit_;
 };
 
 Maybe<void> RunLazyNNGraph(const one::TensorTuple& inputs, const one::TensorTuple& outputs,
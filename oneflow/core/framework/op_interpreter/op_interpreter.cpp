@@ -18,6 +18,7 @@ limitations under the License.
 #include "oneflow/core/autograd/autograd_engine.h"
 #include "oneflow/core/autograd/autograd_mode.h"
 #include "oneflow/core/framework/op_interpreter/op_interpreter_util.h"
+#include "oneflow/core/framework/autocast.h"
 #include "oneflow/core/framework/instructions_builder.h"
 #include "oneflow/core/framework/op_arg_util.h"
 #include "oneflow/core/framework/op_expr_grad_function.h"
@@ -85,6 +86,14 @@ Maybe<void> EagerInterpreter::ApplyImpl(const FunctionOpExpr& op_expr, const Ten
 
 Maybe<void> AutogradInterpreter::Apply(const OpExpr& op_expr, const TensorTuple& inputs,
                                        TensorTuple* outputs, const OpExprInterpContext& ctx) const {
+  // The inputs are cast before the autograd, so that the grads are cast back by the cast ops
+  if (autocast::AutoCastMode::is_enabled() && !LazyMode::is_enabled()) {
+    TensorTuple casted_inputs;
+    if (JUST(autocast::AutoCastInputs(op_expr.op_type_name(), inputs, *outputs,
+                                      &casted_inputs))) {
+      return Apply(op_expr, casted_inputs, outputs, ctx);
+    }
+  }
   bool requires_grad = false;
   if (autograd::GradMode::is_enabled() && !JUST(op_expr.IsGradDisabled())) {
     requires_grad =
@@ -943,6 +943,32 @@ class CastFunctor {
   std::shared_ptr<OpExpr> op_;
 };
 
+class MultiCountNotFiniteFunctor {
+ public:
+  MultiCountNotFiniteFunctor() {
+    op_.resize(kMaxInputCount /*the maximum number of inputs*/);
+    for (int n = 0; n < op_.size(); ++n) {
+      op_[n] = CHECK_JUST(
+          one::OpBuilder("multi_count_not_finite").Input("x", n + 1).Output("y").Build());
+    }
+  }
+  Maybe<Tensor> operator()(const TensorTuple& x) const {
+    CHECK_GE_OR_RETURN(x.size(), 1);
+    TensorTuple counts;
+    for (int i = 0; i < x.size(); i += kMaxInputCount) {
+      size_t size = (i + kMaxInputCount) < x.size() ? kMaxInputCount : x.size() - i;
+      TensorTuple partial_x(size);
+      std::copy(x.begin() + i, x.begin() + i + size, partial_x.begin());
+      counts.emplace_back(JUST(OpInterpUtil::Dispatch<Tensor>(*op_.at(size - 1), partial_x)));
+    }
+    if (counts.size() == 1) { return counts.at(0); }
+    return functional::Add(counts, /*inplace=*/false);
+  }
+
+ private:
+  std::vector<std::shared_ptr<OpExpr>> op_;
+};
+
 class ClampBaseFunctor {
  public:
   ClampBaseFunctor() {
@@ -2808,6 +2834,7 @@ ONEFLOW_FUNCTION_LIBRARY(m) {
   m.add_functor<ArangeFunctor, Arange2Functor>("Arange");
   m.add_functor<ConsistentArangeFunctor, ConsistentArange2Functor>("ConsistentArange");
   m.add_functor<CastFunctor>("Cast");
+  m.add_functor<MultiCountNotFiniteFunctor>("MultiCountNotFinite");
   m.add_functor<ClampFunctor>("Clamp");
   m.add_functor<ClampInplaceFunctor>("ClampInplace");
   m.add_functor<ClampFunctor>("Clip");
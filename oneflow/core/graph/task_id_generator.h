@@ -16,6 +16,7 @@ limitations under the License.
 #ifndef ONEFLOW_CORE_GRAPH_TASK_ID_GENERATOR_H_
 #define ONEFLOW_CORE_GRAPH_TASK_ID_GENERATOR_H_
 
+#include <map>
 #include "oneflow/core/graph/task_id.h"
 
 namespace oneflow {
@@ -29,6 +30,9 @@ class TaskIdGenerator final {
   ~TaskIdGenerator() = default;
 
   TaskId Generate(const StreamId& stream_id);
+  // The next task index of each stream, keyed by the encoded stream id
+  std::map<int64_t, task_index_t> GetState() const;
+  void SetState(const std::map<int64_t, task_index_t>& state);
 
  private:
   HashMap<StreamId, task_index_t> stream_id2task_index_counter_;
@@ -39,6 +43,21 @@ inline TaskId TaskIdGenerator::Generate(const StreamId& stream_id) {
   return TaskId{stream_id, task_index};
 }
 
+inline std::map<int64_t, TaskIdGenerator::task_index_t> TaskIdGenerator::GetState() const {
+  std::map<int64_t, task_index_t> state;
+  for (const auto& pair : stream_id2task_index_counter_) {
+    state.emplace(EncodeStreamIdToInt64(pair.first), pair.second);
+  }
+  return state;
+}
+
+inline void TaskIdGenerator::SetState(const std::map<int64_t, task_index_t>& state) {
+  stream_id2task_index_counter_.clear();
+  for (const auto& pair : state) {
+    stream_id2task_index_counter_.emplace(DecodeStreamIdFromInt64(pair.first), pair.second);
+  }
+}
+
 }  // namespace oneflow
 
 #endif  // ONEFLOW_CORE_GRAPH_TASK_ID_GENERATOR_H_
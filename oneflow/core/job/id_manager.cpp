@@ -14,6 +14,7 @@ See the License for the specific language governing permissions and
 limitations under the License.
 */
 #include "oneflow/core/job/id_manager.h"
+#include <sstream>
 
 namespace oneflow {
 
@@ -28,4 +29,25 @@ IDMgr::IDMgr() {
   chunk_id_count_ = 0;
 }
 
+std::string IDMgr::DumpState() const {
+  std::ostringstream out;
+  out << regst_desc_id_count_ << " " << mem_block_id_count_ << " " << chunk_id_count_;
+  for (const auto& pair : task_id_gen_.GetState()) {
+    out << " " << pair.first << " " << pair.second;
+  }
+  return out.str();
+}
+
+void IDMgr::LoadState(const std::string& state) {
+  std::istringstream in(state);
+  CHECK(in >> regst_desc_id_count_ >> mem_block_id_count_ >> chunk_id_count_)
+      << "invalid id state: " << state;
+  std::map<int64_t, TaskIdGenerator::task_index_t> task_state;
+  int64_t encoded_stream_id = 0;
+  int64_t task_index = 0;
+  while (in >> encoded_stream_id >> task_index) { task_state[encoded_stream_id] = task_index; }
+  CHECK(in.eof()) << "invalid id state: " << state;
+  task_id_gen_.SetState(task_state);
+}
+
 }  // namespace oneflow
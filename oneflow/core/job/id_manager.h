@@ -35,6 +35,11 @@ class IDMgr final {
 
   TaskIdGenerator* GetTaskIdGenerator() { return &task_id_gen_; }
 
+  // The state of all the id counters. A plan compiled from one state allocates the same ids only
+  // when it is compiled again from the same state.
+  std::string DumpState() const;
+  void LoadState(const std::string& state);
+
  private:
   friend class Global<IDMgr>;
   IDMgr();
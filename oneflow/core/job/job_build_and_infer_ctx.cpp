@@ -1065,6 +1065,14 @@ Maybe<void> LazyJobBuildAndInferCtx::Complete() {
   return Maybe<void>::Ok();
 }
 
+Maybe<void> JobBuildAndInferCtx::CompleteFromCachedJob(const Job& completed_job) {
+  CHECK_EQ_OR_RETURN(completed_job.job_conf().job_name(), job().job_conf().job_name())
+      << " Sorry, the cached job does not belong to the current job.";
+  *mut_job() = completed_job;
+  JUST(CheckJob());
+  return Maybe<void>::Ok();
+}
+
 Maybe<void> EagerJobBuildAndInferCtx::Complete() {
   CHECK_NOTNULL(Global<JobDesc>::Get());
   Global<JobDesc>::Delete();
@@ -72,6 +72,9 @@ class JobBuildAndInferCtx {
   Maybe<std::string> NewUniqueOpNameByFunctionalOpConf(const OperatorConf& op_conf);
 
   virtual Maybe<void> Complete() = 0;
+  // Replace the job with a job which has been completed before, so the job passes of Complete()
+  // can be skipped. Used by nn.Graph compile cache.
+  Maybe<void> CompleteFromCachedJob(const Job& completed_job);
 
  protected:
   virtual Maybe<void> CheckAllInputsWithSameParallelNum(const Operator& op,
@@ -16,17 +16,54 @@ limitations under the License.
 #include "oneflow/core/kernel/profiler_kernel_observer.h"
 #include "oneflow/core/profiler/profiler.h"
 #include "oneflow/core/profiler/kernel.h"
+#include "oneflow/core/profiler/host_profiler.h"
+#include "oneflow/core/kernel/kernel.h"
+#include "oneflow/core/common/cpp_attribute.h"
 
 namespace oneflow {
 
+namespace {
+
+thread_local int64_t host_profiler_forward_start_ns = -1;
+
+void RecordHostEvent(KernelContext* kernel_ctx, const Kernel* kernel, int64_t start_ns) {
+  profiler::HostEvent event;
+  const OperatorConf& op_conf = kernel->op_conf();
+  event.name = op_conf.has_user_conf() ? op_conf.user_conf().op_type_name() : op_conf.name();
+  event.op_name = op_conf.name();
+  event.category = "graph";
+  event.thread_id = profiler::HostProfiler::CurrentThreadId();
+  event.start_ns = start_ns;
+  event.end_ns = profiler::HostProfiler::NowNs();
+  event.input_shapes = "[";
+  for (const auto& bn : kernel->op_attribute().input_bns()) {
+    const Blob* blob = kernel_ctx->BnInOp2Blob(bn);
+    if (blob == nullptr) { continue; }
+    if (event.input_shapes.size() > 1) { event.input_shapes += ", "; }
+    event.input_shapes += blob->shape().ToString();
+  }
+  event.input_shapes += "]";
+  profiler::HostProfiler::Get()->RecordEvent(std::move(event));
+}
+
+}  // namespace
+
 void ProfilerKernelObserver::WillForwardDataContent(KernelContext* kernel_ctx,
                                                     const Kernel* kernel) {
   OF_PROFILER_ONLY_CODE(profiler::TraceKernelForwardDataContentStart(kernel_ctx, kernel));
+  if (unlikely(profiler::IsHostProfilerEnabled())) {
+    host_profiler_forward_start_ns = profiler::HostProfiler::NowNs();
+  }
 }
 
 void ProfilerKernelObserver::DidForwardDataContent(KernelContext* kernel_ctx,
                                                    const Kernel* kernel) {
   OF_PROFILER_ONLY_CODE(profiler::TraceKernelForwardDataContentEnd(kernel_ctx, kernel));
+  if (unlikely(host_profiler_forward_start_ns >= 0)) {
+    const int64_t start_ns = host_profiler_forward_start_ns;
+    host_profiler_forward_start_ns = -1;
+    if (profiler::IsHostProfilerEnabled()) { RecordHostEvent(kernel_ctx, kernel, start_ns); }
+  }
 }
 
 }  // namespace oneflow
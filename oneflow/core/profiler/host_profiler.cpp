@@ -0,0 +1,63 @@
+/*
+Copyright 2020 The OneFlow Authors. All rights reserved.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+*/
+#include <chrono>
+#include <functional>
+#include <thread>
+#include "oneflow/core/profiler/host_profiler.h"
+
+namespace oneflow {
+
+namespace profiler {
+
+HostProfiler* HostProfiler::Get() {
+  static HostProfiler host_profiler;
+  return &host_profiler;
+}
+
+void HostProfiler::Enable() {
+  std::unique_lock<std::mutex> lock(mutex_);
+  events_.clear();
+  is_enabled_.store(true);
+}
+
+std::vector<HostEvent> HostProfiler::Disable() {
+  is_enabled_.store(false);
+  std::unique_lock<std::mutex> lock(mutex_);
+  std::vector<HostEvent> events;
+  events.swap(events_);
+  return events;
+}
+
+void HostProfiler::RecordEvent(HostEvent&& event) {
+  std::unique_lock<std::mutex> lock(mutex_);
+  events_.emplace_back(std::move(event));
+}
+
+int64_t HostProfiler::NowNs() {
+  return std::chrono::duration_cast<std::chrono::nanoseconds>(
+             std::chrono::steady_clock::now().time_since_epoch())
+      .count();
+}
+
+int64_t HostProfiler::CurrentThreadId() {
+  thread_local int64_t thread_id =
+      static_cast<int64_t>(std::hash<std::thread::id>()(std::this_thread::get_id()) & 0x7fffffff);
+  return thread_id;
+}
+
+}  // namespace profiler
+
+}  // namespace oneflow
@@ -0,0 +1,79 @@
+/*
+Copyright 2020 The OneFlow Authors. All rights reserved.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+*/
+#ifndef ONEFLOW_CORE_PROFILER_HOST_PROFILER_H_
+#define ONEFLOW_CORE_PROFILER_HOST_PROFILER_H_
+
+#include <atomic>
+#include <mutex>
+#include "oneflow/core/common/util.h"
+
+namespace oneflow {
+
+namespace profiler {
+
+// HostEvent is a range of host time recorded by HostProfiler, e.g. the execution of an eager op
+// in the vm, or the forward of a kernel by an actor of nn.Graph.
+struct HostEvent {
+  // the op type name
+  std::string name;
+  // the name of the op in nn.Graph, empty for eager ops
+  std::string op_name;
+  std::string category;
+  int64_t thread_id = 0;
+  int64_t start_ns = 0;
+  int64_t end_ns = 0;
+  // time from the instruction is issued to it is executed by the vm, -1 if not available
+  int64_t queue_delay_ns = -1;
+  // bytes allocated for the outputs and temporary storage, -1 if not available
+  int64_t allocated_bytes = -1;
+  std::string input_shapes;
+};
+
+// HostProfiler records HostEvents without CUDA or any external tool. It costs a relaxed atomic
+// load per op when it is disabled.
+class HostProfiler final {
+ public:
+  OF_DISALLOW_COPY_AND_MOVE(HostProfiler);
+  ~HostProfiler() = default;
+
+  static HostProfiler* Get();
+
+  bool is_enabled() const { return is_enabled_.load(std::memory_order_relaxed); }
+
+  void Enable();
+  // Returns the events recorded since Enable()
+  std::vector<HostEvent> Disable();
+
+  void RecordEvent(HostEvent&& event);
+
+  static int64_t NowNs();
+  static int64_t CurrentThreadId();
+
+ private:
+  HostProfiler() : is_enabled_(false) {}
+
+  std::atomic<bool> is_enabled_;
+  std::mutex mutex_;
+  std::vector<HostEvent> events_;
+};
+
+inline bool IsHostProfilerEnabled() { return HostProfiler::Get()->is_enabled(); }
+
+}  // namespace profiler
+
+}  // namespace oneflow
+
+#endif  // ONEFLOW_CORE_PROFILER_HOST_PROFILER_H_
@@ -13,18 +13,112 @@ WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 See the License for the specific language governing permissions and
 limitations under the License.
 */
+#include <algorithm>
 #include <cstdlib>
+#include <iterator>
 #include "oneflow/core/vm/cpu_allocator.h"
 #include "oneflow/core/common/util.h"
+#include "oneflow/core/common/env_var.h"
 
 namespace oneflow {
 namespace vm {
 
+namespace {
+
+char* AlignedAlloc(size_t size) {
+  return reinterpret_cast<char*>(aligned_alloc(kHostAlignSize, size));
+}
+
+}  // namespace
+
+CpuAllocator::CpuAllocator() {
+  stats_.cache_limit_bytes =
+      static_cast<size_t>(EnvInteger<ONEFLOW_VM_CPU_ALLOCATOR_CACHE_LIMIT_MB>()) << 20;
+}
+
+CpuAllocator::~CpuAllocator() { ReleaseCachedMemory(0); }
+
+size_t CpuAllocator::SizeClass4Size(size_t size) {
+  if (size <= kHostAlignSize) { return kHostAlignSize; }
+  // 2^msb < size <= 2^(msb + 1)
+  const int32_t msb = 63 ^ __builtin_clzll(size - 1);
+  const size_t step = std::max((static_cast<size_t>(1) << msb) >> 2, kHostAlignSize);
+  return RoundUp(size, step);
+}
+
 void CpuAllocator::Allocate(char** mem_ptr, std::size_t size) {
-  *mem_ptr = reinterpret_cast<char*>(aligned_alloc(kHostAlignSize, size));
+  const size_t size_class = SizeClass4Size(size);
+  std::unique_lock<std::mutex> lock(mutex_);
+  char* ptr = nullptr;
+  auto it = size_class2free_ptrs_.find(size_class);
+  if (it != size_class2free_ptrs_.end() && !it->second.empty()) {
+    ptr = it->second.back();
+    it->second.pop_back();
+    stats_.cached_bytes -= size_class;
+    stats_.num_cache_hits += 1;
+  } else {
+    ptr = AlignedAlloc(size_class);
+    if (ptr == nullptr) {
+      ReleaseCachedMemory(0);
+      ptr = AlignedAlloc(size_class);
+    }
+    CHECK(ptr != nullptr) << "failed to allocate " << size_class << " bytes of host memory";
+  }
+  stats_.allocated_bytes += size;
+  stats_.in_use_bytes += size_class;
+  stats_.peak_in_use_bytes = std::max(stats_.peak_in_use_bytes, stats_.in_use_bytes);
+  stats_.num_allocs += 1;
+  *mem_ptr = ptr;
+}
+
+void CpuAllocator::Deallocate(char* mem_ptr, std::size_t size) {
+  const size_t size_class = SizeClass4Size(size);
+  std::unique_lock<std::mutex> lock(mutex_);
+  stats_.allocated_bytes -= size;
+  stats_.in_use_bytes -= size_class;
+  if (size_class > stats_.cache_limit_bytes) {
+    std::free(mem_ptr);
+    return;
+  }
+  if (stats_.cached_bytes + size_class > stats_.cache_limit_bytes) {
+    ReleaseCachedMemory(stats_.cache_limit_bytes - size_class);
+  }
+  size_class2free_ptrs_[size_class].push_back(mem_ptr);
+  stats_.cached_bytes += size_class;
+}
+
+void CpuAllocator::ReleaseCachedMemory(size_t target_cached_bytes) {
+  while (stats_.cached_bytes > target_cached_bytes && !size_class2free_ptrs_.empty()) {
+    auto it = std::prev(size_class2free_ptrs_.end());
+    while (stats_.cached_bytes > target_cached_bytes && !it->second.empty()) {
+      std::free(it->second.back());
+      it->second.pop_back();
+      stats_.cached_bytes -= it->first;
+    }
+    if (it->second.empty()) { size_class2free_ptrs_.erase(it); }
+  }
+}
+
+void CpuAllocator::EmptyCache() {
+  std::unique_lock<std::mutex> lock(mutex_);
+  ReleaseCachedMemory(0);
 }
 
-void CpuAllocator::Deallocate(char* mem_ptr, std::size_t size) { std::free(mem_ptr); }
+void CpuAllocator::SetCacheLimit(size_t cache_limit_bytes) {
+  std::unique_lock<std::mutex> lock(mutex_);
+  stats_.cache_limit_bytes = cache_limit_bytes;
+  ReleaseCachedMemory(cache_limit_bytes);
+}
+
+CpuAllocator::Stats CpuAllocator::GetStats() {
+  std::unique_lock<std::mutex> lock(mutex_);
+  return stats_;
+}
+
+void CpuAllocator::ResetPeakStats() {
+  std::unique_lock<std::mutex> lock(mutex_);
+  stats_.peak_in_use_bytes = stats_.in_use_bytes;
+}
 
 COMMAND(Global<CpuAllocator>::SetAllocated(new CpuAllocator()));
 
@@ -17,18 +17,60 @@ limitations under the License.
 #define ONEFLOW_CORE_VM_CPU_ALLOCATOR_H_
 
 #include <cstdint>
+#include <map>
+#include <mutex>
+#include <vector>
 #include "oneflow/core/vm/allocator.h"
 
 namespace oneflow {
 namespace vm {
 
+// CpuAllocator caches the freed memory in free lists of size classes, so that the eager tensors
+// of similar sizes reuse memory instead of calling aligned_alloc and free for every tensor.
+//
+// Every size is rounded up to a size class. Each power of two range is divided into four size
+// classes aligned to kHostAlignSize, which bounds the internal fragmentation within 25%, like
+//    SizeClass:  64, 128, 192, 256, 320, 384, 448, 512, 640, 768, 896, 1024, 1280, ...
+// The freed memory is cached until the cached bytes exceed the cache limit, which is set by
+// ONEFLOW_VM_CPU_ALLOCATOR_CACHE_LIMIT_MB. The larger size classes are returned to the system
+// first when the limit is exceeded. A cache limit of 0 disables caching.
 class CpuAllocator final : public Allocator {
  public:
-  explicit CpuAllocator() = default;
-  ~CpuAllocator() override = default;
+  struct Stats {
+    // bytes requested by the memory in use
+    size_t allocated_bytes = 0;
+    // bytes of the size classes in use
+    size_t in_use_bytes = 0;
+    size_t peak_in_use_bytes = 0;
+    // bytes of the free lists
+    size_t cached_bytes = 0;
+    size_t cache_limit_bytes = 0;
+    int64_t num_allocs = 0;
+    int64_t num_cache_hits = 0;
+  };
+
+  CpuAllocator();
+  ~CpuAllocator() override;
 
   void Allocate(char** mem_ptr, std::size_t size) override;
   void Deallocate(char* mem_ptr, std::size_t size) override;
+
+  // Returns all the cached memory to the system
+  void EmptyCache();
+  void SetCacheLimit(size_t cache_limit_bytes);
+  Stats GetStats();
+  void ResetPeakStats();
+
+  static size_t SizeClass4Size(size_t size);
+
+ private:
+  // Returns the cached memory of the larger size classes first, until the cached bytes are no
+  // more than target_cached_bytes
+  void ReleaseCachedMemory(size_t target_cached_bytes);
+
+  std::mutex mutex_;
+  Stats stats_;
+  std::map<size_t, std::vector<char*>> size_class2free_ptrs_;
 };
 
 }  // namespace vm
@@ -0,0 +1,81 @@
+/*
+Copyright 2020 The OneFlow Authors. All rights reserved.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+*/
+#include <algorithm>
+#include "gtest/gtest.h"
+#include "oneflow/core/vm/cpu_allocator.h"
+#include "oneflow/core/common/util.h"
+
+namespace oneflow {
+namespace vm {
+
+TEST(CpuAllocator, size_class) {
+  ASSERT_EQ(CpuAllocator::SizeClass4Size(1), kHostAlignSize);
+  ASSERT_EQ(CpuAllocator::SizeClass4Size(64), 64);
+  ASSERT_EQ(CpuAllocator::SizeClass4Size(65), 128);
+  ASSERT_EQ(CpuAllocator::SizeClass4Size(513), 640);
+  ASSERT_EQ(CpuAllocator::SizeClass4Size(1024), 1024);
+  ASSERT_EQ(CpuAllocator::SizeClass4Size(1025), 1280);
+  for (size_t size = 1; size < (1 << 20); size = size * 3 / 2 + 1) {
+    const size_t size_class = CpuAllocator::SizeClass4Size(size);
+    ASSERT_GE(size_class, size);
+    ASSERT_EQ(size_class % kHostAlignSize, 0);
+    ASSERT_LE(size_class - size, std::max(size / 4, kHostAlignSize));
+  }
+}
+
+TEST(CpuAllocator, cpu_allocator) {
+  CpuAllocator allocator;
+  allocator.SetCacheLimit(1 << 20);
+  std::vector<char*> ptrs;
+  for (int i = 0; i < 16; ++i) {
+    char* ptr = nullptr;
+    allocator.Allocate(&ptr, 1000);
+    ASSERT_TRUE(ptr != nullptr);
+    ASSERT_EQ(reinterpret_cast<uintptr_t>(ptr) % kHostAlignSize, 0);
+    ptrs.emplace_back(ptr);
+  }
+  CpuAllocator::Stats stats = allocator.GetStats();
+  ASSERT_EQ(stats.allocated_bytes, 16 * 1000);
+  ASSERT_EQ(stats.in_use_bytes, 16 * 1024);
+  ASSERT_EQ(stats.cached_bytes, 0);
+  for (char* ptr : ptrs) { allocator.Deallocate(ptr, 1000); }
+  stats = allocator.GetStats();
+  ASSERT_EQ(stats.in_use_bytes, 0);
+  ASSERT_EQ(stats.peak_in_use_bytes, 16 * 1024);
+  ASSERT_EQ(stats.cached_bytes, 16 * 1024);
+
+  // sizes of the same size class reuse the cached memory
+  char* ptr = nullptr;
+  allocator.Allocate(&ptr, 900);
+  ASSERT_TRUE(std::find(ptrs.begin(), ptrs.end(), ptr) != ptrs.end());
+  stats = allocator.GetStats();
+  ASSERT_EQ(stats.num_cache_hits, 1);
+  ASSERT_EQ(stats.cached_bytes, 15 * 1024);
+  allocator.Deallocate(ptr, 900);
+
+  // the cached bytes never exceed the cache limit
+  allocator.SetCacheLimit(4 * 1024);
+  ASSERT_LE(allocator.GetStats().cached_bytes, 4 * 1024);
+  allocator.Allocate(&ptr, 8 * 1024);
+  allocator.Deallocate(ptr, 8 * 1024);
+  ASSERT_LE(allocator.GetStats().cached_bytes, 4 * 1024);
+
+  allocator.EmptyCache();
+  ASSERT_EQ(allocator.GetStats().cached_bytes, 0);
+}
+
+}  // namespace vm
+}  // namespace oneflow
@@ -0,0 +1,96 @@
+/*
+Copyright 2020 The OneFlow Authors. All rights reserved.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+*/
+#include "oneflow/user/kernels/multi_tensor_model_update_kernel_util.h"
+
+namespace oneflow {
+
+template<typename T>
+struct MultiTensorSGDUpdateKernelUtil<DeviceType::kCPU, T> {
+  static void Update(ep::Stream* stream, const MultiTensorUpdateParams<2>& params, T scale,
+                     float l1, float l2, float weight_decay, float learning_rate);
+};
+
+template<typename T>
+void MultiTensorSGDUpdateKernelUtil<DeviceType::kCPU, T>::Update(
+    ep::Stream* stream, const MultiTensorUpdateParams<2>& params, T scale, float l1, float l2,
+    float weight_decay, float learning_rate) {
+  FOR_RANGE(int32_t, t, 0, params.num_tensors) {
+    const T* model_diff = static_cast<const T*>(params.ptr[0][t]);
+    T* model = static_cast<T*>(params.ptr[1][t]);
+    FOR_RANGE(int64_t, i, 0, params.sizes[t]) {
+      SGDUpdateFunctor<T, T>()(model_diff + i, model + i, scale, l1, l2, weight_decay,
+                               learning_rate);
+    }
+  }
+}
+
+template struct MultiTensorSGDUpdateKernelUtil<DeviceType::kCPU, float>;
+template struct MultiTensorSGDUpdateKernelUtil<DeviceType::kCPU, double>;
+
+template<typename T>
+struct MultiTensorMomentumUpdateKernelUtil<DeviceType::kCPU, T> {
+  static void Update(ep::Stream* stream, const MultiTensorUpdateParams<3>& params, T scale,
+                     float l1, float l2, float beta, float weight_decay, float learning_rate);
+};
+
+template<typename T>
+void MultiTensorMomentumUpdateKernelUtil<DeviceType::kCPU, T>::Update(
+    ep::Stream* stream, const MultiTensorUpdateParams<3>& params, T scale, float l1, float l2,
+    float beta, float weight_decay, float learning_rate) {
+  FOR_RANGE(int32_t, t, 0, params.num_tensors) {
+    const T* model_diff = static_cast<const T*>(params.ptr[0][t]);
+    T* model = static_cast<T*>(params.ptr[1][t]);
+    T* momentum = static_cast<T*>(params.ptr[2][t]);
+    FOR_RANGE(int64_t, i, 0, params.sizes[t]) {
+      MomentumUpdateFunctor<T, T>()(model_diff + i, model + i, momentum + i, scale, l1, l2, beta,
+                                    weight_decay, learning_rate);
+    }
+  }
+}
+
+template struct MultiTensorMomentumUpdateKernelUtil<DeviceType::kCPU, float>;
+template struct MultiTensorMomentumUpdateKernelUtil<DeviceType::kCPU, double>;
+
+template<typename T>
+struct MultiTensorAdamUpdateKernelUtil<DeviceType::kCPU, T> {
+  static void Update(ep::Stream* stream, const MultiTensorUpdateParams<4>& params, T scale,
+                     float l1, float l2, float beta1, float beta2, float epsilon,
+                     float weight_decay, float bias_correction1, float bias_correction2,
+                     float learning_rate);
+};
+
+template<typename T>
+void MultiTensorAdamUpdateKernelUtil<DeviceType::kCPU, T>::Update(
+    ep::Stream* stream, const MultiTensorUpdateParams<4>& params, T scale, float l1, float l2,
+    float beta1, float beta2, float epsilon, float weight_decay, float bias_correction1,
+    float bias_correction2, float learning_rate) {
+  FOR_RANGE(int32_t, t, 0, params.num_tensors) {
+    const T* model_diff = static_cast<const T*>(params.ptr[0][t]);
+    T* model = static_cast<T*>(params.ptr[1][t]);
+    T* m = static_cast<T*>(params.ptr[2][t]);
+    T* v = static_cast<T*>(params.ptr[3][t]);
+    FOR_RANGE(int64_t, i, 0, params.sizes[t]) {
+      AdamUpdateFunctor<T, T>()(model_diff + i, model + i, m + i, v + i, /*max_v=*/nullptr, scale,
+                                l1, l2, beta1, beta2, epsilon, weight_decay, /*amsgrad=*/false,
+                                bias_correction1, bias_correction2, learning_rate);
+    }
+  }
+}
+
+template struct MultiTensorAdamUpdateKernelUtil<DeviceType::kCPU, float>;
+template struct MultiTensorAdamUpdateKernelUtil<DeviceType::kCPU, double>;
+
+}  // namespace oneflow
@@ -0,0 +1,143 @@
+/*
+Copyright 2020 The OneFlow Authors. All rights reserved.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+*/
+#include "oneflow/core/framework/framework.h"
+#include "oneflow/user/kernels/multi_tensor_model_update_kernel_util.h"
+#include "oneflow/core/ep/cuda/cuda_stream.h"
+
+namespace oneflow {
+
+namespace {
+
+// All blocks of the grid go through the tensors one by one, so the grid is sized by the largest
+// tensor of a launch.
+template<int N>
+int32_t BlocksNum4MultiTensorUpdateParams(const MultiTensorUpdateParams<N>& params) {
+  int64_t max_size = 1;
+  FOR_RANGE(int32_t, t, 0, params.num_tensors) { max_size = std::max(max_size, params.sizes[t]); }
+  return static_cast<int32_t>(
+      std::min<int64_t>((max_size + kCudaThreadsNumPerBlock - 1) / kCudaThreadsNumPerBlock,
+                        kCudaMaxBlocksNum));
+}
+
+template<typename T>
+__global__ void MultiTensorSGDUpdateGpu(MultiTensorUpdateParams<2> params, T scale, float l1,
+                                        float l2, float weight_decay, float learning_rate) {
+  for (int32_t t = 0; t < params.num_tensors; ++t) {
+    const T* model_diff = static_cast<const T*>(params.ptr[0][t]);
+    T* model = static_cast<T*>(params.ptr[1][t]);
+    CUDA_1D_KERNEL_LOOP_T(int64_t, i, params.sizes[t]) {
+      SGDUpdateFunctor<T, T>()(model_diff + i, model + i, scale, l1, l2, weight_decay,
+                               learning_rate);
+    }
+  }
+}
+
+template<typename T>
+__global__ void MultiTensorMomentumUpdateGpu(MultiTensorUpdateParams<3> params, T scale, float l1,
+                                             float l2, float beta, float weight_decay,
+                                             float learning_rate) {
+  for (int32_t t = 0; t < params.num_tensors; ++t) {
+    const T* model_diff = static_cast<const T*>(params.ptr[0][t]);
+    T* model = static_cast<T*>(params.ptr[1][t]);
+    T* momentum = static_cast<T*>(params.ptr[2][t]);
+    CUDA_1D_KERNEL_LOOP_T(int64_t, i, params.sizes[t]) {
+      MomentumUpdateFunctor<T, T>()(model_diff + i, model + i, momentum + i, scale, l1, l2, beta,
+                                    weight_decay, learning_rate);
+    }
+  }
+}
+
+template<typename T>
+__global__ void MultiTensorAdamUpdateGpu(MultiTensorUpdateParams<4> params, T scale, float l1,
+                                         float l2, float beta1, float beta2, float epsilon,
+                                         float weight_decay, float bias_correction1,
+                                         float bias_correction2, float learning_rate) {
+  for (int32_t t = 0; t < params.num_tensors; ++t) {
+    const T* model_diff = static_cast<const T*>(params.ptr[0][t]);
+    T* model = static_cast<T*>(params.ptr[1][t]);
+    T* m = static_cast<T*>(params.ptr[2][t]);
+    T* v = static_cast<T*>(params.ptr[3][t]);
+    CUDA_1D_KERNEL_LOOP_T(int64_t, i, params.sizes[t]) {
+      AdamUpdateFunctor<T, T>()(model_diff + i, model + i, m + i, v + i, /*max_v=*/nullptr, scale,
+                                l1, l2, beta1, beta2, epsilon, weight_decay, /*amsgrad=*/false,
+                                bias_correction1, bias_correction2, learning_rate);
+    }
+  }
+}
+
+}  // namespace
+
+template<typename T>
+struct MultiTensorSGDUpdateKernelUtil<DeviceType::kCUDA, T> {
+  static void Update(ep::Stream* stream, const MultiTensorUpdateParams<2>& params, T scale,
+                     float l1, float l2, float weight_decay, float learning_rate);
+};
+
+template<typename T>
+void MultiTensorSGDUpdateKernelUtil<DeviceType::kCUDA, T>::Update(
+    ep::Stream* stream, const MultiTensorUpdateParams<2>& params, T scale, float l1, float l2,
+    float weight_decay, float learning_rate) {
+  MultiTensorSGDUpdateGpu<T><<<BlocksNum4MultiTensorUpdateParams(params), kCudaThreadsNumPerBlock,
+                               0, stream->As<ep::CudaStream>()->cuda_stream()>>>(
+      params, scale, l1, l2, weight_decay, learning_rate);
+}
+
+template struct MultiTensorSGDUpdateKernelUtil<DeviceType::kCUDA, float>;
+template struct MultiTensorSGDUpdateKernelUtil<DeviceType::kCUDA, double>;
+
+template<typename T>
+struct MultiTensorMomentumUpdateKernelUtil<DeviceType::kCUDA, T> {
+  static void Update(ep::Stream* stream, const MultiTensorUpdateParams<3>& params, T scale,
+                     float l1, float l2, float beta, float weight_decay, float learning_rate);
+};
+
+template<typename T>
+void MultiTensorMomentumUpdateKernelUtil<DeviceType::kCUDA, T>::Update(
+    ep::Stream* stream, const MultiTensorUpdateParams<3>& params, T scale, float l1, float l2,
+    float beta, float weight_decay, float learning_rate) {
+  MultiTensorMomentumUpdateGpu<T>
+      <<<BlocksNum4MultiTensorUpdateParams(params), kCudaThreadsNumPerBlock, 0,
+         stream->As<ep::CudaStream>()->cuda_stream()>>>(params, scale, l1, l2, beta, weight_decay,
+                                                        learning_rate);
+}
+
+template struct MultiTensorMomentumUpdateKernelUtil<DeviceType::kCUDA, float>;
+template struct MultiTensorMomentumUpdateKernelUtil<DeviceType::kCUDA, double>;
+
+template<typename T>
+struct MultiTensorAdamUpdateKernelUtil<DeviceType::kCUDA, T> {
+  static void Update(ep::Stream* stream, const MultiTensorUpdateParams<4>& params, T scale,
+                     float l1, float l2, float beta1, float beta2, float epsilon,
+                     float weight_decay, float bias_correction1, float bias_correction2,
+                     float learning_rate);
+};
+
+template<typename T>
+void MultiTensorAdamUpdateKernelUtil<DeviceType::kCUDA, T>::Update(
+    ep::Stream* stream, const MultiTensorUpdateParams<4>& params, T scale, float l1, float l2,
+    float beta1, float beta2, float epsilon, float weight_decay, float bias_correction1,
+    float bias_correction2, float learning_rate) {
+  MultiTensorAdamUpdateGpu<T>
+      <<<BlocksNum4MultiTensorUpdateParams(params), kCudaThreadsNumPerBlock, 0,
+         stream->As<ep::CudaStream>()->cuda_stream()>>>(params, scale, l1, l2, beta1, beta2,
+                                                        epsilon, weight_decay, bias_correction1,
+                                                        bias_correction2, learning_rate);
+}
+
+template struct MultiTensorAdamUpdateKernelUtil<DeviceType::kCUDA, float>;
+template struct MultiTensorAdamUpdateKernelUtil<DeviceType::kCUDA, double>;
+
+}  // namespace oneflow
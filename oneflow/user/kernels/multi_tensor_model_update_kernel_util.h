@@ -0,0 +1,58 @@
+/*
+Copyright 2020 The OneFlow Authors. All rights reserved.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+*/
+#ifndef ONEFLOW_USER_KERNELS_MULTI_TENSOR_MODEL_UPDATE_KERNEL_UTIL_H_
+#define ONEFLOW_USER_KERNELS_MULTI_TENSOR_MODEL_UPDATE_KERNEL_UTIL_H_
+
+#include "oneflow/user/kernels/model_update_kernel_util.h"
+
+namespace oneflow {
+
+// Max number of tensors updated by one kernel launch. Params are passed to cuda kernels by value,
+// which is limited to 4KB.
+constexpr int32_t kMultiTensorUpdateMaxTensors = 48;
+
+// ptr[0] is the model diff, ptr[1] is the model and ptr[2:] are the states of the tensors, e.g. m
+// and v of adam.
+template<int N>
+struct MultiTensorUpdateParams {
+  void* ptr[N][kMultiTensorUpdateMaxTensors];
+  int64_t sizes[kMultiTensorUpdateMaxTensors];
+  int32_t num_tensors;
+};
+
+template<DeviceType device_type, typename T>
+struct MultiTensorSGDUpdateKernelUtil {
+  static void Update(ep::Stream* stream, const MultiTensorUpdateParams<2>& params, T scale,
+                     float l1, float l2, float weight_decay, float learning_rate);
+};
+
+template<DeviceType device_type, typename T>
+struct MultiTensorMomentumUpdateKernelUtil {
+  static void Update(ep::Stream* stream, const MultiTensorUpdateParams<3>& params, T scale,
+                     float l1, float l2, float beta, float weight_decay, float learning_rate);
+};
+
+template<DeviceType device_type, typename T>
+struct MultiTensorAdamUpdateKernelUtil {
+  static void Update(ep::Stream* stream, const MultiTensorUpdateParams<4>& params, T scale,
+                     float l1, float l2, float beta1, float beta2, float epsilon,
+                     float weight_decay, float bias_correction1, float bias_correction2,
+                     float learning_rate);
+};
+
+}  // namespace oneflow
+
+#endif  // ONEFLOW_USER_KERNELS_MULTI_TENSOR_MODEL_UPDATE_KERNEL_UTIL_H_
@@ -0,0 +1,167 @@
+/*
+Copyright 2020 The OneFlow Authors. All rights reserved.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+*/
+#include "oneflow/core/framework/framework.h"
+#include "oneflow/user/kernels/multi_tensor_model_update_kernel_util.h"
+#include "oneflow/core/kernel/cuda_graph_support.h"
+#include <array>
+
+namespace oneflow {
+
+namespace {
+
+// Packs the i-th tensors of `arg_names` into params, and calls `update` every
+// kMultiTensorUpdateMaxTensors tensors.
+template<int N>
+void ForEachMultiTensorUpdateParams(
+    user_op::KernelComputeContext* ctx, const std::array<std::string, N>& arg_names,
+    const std::function<void(const MultiTensorUpdateParams<N>&)>& update) {
+  MultiTensorUpdateParams<N> params{};
+  const int32_t num_tensors = ctx->input_size("model");
+  FOR_RANGE(int32_t, i, 0, num_tensors) {
+    const int32_t idx = params.num_tensors;
+    const user_op::Tensor* model = ctx->Tensor4ArgNameAndIndex("model", i);
+    params.sizes[idx] = model->shape().elem_cnt();
+    FOR_RANGE(int32_t, j, 0, N) {
+      user_op::Tensor* tensor = ctx->Tensor4ArgNameAndIndex(arg_names.at(j), i);
+      CHECK_EQ(tensor->shape().elem_cnt(), params.sizes[idx]);
+      params.ptr[j][idx] = tensor->mut_raw_dptr();
+    }
+    params.num_tensors += 1;
+    if (params.num_tensors == kMultiTensorUpdateMaxTensors || i == num_tensors - 1) {
+      update(params);
+      params.num_tensors = 0;
+    }
+  }
+}
+
+template<DeviceType device_type, typename T>
+class MultiTensorSGDUpdateKernel final : public user_op::OpKernel,
+                                         public user_op::CudaGraphSupport {
+ public:
+  MultiTensorSGDUpdateKernel() = default;
+  ~MultiTensorSGDUpdateKernel() override = default;
+
+ private:
+  void Compute(user_op::KernelComputeContext* ctx) const override {
+    const auto scale = static_cast<T>(ctx->Attr<double>("scale"));
+    const auto l1 = ctx->Attr<float>("l1");
+    const auto l2 = ctx->Attr<float>("l2");
+    const auto weight_decay = ctx->Attr<float>("weight_decay");
+    const auto learning_rate = ctx->Attr<float>("learning_rate_val");
+    ForEachMultiTensorUpdateParams<2>(
+        ctx, {"model_diff", "model"}, [&](const MultiTensorUpdateParams<2>& params) {
+          MultiTensorSGDUpdateKernelUtil<device_type, T>::Update(ctx->stream(), params, scale, l1,
+                                                                 l2, weight_decay, learning_rate);
+        });
+  }
+  bool AlwaysComputeWhenAllOutputsEmpty() const override { return true; }
+};
+
+#define REGISTER_MULTI_TENSOR_SGD_UPDATE_KERNEL(device, dtype)  \
+  REGISTER_USER_KERNEL("multi_tensor_sgd_update")               \
+      .SetCreateFn<MultiTensorSGDUpdateKernel<device, dtype>>() \
+      .SetIsMatchedHob((user_op::HobDeviceType() == device)     \
+                       && (user_op::HobDataType("model", 0) == GetDataType<dtype>::value));
+
+REGISTER_MULTI_TENSOR_SGD_UPDATE_KERNEL(DeviceType::kCPU, float);
+REGISTER_MULTI_TENSOR_SGD_UPDATE_KERNEL(DeviceType::kCPU, double);
+#ifdef WITH_CUDA
+REGISTER_MULTI_TENSOR_SGD_UPDATE_KERNEL(DeviceType::kCUDA, float);
+REGISTER_MULTI_TENSOR_SGD_UPDATE_KERNEL(DeviceType::kCUDA, double);
+#endif  // WITH_CUDA
+
+template<DeviceType device_type, typename T>
+class MultiTensorMomentumUpdateKernel final : public user_op::OpKernel,
+                                              public user_op::CudaGraphSupport {
+ public:
+  MultiTensorMomentumUpdateKernel() = default;
+  ~MultiTensorMomentumUpdateKernel() override = default;
+
+ private:
+  void Compute(user_op::KernelComputeContext* ctx) const override {
+    const auto scale = static_cast<T>(ctx->Attr<double>("scale"));
+    const auto l1 = ctx->Attr<float>("l1");
+    const auto l2 = ctx->Attr<float>("l2");
+    const auto beta = ctx->Attr<float>("beta");
+    const auto weight_decay = ctx->Attr<float>("weight_decay");
+    const auto learning_rate = ctx->Attr<float>("learning_rate_val");
+    ForEachMultiTensorUpdateParams<3>(
+        ctx, {"model_diff", "model", "momentum"}, [&](const MultiTensorUpdateParams<3>& params) {
+          MultiTensorMomentumUpdateKernelUtil<device_type, T>::Update(
+              ctx->stream(), params, scale, l1, l2, beta, weight_decay, learning_rate);
+        });
+  }
+  bool AlwaysComputeWhenAllOutputsEmpty() const override { return true; }
+};
+
+#define REGISTER_MULTI_TENSOR_MOMENTUM_UPDATE_KERNEL(device, dtype)  \
+  REGISTER_USER_KERNEL("multi_tensor_momentum_update")               \
+      .SetCreateFn<MultiTensorMomentumUpdateKernel<device, dtype>>() \
+      .SetIsMatchedHob((user_op::HobDeviceType() == device)          \
+                       && (user_op::HobDataType("model", 0) == GetDataType<dtype>::value));
+
+REGISTER_MULTI_TENSOR_MOMENTUM_UPDATE_KERNEL(DeviceType::kCPU, float);
+REGISTER_MULTI_TENSOR_MOMENTUM_UPDATE_KERNEL(DeviceType::kCPU, double);
+#ifdef WITH_CUDA
+REGISTER_MULTI_TENSOR_MOMENTUM_UPDATE_KERNEL(DeviceType::kCUDA, float);
+REGISTER_MULTI_TENSOR_MOMENTUM_UPDATE_KERNEL(DeviceType::kCUDA, double);
+#endif  // WITH_CUDA
+
+template<DeviceType device_type, typename T>
+class MultiTensorAdamUpdateKernel final : public user_op::OpKernel,
+                                          public user_op::CudaGraphSupport {
+ public:
+  MultiTensorAdamUpdateKernel() = default;
+  ~MultiTensorAdamUpdateKernel() override = default;
+
+ private:
+  void Compute(user_op::KernelComputeContext* ctx) const override {
+    const auto scale = static_cast<T>(ctx->Attr<double>("scale"));
+    const auto l1 = ctx->Attr<float>("l1");
+    const auto l2 = ctx->Attr<float>("l2");
+    const auto beta1 = ctx->Attr<float>("beta1");
+    const auto beta2 = ctx->Attr<float>("beta2");
+    const auto epsilon = ctx->Attr<float>("epsilon");
+    const auto weight_decay = ctx->Attr<float>("weight_decay");
+    const auto bias_correction1 = ctx->Attr<float>("bias_correction1_val");
+    const auto bias_correction2 = ctx->Attr<float>("bias_correction2_val");
+    const auto learning_rate = ctx->Attr<float>("learning_rate_val");
+    ForEachMultiTensorUpdateParams<4>(
+        ctx, {"model_diff", "model", "m", "v"}, [&](const MultiTensorUpdateParams<4>& params) {
+          MultiTensorAdamUpdateKernelUtil<device_type, T>::Update(
+              ctx->stream(), params, scale, l1, l2, beta1, beta2, epsilon, weight_decay,
+              bias_correction1, bias_correction2, learning_rate);
+        });
+  }
+  bool AlwaysComputeWhenAllOutputsEmpty() const override { return true; }
+};
+
+#define REGISTER_MULTI_TENSOR_ADAM_UPDATE_KERNEL(device, dtype)  \
+  REGISTER_USER_KERNEL("multi_tensor_adam_update")               \
+      .SetCreateFn<MultiTensorAdamUpdateKernel<device, dtype>>() \
+      .SetIsMatchedHob((user_op::HobDeviceType() == device)      \
+                       && (user_op::HobDataType("model", 0) == GetDataType<dtype>::value));
+
+REGISTER_MULTI_TENSOR_ADAM_UPDATE_KERNEL(DeviceType::kCPU, float);
+REGISTER_MULTI_TENSOR_ADAM_UPDATE_KERNEL(DeviceType::kCPU, double);
+#ifdef WITH_CUDA
+REGISTER_MULTI_TENSOR_ADAM_UPDATE_KERNEL(DeviceType::kCUDA, float);
+REGISTER_MULTI_TENSOR_ADAM_UPDATE_KERNEL(DeviceType::kCUDA, double);
+#endif  // WITH_CUDA
+
+}  // namespace
+
+}  // namespace oneflow
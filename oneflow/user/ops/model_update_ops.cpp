@@ -421,6 +421,54 @@ Maybe<void> InferLarsUpdateDataType(user_op::InferContext* ctx) {
   return Maybe<void>::Ok();
 }
 
+// Inputs of a multi tensor update op are lists of tensors, of which the i-th tensors of all
+// lists are the model, the model diff and the states of the i-th model.
+Maybe<void> InferMultiTensorUpdateTensorDesc(user_op::InferContext* ctx,
+                                             const std::vector<std::string>& state_names) {
+  const int32_t num_models = ctx->input_size("model");
+  CHECK_GT_OR_RETURN(num_models, 0);
+  CHECK_EQ_OR_RETURN(ctx->input_size("model_diff"), num_models);
+  for (const auto& state_name : state_names) {
+    CHECK_EQ_OR_RETURN(ctx->input_size(state_name), num_models);
+  }
+  FOR_RANGE(int32_t, i, 0, num_models) {
+    const user_op::TensorDesc& model = ctx->InputTensorDesc("model", i);
+    const user_op::TensorDesc& model_diff = ctx->InputTensorDesc("model_diff", i);
+    CHECK_EQ_OR_RETURN(model_diff.shape(), model.shape());
+    for (const auto& state_name : state_names) {
+      JUST(CheckShapeLike(&ctx->InputTensorDesc(state_name, i), &model));
+    }
+  }
+  return Maybe<void>::Ok();
+}
+
+Maybe<void> InferMultiTensorUpdateDataType(user_op::InferContext* ctx,
+                                           const std::vector<std::string>& state_names) {
+  const DataType data_type = ctx->InputTensorDesc("model", 0).data_type();
+  FOR_RANGE(int32_t, i, 0, ctx->input_size("model")) {
+    const user_op::TensorDesc& model = ctx->InputTensorDesc("model", i);
+    CHECK_EQ_OR_RETURN(model.data_type(), data_type)
+        << "models of a multi tensor update op must have the same data type.";
+    JUST(CheckDataTypeLike(&ctx->InputTensorDesc("model_diff", i), &model));
+    for (const auto& state_name : state_names) {
+      JUST(CheckDataTypeLike(&ctx->InputTensorDesc(state_name, i), &model));
+    }
+  }
+  return Maybe<void>::Ok();
+}
+
+Maybe<void> MultiTensorUpdateInputArgModifyFn(
+    const user_op::GetInputArgModifier& GetInputArgModifierFn,
+    const user_op::UserOpConfWrapper& conf, const std::vector<std::string>& state_names) {
+  FOR_RANGE(int32_t, i, 0, conf.input_size("model")) {
+    JUST(SetInputArgModifierMutable(GetInputArgModifierFn, "model", i));
+    for (const auto& state_name : state_names) {
+      JUST(SetInputArgModifierMutable(GetInputArgModifierFn, state_name, i));
+    }
+  }
+  return Maybe<void>::Ok();
+}
+
 }  // namespace
 
 /* static */ Maybe<void> SgdUpdateOp::InferLogicalTensorDesc(user_op::InferContext* ctx) {
@@ -786,4 +834,76 @@ Maybe<void> InferLarsUpdateDataType(user_op::InferContext* ctx) {
   return InferLarsUpdateDataType(ctx);
 }
 
+/* static */ Maybe<void> MultiTensorSgdUpdateOp::InferLogicalTensorDesc(
+    user_op::InferContext* ctx) {
+  return InferMultiTensorUpdateTensorDesc(ctx, {});
+}
+
+/*static*/ Maybe<void> MultiTensorSgdUpdateOp::InferPhysicalTensorDesc(
+    user_op::InferContext* ctx) {
+  return InferLogicalTensorDesc(ctx);
+}
+
+/* static */ Maybe<void> MultiTensorSgdUpdateOp::GetSbp(user_op::SbpContext* ctx) {
+  ctx->NewBuilder().Broadcast(ctx->inputs()).Build();
+  return Maybe<void>::Ok();
+}
+
+/* static */ Maybe<void> MultiTensorSgdUpdateOp::ModifyInputArg(
+    const GetInputArgModifier& GetInputArgModifierFn, const user_op::UserOpConfWrapper& conf) {
+  return MultiTensorUpdateInputArgModifyFn(GetInputArgModifierFn, conf, {});
+}
+
+/* static */ Maybe<void> MultiTensorSgdUpdateOp::InferDataType(user_op::InferContext* ctx) {
+  return InferMultiTensorUpdateDataType(ctx, {});
+}
+
+/* static */ Maybe<void> MultiTensorMomentumUpdateOp::InferLogicalTensorDesc(
+    user_op::InferContext* ctx) {
+  return InferMultiTensorUpdateTensorDesc(ctx, {"momentum"});
+}
+
+/*static*/ Maybe<void> MultiTensorMomentumUpdateOp::InferPhysicalTensorDesc(
+    user_op::InferContext* ctx) {
+  return InferLogicalTensorDesc(ctx);
+}
+
+/* static */ Maybe<void> MultiTensorMomentumUpdateOp::GetSbp(user_op::SbpContext* ctx) {
+  ctx->NewBuilder().Broadcast(ctx->inputs()).Build();
+  return Maybe<void>::Ok();
+}
+
+/* static */ Maybe<void> MultiTensorMomentumUpdateOp::ModifyInputArg(
+    const GetInputArgModifier& GetInputArgModifierFn, const user_op::UserOpConfWrapper& conf) {
+  return MultiTensorUpdateInputArgModifyFn(GetInputArgModifierFn, conf, {"momentum"});
+}
+
+/* static */ Maybe<void> MultiTensorMomentumUpdateOp::InferDataType(user_op::InferContext* ctx) {
+  return InferMultiTensorUpdateDataType(ctx, {"momentum"});
+}
+
+/* static */ Maybe<void> MultiTensorAdamUpdateOp::InferLogicalTensorDesc(
+    user_op::InferContext* ctx) {
+  return InferMultiTensorUpdateTensorDesc(ctx, {"m", "v"});
+}
+
+/*static*/ Maybe<void> MultiTensorAdamUpdateOp::InferPhysicalTensorDesc(
+    user_op::InferContext* ctx) {
+  return InferLogicalTensorDesc(ctx);
+}
+
+/* static */ Maybe<void> MultiTensorAdamUpdateOp::GetSbp(user_op::SbpContext* ctx) {
+  ctx->NewBuilder().Broadcast(ctx->inputs()).Build();
+  return Maybe<void>::Ok();
+}
+
+/* static */ Maybe<void> MultiTensorAdamUpdateOp::ModifyInputArg(
+    const GetInputArgModifier& GetInputArgModifierFn, const user_op::UserOpConfWrapper& conf) {
+  return MultiTensorUpdateInputArgModifyFn(GetInputArgModifierFn, conf, {"m", "v"});
+}
+
+/* static */ Maybe<void> MultiTensorAdamUpdateOp::InferDataType(user_op::InferContext* ctx) {
+  return InferMultiTensorUpdateDataType(ctx, {"m", "v"});
+}
+
 }  // namespace oneflow
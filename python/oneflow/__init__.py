@@ -282,6 +282,7 @@ import oneflow.nn.image
 
 from oneflow.framework.check_point_v2 import load
 from oneflow.framework.check_point_v2 import save
+from oneflow.framework.async_checkpoint import save_async
 from oneflow.framework.dtype import convert_oneflow_dtype_to_numpy_dtype, dtypes
 from oneflow.framework.env_util import (
     api_enable_eager_execution as enable_eager_execution,
@@ -404,6 +405,7 @@ import oneflow.framework.docstr as docstr
 import oneflow.cuda
 import oneflow.multiprocessing
 import oneflow.one_embedding
+import oneflow.serving
 
 if oneflow._oneflow_internal.flags.with_mlir():
     oneflow_internal_path = oneflow._oneflow_internal.__file__
@@ -0,0 +1,110 @@
+"""
+Copyright 2020 The OneFlow Authors. All rights reserved.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+import functools
+import threading
+import warnings
+
+import oneflow as flow
+import oneflow._oneflow_internal
+
+_amp = oneflow._oneflow_internal.amp
+# the nesting depth of the autocast regions, the cast cache is cleared at depth 0
+_thread_local = threading.local()
+
+
+def is_autocast_enabled():
+    r"""Returns True if autocast is enabled in the current thread."""
+    return _amp.is_autocast_enabled()
+
+
+class autocast(object):
+    r"""Context-manager that runs the eager ops in mixed precision.
+
+    In an autocast region, the float inputs on ``device_type`` of the ops in the
+    auto mixed precision lists of nn.Graph are cast by the list of the op: the ops
+    in the white list, such as matmul and conv2d, run in ``dtype``, and the ops in
+    the gray and clear lists run in float if their inputs are mixed. The casts of
+    the parameters are cached until the outermost autocast exits, so that a
+    parameter is cast once per forward.
+
+    The inputs of an inplace op are cast to the type of the tensor updated. The
+    backward pass should run outside of the region, the grads are cast back by
+    the cast ops recorded in the forward pass.
+
+    This context manager is thread local. Also functions as a decorator.
+
+    Args:
+        device_type (str): "cuda" or "cpu". (default: "cuda")
+        dtype (oneflow.dtype): the low precision type, flow.float16 on cuda and
+            flow.bfloat16 on cpu by default.
+        enabled (bool): whether to enable autocast in the region. (default: True)
+
+    .. code-block:: python
+
+        >>> import oneflow as flow
+        >>> model = flow.nn.Linear(4, 4).to("cuda")
+        >>> x = flow.randn(2, 4, device="cuda")
+        >>> with flow.amp.autocast("cuda"):
+        ...     y = model(x)
+        >>> y.dtype
+        oneflow.float16
+    """
+
+    def __init__(self, device_type="cuda", dtype=None, enabled=True):
+        assert device_type in ["cuda", "cpu"]
+        if dtype is None:
+            dtype = flow.float16 if device_type == "cuda" else flow.bfloat16
+        if device_type == "cpu" and enabled:
+            # There is no cpu kernel of the low precision types for the ops in the
+            # white list, e.g. matmul, so autocast is disabled on cpu.
+            warnings.warn(
+                "autocast on cpu is not supported since there are no low precision "
+                "cpu kernels of the white list ops, autocast is disabled"
+            )
+            enabled = False
+        self.device_type = device_type
+        self.dtype = dtype
+        self.enabled = enabled
+
+    def __enter__(self):
+        self._prev_state = (
+            _amp.is_autocast_enabled(),
+            _amp.get_autocast_device_type(),
+            _amp.get_autocast_dtype(),
+        )
+        _amp.set_autocast_enabled(self.enabled)
+        _amp.set_autocast_device_type(self.device_type)
+        _amp.set_autocast_dtype(self.dtype)
+        _thread_local.nesting = getattr(_thread_local, "nesting", 0) + 1
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        enabled, device_type, dtype = self._prev_state
+        _amp.set_autocast_enabled(enabled)
+        _amp.set_autocast_device_type(device_type)
+        _amp.set_autocast_dtype(dtype)
+        _thread_local.nesting -= 1
+        if _thread_local.nesting == 0:
+            _amp.clear_autocast_cache()
+        return False
+
+    def __call__(self, func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with self:
+                return func(*args, **kwargs)
+
+        return wrapper
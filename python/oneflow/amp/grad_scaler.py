@@ -13,9 +13,33 @@ WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 See the License for the specific language governing permissions and
 limitations under the License.
 """
+import collections
+
+import oneflow as flow
 
 
 class GradScaler(object):
+    r"""Scales the loss to keep the small fp16 grads from underflowing.
+
+    In nn.Graph, the scaling is configured by ``set_grad_scaler`` of the graph.
+    In eager mode, the loss is scaled by ``scale``, and ``step`` unscales the
+    grads and skips the step of the optimizer if any grad is inf or nan. The
+    grads are checked by a fused op per device and dtype. ``update`` multiplies
+    the scale by ``backoff_factor`` after a skipped step, and by
+    ``growth_factor`` after ``growth_interval`` steps without inf or nan.
+
+    .. code-block:: python
+
+        scaler = flow.amp.GradScaler()
+        for x, y in data:
+            optimizer.zero_grad()
+            with flow.amp.autocast("cuda"):
+                loss = loss_fn(model(x), y)
+            scaler.scale(loss).backward()
+            scaler.step(optimizer)
+            scaler.update()
+    """
+
     def __init__(
         self,
         init_scale=2.0 ** 16,
@@ -32,6 +56,87 @@ class GradScaler(object):
                 "got {}".format(backoff_factor)
             )
         self._growth_interval = growth_interval
+        self._scale = float(init_scale)
+        self._growth_tracker = 0
+        self._per_optimizer_states = {}
+
+    def scale(self, outputs):
+        r"""Multiplies the outputs, a tensor or a list or tuple of tensors, by the scale."""
+        if isinstance(outputs, (list, tuple)):
+            return type(outputs)(self.scale(output) for output in outputs)
+        return outputs * self._scale
+
+    def unscale_(self, optimizer):
+        r"""Divides the grads of the parameters of ``optimizer`` by the scale, and
+        checks whether any of them is inf or nan. It is called by ``step`` if not
+        called before, e.g. to clip the unscaled grads."""
+        state = self._per_optimizer_states.setdefault(id(optimizer), {})
+        if "found_inf" in state:
+            raise RuntimeError(
+                "unscale_() has already been called on this optimizer since the last update()"
+            )
+        grads = collections.defaultdict(list)
+        for param_group in optimizer.param_groups:
+            for param in param_group.parameters:
+                grad = param.grad
+                if grad is None:
+                    continue
+                placement = grad.placement if grad.is_global else grad.device
+                grads[(str(placement), grad.dtype)].append(grad)
+        inv_scale = 1.0 / self._scale
+        counts = []
+        with flow.no_grad():
+            for grads_of_key in grads.values():
+                counts.append(flow._C.multi_count_not_finite(grads_of_key))
+                for grad in grads_of_key:
+                    grad.mul_(inv_scale)
+        state["found_inf"] = sum(count.item() for count in counts) > 0
+
+    def step(self, optimizer, *args, **kwargs):
+        r"""Unscales the grads if ``unscale_`` is not called, and calls
+        ``optimizer.step`` unless any grad is inf or nan."""
+        if id(optimizer) not in self._per_optimizer_states:
+            self.unscale_(optimizer)
+        if self._per_optimizer_states[id(optimizer)]["found_inf"]:
+            return None
+        return optimizer.step(*args, **kwargs)
+
+    def update(self, new_scale=None):
+        r"""Updates the scale by the steps since the last update, or sets it to
+        ``new_scale``."""
+        if new_scale is not None:
+            self._scale = float(new_scale)
+        elif any(
+            state.get("found_inf", False)
+            for state in self._per_optimizer_states.values()
+        ):
+            self._scale *= self._backoff_factor
+            self._growth_tracker = 0
+        else:
+            self._growth_tracker += 1
+            if self._growth_tracker == self._growth_interval:
+                self._scale *= self._growth_factor
+                self._growth_tracker = 0
+        self._per_optimizer_states = {}
+
+    def get_scale(self):
+        return self._scale
+
+    def state_dict(self):
+        return {
+            "scale": self._scale,
+            "growth_factor": self._growth_factor,
+            "backoff_factor": self._backoff_factor,
+            "growth_interval": self._growth_interval,
+            "growth_tracker": self._growth_tracker,
+        }
+
+    def load_state_dict(self, state_dict):
+        self._scale = float(state_dict["scale"])
+        self._growth_factor = state_dict["growth_factor"]
+        self._backoff_factor = state_dict["backoff_factor"]
+        self._growth_interval = state_dict["growth_interval"]
+        self._growth_tracker = state_dict["growth_tracker"]
 
     def _generate_conf_for_graph(self, train_conf):
         train_conf.mutable_dynamic_loss_scale_policy().set_initial_loss_scale(
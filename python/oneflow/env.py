@@ -67,3 +67,62 @@ def get_world_size():
 
     """
     return oneflow._oneflow_internal.GetWorldSize()
+
+
+def cpu_memory_stats():
+    """Returns the statistics of the caching allocator of eager cpu tensors, after
+    the pending eager instructions are done.
+
+    The freed memory of cpu tensors is cached in free lists of size classes for
+    reuse, up to a cache limit which can be set by :func:`set_cpu_cache_limit` or
+    the environment variable ``ONEFLOW_VM_CPU_ALLOCATOR_CACHE_LIMIT_MB``.
+
+    Returns:
+        A dict of
+
+        - ``allocated_bytes``: bytes requested by the tensors alive
+        - ``in_use_bytes``: bytes of the size classes used by the tensors alive
+        - ``peak_in_use_bytes``: the peak of ``in_use_bytes``
+        - ``cached_bytes``: bytes cached in the free lists
+        - ``reserved_bytes``: ``in_use_bytes`` plus ``cached_bytes``
+        - ``cache_limit_bytes``: the limit of ``cached_bytes``
+        - ``num_allocs``: number of allocations
+        - ``num_cache_hits``: number of allocations served by the cache
+        - ``fragmentation``: the fraction of ``reserved_bytes`` not requested by the tensors alive
+
+    """
+    oneflow._oneflow_internal.eager.Sync()
+    stats = oneflow._oneflow_internal.vm.GetCpuAllocatorStats()
+    reserved_bytes = stats["in_use_bytes"] + stats["cached_bytes"]
+    stats["reserved_bytes"] = reserved_bytes
+    stats["fragmentation"] = (
+        1.0 - stats["allocated_bytes"] / reserved_bytes if reserved_bytes > 0 else 0.0
+    )
+    return stats
+
+
+def empty_cpu_cache():
+    """Returns the memory cached by the caching allocator of eager cpu tensors to
+    the system, after the pending eager instructions are done.
+    """
+    oneflow._oneflow_internal.eager.Sync()
+    oneflow._oneflow_internal.vm.EmptyCpuAllocatorCache()
+
+
+def set_cpu_cache_limit(limit_bytes):
+    """Sets the limit of the memory cached by the caching allocator of eager cpu
+    tensors. The cache is trimmed to the limit at once, and 0 disables caching.
+
+    Args:
+        limit_bytes (int): the limit in bytes
+    """
+    assert limit_bytes >= 0, "limit_bytes should be non-negative"
+    oneflow._oneflow_internal.vm.SetCpuAllocatorCacheLimit(limit_bytes)
+
+
+def reset_peak_cpu_memory_stats():
+    """Resets ``peak_in_use_bytes`` of :func:`cpu_memory_stats` to the current
+    ``in_use_bytes``.
+    """
+    oneflow._oneflow_internal.eager.Sync()
+    oneflow._oneflow_internal.vm.ResetCpuAllocatorPeakStats()
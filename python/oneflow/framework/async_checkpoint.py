@@ -0,0 +1,274 @@
+"""
+Copyright 2020 The OneFlow Authors. All rights reserved.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+import copy
+import glob
+import os
+import shutil
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import wait as wait_futures
+from pathlib import Path
+from typing import Any, Dict, Union
+
+import oneflow
+from oneflow.framework.check_point_v2 import _save
+from oneflow.framework.tensor import Tensor
+
+
+def _snapshot(obj):
+    if isinstance(obj, Tensor):
+        assert (
+            obj.is_local
+        ), "global tensors are not supported by async checkpoint, use oneflow.save instead."
+        with oneflow.no_grad():
+            # The copy is launched asynchronously by the eager VM, and it is ordered
+            # before any later in-place update of obj, e.g. an optimizer step.
+            return obj.detach().to("cpu", copy=True)
+    if isinstance(obj, dict):
+        # A shallow copy keeps the type and attributes (e.g. _metadata of a state dict).
+        snapshot = copy.copy(obj)
+        for (k, v) in obj.items():
+            snapshot[k] = _snapshot(v)
+        return snapshot
+    if isinstance(obj, list):
+        return [_snapshot(v) for v in obj]
+    if isinstance(obj, tuple):
+        if hasattr(obj, "_fields"):
+            return type(obj)(*(_snapshot(v) for v in obj))
+        return type(obj)(_snapshot(v) for v in obj)
+    return obj
+
+
+def _dir_size(path: Path) -> int:
+    return sum(f.stat().st_size for f in path.rglob("*") if f.is_file())
+
+
+def _version_dirs(path: Path) -> Dict[int, Path]:
+    prefix = path.name + ".v"
+    version2dir = dict()
+    for sibling in path.parent.glob(glob.escape(prefix) + "*"):
+        version = sibling.name[len(prefix) :]
+        if version.isdigit() and not sibling.is_symlink():
+            version2dir[int(version)] = sibling
+    return version2dir
+
+
+def _new_version_dir(path: Path) -> Path:
+    version2dir = _version_dirs(path)
+    version = max(version2dir.keys(), default=0) + 1
+    return path.with_name(path.name + ".v" + str(version))
+
+
+def _commit(version_dir: Path, path: Path):
+    if path.is_dir() and not path.is_symlink():
+        if any(path.iterdir()):
+            # A checkpoint saved in place by oneflow.save is moved aside and removed
+            # with the old versions, only this first switch to a link is not atomic.
+            os.replace(path, _new_version_dir(path))
+        else:
+            path.rmdir()
+    # The link is switched to the new version by a single rename, so path always
+    # refers to a complete checkpoint, either the old one or the new one.
+    tmp_link = path.with_name(path.name + ".link." + str(os.getpid()))
+    if tmp_link.is_symlink():
+        tmp_link.unlink()
+    os.symlink(version_dir.name, tmp_link)
+    os.replace(tmp_link, path)
+    for old_dir in _version_dirs(path).values():
+        if old_dir != version_dir:
+            shutil.rmtree(old_dir, ignore_errors=True)
+
+
+class AsyncCheckpointer(object):
+    r"""Saves checkpoints in a background thread, off the training thread.
+
+    :meth:`save` takes a snapshot of the tensors of an object into host memory
+    and returns a :class:`concurrent.futures.Future` immediately. The snapshot
+    is then written with :func:`oneflow.save` to a new versioned directory
+    ``{path}.v{N}`` by a background writer, and committed by atomically replacing
+    the target path with a symbolic link to it, so the target path never refers
+    to a partially written checkpoint. Older versions are removed after the switch.
+
+    In a multi-process run, tensors are assumed to be replicated across ranks, as
+    with DDP, and only rank 0 writes the checkpoint; :meth:`save` returns a future
+    of which the result is None on other ranks.
+
+    At most ``max_pending`` snapshots are held at the same time (one being written
+    and one waiting, by default), and at most one checkpoint of a path is in flight:
+    :meth:`save` waits for the previous one before taking a new snapshot.
+
+    Args:
+        max_pending (int, optional): Max number of snapshots held in host memory. Default: 2
+    """
+
+    def __init__(self, max_pending: int = 2):
+        assert max_pending >= 1, "max_pending must be greater than 0."
+        self._executor = ThreadPoolExecutor(max_workers=1)
+        self._pending = threading.BoundedSemaphore(max_pending)
+        self._path2future = dict()
+        self._futures_lock = threading.Lock()
+        self._metrics_lock = threading.Lock()
+        self._num_saved = 0
+        self._total_bytes = 0
+        self._total_snapshot_seconds = 0.0
+        self._total_write_seconds = 0.0
+        self._last_metrics = None
+
+    def save(self, obj: Any, path: Union[str, Path], **kwargs) -> Future:
+        r"""Saves an object to a directory asynchronously.
+
+        Args:
+            obj: The object to be saved, e.g. a state dict of a module, an optimizer or a graph.
+                Tensors in it must be local tensors.
+            path (str): The directory in which the object is saved
+            kwargs: Other arguments passed to :func:`oneflow.save`, e.g. ``sharded``
+
+        Returns:
+            A future, of which the result is a dict of metrics of this checkpoint.
+        """
+        if oneflow.env.get_rank() != 0:
+            future = Future()
+            future.set_result(None)
+            return future
+        path = Path(path).absolute()
+        with self._futures_lock:
+            prev_future = self._path2future.get(path)
+        if prev_future is not None:
+            wait_futures([prev_future])
+        self._pending.acquire()
+        try:
+            start = time.perf_counter()
+            snapshot = _snapshot(obj)
+            snapshot_seconds = time.perf_counter() - start
+            future = self._executor.submit(
+                self._write, snapshot, path, snapshot_seconds, kwargs
+            )
+        except:
+            self._pending.release()
+            raise
+        with self._futures_lock:
+            self._path2future[path] = future
+        future.add_done_callback(lambda _: self._pending.release())
+        future.add_done_callback(lambda f: self._forget(path, f))
+        return future
+
+    def _forget(self, path: Path, future: Future):
+        # Failed futures are kept, so that wait() raises their errors.
+        if future.exception() is not None:
+            return
+        with self._futures_lock:
+            if self._path2future.get(path) is future:
+                del self._path2future[path]
+
+    def _write(self, snapshot, path: Path, snapshot_seconds: float, kwargs):
+        version_dir = _new_version_dir(path)
+        start = time.perf_counter()
+        try:
+            _save(snapshot, version_dir, collective=False, **kwargs)
+            # Waiting for the snapshot copies is included in the write time.
+            nbytes = _dir_size(version_dir)
+            _commit(version_dir, path)
+        except:
+            shutil.rmtree(version_dir, ignore_errors=True)
+            raise
+        write_seconds = time.perf_counter() - start
+        metrics = {
+            "path": str(path),
+            "bytes": nbytes,
+            "snapshot_seconds": snapshot_seconds,
+            "write_seconds": write_seconds,
+            "throughput": nbytes / write_seconds if write_seconds > 0 else 0.0,
+        }
+        with self._metrics_lock:
+            self._num_saved += 1
+            self._total_bytes += nbytes
+            self._total_snapshot_seconds += snapshot_seconds
+            self._total_write_seconds += write_seconds
+            self._last_metrics = metrics
+        return metrics
+
+    def wait(self):
+        r"""Waits for all in-flight checkpoints, and raises the error of a failed one."""
+        with self._futures_lock:
+            futures = list(self._path2future.values())
+            self._path2future.clear()
+        for future in futures:
+            future.result()
+
+    def metrics(self) -> Dict[str, Any]:
+        r"""Returns metrics of the checkpoints written so far.
+
+        ``throughput`` is in bytes per second, and ``last`` holds the metrics of
+        the latest written checkpoint.
+        """
+        with self._metrics_lock:
+            return {
+                "num_saved": self._num_saved,
+                "total_bytes": self._total_bytes,
+                "total_snapshot_seconds": self._total_snapshot_seconds,
+                "total_write_seconds": self._total_write_seconds,
+                "throughput": self._total_bytes / self._total_write_seconds
+                if self._total_write_seconds > 0
+                else 0.0,
+                "last": self._last_metrics,
+            }
+
+
+_default_checkpointer = None
+
+
+def _get_default_checkpointer() -> AsyncCheckpointer:
+    global _default_checkpointer
+    if _default_checkpointer is None:
+        _default_checkpointer = AsyncCheckpointer()
+    return _default_checkpointer
+
+
+def save_async(obj: Any, path: Union[str, Path], **kwargs) -> Future:
+    r"""Save an object to a directory asynchronously.
+
+    Tensors of the object are copied to host memory before it returns, so the
+    object may be updated right after it, e.g. by the next training step. Then
+    the snapshot is written by a background thread with :func:`oneflow.save`
+    to a versioned directory ``{path}.v{N}``, and committed atomically by
+    replacing ``path`` with a symbolic link to it. In a multi-process run, only
+    rank 0 writes the checkpoint.
+
+    Args:
+        obj: The object to be saved. Tensors in it must be local tensors.
+        path (str): The directory in which the object is saved
+        kwargs: Other arguments passed to :func:`oneflow.save`, e.g. ``sharded``
+
+    Returns:
+        A :class:`concurrent.futures.Future`, of which the result is a dict of
+        metrics of the checkpoint: ``bytes``, ``snapshot_seconds``,
+        ``write_seconds`` and ``throughput`` (bytes per second).
+
+    For example:
+
+    .. code-block:: python
+
+        >>> import oneflow as flow
+        >>> import tempfile
+        >>> m = flow.nn.Linear(2, 3)
+        >>> save_dir = tempfile.mkdtemp()
+        >>> future = flow.save_async(m.state_dict(), save_dir)
+        >>> future.result()["bytes"] > 0
+        True
+
+    """
+    return _get_default_checkpointer().save(obj, path, **kwargs)
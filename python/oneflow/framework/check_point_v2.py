@@ -13,12 +13,15 @@ WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 See the License for the specific language governing permissions and
 limitations under the License.
 """
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import contextmanager
+import json
 import os
 import warnings
 from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple, Union
 from pathlib import Path
 import pickle
+import threading
 
 import numpy as np
 from google.protobuf import text_format
@@ -37,6 +40,10 @@ SNAPSHOT_DONE_FILENAME = "snapshot_done"
 META_INFO_FILENAME = "meta"
 PICKLE_FILENAME = "pickled_data"
 DATA_FILENAME = "out"
+SHARDED_INDEX_FILENAME = "sharded_index_rank_{}.json"
+SHARDED_DATA_FILENAME = "sharded_data_rank_{}_{}"
+# Tensor data in a shard file is aligned to 64 bytes.
+SHARDED_DATA_ALIGNMENT = 64
 PROTOCOL_VERSION = 1
 
 
@@ -95,13 +102,16 @@ class FileBackendVariableBlob:
     def dtype(self) -> oneflow.dtype:
         return self.dtype_
 
-    def numpy(self) -> np.ndarray:
+    def numpy(self, mmap: bool = False) -> np.ndarray:
         if not self.has_meta_info_:
             raise RuntimeError("This variable does not have meta info")
-        return np.fromfile(
-            self.file_path,
-            dtype=dtype_util.convert_oneflow_dtype_to_numpy_dtype(self.dtype),
-        ).reshape(self.shape)
+        dtype = dtype_util.convert_oneflow_dtype_to_numpy_dtype(self.dtype)
+        # An empty file cannot be memory-mapped.
+        if mmap and np.prod(self.shape) > 0:
+            # NOTE: Copy-on-write mapping, so the array is writable and the file is
+            # never modified. Data is read from the file when it is accessed.
+            return np.memmap(self.file_path, dtype=dtype, mode="c", shape=self.shape)
+        return np.fromfile(self.file_path, dtype=dtype).reshape(self.shape)
 
 
 def _save_tensor_to_disk(tensor: "oneflow.Tensor", dir_name: Union[str, Path]) -> None:
@@ -122,8 +132,164 @@ def _save_tensor_to_disk(tensor: "oneflow.Tensor", dir_name: Union[str, Path]) -
 ValueContainer = Union[FileBackendVariableBlob, np.ndarray, "oneflow.Tensor"]
 
 
+def _is_broadcast_sbp(sbp) -> bool:
+    return all(s == flow.sbp.broadcast for s in sbp)
+
+
+def _placement_rank_list(placement) -> List[int]:
+    return np.array(placement.ranks).flatten().tolist()
+
+
+def _is_sharded_checkpoint(path: Path) -> bool:
+    return any(path.glob(SHARDED_INDEX_FILENAME.format("*")))
+
+
+class _ShardedWriter(object):
+    r"""Packs tensors of this rank into a few large shard files.
+
+    Tensor data is written straight from host tensor memory by a thread pool
+    while pickling is still going on. The index of the tensors is written
+    after all data has been written.
+    """
+
+    def __init__(self, path: Path, max_shard_size: int, num_threads: int):
+        self._path = path
+        self._rank = flow.env.get_rank()
+        self._max_shard_size = max_shard_size
+        self._pool = ThreadPoolExecutor(max_workers=num_threads)
+        self._futures = []
+        self._fds = []
+        self._cur_shard_size = 0
+        self._index = dict()
+        self._tensor_cnt = 0
+        self._path.mkdir(exist_ok=True)
+
+    def _open_new_shard(self):
+        file_name = SHARDED_DATA_FILENAME.format(self._rank, len(self._fds))
+        fd = os.open(
+            str(self._path / file_name), os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644
+        )
+        self._fds.append(fd)
+        self._cur_shard_size = 0
+
+    @staticmethod
+    def _write(fd: int, array: np.ndarray, offset: int):
+        buf = memoryview(array.reshape(-1).view(np.uint8))
+        while len(buf) > 0:
+            written = os.pwrite(fd, buf, offset)
+            buf = buf[written:]
+            offset += written
+
+    def new_key(self, prefix: str) -> str:
+        key = prefix + str(self._tensor_cnt)
+        self._tensor_cnt += 1
+        return key
+
+    def add(self, key: str, tensor: "oneflow.Tensor"):
+        assert tensor.is_local
+        # For cpu tensor, numpy() shares memory with the tensor without a copy.
+        array = np.ascontiguousarray(tensor.numpy())
+        nbytes = array.nbytes
+        offset = (
+            (self._cur_shard_size + SHARDED_DATA_ALIGNMENT - 1)
+            // SHARDED_DATA_ALIGNMENT
+            * SHARDED_DATA_ALIGNMENT
+        )
+        if len(self._fds) == 0 or (
+            offset > 0 and offset + nbytes > self._max_shard_size
+        ):
+            self._open_new_shard()
+            offset = 0
+        self._cur_shard_size = offset + nbytes
+        self._index[key] = {
+            "file": SHARDED_DATA_FILENAME.format(self._rank, len(self._fds) - 1),
+            "offset": offset,
+            "dtype": array.dtype.str,
+            "shape": list(array.shape),
+            # The pickled object is written by rank 0, so each rank records the
+            # devices of its own tensors here.
+            "device": str(tensor.device),
+        }
+        self._futures.append(
+            self._pool.submit(self._write, self._fds[-1], array, offset)
+        )
+
+    def close(self, write_index: bool = True):
+        try:
+            for future in self._futures:
+                future.result()
+        finally:
+            self._pool.shutdown()
+            for fd in self._fds:
+                os.close(fd)
+        # A checkpoint without the index of a rank is never loaded.
+        if not write_index:
+            return
+        index_path = self._path / SHARDED_INDEX_FILENAME.format(self._rank)
+        index_path.write_text(json.dumps({"rank": self._rank, "tensors": self._index}))
+
+
+class _ShardedReader(object):
+    r"""Loads tensors from shard files by memory-mapping, without intermediate copies."""
+
+    def __init__(self, path: Path):
+        self._path = path
+        self._rank = flow.env.get_rank()
+        # Index of tensors saved by each rank.
+        self._rank2index = dict()
+        for index_path in path.glob(SHARDED_INDEX_FILENAME.format("*")):
+            index = json.loads(index_path.read_text())
+            self._rank2index[index["rank"]] = index["tensors"]
+
+    def _entry(self, key: str, rank: int) -> Tuple[Dict[str, Any], int]:
+        if rank not in self._rank2index and len(self._rank2index) == 1:
+            # Local tensors saved by a single process can be loaded by any rank.
+            (rank,) = self._rank2index.keys()
+        assert rank in self._rank2index, f"tensors of rank {rank} are not saved."
+        return self._rank2index[rank][key], rank
+
+    def device(self, key: str, rank: int) -> Optional[str]:
+        r"""Returns the device of a local tensor when it was saved, or None if
+        the index doesn't record it."""
+        entry, saved_rank = self._entry(key, rank)
+        if "device" not in entry:
+            return None
+        device = flow.device(entry["device"])
+        if saved_rank != rank:
+            # The device index of another rank is meaningless on this rank.
+            return device.type
+        return entry["device"]
+
+    def load(self, key: str, rank: int) -> "oneflow.Tensor":
+        entry, _ = self._entry(key, rank)
+        shape = tuple(entry["shape"])
+        if np.prod(shape, dtype=np.int64) == 0:
+            # A rank saving only empty tensors leaves an empty shard file, which
+            # can't be memory-mapped.
+            return flow.from_numpy(np.empty(shape, dtype=np.dtype(entry["dtype"])))
+        # NOTE: Copy-on-write mapping, so the tensor is writable and the file is never modified.
+        array = np.memmap(
+            str(self._path / entry["file"]),
+            dtype=np.dtype(entry["dtype"]),
+            mode="c",
+            offset=entry["offset"],
+            shape=shape,
+        )
+        return flow.from_numpy(array)
+
+
+def _failed_ranks(failed: bool) -> List[int]:
+    # Each rank broadcasts whether it failed, so no rank returns before all ranks
+    # have called it, and all ranks get the same result.
+    return [
+        src
+        for src in range(flow.env.get_world_size())
+        if _broadcast_py_object(failed, src)
+    ]
+
+
 def _LoadSingleVariable(
-    path: Optional[str], global_src_rank: Optional[int] = None
+    path: Optional[str], global_src_rank: Optional[int] = None, mmap: bool = False
 ) -> "flow.Tensor":
     if global_src_rank is not None:
         rank = flow.env.get_rank()
@@ -131,7 +297,7 @@ def _LoadSingleVariable(
             assert isinstance(path, str)
             file_backed_blob = FileBackendVariableBlob(path)
             loaded = flow.tensor(
-                file_backed_blob.numpy(), dtype=file_backed_blob.dtype
+                file_backed_blob.numpy(mmap), dtype=file_backed_blob.dtype
             ).to("cuda")
         else:
             loaded = flow.tensor([]).to("cuda")
@@ -141,6 +307,9 @@ def _LoadSingleVariable(
         return loaded
 
     assert isinstance(path, str)
+    if mmap:
+        # The tensor shares memory with the memory-mapped file.
+        return flow.from_numpy(FileBackendVariableBlob(path).numpy(mmap=True))
     return flow.tensor(FileBackendVariableBlob(path).numpy())
 
 
@@ -156,7 +325,59 @@ def _broadcast_py_object(obj, src: int = 0):
 # NOTE(jianhao):
 # (de)serializing a container of global tensors requires the order
 # of those tensors are the same across all ranks.
+def _sharded_tensor_getstate(self):
+    rank = flow.env.get_rank()
+    sharded_io = pickling_ctx.sharded_io
+    if self.is_local:
+        key = sharded_io.new_key("tensor_")
+        sharded_io.add(key, self)
+        return {"sharded_key": key, "device": str(self.device)}
+
+    key = sharded_io.new_key("global_tensor_")
+    placement_ranks = _placement_rank_list(self.placement)
+    # Broadcast tensors are only saved by the first rank of the placement,
+    # other tensors are saved by each rank of the placement with its local component.
+    if _is_broadcast_sbp(self.sbp):
+        if rank == placement_ranks[0]:
+            sharded_io.add(key, self.to_local())
+    elif rank in placement_ranks:
+        sharded_io.add(key, self.to_local())
+    return {
+        "sharded_key": key,
+        "placement": self.placement,
+        "sbp": self.sbp,
+    }
+
+
+def _sharded_tensor_setstate(self, pickle_dict):
+    rank = flow.env.get_rank()
+    sharded_io = pickling_ctx.sharded_io
+    key = pickle_dict["sharded_key"]
+    if "placement" not in pickle_dict:
+        loaded = sharded_io.load(key, rank)
+        device = flow.device(sharded_io.device(key, rank) or pickle_dict["device"])
+        if device != loaded.device:
+            loaded = loaded.to(device)
+        return self.__init__(loaded)
+
+    placement = pickle_dict["placement"]
+    sbp = pickle_dict["sbp"]
+    placement_ranks = _placement_rank_list(placement)
+    if rank in placement_ranks:
+        src_rank = placement_ranks[0] if _is_broadcast_sbp(sbp) else rank
+        local = sharded_io.load(key, src_rank)
+        if placement.type != "cpu":
+            local = local.to(placement.type)
+    else:
+        local = flow.tensor([]).to(placement.type)
+    return self.__init__(local.to_global(placement=placement, sbp=sbp))
+
+
 def tensor_getstate(self):
+    save_load_path = pickling_ctx.save_load_path
+    global_src_dsk_rank = pickling_ctx.global_src_dsk_rank
+    if save_load_path is not None and pickling_ctx.sharded_io is not None:
+        return _sharded_tensor_getstate(self)
     if save_load_path is not None:
         # save_load_path is not None means setstate/getstate is called inside
         # flow.save or flow.load
@@ -199,11 +420,18 @@ def tensor_getstate(self):
 
 
 def tensor_setstate(self, pickle_dict):
+    save_load_path = pickling_ctx.save_load_path
+    if save_load_path is not None and "sharded_key" in pickle_dict:
+        return _sharded_tensor_setstate(self, pickle_dict)
     if save_load_path is not None:
         assert isinstance(save_load_path, Path)
         rel_dir_name = pickle_dict["path"]
         abs_dir_name = save_load_path / rel_dir_name
-        self.__init__(_LoadSingleVariable(str(abs_dir_name), global_src_dsk_rank))
+        self.__init__(
+            _LoadSingleVariable(
+                str(abs_dir_name), pickling_ctx.global_src_dsk_rank, pickling_ctx.mmap
+            )
+        )
     else:
         if "placement" in pickle_dict:
             return self.__init__(
@@ -243,7 +471,7 @@ def RegisterMethods():
 
 
 def legacy_load(
-    path: Union[str, Path], global_src_rank: Optional[int] = None,
+    path: Union[str, Path], global_src_rank: Optional[int] = None, mmap: bool = False,
 ) -> Dict[str, "flow.Tensor"]:
     assert os.path.isdir(path), "Directory {} doesn't exist!".format(path)
     rank = flow.env.get_rank()
@@ -259,7 +487,7 @@ def legacy_load(
     for f in all_files:
         var_dir = os.path.join(path, f)
         try:
-            var_dict[f] = _LoadSingleVariable(var_dir, global_src_rank)
+            var_dict[f] = _LoadSingleVariable(var_dir, global_src_rank, mmap)
         except FileNotFoundError:
             warnings.warn(
                 f"'{var_dir}' does not have valid tensor data. Please check it if it is unexpected.",
@@ -269,19 +497,23 @@ def legacy_load(
 
 
 @contextmanager
-def tensor_pickling_context(path: Path, global_src_dst_rank: int):
-    global save_load_path
-    global global_src_dsk_rank
-    global_src_dsk_rank = global_src_dst_rank
-    save_load_path = path
+def tensor_pickling_context(
+    path: Path, global_src_dst_rank: int, sharded=None, mmap: bool = False
+):
+    pickling_ctx.global_src_dsk_rank = global_src_dst_rank
+    pickling_ctx.save_load_path = path
+    pickling_ctx.sharded_io = sharded
+    pickling_ctx.mmap = mmap
     try:
         yield
     finally:
-        global_src_dsk_rank = None
-        save_load_path = None
+        pickling_ctx.global_src_dsk_rank = None
+        pickling_ctx.save_load_path = None
+        pickling_ctx.sharded_io = None
+        pickling_ctx.mmap = False
 
 
-def load(path: str, global_src_rank: Optional[int] = None,) -> Any:
+def load(path: str, global_src_rank: Optional[int] = None, mmap: bool = False) -> Any:
     r"""Loads an object saved with oneflow.save() from a directory.
 
     Args:
@@ -292,6 +524,13 @@ def load(path: str, global_src_rank: Optional[int] = None,) -> Any:
             read the files in `path`, and tensors in the loaded
             object will be consistent with placement = 
             `flow.placement('cuda', [global_src_rank])`
+        mmap (bool, optional): Whether to memory-map the tensor data
+            files instead of reading them. Loaded cpu tensors share
+            memory with the mapped files (copy-on-write), so data is
+            only read when it is accessed, e.g. by `load_state_dict`,
+            and tensors which are never accessed are never read.
+            Tensors of the sharded format are always memory-mapped.
+            Default: ``False``
 
     Returns:
         The loaded object
@@ -307,7 +546,7 @@ def load(path: str, global_src_rank: Optional[int] = None,) -> Any:
     else:
         is_legacy = _broadcast_py_object(None, global_src_rank)
     if is_legacy:
-        return legacy_load(path, global_src_rank)
+        return legacy_load(path, global_src_rank, mmap)
 
     if global_src_rank is not None:
         if rank == global_src_rank:
@@ -318,14 +557,25 @@ def load(path: str, global_src_rank: Optional[int] = None,) -> Any:
     else:
         pickle_bytes = pickle_path.read_bytes()
 
-    with tensor_pickling_context(path, global_src_rank):
+    sharded_reader = None
+    if _is_sharded_checkpoint(path):
+        assert (
+            global_src_rank is None
+        ), "global_src_rank is not supported when loading a sharded checkpoint."
+        sharded_reader = _ShardedReader(path)
+    with tensor_pickling_context(path, global_src_rank, sharded_reader, mmap):
         res = pickle.loads(pickle_bytes)
     assert res["protocol_version"] == PROTOCOL_VERSION
     return res["data"]
 
 
 def save(
-    obj: Any, path: Union[str, Path], global_dst_rank: Optional[int] = None,
+    obj: Any,
+    path: Union[str, Path],
+    global_dst_rank: Optional[int] = None,
+    sharded: bool = False,
+    max_shard_size: int = 1 << 30,
+    num_threads: int = 8,
 ) -> None:
     r"""Save an object to a directory.
 
@@ -337,7 +587,33 @@ def save(
             will be saved by the process whose rank == 
             global_src_rank, while other processes will not do any
             disk I/O.
+        sharded (bool, optional): Whether to save tensors in the sharded
+            format. In the sharded format, tensors of each rank are packed
+            into a few shard files of at most `max_shard_size` bytes, which
+            are written by a thread pool directly from tensor memory, and
+            loaded by memory-mapping. Global tensors are saved by each rank
+            with its local component instead of being gathered, so it
+            cannot be used with `global_dst_rank`. Default: ``False``
+        max_shard_size (int, optional): Max size in bytes of a shard file
+            in the sharded format. A tensor larger than it takes a shard
+            file of its own. Default: 1 GB
+        num_threads (int, optional): Number of threads writing shard files
+            in the sharded format. Default: 8
     """
+    _save(obj, path, global_dst_rank, sharded, max_shard_size, num_threads)
+
+
+def _save(
+    obj: Any,
+    path: Union[str, Path],
+    global_dst_rank: Optional[int] = None,
+    sharded: bool = False,
+    max_shard_size: int = 1 << 30,
+    num_threads: int = 8,
+    collective: bool = True,
+) -> None:
+    # With collective=False a sharded checkpoint is written by the calling rank alone,
+    # without synchronizing with other ranks, e.g. by a background writer thread.
     path: Path = Path(path)
 
     if isinstance(obj, graph_util.Graph):
@@ -356,14 +632,66 @@ def save(
         return
 
     obj = {"protocol_version": PROTOCOL_VERSION, "data": obj}
+    rank = flow.env.get_rank()
+    if sharded:
+        assert (
+            global_dst_rank is None
+        ), "global_dst_rank cannot be used with sharded format."
+        sharded_writer = _ShardedWriter(path, max_shard_size, num_threads)
+        error = None
+        try:
+            try:
+                with tensor_pickling_context(path, None, sharded_writer):
+                    pickled_bytes = pickle.dumps(obj)
+            except:
+                sharded_writer.close(write_index=False)
+                raise
+            sharded_writer.close()
+        except Exception as e:
+            error = e
+        if not collective or flow.env.get_world_size() == 1:
+            if error is not None:
+                raise error
+            (path / PICKLE_FILENAME).write_bytes(pickled_bytes)
+            return
+        # The pickled object is shared by all ranks, so it is written by rank 0 only,
+        # after all ranks have written their shards and indexes. Ranks saving local
+        # tensors must save objects of the same structure. All ranks agree on the
+        # result first, so that a failure on one rank is raised on every rank
+        # instead of leaving the others waiting.
+        failed_ranks = _failed_ranks(error is not None)
+        if error is not None:
+            raise error
+        if len(failed_ranks) > 0:
+            raise RuntimeError(f"failed to save the checkpoint on ranks {failed_ranks}")
+        error = None
+        if rank == 0:
+            try:
+                (path / PICKLE_FILENAME).write_bytes(pickled_bytes)
+            except Exception as e:
+                error = e
+        failed_ranks = _failed_ranks(error is not None)
+        if error is not None:
+            raise error
+        if len(failed_ranks) > 0:
+            raise RuntimeError("failed to write the checkpoint on rank 0")
+        return
+
     with tensor_pickling_context(path, global_dst_rank):
         pickled_bytes = pickle.dumps(obj)
-    rank = flow.env.get_rank()
     if global_dst_rank is None or global_dst_rank == rank:
         path.mkdir(exist_ok=True)
         pickle_path = path / PICKLE_FILENAME
         pickle_path.write_bytes(pickled_bytes)
 
 
-save_load_path = None
-global_src_dsk_rank = None
+class _PicklingContext(threading.local):
+    # Thread-local, so that pickling in a background thread (e.g. an async
+    # checkpoint writer) doesn't affect pickling in other threads.
+    save_load_path = None
+    global_src_dsk_rank = None
+    sharded_io = None
+    mmap = False
+
+
+pickling_ctx = _PicklingContext()
@@ -0,0 +1,281 @@
+"""
+Copyright 2020 The OneFlow Authors. All rights reserved.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+import json
+import os
+from collections import OrderedDict, namedtuple
+
+import oneflow._oneflow_internal
+
+HostEvent = namedtuple(
+    "HostEvent",
+    [
+        "name",
+        "op_name",
+        "category",
+        "thread_id",
+        "start_ns",
+        "end_ns",
+        "queue_delay_ns",
+        "allocated_bytes",
+        "input_shapes",
+        "self_ns",
+    ],
+)
+
+
+def _compute_self_ns(raw_events):
+    # the events on the same thread are either disjoint or nested
+    raw_events = sorted(raw_events, key=lambda e: (e[3], e[4], -e[5]))
+    child_ns = [0] * len(raw_events)
+    stack = []
+    for i, event in enumerate(raw_events):
+        while len(stack) > 0 and (
+            raw_events[stack[-1]][3] != event[3] or raw_events[stack[-1]][5] <= event[4]
+        ):
+            stack.pop()
+        if len(stack) > 0:
+            child_ns[stack[-1]] += event[5] - event[4]
+        stack.append(i)
+    return [
+        HostEvent(*event, self_ns=event[5] - event[4] - child_ns[i])
+        for i, event in enumerate(raw_events)
+    ]
+
+
+def _format_time(ns):
+    if ns >= 1e9:
+        return "{:.3f}s".format(ns / 1e9)
+    if ns >= 1e6:
+        return "{:.3f}ms".format(ns / 1e6)
+    return "{:.3f}us".format(ns / 1e3)
+
+
+def _format_bytes(nbytes):
+    for unit in ["B", "KB", "MB"]:
+        if abs(nbytes) < 1024:
+            return (
+                "{:.2f}{}".format(nbytes, unit) if unit != "B" else "{}B".format(nbytes)
+            )
+        nbytes /= 1024
+    return "{:.2f}GB".format(nbytes)
+
+
+class profile(object):
+    r"""Context manager that records the host time of the ops executed in it.
+
+    The execution of every eager op by the virtual machine is recorded with its
+    input shapes, the bytes allocated for its outputs and temporary storage, and
+    the delay from the op is issued to it is executed. The forward of every op
+    by the actors of :class:`oneflow.nn.Graph` is recorded with its input shapes.
+    The ranges of :class:`record_function` are recorded too. It runs without CUDA
+    or any external tool.
+
+    The time of an op on cuda is the host time to launch its kernel.
+
+    For example:
+
+    .. code-block:: python
+
+        >>> import oneflow as flow
+        >>> import oneflow.profiler
+        >>> with flow.profiler.profile() as prof:
+        ...     with flow.profiler.record_function("relu"):
+        ...         y = flow.relu(flow.ones(2, 3))
+        >>> table = prof.table(sort_by="self_time")
+        >>> prof.export_chrome_trace("/tmp/trace.json")
+
+    """
+
+    def __init__(self):
+        self._events = None
+
+    def __enter__(self):
+        oneflow._oneflow_internal.eager.Sync()
+        oneflow._oneflow_internal.profiler.EnableHostProfiler()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        # wait for the vm to execute the ops issued in the context
+        oneflow._oneflow_internal.eager.Sync()
+        raw_events = oneflow._oneflow_internal.profiler.DisableHostProfiler()
+        self._events = _compute_self_ns(raw_events)
+
+    @property
+    def events(self):
+        """Returns the recorded :class:`HostEvent` list."""
+        assert self._events is not None, "the profiler is not finished yet"
+        return self._events
+
+    def key_averages(self, group_by_input_shape=False):
+        """Aggregates the events by name, and by input shapes too if
+        ``group_by_input_shape`` is True.
+
+        Returns:
+            A list of dicts, each of which has ``name``, ``category``, ``input_shapes``,
+            ``count``, ``self_ns``, ``total_ns``, ``queue_delay_ns`` and ``allocated_bytes``.
+        """
+        rows = OrderedDict()
+        for event in self.events:
+            key = (event.name, event.category)
+            if group_by_input_shape:
+                key += (event.input_shapes,)
+            if key not in rows:
+                rows[key] = {
+                    "name": event.name,
+                    "category": event.category,
+                    "input_shapes": event.input_shapes if group_by_input_shape else "",
+                    "count": 0,
+                    "self_ns": 0,
+                    "total_ns": 0,
+                    "queue_delay_ns": 0,
+                    "allocated_bytes": 0,
+                }
+            row = rows[key]
+            row["count"] += 1
+            row["self_ns"] += event.self_ns
+            row["total_ns"] += event.end_ns - event.start_ns
+            row["queue_delay_ns"] += max(event.queue_delay_ns, 0)
+            row["allocated_bytes"] += max(event.allocated_bytes, 0)
+        return list(rows.values())
+
+    def table(self, sort_by="self_time", row_limit=100, group_by_input_shape=False):
+        """Returns a table of :meth:`key_averages`.
+
+        Args:
+            sort_by (str): one of "self_time", "total_time", "count",
+                "queue_delay" and "allocated_bytes". (default: "self_time")
+            row_limit (int): the max number of rows. (default: 100)
+            group_by_input_shape (bool): whether to aggregate the events by input
+                shapes too. (default: False)
+        """
+        sort_keys = {
+            "self_time": "self_ns",
+            "total_time": "total_ns",
+            "count": "count",
+            "queue_delay": "queue_delay_ns",
+            "allocated_bytes": "allocated_bytes",
+        }
+        assert sort_by in sort_keys, "sort_by should be one of {}".format(
+            list(sort_keys.keys())
+        )
+        rows = sorted(
+            self.key_averages(group_by_input_shape),
+            key=lambda row: row[sort_keys[sort_by]],
+            reverse=True,
+        )[:row_limit]
+        self_ns_sum = sum(event.self_ns for event in self.events)
+        headers = [
+            "Name",
+            "Category",
+            "Self Time",
+            "Self Time %",
+            "Total Time",
+            "Avg Time",
+            "Avg Queue Delay",
+            "Allocated",
+            "Calls",
+        ]
+        if group_by_input_shape:
+            headers.append("Input Shapes")
+        lines = []
+        for row in rows:
+            line = [
+                row["name"],
+                row["category"],
+                _format_time(row["self_ns"]),
+                "{:.2f}%".format(
+                    100.0 * row["self_ns"] / self_ns_sum if self_ns_sum > 0 else 0.0
+                ),
+                _format_time(row["total_ns"]),
+                _format_time(row["total_ns"] / row["count"]),
+                _format_time(row["queue_delay_ns"] / row["count"]),
+                _format_bytes(row["allocated_bytes"]),
+                str(row["count"]),
+            ]
+            if group_by_input_shape:
+                line.append(row["input_shapes"])
+            lines.append(line)
+        widths = [
+            max([len(header)] + [len(line[i]) for line in lines])
+            for i, header in enumerate(headers)
+        ]
+        separator = "-" * (sum(widths) + 2 * (len(widths) - 1))
+        result = [
+            separator,
+            "  ".join(h.ljust(w) for h, w in zip(headers, widths)),
+            separator,
+        ]
+        for line in lines:
+            result.append("  ".join(c.ljust(w) for c, w in zip(line, widths)))
+        result.append(separator)
+        result.append("Self time total: {}".format(_format_time(self_ns_sum)))
+        return "\n".join(result)
+
+    def export_chrome_trace(self, path):
+        """Exports the events to ``path`` in the Chrome trace format, which can be
+        viewed by chrome://tracing or https://ui.perfetto.dev.
+        """
+        pid = os.getpid()
+        trace_events = []
+        for event in self.events:
+            args = {"Self Time (us)": event.self_ns / 1e3}
+            if event.op_name != "":
+                args["Op Name"] = event.op_name
+            if event.input_shapes != "":
+                args["Input Shapes"] = event.input_shapes
+            if event.queue_delay_ns >= 0:
+                args["Queue Delay (us)"] = event.queue_delay_ns / 1e3
+            if event.allocated_bytes >= 0:
+                args["Allocated Bytes"] = event.allocated_bytes
+            trace_events.append(
+                {
+                    "name": event.name,
+                    "cat": event.category,
+                    "ph": "X",
+                    "ts": event.start_ns / 1e3,
+                    "dur": (event.end_ns - event.start_ns) / 1e3,
+                    "pid": pid,
+                    "tid": event.thread_id,
+                    "args": args,
+                }
+            )
+        with open(path, "w") as f:
+            json.dump({"traceEvents": trace_events, "displayTimeUnit": "ms"}, f)
+
+
+class record_function(object):
+    r"""Context manager that records a range of host time named ``name`` in
+    :class:`profile`.
+
+    Args:
+        name (str): the name of the range
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self._start_ns = None
+
+    def __enter__(self):
+        self._start_ns = oneflow._oneflow_internal.profiler.HostProfilerNowNs()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        oneflow._oneflow_internal.profiler.RecordHostEvent(
+            self.name,
+            "python",
+            self._start_ns,
+            oneflow._oneflow_internal.profiler.HostProfilerNowNs(),
+        )
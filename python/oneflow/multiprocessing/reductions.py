@@ -21,6 +21,7 @@ import oneflow as flow
 from oneflow.nn.parameter import Parameter
 from oneflow.framework.tensor import Tensor
 from oneflow.multiprocessing import shared_memory
+from oneflow.multiprocessing.ring_buffer import get_worker_ring, rebuild_ring_tensor
 
 
 try:
@@ -79,6 +80,23 @@ def reduce_tensor(tensor):
 
     if tensor_data.nbytes == 0:
         return (rebuild_empty_tensor, (tensor.shape, tensor.dtype, requires_grad))
+
+    ring = get_worker_ring()
+    offset = ring.locate(tensor_data) if ring is not None else None
+    if offset is not None:
+        # collated into the ring of the DataLoader worker, no copy is needed
+        return (
+            rebuild_ring_tensor,
+            (
+                ring.key,
+                ring.shm_name,
+                ring.slot_size,
+                offset,
+                tensor_data.shape,
+                tensor_data.dtype,
+                requires_grad,
+            ),
+        )
     else:
         shm = shared_memory.SharedMemory(create=True, size=tensor_data.nbytes)
         shm_numpy = np.ndarray(
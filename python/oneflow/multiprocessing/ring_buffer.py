@@ -0,0 +1,235 @@
+"""
+Copyright 2020 The OneFlow Authors. All rights reserved.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+import collections
+import queue
+import threading
+import uuid
+
+import numpy as np
+
+import oneflow as flow
+from oneflow.multiprocessing import shared_memory
+
+_ALIGNMENT = 64
+
+# the rings registered in the consumer process, indexed by key
+_rings = {}
+_rings_lock = threading.Lock()
+
+# the ring the current producer process collates into
+_worker_ring = None
+
+
+def _aligned(nbytes):
+    return (nbytes + _ALIGNMENT - 1) // _ALIGNMENT * _ALIGNMENT
+
+
+def _nbytes_of_tensors(data):
+    if isinstance(data, (flow.Tensor, flow._oneflow_internal.Tensor)):
+        return _aligned(data.numel() * data.element_size())
+    elif isinstance(data, (str, bytes)):
+        return 0
+    elif isinstance(data, collections.abc.Mapping):
+        return sum(_nbytes_of_tensors(v) for v in data.values())
+    elif isinstance(data, collections.abc.Sequence):
+        return sum(_nbytes_of_tensors(v) for v in data)
+    return 0
+
+
+def get_worker_ring():
+    return _worker_ring
+
+
+def _set_worker_ring(ring):
+    global _worker_ring
+    _worker_ring = ring
+
+
+class SharedMemoryRing(object):
+    r"""A ring of fixed size slots in one shared memory segment, which carries
+    the batches from a producer process to the consumer process without
+    creating a shared memory segment per tensor.
+
+    The consumer creates and registers the ring before starting the producer.
+    The producer allocates the segment once the size of a batch is known, takes
+    a free slot for every batch and collates the batch directly into it. The
+    consumer maps the tensors in the slot without copying, and gives the slot
+    back to the producer when the storages of all of them are deleted.
+
+    Args:
+        num_slots (int): number of batches in flight at the same time
+        free_slots (multiprocessing.Queue): queue through which the consumer
+            gives the released slots back to the producer
+    """
+
+    def __init__(self, num_slots, free_slots):
+        assert num_slots > 0, "num_slots should be positive"
+        self.key = uuid.uuid4().hex
+        self.num_slots = num_slots
+        self._free_slots = free_slots
+        self._init_local_states()
+
+    def _init_local_states(self):
+        self.slot_size = 0
+        self._shm = None
+        self._lock = threading.Lock()
+        # consumer states
+        self._slot_refcount = {}
+        # producer states
+        self._base_address = None
+        self._local_free_slots = []
+        self._current_slot = None
+        self._current_offset = 0
+        self._failed = False
+
+    def __getstate__(self):
+        return {
+            "key": self.key,
+            "num_slots": self.num_slots,
+            "_free_slots": self._free_slots,
+        }
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._init_local_states()
+
+    def register(self):
+        with _rings_lock:
+            _rings[self.key] = self
+
+    def unregister(self):
+        with _rings_lock:
+            _rings.pop(self.key, None)
+
+    @property
+    def is_allocated(self):
+        return self._shm is not None
+
+    def allocate(self, slot_size):
+        """Creates the shared memory segment in the producer process."""
+        assert self._shm is None
+        if self._failed:
+            return
+        slot_size = _aligned(slot_size)
+        try:
+            self._shm = shared_memory.SharedMemory(
+                create=True, size=slot_size * self.num_slots
+            )
+        except Exception:
+            # fall back to a segment per tensor
+            self._failed = True
+            return
+        self.slot_size = slot_size
+        self._base_address = np.frombuffer(self._shm.buf, dtype=np.uint8).ctypes.data
+        self._local_free_slots = list(range(self.num_slots))
+
+    def begin_batch(self):
+        """Takes a free slot for the next batch, if there is any."""
+        if self._shm is None:
+            return
+        if len(self._local_free_slots) > 0:
+            self._current_slot = self._local_free_slots.pop()
+        else:
+            try:
+                self._current_slot = self._free_slots.get_nowait()
+            except queue.Empty:
+                self._current_slot = None
+        self._current_offset = 0
+
+    def end_batch(self, data):
+        """Keeps the slot unless tensors of ``data`` were collated into it. The
+        first batch decides the slot size."""
+        if self._shm is None:
+            nbytes = _nbytes_of_tensors(data)
+            if nbytes > 0:
+                # leave some room for the batches larger than the first one
+                self.allocate(nbytes + nbytes // 4)
+            return
+        if self._current_slot is not None and (
+            self._current_offset == 0 or _nbytes_of_tensors(data) == 0
+        ):
+            self._local_free_slots.append(self._current_slot)
+        self._current_slot = None
+
+    def new_array(self, shape, dtype):
+        """Returns a numpy array in the slot of the current batch, or None if
+        there is no slot or it is full."""
+        if self._current_slot is None:
+            return None
+        dtype = np.dtype(dtype)
+        nbytes = int(np.prod(shape)) * dtype.itemsize
+        if nbytes == 0 or self._current_offset + nbytes > self.slot_size:
+            return None
+        offset = self._current_slot * self.slot_size + self._current_offset
+        self._current_offset += _aligned(nbytes)
+        return np.ndarray(shape, dtype=dtype, buffer=self._shm.buf, offset=offset)
+
+    @property
+    def shm_name(self):
+        return self._shm.name
+
+    def locate(self, array):
+        """Returns the offset of ``array`` in the segment, or None if it does
+        not lie in one slot of it."""
+        if self._base_address is None or not array.flags.c_contiguous:
+            return None
+        offset = array.ctypes.data - self._base_address
+        if offset < 0 or offset + array.nbytes > self.slot_size * self.num_slots:
+            return None
+        if offset // self.slot_size != (offset + array.nbytes - 1) // self.slot_size:
+            return None
+        return offset
+
+    def rebuild_tensor(self, shm_name, slot_size, offset, shape, dtype):
+        """Maps a tensor in the consumer process. The slot is released when
+        the storages of all the tensors mapped from it are deleted."""
+        with self._lock:
+            if self._shm is None:
+                self._shm = shared_memory.SharedMemory(name=shm_name)
+                self.slot_size = slot_size
+            slot = offset // self.slot_size
+            self._slot_refcount[slot] = self._slot_refcount.get(slot, 0) + 1
+        array = np.ndarray(shape, dtype=dtype, buffer=self._shm.buf, offset=offset)
+        tensor = flow.from_numpy(array)
+        tensor._register_storage_delete_hook(lambda: self._release(slot))
+        return tensor
+
+    def _release(self, slot):
+        with self._lock:
+            self._slot_refcount[slot] -= 1
+            if self._slot_refcount[slot] > 0:
+                return
+            del self._slot_refcount[slot]
+        try:
+            self._free_slots.put(slot)
+        except (OSError, ValueError):
+            # the producer has exited and the queue is closed
+            pass
+
+
+def rebuild_ring_tensor(key, shm_name, slot_size, offset, shape, dtype, requires_grad):
+    with _rings_lock:
+        ring = _rings.get(key)
+    if ring is not None:
+        t = ring.rebuild_tensor(shm_name, slot_size, offset, shape, dtype)
+    else:
+        # the tensor was not sent to the consumer of the ring, copy it out
+        shm = shared_memory.SharedMemory(name=shm_name)
+        array = np.ndarray(shape, dtype=dtype, buffer=shm.buf, offset=offset).copy()
+        shm.close()
+        t = flow.from_numpy(array)
+    t.requires_grad = requires_grad
+    return t
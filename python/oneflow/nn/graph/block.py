@@ -100,6 +100,11 @@ class Block(object):
     def scope_context(self):
         return graph_build_util.BlockScopeContext(self.prev_scope, self.scope)
 
+    def _clear_build_state(self):
+        # Scopes are bound to the job being built, so a new job needs new scopes.
+        self._scope = None
+        self._prev_scope = None
+
 
 class ModuleBlock(Block):
     def __init__(
@@ -141,6 +146,14 @@ class ModuleBlock(Block):
                 n, get_block_cls(b)(self._name_prefix + self._name + ".", n, b)
             )
 
+    def _clear_build_state(self):
+        super()._clear_build_state()
+        self._args_repr = []
+        self._outs_repr = []
+        for d in (self._modules, self._parameters, self._buffers):
+            for (_, n) in d.items():
+                n._clear_build_state()
+
     def debug(
         self,
         v_level: int = 0,
@@ -592,6 +605,11 @@ class TensorBlock(Block):
             self._lazy_origin_builder.try_build(self)
             self.build_finished = True
 
+    def _clear_build_state(self):
+        super()._clear_build_state()
+        self._lazy_origin_builder = LazyBuilder()
+        self.build_finished = False
+
     def __repr__(self):
         lines = None
         main_str = self._shallow_repr() + ": ("
@@ -0,0 +1,99 @@
+"""
+Copyright 2020 The OneFlow Authors. All rights reserved.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+import hashlib
+import os
+
+import oneflow
+from oneflow.env import get_rank, get_world_size
+
+
+class CompileCache(object):
+    r"""On-disk cache of nn.Graph compilation results.
+
+    A cache entry is keyed by the fingerprint of the forward job, the graph
+    config and the inputs' signature. It holds the completed job (the result of
+    the job passes) and the execution plan, so a later process building the
+    same graph can skip both the job passes and the plan compilation.
+    """
+
+    def __init__(self, cache_dir: str):
+        self._cache_dir = cache_dir
+        self._hits = 0
+        self._misses = 0
+        self._plan_hits = 0
+        self._plan_misses = 0
+        os.makedirs(self._cache_dir, exist_ok=True)
+
+    @property
+    def cache_dir(self):
+        return self._cache_dir
+
+    def fingerprint(self, forward_job_proto, config_proto, input_tensors) -> str:
+        sha = hashlib.sha256()
+        sha.update(oneflow.__version__.encode())
+        sha.update(str(get_world_size()).encode())
+        sha.update(forward_job_proto.SerializeToString(deterministic=True))
+        sha.update(str(config_proto).encode())
+        for t in input_tensors:
+            if t.is_global:
+                sig = f"{t.shape},{t.dtype},{t.placement},{t.sbp}"
+            else:
+                sig = f"{t.shape},{t.dtype},{t.device}"
+            sha.update(sig.encode())
+        return sha.hexdigest()
+
+    def _entry_path(self, key: str, suffix: str) -> str:
+        return os.path.join(self._cache_dir, key + "." + suffix)
+
+    def job_path(self, key: str) -> str:
+        # Each rank keeps its own completed job.
+        return self._entry_path(key, "rank_" + str(get_rank()) + ".job")
+
+    def plan_path(self, key: str) -> str:
+        # Plan is compiled on master and synced to other ranks.
+        return self._entry_path(key, "plan")
+
+    def load_job(self, key: str):
+        path = self.job_path(key)
+        if not os.path.isfile(path):
+            self._misses += 1
+            return None
+        with open(path, "rb") as f:
+            serialized_job = f.read()
+        self._hits += 1
+        return serialized_job
+
+    def save_job(self, key: str, full_job_proto):
+        path = self.job_path(key)
+        # Write to a temp file then rename it, so a concurrent reader never sees a partial job.
+        tmp_path = path + ".tmp." + str(os.getpid())
+        with open(tmp_path, "wb") as f:
+            f.write(full_job_proto.SerializeToString())
+        os.replace(tmp_path, path)
+
+    def record_plan(self, hit: bool):
+        if hit:
+            self._plan_hits += 1
+        else:
+            self._plan_misses += 1
+
+    def stats(self):
+        return {
+            "hits": self._hits,
+            "misses": self._misses,
+            "plan_hits": self._plan_hits,
+            "plan_misses": self._plan_misses,
+        }
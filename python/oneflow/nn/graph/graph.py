@@ -31,8 +31,10 @@ from oneflow.framework.multi_client_session import MultiClientSession
 from oneflow.framework.tensor import Tensor, TensorTuple
 from oneflow.framework.tensor_tuple_util import convert_to_tensor_tuple
 from oneflow.nn.graph.block import Block, BlockType, get_block_cls
+from oneflow.nn.graph.compile_cache import CompileCache
 from oneflow.nn.graph.graph_config import GraphConfig
 from oneflow.nn.graph.optimizer import OptDict, VariableConfig
+from oneflow.nn.graph.prefetcher import InputPrefetcher
 from oneflow.nn.graph.util import (
     add_indent,
     seq_to_func_return,
@@ -89,6 +91,24 @@ class Graph(object):
         nn.Graph cannot be nested at the moment.
     """
     _child_init_cnt = dict()
+    # States of a compiled graph, each shape variant has its own copy of them.
+    _shape_variant_attrs = (
+        "_name",
+        "_c_nn_graph",
+        "_is_compiled",
+        "_forward_job_proto",
+        "_full_job_proto",
+        "_args_repr",
+        "_outs_repr",
+        "_eager_outputs",
+        "_eager_outputs_buffer",
+        "_outputs_tensor_tuple",
+        "_outputs_tensor_tuple_buffer",
+        "_cur_index_of_ouputs_buffer",
+        "_state_tensor_tuple",
+        "_variables_conf",
+        "_compile_cache_key",
+    )
 
     def __init__(self):
         """
@@ -129,6 +149,13 @@ class Graph(object):
         self._debug_max_v_level = 0
         self._outputs_buffer_size = 2
         self._cur_index_of_ouputs_buffer = 0
+        self._compile_cache = None
+        self._compile_cache_key = None
+        # Compiled shape variants in LRU order, the current variant's states are held by self.
+        self._shape_variants = OrderedDict()
+        self._cur_shape_signature = None
+        self._shape_variant_cnt = 0
+        self._shape_variant_base_name = self._name
 
         self._c_nn_graph = oneflow._oneflow_internal.nn.graph.CNNGraph(self._name)
         session = session_ctx.GetDefaultSession()
@@ -202,6 +229,10 @@ class Graph(object):
 
             Donot override this function.
         """
+        if self.config._max_num_shape_variants > 0:
+            args, kwargs = self.__pad_io_to_shape_buckets(*args, **kwargs)
+            self.__switch_shape_variant(self.__io_shape_signature(*args, **kwargs))
+
         if not self._is_compiled:
             with graph_build_util.GLogScopeContext(
                 self._debug_min_s_level, self._debug_max_v_level
@@ -210,6 +241,51 @@ class Graph(object):
 
         return self.__run(*args, **kwargs)
 
+    def run_async(
+        self, iterable, depth: int = None, device=None, placement=None, sbp=None,
+    ):
+        r"""Run the graph on each batch of ``iterable`` and yield the outputs, with inputs prefetched to device.
+
+        Batches are fetched from ``iterable`` (such as a ``oneflow.utils.data.DataLoader``) in a
+        background thread and copied to device ``depth`` batches ahead of execution, so the
+        host-to-device copy of next batches is overlapped with the execution of the current batch.
+
+        A batch of list/tuple is passed to the graph as positional arguments, a batch of dict is
+        passed as keyword arguments, other batch is passed as the only argument.
+
+        For example:
+
+        .. code-block:: python
+
+            g = CustomGraph()
+            for out_tensors in g.run_async(data_loader):
+                ...
+
+        Args:
+            iterable: an iterable of batches.
+            depth (int, optional): number of batches staged on device ahead of execution.
+                Default is the outputs buffer size of the graph, which is the number of
+                executions that can be in flight.
+            device (oneflow.device, optional): device inputs are copied to. Default is the
+                device of the graph's first parameter or buffer if inputs are not global.
+            placement (oneflow.placement, optional): placement of global inputs.
+            sbp (oneflow.sbp.sbp or tuple of oneflow.sbp.sbp, optional): sbp of global inputs.
+        """
+        if depth is None:
+            depth = self.config._outputs_buffer_size
+        if device is None and placement is None:
+            for state_block in self._state():
+                if not state_block.origin.is_global:
+                    device = state_block.origin.device
+                break
+        for batch in InputPrefetcher(iterable, depth, device, placement, sbp):
+            if isinstance(batch, (list, tuple)):
+                yield self(*batch)
+            elif isinstance(batch, dict):
+                yield self(**batch)
+            else:
+                yield self(batch)
+
     def add_optimizer(
         self, optim: Optimizer, *, lr_sch: LRScheduler = None, is_sparse: bool = False,
     ):
@@ -411,6 +487,18 @@ class Graph(object):
         """
         return self.config.training
 
+    @property
+    def compile_cache_stats(self):
+        r"""Hit and miss stats of the compile cache enabled by ``config.enable_compile_cache()``.
+
+        ``hits``/``misses`` count the completed job lookups, ``plan_hits``/``plan_misses``
+        count the execution plan lookups, which only happen on rank 0.
+        Returns None if the compile cache is not enabled.
+        """
+        if self._compile_cache is None:
+            return None
+        return self._compile_cache.stats()
+
     def debug(
         self,
         v_level: int = 0,
@@ -601,6 +689,8 @@ class Graph(object):
     def _generate_config_proto(self):
         self.config.proto.set_job_name(self._name)
         self._outputs_buffer_size = self.config._outputs_buffer_size
+        if self.config._compile_cache_dir is not None and self._compile_cache is None:
+            self._compile_cache = CompileCache(self.config._compile_cache_dir)
 
         if self._grad_scaler is not None:
             self._grad_scaler._generate_conf_for_graph(
@@ -675,7 +765,13 @@ class Graph(object):
                 0, 0, self._shallow_repr() + " start building plan.",
             )
             compile_and_init_start = time.perf_counter()
+            if self._compile_cache is not None:
+                self._c_nn_graph.set_plan_cache_path(
+                    self._compile_cache.plan_path(self._compile_cache_key)
+                )
             self._c_nn_graph.complie_and_init_runtime()
+            if self._compile_cache is not None and get_rank() == 0:
+                self._compile_cache.record_plan(self._c_nn_graph.plan_cache_hit)
             compile_and_init_end = time.perf_counter()
             self.__print(
                 0,
@@ -707,6 +803,106 @@ class Graph(object):
         self._additional_variable_tobe_loaded.clear()
         return eager_outputs
 
+    def __io_shape_signature(self, *args, **kwargs):
+        def tensor_signature(t):
+            if t.is_global:
+                return (tuple(t.shape), str(t.dtype), str(t.placement), str(t.sbp))
+            return (tuple(t.shape), str(t.dtype), str(t.device))
+
+        # NOTE: The graph name is not used as prefix, because it's different between variants.
+        io_node = IONode(None, 0, (args, kwargs), "_input")
+        signature = []
+        for (name, node) in list(io_node.named_nodes()):
+            if node._type == IONodeType.TENSOR:
+                signature.append((name, tensor_signature(node._value)))
+            elif node._is_leaf:
+                signature.append((name, None))
+        return tuple(signature)
+
+    def __pad_io_to_shape_buckets(self, *args, **kwargs):
+        buckets = self.config._shape_buckets
+        if len(buckets) == 0:
+            return args, kwargs
+
+        def pad(t):
+            for (dim, sizes) in buckets.items():
+                if dim >= t.ndim:
+                    continue
+                size = t.shape[dim]
+                padded_size = next((b for b in sizes if b >= size), size)
+                if padded_size == size:
+                    continue
+                pad_shape = list(t.shape)
+                pad_shape[dim] = padded_size - size
+                if t.is_global:
+                    zeros = oneflow.zeros(
+                        pad_shape, dtype=t.dtype, placement=t.placement, sbp=t.sbp
+                    )
+                else:
+                    zeros = oneflow.zeros(pad_shape, dtype=t.dtype, device=t.device)
+                t = oneflow.cat([t, zeros], dim=dim)
+            return t
+
+        return self.__map_io("input", pad, *args, **kwargs)
+
+    def __switch_shape_variant(self, signature):
+        if self._cur_shape_signature is None:
+            assert (
+                len(self._opts) == 0
+            ), "nn.Graph with optimizer does not support shape variants."
+            self._shape_variants[signature] = None
+            self._cur_shape_signature = signature
+            return
+        if signature == self._cur_shape_signature:
+            self._shape_variants.move_to_end(signature)
+            return
+
+        # Stash states of the current variant.
+        self._shape_variants[self._cur_shape_signature] = {
+            attr: self.__dict__.get(attr) for attr in Graph._shape_variant_attrs
+        }
+        if signature in self._shape_variants:
+            self.__dict__.update(self._shape_variants[signature])
+            self._shape_variants.move_to_end(signature)
+        else:
+            self.__new_shape_variant()
+        self._shape_variants[signature] = None
+        self._cur_shape_signature = signature
+
+        while len(self._shape_variants) > self.config._max_num_shape_variants:
+            _, evicted = self._shape_variants.popitem(last=False)
+            self.__print(
+                0,
+                0,
+                self._shallow_repr() + " release shape variant " + evicted["_name"],
+            )
+            # Sync to make sure the evicted variant is not running.
+            oneflow._oneflow_internal.eager.Sync()
+            evicted["_c_nn_graph"].close()
+
+    def __new_shape_variant(self):
+        self._shape_variant_cnt += 1
+        self._name = (
+            self._shape_variant_base_name
+            + "_shape_variant_"
+            + str(self._shape_variant_cnt)
+        )
+        self._c_nn_graph = oneflow._oneflow_internal.nn.graph.CNNGraph(self._name)
+        session = session_ctx.GetDefaultSession()
+        assert type(session) is MultiClientSession
+        session.AddCGraph(self._c_nn_graph)
+        self._is_compiled = False
+        self._forward_job_proto = None
+        self._full_job_proto = None
+        self._args_repr = []
+        self._outs_repr = []
+        self._cur_index_of_ouputs_buffer = 0
+        self._variables_conf = OrderedDict()
+        self._compile_cache_key = None
+        # Parameters and buffers are shared, only their lazy builders are built again.
+        for name, block in self._blocks.items():
+            block._clear_build_state()
+
     def __build_graph(self, *args, **kwargs):
         session = session_ctx.GetDefaultSession()
         assert type(session) is MultiClientSession
@@ -768,9 +964,29 @@ class Graph(object):
                 self._shallow_repr() + " start building graph with compile passes.",
             )
             # Complete the graph job proto
-            oneflow._oneflow_internal.CurJobBuildAndInferCtx_Complete()
+            cached_job = None
+            if self._compile_cache is not None:
+                self._compile_cache_key = self._compile_cache.fingerprint(
+                    self._forward_job_proto,
+                    self.config.proto,
+                    self.__flatten_io("input", *args, **kwargs),
+                )
+                cached_job = self._compile_cache.load_job(self._compile_cache_key)
+            if cached_job is not None:
+                self.__print(
+                    0, 1, self._shallow_repr() + " load completed graph from cache."
+                )
+                oneflow._oneflow_internal.CurJobBuildAndInferCtx_CompleteFromCachedJob(
+                    cached_job
+                )
+            else:
+                oneflow._oneflow_internal.CurJobBuildAndInferCtx_Complete()
             # Save full graph job proto after job Complete for find real output blob shape and build it.
             self._full_job_proto = c_api_util.GetCurrentJob()
+            if self._compile_cache is not None and cached_job is None:
+                self._compile_cache.save_job(
+                    self._compile_cache_key, self._full_job_proto
+                )
             self.__print(
                 0, 1, self._shallow_repr() + " end building graph with compile passes."
             )
@@ -891,6 +1107,8 @@ class Graph(object):
                 )
 
     def __run(self, *args, **kwargs):
+        if self.config._zero_copy_outputs:
+            return self.__run_with_donated_outputs(*args, **kwargs)
         try:
             flattened_eager_args = self.__flatten_io("input", *args, **kwargs)
             outputs_tensor_tuple = self._outputs_tensor_tuple_buffer[
@@ -933,6 +1151,37 @@ class Graph(object):
         # Always pack outputs to remain type of outputs
         return seq_to_func_return(eager_outputs, True)
 
+    def __run_with_donated_outputs(self, *args, **kwargs):
+        try:
+            flattened_eager_args = self.__flatten_io("input", *args, **kwargs)
+            # Donate fresh output tensors to the graph, so outputs need not to be copied out
+            # of the outputs buffer.
+            eager_outputs, _ = self.__empty_like_io("output", *self._eager_outputs)
+            # The donated tensors are synced to the critical section when the graph is
+            # launched, and they are never reused as buffers by later runs.
+            outputs_tensor_tuple = convert_to_tensor_tuple(
+                self.__flatten_io("output", *eager_outputs)
+            )
+            oneflow._oneflow_internal.nn.graph.RunLazyNNGraph(
+                convert_to_tensor_tuple(flattened_eager_args),
+                outputs_tensor_tuple,
+                self._state_tensor_tuple,
+                self._c_nn_graph,
+            )
+        except:
+            self.__print(
+                2,
+                0,
+                "[ERROR]"
+                + self._shallow_repr()
+                + " run got error: "
+                + sys_exc_error_msg(),
+            )
+            raise
+
+        # Always pack outputs to remain type of outputs
+        return seq_to_func_return(eager_outputs, True)
+
     def __build_io(self, io_type, build_func, *args, **kwargs):
         assert io_type in ("input", "output")
         op_names = []
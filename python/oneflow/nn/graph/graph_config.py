@@ -16,6 +16,7 @@ limitations under the License.
 import os
 
 from collections import OrderedDict
+from typing import Dict, Sequence
 
 from oneflow.nn.graph.optimizer import OptDict
 import oneflow._oneflow_internal.oneflow.core.job.job_conf as job_conf_cfg
@@ -28,6 +29,10 @@ class GraphConfig(object):
     def __init__(self):
         super().__init__()
         self._outputs_buffer_size = 2
+        self._zero_copy_outputs = False
+        self._compile_cache_dir = None
+        self._max_num_shape_variants = 0
+        self._shape_buckets = dict()
         self.proto = job_conf_cfg.JobConfigProto()
         self._train(False)
 
@@ -61,6 +66,36 @@ class GraphConfig(object):
         """
         self._outputs_buffer_size = value
 
+    def enable_zero_copy_outputs(self, mode: bool = True):
+        r"""If set to true, the graph returns outputs without copying them from the outputs buffer.
+
+        By default, each call of the graph copies its outputs out of the outputs buffer, so the outputs
+        buffer can be reused by later calls. In zero copy mode, fresh output tensors are donated to the
+        graph on each call and the graph writes its outputs into them directly, which saves one device
+        copy of each output per call. The outputs buffer is not used in this mode.
+
+        For example:
+
+        .. code-block:: python
+
+            import oneflow as flow
+
+            class Graph(flow.nn.Graph):
+                def __init__(self):
+                    super().__init__()
+                    self.linear = flow.nn.Linear(3, 8, False)
+                    self.config.enable_zero_copy_outputs(True)
+                def build(self, x):
+                    return self.linear(x)
+
+            graph = Graph()
+
+        Args:
+            mode (bool, optional): The default vaule is True.
+        """
+        assert type(mode) is bool
+        self._zero_copy_outputs = mode
+
     def enable_amp(self, mode: bool = True):
         r"""If set to true, then graph will use mixed precision mode, it means use both float16 and float32 during model training.
 
@@ -369,6 +404,90 @@ class GraphConfig(object):
         """
         self.proto.set_cudnn_conv_heuristic_search_algo(mode)
 
+    def enable_compile_cache(self, cache_dir: str = None):
+        r"""Enable the on-disk compile cache of ``nn.Graph`` with ``cache_dir`` as the cache directory.
+
+        When enabled, the completed job and the execution plan of the graph are saved
+        to ``cache_dir`` at the first compilation. A later process building the same graph
+        (same graph structure, config, input shapes/dtypes and placements) will load them
+        from the cache instead of running the compile passes and plan generation again.
+
+        Hit and miss stats are available from ``nn.Graph.compile_cache_stats`` after the first call.
+
+        For example:
+
+        .. code-block:: python
+
+            import oneflow as flow
+
+            class Graph(flow.nn.Graph):
+                def __init__(self):
+                    super().__init__()
+                    self.linear = flow.nn.Linear(3, 8, False)
+                    self.config.enable_compile_cache("./graph_compile_cache")
+                def build(self, x):
+                    return self.linear(x)
+
+            graph = Graph()
+
+        Args:
+            cache_dir (str, optional): the cache directory. The cache is disabled if it is None. Default is None.
+        """
+        assert cache_dir is None or isinstance(cache_dir, str)
+        self._compile_cache_dir = cache_dir
+
+    def enable_shape_variants(
+        self,
+        mode: bool = True,
+        max_num_variants: int = 8,
+        buckets: Dict[int, Sequence[int]] = None,
+    ):
+        r"""If set to true, the graph compiles a variant for each input shape signature it is called with,
+        instead of assuming the input shapes of the first call forever.
+
+        Compiled variants are kept in a LRU with at most ``max_num_variants`` items, the least recently
+        used variant is released when a new one is compiled. All variants share the parameters and buffers
+        of the graph's modules, so memory of the states is not multiplied.
+
+        ``buckets`` maps an input dimension to the sizes that dimension is padded up to. An input whose
+        dimension size is in between two bucket sizes is padded with zeros to the larger one, so inputs
+        of different sizes share a variant. A size larger than all bucket sizes is not padded. Note that
+        outputs are computed on the padded inputs, it's up to the caller to slice the outputs.
+
+        Only graphs without optimizer, such as evaluation graphs, support shape variants at the moment.
+
+        For example:
+
+        .. code-block:: python
+
+            import oneflow as flow
+
+            class Graph(flow.nn.Graph):
+                def __init__(self):
+                    super().__init__()
+                    self.linear = flow.nn.Linear(3, 8, False)
+                    # Pad batch dimension of inputs to 8, 16 or 32, keep at most 3 compiled variants.
+                    self.config.enable_shape_variants(True, max_num_variants=3, buckets={0: [8, 16, 32]})
+                def build(self, x):
+                    return self.linear(x)
+
+            graph = Graph()
+
+        Args:
+            mode (bool, optional): The default vaule is True.
+            max_num_variants (int, optional): max number of compiled variants. The default value is 8.
+            buckets (dict, optional): bucket sizes of input dimensions. The default value is None.
+        """
+        assert type(mode) is bool
+        assert isinstance(max_num_variants, int)
+        assert max_num_variants >= 1
+        self._max_num_shape_variants = max_num_variants if mode else 0
+        self._shape_buckets = dict()
+        if buckets is not None:
+            for (dim, sizes) in buckets.items():
+                assert isinstance(dim, int) and dim >= 0
+                self._shape_buckets[dim] = sorted(sizes)
+
     def _generate_optimizer_and_variable_configs(
         self, opt_dict: OptDict = None, variables_conf: OrderedDict = None,
     ):
@@ -0,0 +1,132 @@
+"""
+Copyright 2020 The OneFlow Authors. All rights reserved.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+import queue
+import sys
+import threading
+from collections import deque
+
+import numpy as np
+
+import oneflow
+from oneflow.framework.tensor import Tensor
+
+
+class _EndOfIterable(object):
+    pass
+
+
+class _ExceptionWrapper(object):
+    def __init__(self, exc_info):
+        self.exc_info = exc_info
+
+    def reraise(self):
+        raise self.exc_info[1].with_traceback(self.exc_info[2])
+
+
+class InputPrefetcher(object):
+    r"""Iterates over batches of ``iterable`` with ``depth`` batches staged on device ahead.
+
+    Batches are fetched from ``iterable`` by a background thread, so collating on host is
+    overlapped with execution. Then host tensors and numpy arrays in a batch are copied to
+    ``device`` (or to global with ``placement`` and ``sbp``) ``depth`` batches ahead of the
+    batch being consumed. As eager copies are asynchronous, the copies of the next batches are
+    overlapped with the execution of the current batch.
+
+    A batch may be a Tensor, a numpy array, or a list/tuple/dict of them. Other items of a
+    batch are passed through.
+    """
+
+    def __init__(
+        self, iterable, depth: int = 2, device=None, placement=None, sbp=None,
+    ):
+        assert depth >= 1, "prefetch depth must be greater than 0."
+        assert (device is None) or (
+            placement is None and sbp is None
+        ), "device and placement/sbp cannot be set at the same time."
+        assert (placement is None) == (
+            sbp is None
+        ), "placement and sbp must be set at the same time."
+        self._iterable = iterable
+        self._depth = depth
+        self._device = device
+        self._placement = placement
+        self._sbp = sbp
+
+    def _stage_leaf(self, item):
+        if isinstance(item, np.ndarray):
+            item = oneflow.tensor(item)
+        if not isinstance(item, Tensor):
+            return item
+        if self._placement is not None:
+            return item.to_global(placement=self._placement, sbp=self._sbp)
+        if self._device is not None:
+            return item.to(self._device)
+        return item
+
+    def _stage(self, batch):
+        if isinstance(batch, (list, tuple)):
+            return type(batch)(self._stage(b) for b in batch)
+        if isinstance(batch, dict):
+            return {k: self._stage(v) for (k, v) in batch.items()}
+        return self._stage_leaf(batch)
+
+    @staticmethod
+    def _put(host_queue, item, done_event):
+        # Returns False if the consumer has stopped, so that the fetch thread never
+        # blocks on a full queue that will not be drained.
+        while not done_event.is_set():
+            try:
+                host_queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _fetch_loop(self, iterator, host_queue, done_event):
+        try:
+            for batch in iterator:
+                if not self._put(host_queue, batch, done_event):
+                    return
+            self._put(host_queue, _EndOfIterable(), done_event)
+        except:
+            self._put(host_queue, _ExceptionWrapper(sys.exc_info()), done_event)
+
+    def __iter__(self):
+        host_queue = queue.Queue(maxsize=self._depth)
+        done_event = threading.Event()
+        fetch_thread = threading.Thread(
+            target=self._fetch_loop,
+            args=(iter(self._iterable), host_queue, done_event),
+            daemon=True,
+        )
+        fetch_thread.start()
+        staged = deque()
+        is_end = False
+        try:
+            while True:
+                while not is_end and len(staged) < self._depth:
+                    batch = host_queue.get()
+                    if isinstance(batch, _EndOfIterable):
+                        is_end = True
+                    elif isinstance(batch, _ExceptionWrapper):
+                        batch.reraise()
+                    else:
+                        staged.append(self._stage(batch))
+                if len(staged) == 0:
+                    return
+                yield staged.popleft()
+        finally:
+            done_event.set()
@@ -53,6 +53,9 @@ class Adam(Optimizer):
         weight_decay (float, optional): weight decay (L2 penalty) (default: 0)
         amsgrad (bool, optional): whether to use the AMSGrad variant of this algorithm. (default: False) 
         do_bias_correction (bool, optional): Whether do bias correction (default: True)
+        foreach (bool, optional): whether to update the parameters of the same device
+            and dtype by one multi-tensor kernel instead of one kernel per parameter.
+            The AMSGrad variant is always updated per parameter. (default: False)
 
     .. _Adam\\: A Method for Stochastic Optimization:
         https://arxiv.org/abs/1412.6980
@@ -116,6 +119,7 @@ class Adam(Optimizer):
         weight_decay: float = 0,
         amsgrad: bool = False,
         do_bias_correction: bool = True,
+        foreach: bool = False,
     ):
         assert lr >= 0.0, f"Invalid learning rate: {lr}"
         assert eps >= 0.0, f"Invalid epsilon value: {eps}"
@@ -135,6 +139,7 @@ class Adam(Optimizer):
         options["bias_correction1"] = 1.0
         options["bias_correction2"] = 1.0
         options["do_bias_correction"] = do_bias_correction
+        options["foreach"] = foreach
         super().__init__(params, options)
 
         for param_group in self.param_groups:
@@ -193,7 +198,14 @@ class Adam(Optimizer):
                     "do_bias_correction": param_group["do_bias_correction"],
                     "amsgrad": param_group["amsgrad"],
                 }
-                for param in param_group.parameters:
+                params = param_group.parameters
+                if param_group["foreach"] and not param_group["amsgrad"]:
+                    multi_tensor_params, params = self._split_multi_tensor_params(
+                        param_group
+                    )
+                    for group_params in multi_tensor_params:
+                        self._multi_tensor_update(group_params, param_group)
+                for param in params:
                     if param.grad is None:
                         continue
                     if "exp_avg" not in self._state[param]:
@@ -227,6 +239,28 @@ class Adam(Optimizer):
 
             return loss
 
+    def _multi_tensor_update(self, params, param_group):
+        self._init_multi_tensor_state(params, ("exp_avg", "exp_avg_sq"))
+        op = self._multi_tensor_op(
+            "multi_tensor_adam_update", ("model", "model_diff", "m", "v"), len(params)
+        )
+        flow._C.dispatch_multi_tensor_adam_update(
+            op,
+            (
+                *params,
+                *[param.grad for param in params],
+                *[self._state[param]["exp_avg"] for param in params],
+                *[self._state[param]["exp_avg_sq"] for param in params],
+            ),
+            learning_rate=param_group["lr"],
+            bias_correction1=param_group["bias_correction1"],
+            bias_correction2=param_group["bias_correction2"],
+            l2=param_group["weight_decay"],
+            beta1=param_group["betas"][0],
+            beta2=param_group["betas"][1],
+            epsilon=param_group["eps"],
+        )
+
     def _generate_conf_for_graph(self, train_conf, vars_conf):
         new_opt_confs = []
         for param_group in self.param_groups:
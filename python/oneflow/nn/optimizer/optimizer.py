@@ -182,7 +182,11 @@ class Optimizer(object):
 
         # Update parameter groups, setting their 'params' value
         def update_group(group, new_group):
+            # keep the current value of options missing in an older state_dict
+            options = group._options
             group._options = deepcopy(new_group["_options"])
+            for key in options:
+                group._options.setdefault(key, options[key])
             group._enable_clip_grad = new_group["_enable_clip_grad"]
             return group
 
@@ -285,6 +289,52 @@ class Optimizer(object):
                     else:
                         param.grad.zeros_()
 
+    def _split_multi_tensor_params(self, param_group):
+        """Splits the parameters with grads of `param_group` into lists of local
+        float parameters sharing the same device and dtype, which can be updated
+        by one multi-tensor kernel each, and the rest parameters.
+        """
+        groups = collections.OrderedDict()
+        rest = []
+        for param in param_group.parameters:
+            if param.grad is None:
+                continue
+            if param.is_global or param.dtype not in (flow.float32, flow.float64):
+                rest.append(param)
+                continue
+            groups.setdefault((str(param.device), param.dtype), []).append(param)
+        return list(groups.values()), rest
+
+    def _init_multi_tensor_state(self, params, state_names):
+        """Allocates the missing states of `params` as views of one flat buffer
+        per state name.
+        """
+        params = [p for p in params if state_names[0] not in self._state[p]]
+        if len(params) == 0:
+            return
+        numels = [param.numel() for param in params]
+        for state_name in state_names:
+            flat_state = flow.zeros(
+                sum(numels), dtype=params[0].dtype, device=params[0].device
+            )
+            offset = 0
+            for param, numel in zip(params, numels):
+                self._state[param][state_name] = flow._C.slice_view_1d_contiguous(
+                    flat_state, offset, offset + numel
+                ).view(param.shape)
+                offset += numel
+
+    def _multi_tensor_op(self, op_type_name, input_names, num_tensors):
+        if not hasattr(self, "_multi_tensor_ops"):
+            self._multi_tensor_ops = dict()
+        key = (op_type_name, num_tensors)
+        if key not in self._multi_tensor_ops:
+            op = flow.stateful_op(op_type_name)
+            for input_name in input_names:
+                op = op.Input(input_name, num_tensors)
+            self._multi_tensor_ops[key] = op.Build()
+        return self._multi_tensor_ops[key]
+
     def _parse_input_parameters(self, parameters):
         """
         Supports such parameters:
@@ -48,6 +48,9 @@ class SGD(Optimizer):
         lr (float, optional): learning rate (default: 1e-3)
         momentum (float, optional): Momentum factor (default: 0.0)
         weight_decay (float, optional): weight decay (L2 penalty) (default: 0.0)
+        foreach (bool, optional): whether to update the parameters of the same device
+            and dtype by one multi-tensor kernel instead of one kernel per parameter.
+            (default: False)
 
     For example: 
 
@@ -101,6 +104,7 @@ class SGD(Optimizer):
         lr: float = 0.001,
         momentum: float = 0.0,
         weight_decay: float = 0.0,
+        foreach: bool = False,
     ):
         assert lr >= 0.0, f"Invalid learning rate: {lr}"
         assert momentum >= 0.0, f"Invalid momentum: {momentum}"
@@ -109,6 +113,7 @@ class SGD(Optimizer):
         options["lr"] = lr
         options["momentum"] = momentum
         options["weight_decay"] = weight_decay
+        options["foreach"] = foreach
         super().__init__(params, options)
 
         for param_group in self.param_groups:
@@ -135,7 +140,14 @@ class SGD(Optimizer):
             for param_group in self.param_groups:
                 lr = param_group["lr"]
                 l2 = param_group["weight_decay"]
-                for param in param_group.parameters:
+                params = param_group.parameters
+                if param_group["foreach"]:
+                    multi_tensor_params, params = self._split_multi_tensor_params(
+                        param_group
+                    )
+                    for group_params in multi_tensor_params:
+                        self._multi_tensor_update(group_params, param_group)
+                for param in params:
                     if param.grad is None:
                         continue
                     if param_group["momentum"] == 0.0:
@@ -157,6 +169,37 @@ class SGD(Optimizer):
             self._state["step"] = self._state["step"] + 1
             return loss
 
+    def _multi_tensor_update(self, params, param_group):
+        grads = [param.grad for param in params]
+        if param_group["momentum"] == 0.0:
+            op = self._multi_tensor_op(
+                "multi_tensor_sgd_update", ("model", "model_diff"), len(params)
+            )
+            flow._C.dispatch_multi_tensor_sgd_update(
+                op,
+                (*params, *grads),
+                learning_rate=param_group["lr"],
+                l2=param_group["weight_decay"],
+            )
+        else:
+            self._init_multi_tensor_state(params, ("momentum_buf",))
+            op = self._multi_tensor_op(
+                "multi_tensor_momentum_update",
+                ("model", "model_diff", "momentum"),
+                len(params),
+            )
+            flow._C.dispatch_multi_tensor_momentum_update(
+                op,
+                (
+                    *params,
+                    *grads,
+                    *[self._state[param]["momentum_buf"] for param in params],
+                ),
+                learning_rate=param_group["lr"],
+                l2=param_group["weight_decay"],
+                beta=param_group["momentum"],
+            )
+
     def _generate_conf_for_graph(self, train_conf, vars_conf):
         new_opt_confs = []
         for param_group in self.param_groups:
@@ -14,6 +14,7 @@ See the License for the specific language governing permissions and
 limitations under the License.
 """
 from collections import OrderedDict
+from typing import Optional
 
 import oneflow as flow
 from oneflow.framework.tensor_tuple_util import convert_to_tensor_tuple
@@ -34,39 +35,102 @@ def grad_setting_fn(module, param):
     return grad_setting
 
 
-def allreduce_fn(module, param):
+def allreduce_fn(module, param, mul_factor):
     ddp_state_for_reversed_params = module._ddp_state_for_reversed_params
     buckets = module._buckets
     bucket_tensors = module._bucket_tensors
+    bucket_ready_count = module._bucket_ready_count
+    bucket_index = module._bucket_index[param]
 
     def allreduce(grad):
+        if ddp_state_for_reversed_params[param][0]:
+            return
         ddp_state_for_reversed_params[param][0] = True
-        for index, bucket in enumerate(buckets):
-            deleted = all(ddp_state_for_reversed_params[x][1] for x in bucket)
-            if deleted:
-                continue
-
-            assert not any(ddp_state_for_reversed_params[x][1] for x in bucket)
-
-            all_params_in_bucket_ready = all(
-                ddp_state_for_reversed_params[x][0] for x in bucket
-            )
-            if all_params_in_bucket_ready:
-                for x in bucket:
-                    ddp_state_for_reversed_params[x][1] = True
-                # NOTE(jianhao)(higher-order-grad):
-                # local allreduce doesn't have gradient function, higher-order grad may be unsupported
-                flow._C.local_all_reduce(bucket_tensors[index], inplace=True)
-            else:
+        bucket_ready_count[bucket_index] += 1
+        # Buckets are all-reduced in the same order on all ranks, so a ready
+        # bucket waits for the buckets before it.
+        while module._next_bucket_to_reduce < len(buckets):
+            index = module._next_bucket_to_reduce
+            if bucket_ready_count[index] < len(buckets[index]):
                 break
+            # The gradient shoule be averaged by all the nodes, so besides allreduce,
+            # a division by world_size is required.
+            # Use x * (1 / world_size) instead of x / world_size because
+            # multiplication is faster than division.
+            bucket_tensors[index].mul_(mul_factor)
+            # NOTE(jianhao)(higher-order-grad):
+            # local allreduce doesn't have gradient function, higher-order grad may be unsupported
+            # The all-reduce is launched on the communication stream and
+            # overlaps with the rest of backward.
+            flow._C.local_all_reduce(bucket_tensors[index], inplace=True)
+            module._next_bucket_to_reduce += 1
 
     return allreduce
 
 
+def _numel_in_bucket(tensor: flow.Tensor):
+    def align(x: int, unit_size: int):
+        return (x + (unit_size - 1)) // unit_size * unit_size
+
+    # tensor memory should be align to 512 bytes for cuda operations
+    # TODO(jianhao): expose the `kCudaMemAllocAlignSize` from C++ to
+    # avoid this hardcoded "512"
+    return align(tensor.numel(), max(512 // tensor.element_size(), 1))
+
+
+def _make_buckets(params, bucket_size, bucket_cap_bytes):
+    # A bucket only holds params of the same dtype. If bucket_size is set, a
+    # bucket holds at most bucket_size params, otherwise at most
+    # bucket_cap_bytes bytes unless it has only one param.
+    buckets = []
+    dtype2bucket = {}
+    dtype2bytes = {}
+    for param in params:
+        nbytes = _numel_in_bucket(param) * param.element_size()
+        bucket = dtype2bucket.get(param.dtype)
+        if bucket is not None:
+            if bucket_size is not None:
+                is_full = len(bucket) >= bucket_size
+            else:
+                is_full = dtype2bytes[param.dtype] + nbytes > bucket_cap_bytes
+            if is_full:
+                bucket = None
+        if bucket is None:
+            bucket = []
+            buckets.append(bucket)
+            dtype2bucket[param.dtype] = bucket
+            dtype2bytes[param.dtype] = 0
+        bucket.append(param)
+        dtype2bytes[param.dtype] += nbytes
+    return buckets
+
+
 def DistributedDataParallel(
-    module: "flow.nn.Module", *, broadcast_buffers: bool = True, bucket_size: int = 10
+    module: "flow.nn.Module",
+    *,
+    broadcast_buffers: bool = True,
+    bucket_size: Optional[int] = None,
+    bucket_cap_mb: float = 25.0,
 ):
-    assert all(x.dtype == flow.float32 for x in module.parameters())
+    """Averages the gradients of the parameters of ``module`` over all ranks
+    during backward.
+
+    Gradients are gathered into buckets, which are all-reduced one by one as
+    soon as all their gradients are ready, overlapping with the rest of
+    backward.
+
+    Args:
+        module (nn.Module): the module to be wrapped, whose parameters are on the
+            same device. float16 and bfloat16 parameters are supported on cuda.
+        broadcast_buffers (bool, optional): whether to broadcast the buffers of
+            rank 0 to the other ranks before every forward (default: True)
+        bucket_size (int, optional): max number of parameters in a bucket. If it
+            is None, buckets are limited by ``bucket_cap_mb`` (default: None)
+        bucket_cap_mb (float, optional): max megabytes of a bucket (default: 25.0)
+    """
+    assert all(x.is_floating_point() for x in module.parameters())
+    assert bucket_size is None or bucket_size >= 1
+    assert bucket_cap_mb > 0
 
     world_size = flow.env.get_world_size()
     with flow.no_grad():
@@ -84,69 +148,48 @@ def DistributedDataParallel(
     reversed_param_list = list(
         reversed(list([param for param in module.parameters() if param.requires_grad]))
     )
-    module._param_grad_offset_in_bucket = {}
-
-    def numel_in_bucket(tensor: flow.Tensor):
-        def align(x: int, unit_size: int):
-            return (x + (unit_size - 1)) // unit_size * unit_size
-
-        # tensor memory should be align to 512 bytes for cuda operations,
-        # 4 is the bytes of a float number
-        # TODO(jianhao): expose the `kCudaMemAllocAlignSize` from C++ to
-        # avoid this hardcoded "512"
-        return align(tensor.numel(), 512 // 4)
-
-    offset_in_bucket = 0
-    with flow.no_grad():
-        for i, param in enumerate(reversed_param_list):
-            assert param.is_leaf
-            if i % bucket_size == 0:
-                offset_in_bucket = 0
-            module._param_grad_offset_in_bucket[param] = offset_in_bucket
-            offset_in_bucket += numel_in_bucket(param)
+    for param in reversed_param_list:
+        assert param.is_leaf
 
-    module._bucket_index = {
-        x: i // bucket_size for i, x in enumerate(reversed_param_list)
-    }
-    module._buckets = [
-        reversed_param_list[i : i + bucket_size]
-        for i in range(0, len(reversed_param_list), bucket_size)
-    ]
-
-    bucket_elems = 0
+    module._buckets = _make_buckets(
+        reversed_param_list, bucket_size, int(bucket_cap_mb * 1024 * 1024)
+    )
+    module._bucket_index = {}
+    module._param_grad_offset_in_bucket = {}
     module._bucket_tensors = []
-    for b in module._buckets:
-        bucket_elems = sum([numel_in_bucket(x) for x in b])
+    for index, bucket in enumerate(module._buckets):
+        offset_in_bucket = 0
+        for param in bucket:
+            module._bucket_index[param] = index
+            module._param_grad_offset_in_bucket[param] = offset_in_bucket
+            offset_in_bucket += _numel_in_bucket(param)
         module._bucket_tensors.append(
-            flow.zeros(bucket_elems, dtype=flow.float32, device=device)
+            flow.zeros(offset_in_bucket, dtype=bucket[0].dtype, device=device)
         )
+    # number of params whose grads are ready in every bucket
+    module._bucket_ready_count = [0] * len(module._buckets)
+    module._next_bucket_to_reduce = 0
 
     ddp_state_for_reversed_params = OrderedDict(
-        reversed([(x, [False, False]) for x in module.parameters() if x.requires_grad])
+        reversed([(x, [False]) for x in module.parameters() if x.requires_grad])
     )
     module._ddp_state_for_reversed_params = ddp_state_for_reversed_params
-    # The gradient shoule be averaged by all the nodes, so besides allreduce,
-    # a division by world_size is required.
-    # Use x * (1 / world_size) instead of x / world_size for two reasons:
-    # 1. multiplication is faster than division
-    # 2. An inplace operation is needed here (for allreduce grouping)
-    #    But we do not have inplace division in oneflow.
     mul_factor = 1 / world_size
 
-    def inplace_mul_and_return_none(x):
-        x.mul_(mul_factor)
-        return None
-
     for param in module.parameters():
         if param.requires_grad:
             param.register_hook(grad_setting_fn(module, param))
-            param._register_post_grad_accumulation_hook(inplace_mul_and_return_none)
-            param._register_post_grad_accumulation_hook(allreduce_fn(module, param))
+            param._register_post_grad_accumulation_hook(
+                allreduce_fn(module, param, mul_factor)
+            )
 
     def post_forward_hook(module, input, output):
         ddp_state_for_reversed_params = module._ddp_state_for_reversed_params
         for state in ddp_state_for_reversed_params.values():
-            state[0], state[1] = False, False
+            state[0] = False
+        for index in range(len(module._bucket_ready_count)):
+            module._bucket_ready_count[index] = 0
+        module._next_bucket_to_reduce = 0
         if isinstance(output, (tuple, list)):
             if isinstance(output[0], dict):
                 # For List[Dict[Tensor]] return type.
@@ -0,0 +1,156 @@
+"""
+Copyright 2020 The OneFlow Authors. All rights reserved.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+from collections import OrderedDict
+from typing import Iterable, List
+
+import oneflow as flow
+from oneflow.framework.tensor import Tensor
+from oneflow.nn.parameter import Parameter
+from oneflow.nn.utils.clip_grad import clip_grad_norm_
+
+
+def _numel_in_buffer(param: Tensor):
+    # align every param to 512 bytes for cuda operations, the same as the
+    # buckets of DistributedDataParallel
+    unit_size = max(512 // param.element_size(), 1)
+    return (param.numel() + (unit_size - 1)) // unit_size * unit_size
+
+
+def _view_in_buffer(buffer: Tensor, offset: int, param: Tensor):
+    return flow._C.slice_view_1d_contiguous(
+        buffer, offset, offset + param.numel()
+    ).view(param.shape)
+
+
+class ContiguousParams(object):
+    r"""Re-homes parameters and their gradients into flat contiguous buffers.
+
+    The parameters requiring grad are grouped by device and dtype. Each group
+    is copied into one flat parameter buffer, and every parameter is replaced
+    in-place by a view of it, so the modules owning the parameters keep working
+    unchanged. The gradient of every parameter is a view of a flat gradient
+    buffer of the same layout, into which backward accumulates in-place.
+
+    Passing :meth:`parameters` instead of the original parameters to an
+    optimizer makes its states flat buffers too, and its ``step`` and
+    ``zero_grad`` launch one kernel per buffer instead of one per parameter.
+
+    Args:
+        parameters (Iterable[Tensor]): local leaf parameters, e.g. ``module.parameters()``
+
+    .. note::
+        Apply it after the module has been moved to its device, and do not wrap
+        the module with :func:`oneflow.nn.parallel.DistributedDataParallel`
+        afterwards. Use :meth:`all_reduce_grads` instead. Assigning ``.data`` or
+        ``.grad`` of the parameters, e.g. ``zero_grad(set_to_none=True)``,
+        detaches them from the buffers.
+
+    For example:
+
+    .. code-block:: python
+
+        >>> import oneflow as flow
+        >>> model = flow.nn.Sequential(flow.nn.Linear(4, 8), flow.nn.Linear(8, 2))
+        >>> params = flow.nn.utils.ContiguousParams(model.parameters())
+        >>> len(params.parameters())
+        1
+        >>> optimizer = flow.optim.SGD(params.parameters(), lr=0.1)
+        >>> model(flow.ones(3, 4)).sum().backward()
+        >>> norm = params.clip_grad_norm_(1.0)
+        >>> optimizer.step()
+        >>> optimizer.zero_grad()
+
+    """
+
+    def __init__(self, parameters: Iterable[Tensor]):
+        if isinstance(parameters, Tensor):
+            parameters = [parameters]
+        params = [p for p in parameters if p.requires_grad]
+        assert all(p.is_leaf for p in params), "parameters must be leaf tensor"
+        assert all(p.is_local for p in params), "parameters must be local tensor"
+        groups = OrderedDict()
+        for param in params:
+            groups.setdefault((str(param.device), param.dtype), []).append(param)
+
+        self._params = params
+        self._flat_params = []
+        self._param2offset = OrderedDict()
+        with flow.no_grad():
+            for (_, dtype), group_params in groups.items():
+                device = group_params[0].device
+                offsets = []
+                numel = 0
+                for param in group_params:
+                    offsets.append(numel)
+                    numel += _numel_in_buffer(param)
+                flat_param = Parameter(flow.zeros(numel, dtype=dtype, device=device))
+                flat_param.grad = flow.zeros(numel, dtype=dtype, device=device)
+                for param, offset in zip(group_params, offsets):
+                    param_view = _view_in_buffer(flat_param, offset, param)
+                    param_view.copy_(param.detach())
+                    # hooks of param are re-registered by the data setter
+                    param.data = param_view
+                    param.grad = _view_in_buffer(flat_param.grad, offset, param)
+                    param._is_grad_acc_inplace = True
+                    self._param2offset[param] = (len(self._flat_params), offset)
+                self._flat_params.append(flat_param)
+
+    def parameters(self) -> List[Parameter]:
+        """Returns the flat parameter buffers, whose ``grad`` are the flat
+        gradient buffers.
+        """
+        return list(self._flat_params)
+
+    def views(self, flat_tensors: List[Tensor]) -> "OrderedDict[Tensor, Tensor]":
+        """Returns the per-parameter views of tensors laid out like
+        :meth:`parameters`, e.g. the optimizer states of the flat parameters.
+        """
+        assert len(flat_tensors) == len(self._flat_params)
+        for flat_tensor, flat_param in zip(flat_tensors, self._flat_params):
+            assert flat_tensor.shape == flat_param.shape
+        views = OrderedDict()
+        for param, (index, offset) in self._param2offset.items():
+            views[param] = _view_in_buffer(flat_tensors[index], offset, param)
+        return views
+
+    def zero_grad(self):
+        for flat_param in self._flat_params:
+            flat_param.grad.zeros_()
+
+    def clip_grad_norm_(
+        self, max_norm: float, norm_type: float = 2.0, error_if_nonfinite: bool = False,
+    ) -> Tensor:
+        """Clips the gradient norm of the parameters like
+        :func:`oneflow.nn.utils.clip_grad_norm_`.
+        """
+        if float(norm_type) == float("-inf"):
+            # the zero paddings between params must not take part in min
+            return clip_grad_norm_(
+                self._params, max_norm, norm_type, error_if_nonfinite
+            )
+        return clip_grad_norm_(
+            self._flat_params, max_norm, norm_type, error_if_nonfinite
+        )
+
+    def all_reduce_grads(self):
+        """Averages the gradients over all ranks, one all-reduce per buffer."""
+        world_size = flow.env.get_world_size()
+        if world_size == 1:
+            return
+        with flow.no_grad():
+            for flat_param in self._flat_params:
+                flow._C.local_all_reduce(flat_param.grad, inplace=True)
+                flat_param.grad.mul_(1 / world_size)
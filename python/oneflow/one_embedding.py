@@ -17,7 +17,10 @@ import oneflow as flow
 from oneflow.nn.module import Module
 import json
 import datetime
+import os
 from oneflow._oneflow_internal import OneEmbeddingHandler
+from oneflow._oneflow_internal import PersistentTableReader as _PersistentTableReader
+from oneflow._oneflow_internal import PersistentTableWriter as _PersistentTableWriter
 import numpy as np
 import traceback
 
@@ -40,7 +43,7 @@ def _check_initializer(initializer):
 def _check_cache(cache):
     assert isinstance(cache, dict)
     assert cache.__contains__("policy")
-    assert cache["policy"] in ["lru", "full"]
+    assert cache["policy"] in ["lru", "full", "clock"]
     cache_memory_budget_mb = 0
     if cache.__contains__("cache_memory_budget_mb"):
         cache_memory_budget_mb = cache["cache_memory_budget_mb"]
@@ -52,6 +55,25 @@ def _check_cache(cache):
     assert cache["value_memory_kind"] in ["device", "host"]
 
 
+def _storage_type_name(storage_dtype):
+    if storage_dtype == flow.float:
+        return "float"
+    elif storage_dtype == flow.float16:
+        return "float16"
+    elif storage_dtype == flow.int8:
+        return "int8"
+    else:
+        raise NotImplementedError("unsupported storage_dtype")
+
+
+def _add_storage_options(options, storage_dtype, quantize_states):
+    if storage_dtype is not None:
+        _storage_type_name(storage_dtype)
+        options["storage_dtype"] = storage_dtype
+        options["quantize_states"] = quantize_states
+    return options
+
+
 class MultiTableEmbedding(Module):
     def __init__(
         self,
@@ -89,8 +111,23 @@ class MultiTableEmbedding(Module):
         assert value_type_size > 0
         key_value_store_options["value_type_size"] = value_type_size
 
+        self.device_type = store_options.get("device_type", "cuda")
+        assert self.device_type in ["cuda", "cpu"]
+        key_value_store_options["device_type"] = self.device_type
+
         scale_factor = store_options["size_factor"]
         key_value_store_options["storage_dim"] = scale_factor * embedding_dim
+        key_value_store_options["embedding_dim"] = embedding_dim
+
+        # the values are stored quantized in the caches and the persistent table
+        storage_dtype = store_options.get("storage_dtype", None)
+        if storage_dtype is not None:
+            if storage_dtype != flow.float:
+                assert dtype == flow.float
+            key_value_store_options["storage_type"] = _storage_type_name(storage_dtype)
+            key_value_store_options["quantize_states"] = bool(
+                store_options.get("quantize_states", False)
+            )
 
         # kv store
         assert store_options.__contains__("kv_store")
@@ -107,6 +144,10 @@ class MultiTableEmbedding(Module):
                 for i in range(len(caches)):
                     assert isinstance(caches[i], dict)
                     _check_cache(caches[i])
+            if self.device_type == "cpu":
+                for cache in caches:
+                    assert cache["policy"] in ["lru", "clock"]
+                    assert cache["value_memory_kind"] == "host"
             for i in range(len(caches)):
                 if caches[i].__contains__("capacity"):
                     caches[i]["capacity"] = caches[i]["capacity"] // parallel_num
@@ -157,7 +198,9 @@ class MultiTableEmbedding(Module):
 
     def _save_to_state_dict(self, destination, prefix, keep_vars):
         snapshot_timestamp_tensor = flow.tensor(
-            datetime.datetime.now().timestamp(), dtype=flow.float64, device="cuda"
+            datetime.datetime.now().timestamp(),
+            dtype=flow.float64,
+            device=self.device_type,
         )
         # Broadcast timestamp tensor from master rank.
         flow.comm.broadcast(snapshot_timestamp_tensor, src=0)
@@ -193,12 +236,56 @@ class MultiTableEmbedding(Module):
                     )
                 )
 
-    def save_snapshot(self, snapshot_name):
-        self.handler.SaveSnapshot(snapshot_name)
+    def save_snapshot(self, snapshot_name, delta=False):
+        """Saves a snapshot of the embedding tables of this rank.
+
+        If ``delta`` is True, only the chunks of the tables modified since the snapshot
+        saved or loaded last are written, and that snapshot becomes the parent of this
+        one. The parent must be kept until this snapshot is compacted with
+        :meth:`compact_snapshot`. A full snapshot is saved if there is no parent.
+        """
+        if delta:
+            self.handler.SaveDeltaSnapshot(snapshot_name)
+        else:
+            self.handler.SaveSnapshot(snapshot_name)
 
     def load_snapshot(self, snapshot_name):
         self.handler.LoadSnapshot(snapshot_name)
 
+    def compact_snapshot(self, snapshot_name):
+        """Copies the chunks a delta snapshot inherits from its ancestors into it, so
+        that the ancestors can be deleted. The chunks are hard linked, so it takes no
+        extra space.
+        """
+        self.handler.CompactSnapshot(snapshot_name)
+
+    def prefetch(self, ids):
+        """Starts reading the embeddings of ``ids`` from the persistent storage in the
+        background, so that a later lookup of them does not wait for the storage, e.g.
+        pass the ids of the next batch before running the current one.
+
+        Each rank prefetches the given ids which are in its own shard.
+        """
+        assert self.key_type == ids.dtype, "ids data_type must equals key_type"
+        if ids.is_global:
+            ids = ids.to_local()
+        self.handler.Prefetch(ids.numpy().ravel())
+
+    def cache_stats(self):
+        """Returns the stats of the caches of this rank, from the outermost cache to
+        the innermost one. Each is a dict of ``num_queries``, ``num_hits``,
+        ``num_evictions``, ``size``, ``capacity`` and ``hit_rate``.
+
+        Only the caches of ``device_type`` cpu count queries, hits and evictions.
+        """
+        stats = self.handler.CacheStats()
+        for cache_stats in stats:
+            num_queries = cache_stats["num_queries"]
+            cache_stats["hit_rate"] = (
+                cache_stats["num_hits"] / num_queries if num_queries > 0 else 0.0
+            )
+        return stats
+
     def forward(self, ids, table_ids=None):
         assert self.key_type == ids.dtype, "ids data_type must equals key_type"
         return flow._C.one_embedding_lookup(
@@ -214,7 +301,12 @@ class MultiTableEmbedding(Module):
 
 
 def make_device_mem_store_options(
-    persistent_path, capacity, size_factor=1, physical_block_size=512
+    persistent_path,
+    capacity,
+    size_factor=1,
+    physical_block_size=512,
+    storage_dtype=None,
+    quantize_states=False,
 ):
     assert isinstance(persistent_path, (str, list, tuple))
     assert capacity > 0
@@ -235,7 +327,7 @@ def make_device_mem_store_options(
         },
         "size_factor": size_factor,
     }
-    return options
+    return _add_storage_options(options, storage_dtype, quantize_states)
 
 
 def make_cached_ssd_store_options(
@@ -244,6 +336,8 @@ def make_cached_ssd_store_options(
     capacity=None,
     size_factor=1,
     physical_block_size=512,
+    storage_dtype=None,
+    quantize_states=False,
 ):
     assert isinstance(persistent_path, (str, list, tuple))
     assert cache_budget_mb > 0
@@ -268,11 +362,17 @@ def make_cached_ssd_store_options(
         },
         "size_factor": size_factor,
     }
-    return options
+    return _add_storage_options(options, storage_dtype, quantize_states)
 
 
 def make_cached_host_mem_store_options(
-    cache_budget_mb, persistent_path, capacity, size_factor=1, physical_block_size=512,
+    cache_budget_mb,
+    persistent_path,
+    capacity,
+    size_factor=1,
+    physical_block_size=512,
+    storage_dtype=None,
+    quantize_states=False,
 ):
     assert isinstance(persistent_path, (str, list, tuple))
     assert cache_budget_mb > 0
@@ -299,7 +399,65 @@ def make_cached_host_mem_store_options(
         },
         "size_factor": size_factor,
     }
-    return options
+    return _add_storage_options(options, storage_dtype, quantize_states)
+
+
+def make_cpu_store_options(
+    persistent_path,
+    cache_budget_mb=None,
+    capacity=None,
+    cache_policy="lru",
+    size_factor=1,
+    physical_block_size=512,
+    storage_dtype=None,
+    quantize_states=False,
+):
+    """Returns the store options of an embedding kept in host memory and on ssd,
+    for the nodes without cuda devices.
+
+    The persistent table on ``persistent_path`` is fronted by a host cache of
+    ``cache_budget_mb``, which evicts the keys by ``cache_policy``, "lru" or "clock".
+    The cache is sharded over lock-striped hash tables, so that it can be queried
+    from multiple threads. No cache is used if ``cache_budget_mb`` is None.
+
+    If ``storage_dtype`` is flow.float16 or flow.int8, the embeddings are kept
+    at that width in the cache and the persistent table, int8 with a float scale
+    per row, and dequantized on lookup. The optimizer states are kept so too if
+    ``quantize_states``. The other ``make_*_store_options`` take the same arguments.
+
+    Only the storage runs on cpu: the ops that look up and update the embeddings,
+    such as id_shuffle and embedding_lookup, have only cuda kernels yet. The store
+    can be prefetched into, snapshotted and inspected with ``cache_stats``.
+    """
+    assert isinstance(persistent_path, (str, list, tuple))
+    assert cache_policy in ["lru", "clock"]
+    if capacity is not None:
+        assert capacity > 0
+    else:
+        capacity = 0
+    caches = []
+    if cache_budget_mb is not None:
+        assert cache_budget_mb > 0
+        caches.append(
+            {
+                "policy": cache_policy,
+                "cache_memory_budget_mb": cache_budget_mb,
+                "value_memory_kind": "host",
+            }
+        )
+    options = {
+        "kv_store": {
+            "caches": caches,
+            "persistent_table": {
+                "path": persistent_path,
+                "physical_block_size": physical_block_size,
+                "capacity_hint": int(capacity),
+            },
+        },
+        "size_factor": size_factor,
+        "device_type": "cpu",
+    }
+    return _add_storage_options(options, storage_dtype, quantize_states)
 
 
 def make_uniform_initializer(low, high):
@@ -312,3 +470,196 @@ def make_normal_initializer(mean, std):
 
 def make_table(initializer):
     return {"initializer": initializer}
+
+
+def _persistent_table_paths(paths):
+    if isinstance(paths, str):
+        return [paths]
+    assert isinstance(paths, (list, tuple)) and len(paths) > 0
+    return list(paths)
+
+
+def _type_size(dtype):
+    return np.dtype(flow.convert_oneflow_dtype_to_numpy_dtype(dtype)).itemsize
+
+
+def _physical_block_size(paths, physical_block_size):
+    # The tables keep the block size they were created with in a meta file, which
+    # they must be opened with. New tables take the default of make_*_store_options.
+    if physical_block_size is not None:
+        assert physical_block_size in [512, 4096]
+        return physical_block_size
+    block_sizes = set()
+    for path in paths:
+        meta_file = os.path.join(path, "PHYSICAL_BLOCK_SIZE")
+        if os.path.isfile(meta_file):
+            with open(meta_file) as f:
+                block_sizes.add(int(f.read()))
+    assert len(block_sizes) <= 1, "the tables have different physical block sizes"
+    return block_sizes.pop() if len(block_sizes) > 0 else 512
+
+
+class PersistentTableReader(object):
+    """Iterates over the rows of a snapshot of persistent tables in chunks of
+    ``(keys, values)`` numpy arrays, without a :class:`MultiTableEmbedding`, e.g. to
+    export the embeddings trained to a serving system.
+
+    The snapshot is read chunk by chunk from the files of the tables, so it does
+    not have to fit in memory and it does not disturb the training using the tables.
+    Save the snapshot with :meth:`MultiTableEmbedding.save_snapshot` first to read the
+    current embeddings.
+
+    Args:
+        paths (str or list of str): the persistent tables, i.e. the paths of the tables of
+            all the ranks, which are ``"{path}/{rank}-{num_ranks}"`` if the embedding was
+            given a single path, with the rank zero padded to the width of num_ranks
+        snapshot_name (str): the snapshot to read
+        key_type (flow.dtype): the key type of the embedding
+        value_type (flow.dtype): the dtype of the embedding
+        storage_dim (int): the number of values of each row, which is ``size_factor``
+            times ``embedding_dim`` of the embedding
+        batch_size (int): the maximum number of rows yielded at a time
+        physical_block_size (int): the same as the tables were created with, read from
+            the tables if None
+
+    For example:
+
+    .. code-block:: python
+
+        >>> reader = flow.one_embedding.PersistentTableReader(
+        ...     paths, "final", flow.int64, flow.float, 128
+        ... )  # doctest: +SKIP
+        >>> for keys, values in reader:  # doctest: +SKIP
+        ...     serving_table.put(keys, values[:, :64])
+
+    """
+
+    def __init__(
+        self,
+        paths,
+        snapshot_name,
+        key_type,
+        value_type,
+        storage_dim,
+        batch_size=65536,
+        physical_block_size=None,
+    ):
+        assert storage_dim > 0
+        assert batch_size > 0
+        self.paths = _persistent_table_paths(paths)
+        self.snapshot_name = snapshot_name
+        self.key_type = key_type
+        self.value_type = value_type
+        self.storage_dim = storage_dim
+        self.batch_size = batch_size
+        self.physical_block_size = _physical_block_size(self.paths, physical_block_size)
+
+    def __iter__(self):
+        key_np_type = flow.convert_oneflow_dtype_to_numpy_dtype(self.key_type)
+        value_np_type = flow.convert_oneflow_dtype_to_numpy_dtype(self.value_type)
+        for path in self.paths:
+            reader = _PersistentTableReader(
+                path,
+                self.snapshot_name,
+                _type_size(self.key_type),
+                _type_size(self.value_type) * self.storage_dim,
+                self.physical_block_size,
+            )
+            while True:
+                keys = np.empty(self.batch_size, dtype=key_np_type)
+                values = np.empty(
+                    (self.batch_size, self.storage_dim), dtype=value_np_type
+                )
+                n = reader.Next(keys, values)
+                if n == 0:
+                    break
+                yield keys[:n], values[:n]
+
+
+class PersistentTableWriter(object):
+    """Writes rows into persistent tables in large batches, and saves them as a
+    snapshot of the tables on :meth:`close`, which a :class:`MultiTableEmbedding` on
+    the tables can then load with :meth:`MultiTableEmbedding.load_snapshot`.
+
+    The keys are sharded over the tables in ``paths`` the same way as the embedding
+    shards the ids over the ranks, so reading the snapshot of one set of tables with
+    :class:`PersistentTableReader` and writing it here reshards it. Filter or convert
+    the rows in between to select or quantize them, the values are converted to
+    ``value_type`` when written.
+
+    Args:
+        paths (str or list of str): the persistent tables of all the ranks, in the order
+            of the ranks, better new directories, since the snapshot saved only has the
+            rows written
+        snapshot_name (str): the snapshot to save
+        key_type (flow.dtype): flow.int32 or flow.int64, the key type of the embedding
+        value_type (flow.dtype): the dtype of the embedding
+        storage_dim (int): the number of values of each row, which is ``size_factor``
+            times ``embedding_dim`` of the embedding
+        batch_size (int): the maximum number of rows put into the tables at a time
+        physical_block_size (int): the physical block size of the tables. If None, the
+            block size of the existing tables, or 512 as in ``make_*_store_options``
+
+    For example:
+
+    .. code-block:: python
+
+        >>> reader = flow.one_embedding.PersistentTableReader(
+        ...     src_paths, "final", flow.int64, flow.float, 64
+        ... )  # doctest: +SKIP
+        >>> with flow.one_embedding.PersistentTableWriter(
+        ...     dst_paths, "final", flow.int64, flow.float16, 64
+        ... ) as writer:  # doctest: +SKIP
+        ...     for keys, values in reader:
+        ...         writer.write(keys, values)
+
+    """
+
+    def __init__(
+        self,
+        paths,
+        snapshot_name,
+        key_type,
+        value_type,
+        storage_dim,
+        batch_size=65536,
+        physical_block_size=None,
+    ):
+        assert key_type in [flow.int32, flow.int64]
+        assert storage_dim > 0
+        assert batch_size > 0
+        paths = _persistent_table_paths(paths)
+        self.key_np_type = flow.convert_oneflow_dtype_to_numpy_dtype(key_type)
+        self.value_np_type = flow.convert_oneflow_dtype_to_numpy_dtype(value_type)
+        self.storage_dim = storage_dim
+        self.batch_size = batch_size
+        self.writer = _PersistentTableWriter(
+            paths,
+            snapshot_name,
+            _type_size(key_type),
+            _type_size(value_type) * storage_dim,
+            _physical_block_size(paths, physical_block_size),
+        )
+
+    def write(self, keys, values):
+        """Writes the rows of ``keys`` and ``values``, which are numpy arrays of shape
+        ``(n,)`` and ``(n, storage_dim)``. A key written again replaces its value.
+        """
+        keys = np.ascontiguousarray(keys, dtype=self.key_np_type).reshape(-1)
+        values = np.ascontiguousarray(values, dtype=self.value_np_type).reshape(
+            -1, self.storage_dim
+        )
+        assert keys.shape[0] == values.shape[0]
+        for start in range(0, keys.shape[0], self.batch_size):
+            end = start + self.batch_size
+            self.writer.Write(keys[start:end], values[start:end])
+
+    def close(self):
+        """Saves the rows written as the snapshot of the tables."""
+        self.writer.Close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
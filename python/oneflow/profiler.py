@@ -17,3 +17,4 @@ from oneflow.framework.profiler import ProfilerStart as profiler_start
 from oneflow.framework.profiler import ProfilerStop as profiler_stop
 from oneflow.framework.profiler import RangePop as range_pop
 from oneflow.framework.profiler import RangePush as range_push
+from oneflow.framework.host_profiler import profile, record_function
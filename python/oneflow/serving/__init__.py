@@ -14,8 +14,10 @@ See the License for the specific language governing permissions and
 limitations under the License.
 """
 
+from oneflow.serving.dynamic_batcher import DynamicBatcher
 from oneflow.serving.inference_session import (
     InferenceSession,
     ModelVersionPolicy,
     SessionOption,
 )
+from oneflow.serving.model_registry import ModelRegistry
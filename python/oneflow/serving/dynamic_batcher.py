@@ -0,0 +1,256 @@
+"""
+Copyright 2020 The OneFlow Authors. All rights reserved.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+import asyncio
+import collections
+import time
+
+import numpy as np
+
+
+class _Request(object):
+    def __init__(self, inputs, batch_size, future):
+        self.inputs = inputs
+        self.batch_size = batch_size
+        self.future = future
+        self.enqueue_time = time.perf_counter()
+
+
+class BatchingMetrics(object):
+    r"""The batch sizes and the queueing latencies of a DynamicBatcher."""
+
+    def __init__(self, max_num_latencies=4096):
+        self.num_requests = 0
+        self.num_batches = 0
+        self.batch_size_histogram = collections.Counter()
+        # the latest queueing latencies in seconds, from enqueue to launch
+        self.queue_latencies = collections.deque(maxlen=max_num_latencies)
+
+    def add_batch(self, requests, launch_time):
+        self.num_requests += len(requests)
+        self.num_batches += 1
+        self.batch_size_histogram[sum(r.batch_size for r in requests)] += 1
+        for request in requests:
+            self.queue_latencies.append(launch_time - request.enqueue_time)
+
+    def summary(self):
+        latencies_ms = np.array(self.queue_latencies, dtype=np.float64) * 1000
+        if latencies_ms.size == 0:
+            latencies_ms = np.zeros(1)
+        return {
+            "num_requests": self.num_requests,
+            "num_batches": self.num_batches,
+            "batch_size_histogram": dict(sorted(self.batch_size_histogram.items())),
+            "queue_latency_ms": {
+                "mean": float(latencies_ms.mean()),
+                "p50": float(np.percentile(latencies_ms, 50)),
+                "p99": float(np.percentile(latencies_ms, 99)),
+                "max": float(latencies_ms.max()),
+            },
+        }
+
+
+class DynamicBatcher(object):
+    r"""Coalesces the concurrent requests of a job of an InferenceSession.
+
+    Each request gives its inputs with a leading batch axis, as ``async_run`` of
+    the session does. The requests with the same input shapes but the batch axis
+    and the same dtypes are queued together, and are concatenated into a batch
+    once ``max_batch_size`` rows are queued or the oldest request has waited for
+    ``max_queue_delay_ms``. The batch is padded to the batch size of the job,
+    which is set by ``set_job_batch_size``, run as one job, and the outputs whose
+    batch axis matches the batch are split back to the requests. The other
+    outputs are returned to each request as a whole.
+
+    .. code-block:: python
+
+        batcher = flow.serving.DynamicBatcher(session, "inference")
+
+        async def handle(image):
+            (logits,) = await batcher.async_run(image=image)
+            return logits
+
+    Args:
+        session (InferenceSession): a launched session.
+        job_name (str): the job to run.
+        max_batch_size (int): the max number of rows of a batch, the batch size
+            of the job by default.
+        max_queue_delay_ms (float): the max time a request waits for a batch.
+        pad_to_batch_size (bool): whether to pad the batches to the batch size of
+            the job, which is required by the jobs of static input shapes.
+    """
+
+    def __init__(
+        self,
+        session,
+        job_name,
+        max_batch_size=None,
+        max_queue_delay_ms=2.0,
+        pad_to_batch_size=True,
+    ):
+        self.session_ = session
+        self.job_name_ = job_name
+        self.input_names_ = tuple(session.list_inputs(job_name))
+        job_batch_size = None
+        if len(self.input_names_) > 0:
+            job_batch_size = session.input_info(self.input_names_[0], job_name)[
+                "shape"
+            ][0]
+        if max_batch_size is None:
+            max_batch_size = job_batch_size
+        assert max_batch_size is not None and max_batch_size > 0
+        if pad_to_batch_size and job_batch_size is not None:
+            assert max_batch_size <= job_batch_size
+        self.max_batch_size_ = max_batch_size
+        self.padded_batch_size_ = job_batch_size if pad_to_batch_size else None
+        self.max_queue_delay_ = max_queue_delay_ms / 1000.0
+        self.key2requests_ = {}
+        self.key2timer_ = {}
+        self.batch_tasks_ = set()
+        self.metrics_ = BatchingMetrics()
+
+    @property
+    def event_loop(self):
+        return self.session_.event_loop_
+
+    def metrics(self):
+        r"""Returns the numbers of requests and batches, the histogram of the
+        batch sizes and the percentiles of the queueing latencies."""
+        return self.metrics_.summary()
+
+    def run(self, **kwargs):
+        return self.event_loop.run_until_complete(self.async_run(**kwargs))
+
+    async def async_run(self, **kwargs):
+        batch_size = None
+        for input_name in self.input_names_:
+            if input_name not in kwargs:
+                raise ValueError('input "{}" is absent'.format(input_name))
+            value = kwargs[input_name]
+            if not isinstance(value, np.ndarray) or value.ndim == 0:
+                raise ValueError(
+                    'input "{}" requires numpy.ndarray with a batch axis'.format(
+                        input_name
+                    )
+                )
+            if batch_size is None:
+                batch_size = value.shape[0]
+            elif value.shape[0] != batch_size:
+                raise ValueError("the inputs have different batch sizes")
+        if batch_size is None or batch_size == 0:
+            raise ValueError("the request is empty")
+        if batch_size > self.max_batch_size_:
+            raise ValueError(
+                "the batch size {} of the request exceeds {}".format(
+                    batch_size, self.max_batch_size_
+                )
+            )
+        key = tuple(
+            (name, kwargs[name].shape[1:], kwargs[name].dtype.str)
+            for name in self.input_names_
+        )
+        request = _Request(
+            {name: kwargs[name] for name in self.input_names_},
+            batch_size,
+            self.event_loop.create_future(),
+        )
+        self.key2requests_.setdefault(key, []).append(request)
+        if self._num_queued_rows(key) >= self.max_batch_size_:
+            self._flush(key)
+        elif key not in self.key2timer_:
+            self.key2timer_[key] = self.event_loop.call_later(
+                self.max_queue_delay_, self._flush, key, True
+            )
+        return await request.future
+
+    async def wait_for_all_batches_finished(self):
+        for key in list(self.key2requests_.keys()):
+            self._flush(key, force=True)
+        if len(self.batch_tasks_) > 0:
+            await asyncio.gather(*self.batch_tasks_, return_exceptions=True)
+
+    def _num_queued_rows(self, key):
+        return sum(r.batch_size for r in self.key2requests_.get(key, []))
+
+    def _flush(self, key, force=False):
+        # Launches the full batches, and the rest as well if the oldest request
+        # has waited long enough, otherwise the rest keeps waiting
+        timer = self.key2timer_.pop(key, None)
+        if timer is not None:
+            timer.cancel()
+        requests = self.key2requests_.pop(key, [])
+        while len(requests) > 0:
+            num_rows = 0
+            num_requests = 0
+            for request in requests:
+                if num_rows + request.batch_size > self.max_batch_size_:
+                    break
+                num_rows += request.batch_size
+                num_requests += 1
+            if num_requests == len(requests) and num_rows < self.max_batch_size_:
+                if not force:
+                    break
+            self._launch(requests[:num_requests])
+            requests = requests[num_requests:]
+        if len(requests) > 0:
+            self.key2requests_[key] = requests
+            delay = requests[0].enqueue_time + self.max_queue_delay_
+            self.key2timer_[key] = self.event_loop.call_later(
+                max(delay - time.perf_counter(), 0), self._flush, key, True
+            )
+
+    def _launch(self, requests):
+        self.metrics_.add_batch(requests, time.perf_counter())
+        task = self.event_loop.create_task(self._run_batch(requests))
+        self.batch_tasks_.add(task)
+        task.add_done_callback(self.batch_tasks_.discard)
+
+    async def _run_batch(self, requests):
+        num_rows = sum(r.batch_size for r in requests)
+        inputs = {}
+        for input_name in self.input_names_:
+            values = [r.inputs[input_name] for r in requests]
+            if (
+                self.padded_batch_size_ is not None
+                and num_rows < self.padded_batch_size_
+            ):
+                values.append(
+                    np.zeros(
+                        (self.padded_batch_size_ - num_rows,) + values[0].shape[1:],
+                        dtype=values[0].dtype,
+                    )
+                )
+            inputs[input_name] = (
+                values[0] if len(values) == 1 else np.concatenate(values)
+            )
+        batch_size = inputs[self.input_names_[0]].shape[0]
+        try:
+            outputs = await self.session_.async_run(self.job_name_, **inputs)
+        except Exception as e:
+            for request in requests:
+                if not request.future.done():
+                    request.future.set_exception(e)
+            return
+        offset = 0
+        for request in requests:
+            request_outputs = []
+            for output in outputs:
+                if output.ndim > 0 and output.shape[0] == batch_size:
+                    request_outputs.append(output[offset : offset + request.batch_size])
+                else:
+                    request_outputs.append(output)
+            offset += request.batch_size
+            if not request.future.done():
+                request.future.set_result(tuple(request_outputs))
@@ -14,10 +14,12 @@ See the License for the specific language governing permissions and
 limitations under the License.
 """
 import asyncio
+import collections
 import contextlib
 import enum
 import inspect
 import os
+import threading
 
 import google.protobuf.text_format as text_format
 import numpy as np
@@ -34,9 +36,7 @@ import oneflow.core.job.job_set_pb2 as job_set_util
 import oneflow.core.operator.interface_blob_conf_pb2 as interface_blob_conf_proto
 import oneflow.core.serving.saved_model_pb2 as saved_model_pb
 import oneflow.framework.c_api_util as c_api_util
-import oneflow.framework.compile_context as compile_ctx
 import oneflow.framework.dtype as dtype_util
-import oneflow.framework.input_blob_def as input_blob_util
 import oneflow.framework.job_instance as job_instance_util
 import oneflow.framework.runtime_mode as runtime_mode
 import oneflow.framework.scope_util as scope_util
@@ -115,11 +115,48 @@ class ModelVersionPolicy(enum.Enum):
     LATEST = 1
 
 
+class _CopyStats(object):
+    # The bytes copied between the caller's arrays and the interface blobs
+    def __init__(self, max_num_records=4096):
+        self.num_requests = 0
+        self.pushed_bytes = 0
+        self.pulled_bytes = 0
+        self.staged_bytes = 0
+        self.allocated_bytes = 0
+        self.request_bytes = collections.deque(maxlen=max_num_records)
+
+    def add_request(self, pushed_bytes, pulled_bytes, staged_bytes, allocated_bytes):
+        self.num_requests += 1
+        self.pushed_bytes += pushed_bytes
+        self.pulled_bytes += pulled_bytes
+        self.staged_bytes += staged_bytes
+        self.allocated_bytes += allocated_bytes
+        self.request_bytes.append(pushed_bytes + pulled_bytes + staged_bytes)
+
+    def summary(self):
+        num_requests = max(self.num_requests, 1)
+        return {
+            "num_requests": self.num_requests,
+            "pushed_bytes": self.pushed_bytes,
+            "pulled_bytes": self.pulled_bytes,
+            "staged_bytes": self.staged_bytes,
+            "allocated_bytes": self.allocated_bytes,
+            "copied_bytes_per_request": (
+                self.pushed_bytes + self.pulled_bytes + self.staged_bytes
+            )
+            / num_requests,
+            "max_copied_bytes_per_request": max(self.request_bytes, default=0),
+        }
+
+
 class SessionOption(object):
     def __init__(self):
         self.device_tag = "gpu"
         self.device_num = 1
         self.is_mirrored_view = False
+        # The max number of user jobs in flight, unbounded if None. The calls of
+        # async_run beyond it wait until a former job has been pulled.
+        self.max_in_flight_jobs = None
 
 
 class InferenceSession(object):
@@ -141,8 +178,13 @@ class InferenceSession(object):
         self.inter_user_job_info_ = None
         self.cur_job_name_ = None
         self.inferface_name2info_ = {}
+        self.job_name2interface_names_ = {}
         self.output_name2future_ = {}
-        self.job_futures_ = []
+        self.job_futures_ = set()
+        self.job_slots_ = None
+        self.output_name2free_buffers_ = collections.defaultdict(list)
+        self.output_buffers_lock_ = threading.Lock()
+        self.copy_stats_ = _CopyStats()
         self.status_ = None
         self._init_event_loop()
         self.init()
@@ -263,7 +305,7 @@ class InferenceSession(object):
 
     def compile(self, op_list):
         self._check_status(self.SessionStatus.OPEN)
-        scope = flow.current_scope()
+        scope = oneflow._oneflow_internal.GetCurrentScope()
         device_tag = scope.device_parallel_desc_symbol.device_tag
         for op_conf in op_list:
             if _need_check_device_tag(op_conf) and op_conf.device_tag != device_tag:
@@ -272,7 +314,10 @@ class InferenceSession(object):
                         op_conf.name, op_conf.device_tag, device_tag
                     )
                 )
-            compile_ctx.CurJobAddOp(op_conf)
+            op_conf.scope_symbol_id = scope.symbol_id
+            if not op_conf.HasField("device_tag"):
+                op_conf.device_tag = device_tag
+            c_api_util.CurJobBuildAndInferCtx_AddAndInferConsistentOp(op_conf)
         oneflow._oneflow_internal.CurJobBuildAndInferCtx_Complete()
         oneflow._oneflow_internal.CurJobBuildAndInferCtx_Rebuild()
 
@@ -290,6 +335,7 @@ class InferenceSession(object):
         saved_model_meta_file_basename="saved_model",
         graph_name=None,
         signature_name=None,
+        batch_size=None,
     ):
         if not os.path.isdir(saved_model_dir):
             raise ValueError("{} is not a valid directory".format(saved_model_dir))
@@ -346,7 +392,7 @@ class InferenceSession(object):
                 raise ValueError("signature {} do not exist".format(signature_name))
             else:
                 signature = graph_def.signatures[signature_name]
-        with self.open(graph_name, signature):
+        with self.open(graph_name, signature, batch_size):
             self.compile(graph_def.op_list)
 
     def print_job_set(self):
@@ -361,26 +407,48 @@ class InferenceSession(object):
         self._check_status(self.SessionStatus.RUNNING)
         return list(self.job_name2job_conf_.keys())
 
-    def list_inputs(self):
+    def list_inputs(self, job_name=None):
+        r"""Returns the names of the inputs of the job, or of all the jobs if
+        ``job_name`` is None."""
         self._check_status(self.SessionStatus.RUNNING)
         input_names = []
         for (
             input_name,
             _,
         ) in self.inter_user_job_info_.input_or_var_op_name2push_job_name.items():
-            input_names.append(input_name)
+            if job_name is None or input_name in self._get_interface_names(job_name):
+                input_names.append(input_name)
         return tuple(input_names)
 
-    def list_outputs(self):
+    def list_outputs(self, job_name=None):
+        r"""Returns the names of the outputs of the job, or of all the jobs if
+        ``job_name`` is None."""
         self._check_status(self.SessionStatus.RUNNING)
         output_names = []
         for (
             output_name,
             _,
         ) in self.inter_user_job_info_.output_or_var_op_name2pull_job_name.items():
-            output_names.append(output_name)
+            if job_name is None or output_name in self._get_interface_names(job_name):
+                output_names.append(output_name)
         return tuple(output_names)
 
+    def _get_interface_names(self, job_name):
+        if job_name not in self.job_name2interface_names_:
+            interface_names = None
+            for job in c_api_util.GetJobSet().job:
+                if job.job_conf.job_name == job_name:
+                    interface_names = frozenset(
+                        op_conf.name
+                        for op_conf in job.net.op
+                        if op_conf.WhichOneof("op_type")
+                        in ("input_conf", "output_conf")
+                    )
+            if interface_names is None:
+                raise ValueError('job "{}" is not found'.format(job_name))
+            self.job_name2interface_names_[job_name] = interface_names
+        return self.job_name2interface_names_[job_name]
+
     def input_info(self, input_name, job_name=None):
         return self._get_op_blob_info(job_name, input_name, "out")
 
@@ -409,12 +477,138 @@ class InferenceSession(object):
         return self.event_loop_.run_until_complete(self.async_run(job_name, **kwargs))
 
     async def async_run(self, job_name, **kwargs):
+        return await self._async_run(job_name, None, kwargs)
+
+    def run_into(self, job_name, outputs, **kwargs):
+        self._check_status(self.SessionStatus.RUNNING)
+        return self.event_loop_.run_until_complete(
+            self.async_run_into(job_name, outputs, **kwargs)
+        )
+
+    async def async_run_into(self, job_name, outputs, **kwargs):
+        r"""Runs the job like ``async_run``, but pulls the outputs into the
+        arrays of ``outputs``, a dict from the output names or a sequence in the
+        order of ``list_outputs``, instead of allocating new ones. The arrays must
+        be writeable, C-contiguous and aligned, and have the shapes and the dtypes
+        of the outputs. The outputs absent from a dict are allocated as usual.
+        """
+        if not isinstance(outputs, dict):
+            output_names = self.list_outputs(job_name)
+            assert len(outputs) == len(output_names)
+            outputs = dict(zip(output_names, outputs))
+        for output_name, output in outputs.items():
+            if not isinstance(output, np.ndarray):
+                raise ValueError(
+                    'output "{}" requires numpy.ndarray'.format(output_name)
+                )
+            if not (
+                output.flags.c_contiguous
+                and output.flags.aligned
+                and output.flags.writeable
+            ):
+                raise ValueError(
+                    'output "{}" requires a writeable contiguous array'.format(
+                        output_name
+                    )
+                )
+        return await self._async_run(job_name, outputs, kwargs)
+
+    def copy_stats(self):
+        r"""Returns the bytes copied into the input blobs and out of the output
+        blobs, the bytes staged to convert the inputs of mismatched layouts or
+        dtypes, and the bytes of the output arrays allocated, in total and per
+        request."""
+        return self.copy_stats_.summary()
+
+    async def _async_run(self, job_name, outputs, inputs):
         self._check_status(self.SessionStatus.RUNNING)
-        self._run_push_jobs(**kwargs)
-        job_inst = job_instance_util.MakeUserJobInstance(job_name)
-        self._run_job(job_inst)
-        output_futures = tuple(self._run_pull_jobs(job_name).values())
-        return await asyncio.gather(*output_futures)
+        job_slots = self._get_job_slots()
+        if job_slots is not None:
+            await job_slots.acquire()
+        try:
+            pushed_bytes, staged_bytes = self._run_push_jobs(job_name, **inputs)
+            job_inst = job_instance_util.MakeUserJobInstance(job_name)
+            self._run_job(job_inst)
+            output_futures = tuple(self._run_pull_jobs(job_name, outputs).values())
+            results = await asyncio.gather(*output_futures)
+        finally:
+            if job_slots is not None:
+                job_slots.release()
+        pulled_bytes = 0
+        allocated_bytes = 0
+        for result, is_allocated in results:
+            pulled_bytes += result.nbytes
+            if is_allocated:
+                allocated_bytes += result.nbytes
+        self.copy_stats_.add_request(
+            pushed_bytes, pulled_bytes, staged_bytes, allocated_bytes
+        )
+        return [result for (result, _) in results]
+
+    def run_pipelined(self, job_name, inputs, num_in_flight=None, reuse_outputs=True):
+        r"""Runs the job on each dict of inputs in ``inputs``, keeping up to
+        ``num_in_flight`` jobs in flight so that the push, the compute and the
+        pull of successive jobs overlap, and yields the outputs in the order of
+        ``inputs``.
+
+        If ``reuse_outputs`` is True, the outputs yielded are only valid until
+        the next iteration, since their buffers are reused for the later pulls.
+        """
+        self._check_status(self.SessionStatus.RUNNING)
+        if num_in_flight is None:
+            num_in_flight = self.option_.max_in_flight_jobs or 2
+        assert num_in_flight > 0
+        inputs = iter(inputs)
+        pending = collections.deque()
+        outputs = None
+        try:
+            while True:
+                while len(pending) < num_in_flight:
+                    kwargs = next(inputs, None)
+                    if kwargs is None:
+                        break
+                    pending.append(
+                        self.event_loop_.create_task(self.async_run(job_name, **kwargs))
+                    )
+                if len(pending) == 0:
+                    break
+                if outputs is not None and reuse_outputs:
+                    self.release_outputs(outputs, job_name)
+                outputs = self.event_loop_.run_until_complete(pending.popleft())
+                yield outputs
+        finally:
+            if len(pending) > 0:
+                self.event_loop_.run_until_complete(
+                    asyncio.gather(*pending, return_exceptions=True)
+                )
+
+    def release_outputs(self, outputs, job_name=None):
+        r"""Returns the buffers of the outputs of a job, in the order returned by
+        ``run``, to be reused by the later pulls of the same outputs. The arrays
+        must not be used after being released. ``job_name`` is required if the
+        session has several jobs."""
+        output_names = self.list_outputs(job_name)
+        assert len(outputs) == len(output_names)
+        max_num_free_buffers = max(self.option_.max_in_flight_jobs or 0, 2)
+        with self.output_buffers_lock_:
+            for output_name, output in zip(output_names, outputs):
+                free_buffers = self.output_name2free_buffers_[output_name]
+                if len(free_buffers) < max_num_free_buffers:
+                    free_buffers.append(output)
+
+    def _get_job_slots(self):
+        max_in_flight_jobs = self.option_.max_in_flight_jobs
+        if max_in_flight_jobs is None:
+            return None
+        if self.job_slots_ is None:
+            assert max_in_flight_jobs > 0
+            self.job_slots_ = asyncio.Semaphore(max_in_flight_jobs)
+        return self.job_slots_
+
+    def _acquire_output_buffer(self, output_name):
+        with self.output_buffers_lock_:
+            free_buffers = self.output_name2free_buffers_[output_name]
+            return free_buffers.pop() if len(free_buffers) > 0 else None
 
     def _run_job(self, job_inst):
         future = self.event_loop_.create_future()
@@ -424,32 +618,56 @@ class InferenceSession(object):
 
         job_inst.AddPostFinishCallback(job_finish_cb)
         oneflow._oneflow_internal.LaunchJob(job_inst)
-        self.job_futures_.append(future)
+        self.job_futures_.add(future)
+        future.add_done_callback(self.job_futures_.discard)
 
-    def _run_push_jobs(self, **kwargs):
+    def _run_push_jobs(self, job_name, **kwargs):
+        pushed_bytes = 0
+        staged_bytes = 0
         for (
             input_name,
             push_job_name,
         ) in self.inter_user_job_info_.input_or_var_op_name2push_job_name.items():
+            if input_name not in self._get_interface_names(job_name):
+                continue
             if input_name not in kwargs:
                 raise ValueError('input "{}" is absent'.format(input_name))
             input_numpy = kwargs[input_name]
             if not isinstance(input_numpy, np.ndarray):
                 raise ValueError('input "{}" requires numpy.ndarray'.format(input_name))
-            push_fn = input_blob_util._MakePushNdarrayCallback(input_numpy)
+            # The blob is copied from the array directly if it is C-contiguous and
+            # of the dtype of the blob, otherwise from a converted copy of it
+            dtype = flow.convert_oneflow_dtype_to_numpy_dtype(
+                self.input_info(input_name, job_name)["dtype"]
+            )
+            if not input_numpy.flags.c_contiguous or input_numpy.dtype != dtype:
+                input_numpy = np.ascontiguousarray(input_numpy, dtype=dtype)
+                staged_bytes += input_numpy.nbytes
+            pushed_bytes += input_numpy.nbytes
+            push_fn = self._make_push_job_cb(input_numpy)
             push_job_inst = job_instance_util.MakePushJobInstance(
                 push_job_name, input_name, push_fn
             )
             self._run_job(push_job_inst)
+        return (pushed_bytes, staged_bytes)
+
+    def _make_push_job_cb(self, input_numpy):
+        def push_fn(ofblob):
+            ofblob.CopyFromNdarray(input_numpy)
+
+        return push_fn
 
-    def _run_pull_jobs(self, user_job_name):
+    def _run_pull_jobs(self, user_job_name, outputs=None):
         output_futures = {}
         for (
             output_name,
             pull_job_name,
         ) in self.inter_user_job_info_.output_or_var_op_name2pull_job_name.items():
+            if output_name not in self._get_interface_names(user_job_name):
+                continue
             future = self.event_loop_.create_future()
-            pull_fn = self._make_pull_job_cb(output_name, user_job_name, future)
+            out = None if outputs is None else outputs.get(output_name)
+            pull_fn = self._make_pull_job_cb(output_name, user_job_name, future, out)
             pull_job_inst = job_instance_util.MakePullJobInstance(
                 pull_job_name, output_name, pull_fn
             )
@@ -457,17 +675,29 @@ class InferenceSession(object):
             output_futures[output_name] = future
         return output_futures
 
-    def _make_pull_job_cb(self, output_name, user_job_name, future):
-        output_lbn = oneflow._oneflow_internal.JobBuildAndInferCtx_GetOpBlobLbn(
-            user_job_name, output_name, "out"
-        )
-        split_axis = c_api_util.JobBuildAndInferCtx_GetSplitAxisFromProducerView(
-            user_job_name, output_lbn
-        )
-
+    def _make_pull_job_cb(self, output_name, user_job_name, future, out=None):
         def pull_fn(ofblob):
-            ndarray = ofblob.CopyToNdarray()
-            self.event_loop_.call_soon_threadsafe(future.set_result, ndarray)
+            shape = ofblob.shape
+            dtype = flow.convert_oneflow_dtype_to_numpy_dtype(ofblob.dtype)
+            if out is not None and (out.shape != shape or out.dtype != dtype):
+                error = ValueError(
+                    'output "{}" requires an array of shape {} and {}'.format(
+                        output_name, shape, ofblob.dtype
+                    )
+                )
+                self.event_loop_.call_soon_threadsafe(future.set_exception, error)
+                return
+            buffer = (
+                out if out is not None else self._acquire_output_buffer(output_name)
+            )
+            # A released buffer of another shape, e.g. of a dynamic output, is
+            # dropped and a new array is allocated instead
+            if buffer is not None and (buffer.shape != shape or buffer.dtype != dtype):
+                buffer = None
+            ndarray = ofblob.CopyToNdarray(buffer)
+            self.event_loop_.call_soon_threadsafe(
+                future.set_result, (ndarray, ndarray is not buffer)
+            )
 
         return pull_fn
 
@@ -488,4 +718,4 @@ class InferenceSession(object):
 
     async def wait_for_all_jobs_finished(self):
         await asyncio.gather(*self.job_futures_)
-        self.job_futures_ = []
+        self.job_futures_ = set()
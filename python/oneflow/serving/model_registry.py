@@ -0,0 +1,422 @@
+"""
+Copyright 2020 The OneFlow Authors. All rights reserved.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+import asyncio
+import concurrent.futures
+import multiprocessing
+import os
+import threading
+import time
+
+import numpy as np
+
+from oneflow.serving.inference_session import (
+    ModelVersionPolicy,
+    SessionOption,
+    _find_model_latest_version,
+)
+
+
+def _dir_size(path):
+    size = 0
+    for root, _, files in os.walk(path):
+        for f in files:
+            size += os.path.getsize(os.path.join(root, f))
+    return size
+
+
+def _serve(conn, option, saved_model_dir, model_version, batch_size, load_kwargs):
+    # Runs in the worker process, which owns the global session of a model version
+    import oneflow as flow
+    from oneflow.serving.inference_session import InferenceSession
+
+    try:
+        session = InferenceSession(option)
+        session.load_saved_model(
+            saved_model_dir,
+            model_version=model_version,
+            batch_size=batch_size,
+            **load_kwargs
+        )
+        session.launch()
+        (job_name,) = session.list_jobs()
+        input_names = session.list_inputs(job_name)
+        output_names = session.list_outputs(job_name)
+        # warm up with zeros, so that the first request does not pay for it
+        warmup_inputs = {}
+        for input_name in input_names:
+            info = session.input_info(input_name, job_name)
+            warmup_inputs[input_name] = np.zeros(
+                info["shape"],
+                dtype=flow.convert_oneflow_dtype_to_numpy_dtype(info["dtype"]),
+            )
+        session.run(job_name, **warmup_inputs)
+    except Exception as e:
+        conn.send(("error", RuntimeError("{}: {}".format(type(e).__name__, e))))
+        return
+    conn.send(("ready", (job_name, input_names, output_names)))
+    while True:
+        request = conn.recv()
+        if request is None:
+            break
+        request_id, inputs = request
+        try:
+            conn.send((request_id, (True, session.run(job_name, **inputs))))
+        except Exception as e:
+            conn.send(
+                (
+                    request_id,
+                    (False, RuntimeError("{}: {}".format(type(e).__name__, e))),
+                )
+            )
+    session.close()
+
+
+class _ModelWorker(object):
+    def __init__(
+        self,
+        mp_context,
+        option,
+        saved_model_dir,
+        model_version,
+        batch_size,
+        load_kwargs,
+        load_timeout=None,
+    ):
+        self.conn_, child_conn = mp_context.Pipe()
+        self.process_ = mp_context.Process(
+            target=_serve,
+            args=(
+                child_conn,
+                option,
+                saved_model_dir,
+                model_version,
+                batch_size,
+                load_kwargs,
+            ),
+            daemon=True,
+        )
+        self.process_.start()
+        child_conn.close()
+        # poll also returns once the worker exits, then recv raises EOFError
+        if not self.conn_.poll(load_timeout):
+            self.process_.terminate()
+            self.process_.join()
+            self.conn_.close()
+            raise TimeoutError(
+                "the model worker did not load in {} seconds".format(load_timeout)
+            )
+        try:
+            status, payload = self.conn_.recv()
+        except EOFError:
+            status = "error"
+            payload = RuntimeError("the model worker exited while loading")
+        if status != "ready":
+            self.process_.join()
+            self.conn_.close()
+            raise payload
+        self.job_name, self.input_names, self.output_names = payload
+        self.footprint_bytes = _dir_size(
+            os.path.join(saved_model_dir, str(model_version))
+        )
+        self.last_used_time = time.monotonic()
+        self.cond_ = threading.Condition()
+        self.request_id2future_ = {}
+        self.next_request_id_ = 0
+        self.closed_ = False
+        self.receiver_ = threading.Thread(target=self._receive, daemon=True)
+        self.receiver_.start()
+
+    def submit(self, inputs):
+        future = concurrent.futures.Future()
+        with self.cond_:
+            if self.closed_:
+                raise RuntimeError("the model version has been unloaded")
+            request_id = self.next_request_id_
+            self.next_request_id_ += 1
+            self.request_id2future_[request_id] = future
+            self.last_used_time = time.monotonic()
+            self.conn_.send((request_id, inputs))
+        return future
+
+    def _receive(self):
+        while True:
+            try:
+                request_id, (ok, payload) = self.conn_.recv()
+            except (EOFError, OSError):
+                break
+            with self.cond_:
+                future = self.request_id2future_.pop(request_id)
+                self.cond_.notify_all()
+            if ok:
+                future.set_result(payload)
+            else:
+                future.set_exception(payload)
+        with self.cond_:
+            for future in self.request_id2future_.values():
+                future.set_exception(RuntimeError("the model worker exited"))
+            self.request_id2future_.clear()
+            self.cond_.notify_all()
+
+    def close(self):
+        # Waits for the requests in flight, then stops the worker
+        with self.cond_:
+            self.closed_ = True
+            while len(self.request_id2future_) > 0 and self.receiver_.is_alive():
+                self.cond_.wait()
+            try:
+                self.conn_.send(None)
+            except (BrokenPipeError, OSError):
+                pass
+        self.process_.join(timeout=60)
+        if self.process_.is_alive():
+            self.process_.terminate()
+        self.receiver_.join()
+        self.conn_.close()
+
+
+class ModelRegistry(object):
+    r"""Serves several models, each of several versions, in one process.
+
+    A lazy session is global to its process, so each model version runs an
+    InferenceSession in a worker process of its own. A version is loaded,
+    compiled and warmed up in the background while the former version keeps
+    serving, and then the traffic of the model is switched to it at once.
+    The inactive versions are kept for rollback, and the least recently used
+    of them are unloaded once the footprint of the loaded versions, estimated
+    by the sizes of their saved models, exceeds ``memory_budget_bytes``.
+
+    The isolation has costs. Each loaded version holds a process with its own
+    runtime and device memory, and every request and its outputs are pickled
+    through a pipe to and from the worker. Those extra copies cancel the copies
+    saved by ``InferenceSession.run_into`` and the output buffer reuse, so a
+    single model that needs the least copying should be served by an
+    InferenceSession in the serving process instead.
+
+    .. code-block:: python
+
+        registry = flow.serving.ModelRegistry(memory_budget_bytes=8 << 30)
+        registry.load("resnet", "/models/resnet").result()
+        (logits,) = registry.run("resnet", image=image)
+        # roll out a new version without stopping the traffic
+        registry.load("resnet", "/models/resnet", model_version=2)
+
+    Args:
+        option (SessionOption): the option of the sessions of the versions.
+        memory_budget_bytes (int): the max footprint of the loaded versions,
+            unbounded if None.
+        max_loading_workers (int): the max number of versions loaded at once.
+        load_timeout (float): the seconds to load, compile and warm up a version
+            in, after which its worker is terminated and the load fails with
+            TimeoutError. Unbounded if None.
+    """
+
+    def __init__(
+        self,
+        option=None,
+        memory_budget_bytes=None,
+        max_loading_workers=2,
+        load_timeout=600,
+    ):
+        self.option_ = option if option is not None else SessionOption()
+        self.memory_budget_bytes_ = memory_budget_bytes
+        self.load_timeout_ = load_timeout
+        self.lock_ = threading.Lock()
+        self.model_name2version2worker_ = {}
+        self.model_name2active_version_ = {}
+        self.mp_context_ = multiprocessing.get_context("spawn")
+        self.loader_ = concurrent.futures.ThreadPoolExecutor(
+            max_workers=max_loading_workers
+        )
+
+    def load(
+        self,
+        model_name,
+        saved_model_dir,
+        model_version=ModelVersionPolicy.LATEST,
+        batch_size=None,
+        activate=True,
+        **load_kwargs
+    ):
+        r"""Loads a version of a saved model in the background, and switches the
+        traffic of the model to it once it is warmed up if ``activate`` is True.
+        Returns a future of the version loaded."""
+        if not os.path.isdir(saved_model_dir):
+            raise ValueError("{} is not a valid directory".format(saved_model_dir))
+        if model_version == ModelVersionPolicy.LATEST:
+            model_version = int(_find_model_latest_version(saved_model_dir))
+        elif not isinstance(model_version, int):
+            raise NotImplementedError
+        return self.loader_.submit(
+            self._load,
+            model_name,
+            saved_model_dir,
+            model_version,
+            batch_size,
+            activate,
+            load_kwargs,
+        )
+
+    def _load(
+        self, model_name, saved_model_dir, model_version, batch_size, activate, kwargs
+    ):
+        with self.lock_:
+            version2worker = self.model_name2version2worker_.get(model_name, {})
+            loaded = model_version in version2worker
+        if not loaded:
+            worker = self._make_worker(
+                saved_model_dir, model_version, batch_size, kwargs
+            )
+        duplicate = None
+        with self.lock_:
+            if not loaded:
+                version2worker = self.model_name2version2worker_.setdefault(
+                    model_name, {}
+                )
+                # keep the version loaded by a concurrent call if any
+                if version2worker.setdefault(model_version, worker) is not worker:
+                    duplicate = worker
+            if activate or model_name not in self.model_name2active_version_:
+                self._activate(model_name, model_version)
+        if duplicate is not None:
+            duplicate.close()
+        self._evict()
+        return model_version
+
+    def _make_worker(self, saved_model_dir, model_version, batch_size, load_kwargs):
+        return _ModelWorker(
+            self.mp_context_,
+            self.option_,
+            saved_model_dir,
+            model_version,
+            batch_size,
+            load_kwargs,
+            self.load_timeout_,
+        )
+
+    def activate(self, model_name, model_version):
+        r"""Switches the traffic of a model to a loaded version, e.g. to roll
+        back. The requests in flight complete on the former version."""
+        with self.lock_:
+            self._activate(model_name, model_version)
+
+    def _activate(self, model_name, model_version):
+        # Requires self.lock_
+        if model_version not in self.model_name2version2worker_.get(model_name, {}):
+            raise ValueError(
+                "version {} of model {} is not loaded".format(model_version, model_name)
+            )
+        self.model_name2active_version_[model_name] = model_version
+
+    def unload(self, model_name, model_version):
+        r"""Unloads an inactive version after its requests in flight complete."""
+        with self.lock_:
+            if self.model_name2active_version_.get(model_name) == model_version:
+                raise ValueError(
+                    "version {} of model {} is active".format(model_version, model_name)
+                )
+            worker = self.model_name2version2worker_[model_name].pop(model_version)
+        worker.close()
+
+    def _evict(self):
+        if self.memory_budget_bytes_ is None:
+            return
+        evicted = []
+        with self.lock_:
+            footprint = self._footprint_bytes()
+            candidates = []
+            for model_name, version2worker in self.model_name2version2worker_.items():
+                active_version = self.model_name2active_version_.get(model_name)
+                for version, worker in version2worker.items():
+                    if version != active_version:
+                        candidates.append((worker.last_used_time, model_name, version))
+            candidates.sort()
+            for _, model_name, version in candidates:
+                if footprint <= self.memory_budget_bytes_:
+                    break
+                worker = self.model_name2version2worker_[model_name].pop(version)
+                footprint -= worker.footprint_bytes
+                evicted.append(worker)
+        for worker in evicted:
+            worker.close()
+
+    def _footprint_bytes(self):
+        return sum(
+            worker.footprint_bytes
+            for version2worker in self.model_name2version2worker_.values()
+            for worker in version2worker.values()
+        )
+
+    def submit(self, model_name, model_version=None, **kwargs):
+        r"""Runs a version of a model, the active one by default, and returns a
+        future of the outputs."""
+        with self.lock_:
+            if model_version is None:
+                if model_name not in self.model_name2active_version_:
+                    raise ValueError("model {} is not loaded".format(model_name))
+                model_version = self.model_name2active_version_[model_name]
+            version2worker = self.model_name2version2worker_.get(model_name, {})
+            if model_version not in version2worker:
+                raise ValueError(
+                    "version {} of model {} is not loaded".format(
+                        model_version, model_name
+                    )
+                )
+            worker = version2worker[model_version]
+        # The request is sent out of the lock, so that sending large inputs does
+        # not hold up the other models. A version unloaded meanwhile still
+        # completes the requests sent before it is closed.
+        return worker.submit(kwargs)
+
+    def run(self, model_name, model_version=None, **kwargs):
+        return self.submit(model_name, model_version, **kwargs).result()
+
+    async def async_run(self, model_name, model_version=None, **kwargs):
+        return await asyncio.wrap_future(
+            self.submit(model_name, model_version, **kwargs)
+        )
+
+    def list_models(self):
+        with self.lock_:
+            return {
+                model_name: {
+                    "versions": sorted(version2worker.keys()),
+                    "active_version": self.model_name2active_version_.get(model_name),
+                }
+                for (
+                    model_name,
+                    version2worker,
+                ) in self.model_name2version2worker_.items()
+            }
+
+    def memory_usage(self):
+        with self.lock_:
+            return {
+                "footprint_bytes": self._footprint_bytes(),
+                "memory_budget_bytes": self.memory_budget_bytes_,
+            }
+
+    def close(self):
+        self.loader_.shutdown(wait=True)
+        with self.lock_:
+            workers = [
+                worker
+                for version2worker in self.model_name2version2worker_.values()
+                for worker in version2worker.values()
+            ]
+            self.model_name2version2worker_ = {}
+            self.model_name2active_version_ = {}
+        for worker in workers:
+            worker.close()
@@ -0,0 +1,65 @@
+"""
+Copyright 2020 The OneFlow Authors. All rights reserved.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+# Compares the time of a DataLoader epoch fetching samples one at a time with
+# one fetching the batch with __getitems__.
+# Usage: python3 benchmark_dataloader_getitems.py [num_samples]
+import sys
+import time
+
+import numpy as np
+
+import oneflow as flow
+
+
+class ColumnarDataset(flow.utils.data.Dataset):
+    def __init__(self, length, dim=16):
+        self.features = np.arange(length * dim, dtype=np.float32).reshape(length, dim)
+        self.labels = np.arange(length, dtype=np.int64)
+
+    def __getitem__(self, index):
+        return {"feature": self.features[index], "label": self.labels[index]}
+
+    def __len__(self):
+        return len(self.labels)
+
+
+class BatchedColumnarDataset(ColumnarDataset):
+    def __getitems__(self, indices):
+        return {"feature": self.features[indices], "label": self.labels[indices]}
+
+
+def bench_epoch(dataset, epochs):
+    dataloader = flow.utils.data.DataLoader(dataset, batch_size=256, shuffle=True)
+    start_t = time.perf_counter()
+    for _ in range(epochs):
+        for _ in dataloader:
+            pass
+    return (time.perf_counter() - start_t) / epochs
+
+
+def bench(num_samples, epochs=2):
+    per_item = bench_epoch(ColumnarDataset(num_samples), epochs)
+    batched = bench_epoch(BatchedColumnarDataset(num_samples), epochs)
+    print(
+        "DataLoader epoch of {} samples: {:.1f} ms per item, "
+        "{:.1f} ms with __getitems__".format(
+            num_samples, per_item * 1000, batched * 1000
+        )
+    )
+
+
+if __name__ == "__main__":
+    bench(int(sys.argv[1]) if len(sys.argv) > 1 else 65536)
@@ -0,0 +1,73 @@
+"""
+Copyright 2020 The OneFlow Authors. All rights reserved.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+# Compares the batches per second of a DataLoader sending each tensor in its own
+# shared memory segment with one sending batches through shared memory rings.
+# Usage: python3 benchmark_dataloader_shared_memory_ring.py [num_workers ...]
+import sys
+import time
+
+import numpy as np
+
+import oneflow as flow
+
+
+class SyntheticImageDataset(flow.utils.data.Dataset):
+    def __init__(self, length, shape=(3, 64, 64)):
+        self.length = length
+        self.shape = shape
+
+    def __getitem__(self, index):
+        return np.full(self.shape, index % 251, dtype=np.float32), index % 1000
+
+    def __len__(self):
+        return self.length
+
+
+def bench_dataloader(dataset, use_shared_memory_ring, num_workers, epochs):
+    dataloader = flow.utils.data.DataLoader(
+        dataset,
+        batch_size=64,
+        num_workers=num_workers,
+        persistent_workers=True,
+        use_shared_memory_ring=use_shared_memory_ring,
+    )
+    # warm up the workers
+    for _ in dataloader:
+        pass
+    start_t = time.perf_counter()
+    num_batches = 0
+    for _ in range(epochs):
+        for image, _ in dataloader:
+            image.sum().numpy()
+            num_batches += 1
+    return num_batches / (time.perf_counter() - start_t)
+
+
+def bench(num_workers_list, epochs=3):
+    dataset = SyntheticImageDataset(length=2048)
+    for num_workers in num_workers_list:
+        baseline = bench_dataloader(dataset, False, num_workers, epochs)
+        ring = bench_dataloader(dataset, True, num_workers, epochs)
+        print(
+            "DataLoader with {} workers: {:.1f} batches/s with a segment per "
+            "tensor, {:.1f} batches/s with shared memory rings".format(
+                num_workers, baseline, ring
+            )
+        )
+
+
+if __name__ == "__main__":
+    bench([int(x) for x in sys.argv[1:]] or [1, 4])
@@ -0,0 +1,71 @@
+"""
+Copyright 2020 The OneFlow Authors. All rights reserved.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+# Compares the batches per second of a DataLoader copying batches to the device
+# in the training loop with one staging them through the pooled host buffers.
+# Usage: python3 benchmark_dataloader_staging.py [cpu|cuda] [num_workers]
+import sys
+import time
+
+import numpy as np
+
+import oneflow as flow
+
+
+class RandomDataset(flow.utils.data.Dataset):
+    def __init__(self, length, shape=(3, 224, 224)):
+        self.length = length
+        self.shape = shape
+
+    def __getitem__(self, index):
+        return np.random.randn(*self.shape).astype(np.float32), index
+
+    def __len__(self):
+        return self.length
+
+
+def bench_dataloader(staging, device, num_workers, epochs):
+    dataloader = flow.utils.data.DataLoader(
+        RandomDataset(length=512),
+        batch_size=32,
+        num_workers=num_workers,
+        prefetch_device=device if staging else None,
+        persistent_workers=num_workers > 0,
+    )
+    start_t = time.perf_counter()
+    num_batches = 0
+    for _ in range(epochs):
+        for x, _ in dataloader:
+            if not staging:
+                x = x.to(device)
+            x.sum().numpy()
+            num_batches += 1
+    return num_batches / (time.perf_counter() - start_t)
+
+
+def bench(device, num_workers, epochs=3):
+    baseline = bench_dataloader(False, device, num_workers, epochs)
+    staged = bench_dataloader(True, device, num_workers, epochs)
+    print(
+        "DataLoader to {} with {} workers: {:.1f} batches/s without staging, "
+        "{:.1f} batches/s with staging".format(device, num_workers, baseline, staged)
+    )
+
+
+if __name__ == "__main__":
+    bench(
+        flow.device(sys.argv[1] if len(sys.argv) > 1 else "cuda"),
+        int(sys.argv[2]) if len(sys.argv) > 2 else 2,
+    )
@@ -0,0 +1,141 @@
+"""
+Copyright 2020 The OneFlow Authors. All rights reserved.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+import unittest
+
+import numpy as np
+
+import oneflow as flow
+import oneflow.unittest
+from oneflow.utils.data._utils.collate import default_collate
+
+
+class ColumnarDataset(flow.utils.data.Dataset):
+    def __init__(self, length=1024, dim=16):
+        self.features = np.arange(length * dim, dtype=np.float32).reshape(length, dim)
+        self.labels = np.arange(length, dtype=np.int64)
+
+    def __getitem__(self, index):
+        return {"feature": self.features[index], "label": self.labels[index]}
+
+    def __len__(self):
+        return len(self.labels)
+
+
+class BatchedColumnarDataset(ColumnarDataset):
+    def __getitems__(self, indices):
+        return {"feature": self.features[indices], "label": self.labels[indices]}
+
+
+def _check_batches(test_case, dataset, dataloader):
+    num_samples = 0
+    for batch in dataloader:
+        label = batch["label"].numpy()
+        test_case.assertEqual(batch["label"].dtype, flow.int64)
+        test_case.assertTrue(
+            np.array_equal(batch["feature"].numpy(), dataset.features[label])
+        )
+        num_samples += len(label)
+    test_case.assertEqual(num_samples, len(dataset))
+
+
+@flow.unittest.skip_unless_1n1d()
+class TestDataLoaderGetitems(flow.unittest.TestCase):
+    def test_getitems(test_case):
+        for dataset in [ColumnarDataset(), BatchedColumnarDataset()]:
+            for num_workers in [0, 2]:
+                dataloader = flow.utils.data.DataLoader(
+                    dataset, batch_size=64, shuffle=True, num_workers=num_workers
+                )
+                _check_batches(test_case, dataset, dataloader)
+
+    def test_getitems_subset(test_case):
+        dataset = BatchedColumnarDataset()
+        subset = flow.utils.data.Subset(dataset, list(range(100, 300)))
+        batch = subset.__getitems__([0, 5])
+        test_case.assertTrue(np.array_equal(batch["label"], [100, 105]))
+
+        dataloader = flow.utils.data.DataLoader(subset, batch_size=32)
+        labels = np.concatenate([b["label"].numpy() for b in dataloader])
+        test_case.assertTrue(np.array_equal(labels, np.arange(100, 300)))
+
+    def test_getitems_tensor_dataset(test_case):
+        x = flow.arange(40, dtype=flow.float32).reshape(20, 2)
+        y = flow.arange(20)
+        dataset = flow.utils.data.TensorDataset(x, y)
+        dataloader = flow.utils.data.DataLoader(dataset, batch_size=8, shuffle=True)
+        for bx, by in dataloader:
+            test_case.assertTrue(np.array_equal(bx.numpy(), x.numpy()[by.numpy()]))
+
+    def test_getitems_custom_collate_fn(test_case):
+        def collate_labels(samples):
+            test_case.assertIsInstance(samples, list)
+            return [int(sample[-1]) for sample in samples]
+
+        x = flow.arange(40, dtype=flow.float32).reshape(20, 2)
+        y = flow.arange(20)
+        dataloader = flow.utils.data.DataLoader(
+            flow.utils.data.TensorDataset(x, y),
+            batch_size=8,
+            collate_fn=collate_labels,
+        )
+        test_case.assertEqual(
+            list(dataloader), [list(range(8)), list(range(8, 16)), list(range(16, 20))]
+        )
+
+        def collate_features(samples):
+            return np.stack([sample["feature"] for sample in samples])
+
+        dataset = BatchedColumnarDataset(length=64)
+        for num_workers in [0, 2]:
+            dataloader = flow.utils.data.DataLoader(
+                dataset,
+                batch_size=16,
+                num_workers=num_workers,
+                collate_fn=collate_features,
+            )
+            batches = list(dataloader)
+            test_case.assertIsInstance(batches[0], np.ndarray)
+            test_case.assertTrue(
+                np.array_equal(np.concatenate(batches), dataset.features)
+            )
+
+    def test_default_collate_numpy(test_case):
+        arrays = [np.full((2, 3), i, dtype=np.float32) for i in range(4)]
+        out = default_collate(arrays)
+        test_case.assertEqual(out.dtype, flow.float32)
+        test_case.assertTrue(np.array_equal(out.numpy(), np.stack(arrays)))
+
+        out = default_collate([np.int32(i) for i in range(4)])
+        test_case.assertEqual(out.dtype, flow.int32)
+        test_case.assertTrue(np.array_equal(out.numpy(), np.arange(4)))
+
+        out = default_collate([1, 2, 3])
+        test_case.assertEqual(out.dtype, flow.int64)
+        test_case.assertTrue(np.array_equal(out.numpy(), [1, 2, 3]))
+
+        out = default_collate([0.5, 1.5])
+        test_case.assertEqual(out.dtype, flow.float64)
+        test_case.assertTrue(np.array_equal(out.numpy(), [0.5, 1.5]))
+
+        out = default_collate([True, False])
+        test_case.assertEqual(out.dtype, flow.bool)
+
+        with test_case.assertRaises(Exception):
+            default_collate([np.zeros((2, 3)), np.zeros((3, 2))])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,92 @@
+"""
+Copyright 2020 The OneFlow Authors. All rights reserved.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+import unittest
+
+import numpy as np
+
+import oneflow as flow
+import oneflow.unittest
+
+
+class SyntheticImageDataset(flow.utils.data.Dataset):
+    def __init__(self, length=512, shape=(3, 64, 64), as_tensor=False):
+        self.length = length
+        self.shape = shape
+        self.as_tensor = as_tensor
+
+    def __getitem__(self, index):
+        image = np.full(self.shape, index % 251, dtype=np.float32)
+        if self.as_tensor:
+            image = flow.tensor(image)
+        return image, index % 1000
+
+    def __len__(self):
+        return self.length
+
+
+def _check_batches(test_case, dataset, dataloader, keep_batches):
+    kept = []
+    num_samples = 0
+    for image, label in dataloader:
+        for i, sample in zip(label.numpy(), image.numpy()):
+            test_case.assertTrue(np.array_equal(sample, dataset[i][0]))
+        num_samples += image.shape[0]
+        if keep_batches:
+            kept.append(image)
+    test_case.assertEqual(num_samples, len(dataset))
+
+
+@flow.unittest.skip_unless_1n1d()
+class TestDataLoaderSharedMemoryRing(flow.unittest.TestCase):
+    def test_shared_memory_ring(test_case):
+        for as_tensor in [False, True]:
+            dataset = SyntheticImageDataset(length=256, as_tensor=as_tensor)
+            dataloader = flow.utils.data.DataLoader(
+                dataset, batch_size=16, num_workers=2, use_shared_memory_ring=True
+            )
+            iterator = iter(dataloader)
+            _check_batches(test_case, dataset, iterator, keep_batches=False)
+            for ring in iterator._shared_memory_rings:
+                test_case.assertTrue(ring.is_allocated)
+
+    def test_shared_memory_ring_exhausted(test_case):
+        # batches held by the consumer keep their slots, the rest fall back to
+        # a shared memory segment per tensor
+        dataset = SyntheticImageDataset(length=256)
+        dataloader = flow.utils.data.DataLoader(
+            dataset, batch_size=16, num_workers=2, use_shared_memory_ring=True
+        )
+        _check_batches(test_case, dataset, dataloader, keep_batches=True)
+
+    def test_shared_memory_ring_larger_batches(test_case):
+        # the slot size is decided by the first batch
+        dataset = SyntheticImageDataset(length=100)
+        batch_sampler = [[0], [1, 2]] + [
+            list(range(i, i + 10)) for i in range(10, 100, 10)
+        ]
+        dataloader = flow.utils.data.DataLoader(
+            dataset,
+            batch_sampler=batch_sampler,
+            num_workers=1,
+            use_shared_memory_ring=True,
+        )
+        for image, label in dataloader:
+            for i, sample in zip(label.numpy(), image.numpy()):
+                test_case.assertTrue(np.array_equal(sample, dataset[i][0]))
+
+
+if __name__ == "__main__":
+    unittest.main()
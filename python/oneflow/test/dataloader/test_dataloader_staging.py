@@ -0,0 +1,144 @@
+"""
+Copyright 2020 The OneFlow Authors. All rights reserved.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+import os
+import unittest
+
+import numpy as np
+
+import oneflow as flow
+import oneflow.unittest
+from oneflow.utils.data._utils.pin_memory import StagingBufferPool, stage
+
+
+class RandomDataset(flow.utils.data.Dataset):
+    def __init__(self, length=256, shape=(3, 32, 32)):
+        self.length = length
+        self.shape = shape
+
+    def __getitem__(self, index):
+        np.random.seed(index)
+        return np.random.randn(*self.shape).astype(np.float32), index
+
+    def __len__(self):
+        return self.length
+
+
+def _test_staging_buffer_pool(test_case):
+    pool = StagingBufferPool(capacity=2)
+    x = pool.acquire((4, 8), flow.float32)
+    pool.release(x)
+    test_case.assertTrue(pool.acquire((4, 8), flow.float32) is x)
+    test_case.assertFalse(pool.acquire((4, 8), flow.float32) is x)
+    test_case.assertFalse(pool.acquire((4, 8), flow.int32) is x)
+    for shape in [(1,), (2,), (3,)]:
+        pool.release(flow.empty(shape))
+    # the least recently released buffer is dropped
+    test_case.assertEqual(pool.stats()["num_free"], 2)
+    test_case.assertEqual(pool.acquire((1,), flow.float32).shape, flow.Size([1]))
+    test_case.assertEqual(
+        pool.stats(), {"num_allocated": 4, "num_reused": 1, "num_free": 2}
+    )
+
+
+def _test_stage(test_case, device):
+    pool = StagingBufferPool()
+    data = {"x": flow.ones(4, 8), "y": [flow.zeros(2), "label"]}
+    for _ in range(3):
+        out = stage(data, pool, flow.device(device))
+        test_case.assertEqual(out["x"].device, flow.device(device))
+        test_case.assertTrue(np.array_equal(out["x"].numpy(), np.ones((4, 8))))
+        test_case.assertTrue(np.array_equal(out["y"][0].numpy(), np.zeros(2)))
+        test_case.assertEqual(out["y"][1], "label")
+    stats = pool.stats()
+    if device == "cpu":
+        # tensors already on the device are passed through
+        test_case.assertTrue(out["x"] is data["x"])
+        test_case.assertEqual(stats["num_allocated"], 0)
+    else:
+        test_case.assertEqual(stats["num_allocated"], 2)
+        test_case.assertEqual(stats["num_reused"], 4)
+        test_case.assertEqual(stats["num_free"], 2)
+    test_case.assertTrue(stage(data, pool, None)["x"] is data["x"])
+
+
+def _test_dataloader_prefetch_device(test_case, device, num_workers):
+    dataset = RandomDataset(length=64)
+    dataloader = flow.utils.data.DataLoader(
+        dataset,
+        batch_size=8,
+        num_workers=num_workers,
+        prefetch_device=device,
+        prefetch_device_depth=3,
+    )
+    indices = []
+    for x, index in dataloader:
+        test_case.assertEqual(x.device, flow.device(device))
+        test_case.assertEqual(x.shape, flow.Size([8, 3, 32, 32]))
+        for i, sample in zip(index.numpy(), x.numpy()):
+            test_case.assertTrue(np.array_equal(sample, dataset[i][0]))
+        indices.extend(index.numpy().tolist())
+    test_case.assertEqual(sorted(indices), list(range(64)))
+
+
+def _test_dataloader_buffer_reuse(test_case, device, num_workers):
+    dataloader = flow.utils.data.DataLoader(
+        RandomDataset(length=40),
+        batch_size=8,
+        num_workers=num_workers,
+        prefetch_device=device,
+        persistent_workers=num_workers > 0,
+    )
+    pool = dataloader._staging_buffer_pool
+    num_allocated = []
+    for _ in range(3):
+        for x, _ in dataloader:
+            test_case.assertEqual(x.device, flow.device(device))
+        num_allocated.append(pool.stats()["num_allocated"])
+    # the buffers of the first epoch are reused by the following epochs
+    test_case.assertGreater(num_allocated[0], 0)
+    test_case.assertEqual(num_allocated, [num_allocated[0]] * 3)
+    test_case.assertGreaterEqual(pool.stats()["num_reused"], 2 * 5 * 2)
+
+
+@flow.unittest.skip_unless_1n1d()
+class TestDataLoaderStaging(flow.unittest.TestCase):
+    def test_staging_buffer_pool(test_case):
+        _test_staging_buffer_pool(test_case)
+
+    def test_stage_cpu(test_case):
+        _test_stage(test_case, "cpu")
+
+    @unittest.skipIf(os.getenv("ONEFLOW_TEST_CPU_ONLY"), "only test cpu cases")
+    def test_stage_gpu(test_case):
+        _test_stage(test_case, "cuda")
+
+    def test_dataloader_prefetch_device_cpu(test_case):
+        _test_dataloader_prefetch_device(test_case, "cpu", 0)
+        _test_dataloader_prefetch_device(test_case, "cpu", 2)
+
+    @unittest.skipIf(os.getenv("ONEFLOW_TEST_CPU_ONLY"), "only test cpu cases")
+    def test_dataloader_prefetch_device_gpu(test_case):
+        _test_dataloader_prefetch_device(test_case, "cuda", 0)
+        _test_dataloader_prefetch_device(test_case, "cuda", 2)
+
+    @unittest.skipIf(os.getenv("ONEFLOW_TEST_CPU_ONLY"), "only test cpu cases")
+    def test_dataloader_buffer_reuse_gpu(test_case):
+        _test_dataloader_buffer_reuse(test_case, "cuda", 0)
+        _test_dataloader_buffer_reuse(test_case, "cuda", 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
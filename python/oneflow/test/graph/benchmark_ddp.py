@@ -0,0 +1,67 @@
+"""
+Copyright 2020 The OneFlow Authors. All rights reserved.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+# Scaling efficiency of data parallel training: the time of an iteration without
+# ddp divided by the time of an iteration with ddp, both with the same batch size
+# per rank.
+# Usage: python3 -m oneflow.distributed.launch --nproc_per_node 2 benchmark_ddp.py [cpu|cuda]
+import sys
+import time
+
+import oneflow as flow
+from oneflow.nn.parallel import DistributedDataParallel as ddp
+
+
+def make_model(device):
+    flow.manual_seed(0)
+    return flow.nn.Sequential(*[flow.nn.Linear(256, 256) for _ in range(16)]).to(device)
+
+
+def time_iters(model, device, iters):
+    optimizer = flow.optim.SGD(model.parameters(), lr=0.01)
+    x = flow.randn(64, 256, device=device)
+    for i in range(iters + 1):
+        if i == 1:
+            start_t = time.perf_counter()
+        model(x).sum().backward()
+        optimizer.step()
+        optimizer.zero_grad()
+        model[0].weight.numpy()
+    return (time.perf_counter() - start_t) / iters
+
+
+def bench(device, iters=10):
+    local_time = time_iters(make_model(device), device, iters)
+    ddp_time = time_iters(ddp(make_model(device)), device, iters)
+    if flow.env.get_rank() == 0:
+        print(
+            "ddp on {} {} processes: {:.2f} ms/iter without ddp, "
+            "{:.2f} ms/iter with ddp, scaling efficiency {:.2%}".format(
+                flow.env.get_world_size(),
+                device.type,
+                local_time * 1000,
+                ddp_time * 1000,
+                local_time / ddp_time,
+            )
+        )
+
+
+if __name__ == "__main__":
+    device_type = sys.argv[1] if len(sys.argv) > 1 else "cpu"
+    if device_type == "cuda":
+        device = flow.device("cuda", flow.env.get_local_rank())
+    else:
+        device = flow.device("cpu")
+    bench(device)
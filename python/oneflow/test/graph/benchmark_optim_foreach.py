@@ -0,0 +1,58 @@
+"""
+Copyright 2020 The OneFlow Authors. All rights reserved.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+# Compares the time per step of optimizers with and without foreach.
+# Usage: python3 benchmark_optim_foreach.py [cpu|cuda] [num_params]
+import sys
+import time
+
+import oneflow as flow
+from oneflow.nn import Parameter
+
+
+def bench_step(optim_cls, foreach, device, num_params, iters):
+    params = [Parameter(flow.randn(16, 16, device=device)) for _ in range(num_params)]
+    for param in params:
+        param.grad = flow.randn(16, 16, device=device)
+    optim = optim_cls(params, lr=1e-3, foreach=foreach)
+    optim.step()
+    params[0].numpy()
+    start_t = time.perf_counter()
+    for _ in range(iters):
+        optim.step()
+    params[0].numpy()
+    return (time.perf_counter() - start_t) / iters
+
+
+def bench(device, num_params=1000, iters=20):
+    for optim_cls in (flow.optim.SGD, flow.optim.Adam):
+        per_param = bench_step(optim_cls, False, device, num_params, iters)
+        foreach = bench_step(optim_cls, True, device, num_params, iters)
+        print(
+            "{} step of {} params on {}: per-param {:.3f} ms, foreach {:.3f} ms".format(
+                optim_cls.__name__,
+                num_params,
+                device,
+                per_param * 1000,
+                foreach * 1000,
+            )
+        )
+
+
+if __name__ == "__main__":
+    bench(
+        flow.device(sys.argv[1] if len(sys.argv) > 1 else "cpu"),
+        int(sys.argv[2]) if len(sys.argv) > 2 else 1000,
+    )
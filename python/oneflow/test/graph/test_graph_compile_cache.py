@@ -0,0 +1,154 @@
+"""
+Copyright 2020 The OneFlow Authors. All rights reserved.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+import numpy as np
+
+import oneflow as flow
+import oneflow.unittest
+
+
+def _test_graph_compile_cache(test_case, device):
+    linear = flow.nn.Linear(3, 8, False)
+    linear = linear.to(device)
+
+    class LinearGraph(flow.nn.Graph):
+        def __init__(self, cache_dir):
+            super().__init__()
+            self.linear = linear
+            self.config.enable_compile_cache(cache_dir)
+
+        def build(self, x):
+            return self.linear(x)
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        linear_g = LinearGraph(cache_dir)
+        test_case.assertEqual(linear_g.compile_cache_stats, None)
+        x = flow.randn(4, 3, device=device)
+        of_lazy_out = linear_g(x)
+        of_eager_out = linear(x)
+        test_case.assertTrue(np.array_equal(of_lazy_out.numpy(), of_eager_out.numpy()))
+
+        stats = linear_g.compile_cache_stats
+        test_case.assertEqual(stats["hits"], 0)
+        test_case.assertEqual(stats["misses"], 1)
+        key = linear_g._compile_cache_key
+        test_case.assertTrue(
+            os.path.isfile(linear_g._compile_cache.job_path(key)), "job is not cached"
+        )
+        if flow.env.get_rank() == 0:
+            test_case.assertEqual(stats["plan_misses"], 1)
+            test_case.assertTrue(
+                os.path.isfile(linear_g._compile_cache.plan_path(key)),
+                "plan is not cached",
+            )
+
+
+# Builds the same graph in a new process, optionally after compiling another graph,
+# which allocates ids of the plan that the cached plan would otherwise reuse.
+_BUILD_GRAPH_SCRIPT = """
+import json
+import sys
+
+import numpy as np
+import oneflow as flow
+
+cache_dir, device, compile_other_graph = sys.argv[1], sys.argv[2], sys.argv[3] == "1"
+if compile_other_graph:
+
+    class OtherGraph(flow.nn.Graph):
+        def build(self, x):
+            return x + 1
+
+    OtherGraph()(flow.ones(2, device=device))
+
+linear = flow.nn.Linear(3, 8, False).to(device)
+
+
+class LinearGraph(flow.nn.Graph):
+    def __init__(self):
+        super().__init__()
+        self.linear = linear
+        self.config.enable_compile_cache(cache_dir)
+
+    def build(self, x):
+        return self.linear(x)
+
+
+linear_g = LinearGraph()
+x = flow.randn(4, 3, device=device)
+assert np.allclose(linear_g(x).numpy(), linear(x).numpy(), 1e-4, 1e-4)
+print(json.dumps(linear_g.compile_cache_stats))
+"""
+
+
+def _build_graph_in_new_process(cache_dir, device, compile_other_graph):
+    result = subprocess.run(
+        [
+            sys.executable,
+            "-c",
+            _BUILD_GRAPH_SCRIPT,
+            cache_dir,
+            device,
+            "1" if compile_other_graph else "0",
+        ],
+        stdout=subprocess.PIPE,
+        check=True,
+    )
+    return json.loads(result.stdout.decode().strip().splitlines()[-1])
+
+
+def _test_graph_compile_cache_hit(test_case, device):
+    with tempfile.TemporaryDirectory() as cache_dir:
+        stats = _build_graph_in_new_process(cache_dir, device, False)
+        test_case.assertEqual(
+            stats, {"hits": 0, "misses": 1, "plan_hits": 0, "plan_misses": 1}
+        )
+        # Both the completed job and the plan are loaded from the cache.
+        stats = _build_graph_in_new_process(cache_dir, device, False)
+        test_case.assertEqual(
+            stats, {"hits": 1, "misses": 0, "plan_hits": 1, "plan_misses": 0}
+        )
+        # After another graph has been compiled, the plan is compiled again, since its
+        # ids have been taken by the plan of the other graph.
+        stats = _build_graph_in_new_process(cache_dir, device, True)
+        test_case.assertEqual(stats["plan_hits"], 0)
+        test_case.assertEqual(stats["plan_misses"], 1)
+
+
+@flow.unittest.skip_unless_1n1d()
+class TestGraphCompileCache(oneflow.unittest.TestCase):
+    def test_graph_compile_cache_cpu(test_case):
+        _test_graph_compile_cache(test_case, flow.device("cpu"))
+
+    @unittest.skipIf(os.getenv("ONEFLOW_TEST_CPU_ONLY"), "only test cpu cases")
+    def test_graph_compile_cache_gpu(test_case):
+        _test_graph_compile_cache(test_case, flow.device("cuda"))
+
+    def test_graph_compile_cache_hit_cpu(test_case):
+        _test_graph_compile_cache_hit(test_case, "cpu")
+
+    @unittest.skipIf(os.getenv("ONEFLOW_TEST_CPU_ONLY"), "only test cpu cases")
+    def test_graph_compile_cache_hit_gpu(test_case):
+        _test_graph_compile_cache_hit(test_case, "cuda")
+
+
+if __name__ == "__main__":
+    unittest.main()
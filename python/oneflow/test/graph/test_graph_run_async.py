@@ -0,0 +1,88 @@
+"""
+Copyright 2020 The OneFlow Authors. All rights reserved.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+import os
+import threading
+import time
+import unittest
+import numpy as np
+
+import oneflow as flow
+import oneflow.unittest
+
+
+def _test_graph_run_async(test_case, device):
+    linear = flow.nn.Linear(3, 8, False).to(device)
+
+    class LinearGraph(flow.nn.Graph):
+        def __init__(self):
+            super().__init__()
+            self.linear = linear
+
+        def build(self, x, y):
+            return self.linear(x) + y
+
+    linear_g = LinearGraph()
+    batches = [
+        (np.random.randn(4, 3).astype(np.float32), flow.randn(4, 8)) for _ in range(10)
+    ]
+    outs = list(linear_g.run_async(batches, depth=3))
+    test_case.assertEqual(len(outs), len(batches))
+    for (out, (x, y)) in zip(outs, batches):
+        test_case.assertEqual(out.device, device)
+        eager_out = linear(flow.tensor(x, device=device)) + y.to(device)
+        test_case.assertTrue(np.allclose(out.numpy(), eager_out.numpy(), 1e-5, 1e-5))
+
+    # Errors raised in the iterable are raised to the caller.
+    def error_batches():
+        yield batches[0]
+        raise ValueError("broken iterable")
+
+    with test_case.assertRaises(ValueError):
+        for _ in linear_g.run_async(error_batches()):
+            pass
+
+
+def _test_prefetcher_stopped_early(test_case):
+    from oneflow.nn.graph.prefetcher import InputPrefetcher
+
+    num_threads = threading.active_count()
+    # The fetch thread is blocked on the full queue when the consumer stops, both
+    # when putting a batch and when putting the end of the iterable.
+    for num_batches in (100, 2):
+        for batch in InputPrefetcher(range(num_batches), depth=1):
+            break
+        for _ in range(50):
+            if threading.active_count() == num_threads:
+                break
+            time.sleep(0.1)
+        test_case.assertEqual(threading.active_count(), num_threads)
+
+
+@flow.unittest.skip_unless_1n1d()
+class TestGraphRunAsync(oneflow.unittest.TestCase):
+    def test_graph_run_async_cpu(test_case):
+        _test_graph_run_async(test_case, flow.device("cpu"))
+
+    def test_prefetcher_stopped_early(test_case):
+        _test_prefetcher_stopped_early(test_case)
+
+    @unittest.skipIf(os.getenv("ONEFLOW_TEST_CPU_ONLY"), "only test cpu cases")
+    def test_graph_run_async_gpu(test_case):
+        _test_graph_run_async(test_case, flow.device("cuda"))
+
+
+if __name__ == "__main__":
+    unittest.main()
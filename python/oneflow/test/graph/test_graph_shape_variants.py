@@ -0,0 +1,79 @@
+"""
+Copyright 2020 The OneFlow Authors. All rights reserved.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+import os
+import unittest
+import numpy as np
+
+import oneflow as flow
+import oneflow.unittest
+
+
+def _test_graph_shape_variants(test_case, device):
+    linear = flow.nn.Linear(3, 8, False)
+    linear = linear.to(device)
+    linear.eval()
+
+    class LinearGraph(flow.nn.Graph):
+        def __init__(self):
+            super().__init__()
+            self.linear = linear
+            self.config.enable_shape_variants(
+                True, max_num_variants=2, buckets={0: [4, 8]}
+            )
+
+        def build(self, x):
+            return self.linear(x)
+
+    linear_g = LinearGraph()
+
+    def check(batch_size, padded_size, num_variants):
+        x = flow.randn(batch_size, 3, device=device)
+        of_lazy_out = linear_g(x)
+        of_eager_out = linear(x)
+        test_case.assertEqual(of_lazy_out.shape, flow.Size([padded_size, 8]))
+        test_case.assertTrue(
+            np.allclose(
+                of_lazy_out[:batch_size].numpy(), of_eager_out.numpy(), 1e-5, 1e-5
+            )
+        )
+        test_case.assertEqual(len(linear_g._shape_variants), num_variants)
+
+    check(3, 4, 1)
+    check(4, 4, 1)
+    check(6, 8, 2)
+    # Reuse the variant of bucket 4.
+    check(2, 4, 2)
+    # Size out of buckets is not padded, the least recently used variant is released.
+    check(10, 10, 2)
+    check(7, 8, 2)
+
+    # Variants share the parameter.
+    flow.nn.init.constant_(linear.weight, 1.0)
+    check(1, 4, 2)
+
+
+@flow.unittest.skip_unless_1n1d()
+class TestGraphShapeVariants(oneflow.unittest.TestCase):
+    def test_graph_shape_variants_cpu(test_case):
+        _test_graph_shape_variants(test_case, flow.device("cpu"))
+
+    @unittest.skipIf(os.getenv("ONEFLOW_TEST_CPU_ONLY"), "only test cpu cases")
+    def test_graph_shape_variants_gpu(test_case):
+        _test_graph_shape_variants(test_case, flow.device("cuda"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,97 @@
+"""
+Copyright 2020 The OneFlow Authors. All rights reserved.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+import os
+import unittest
+import numpy as np
+
+import oneflow as flow
+import oneflow.unittest
+
+
+def _make_graph(module, zero_copy):
+    class LinearGraph(flow.nn.Graph):
+        def __init__(self):
+            super().__init__()
+            self.m = module
+            self.config.enable_zero_copy_outputs(zero_copy)
+
+        def build(self, x):
+            y = self.m(x)
+            return y, {"relu": flow.relu(y)}
+
+    return LinearGraph()
+
+
+def _test_graph_zero_copy_outputs(test_case, device):
+    linear = flow.nn.Linear(3, 8, False).to(device)
+    linear_g = _make_graph(linear, True)
+
+    outs = []
+    for i in range(4):
+        x = flow.randn(4, 3, device=device)
+        y, d = linear_g(x)
+        eager_y = linear(x)
+        outs.append((y, eager_y))
+        test_case.assertTrue(np.allclose(y.numpy(), eager_y.numpy(), 1e-5, 1e-5))
+        test_case.assertTrue(
+            np.allclose(d["relu"].numpy(), flow.relu(eager_y).numpy(), 1e-5, 1e-5)
+        )
+    # Outputs are donated on each call, so they are never overwritten by later calls.
+    for (y, eager_y) in outs:
+        test_case.assertTrue(np.allclose(y.numpy(), eager_y.numpy(), 1e-5, 1e-5))
+
+
+def _data_ptr(tensor):
+    # The numpy array of a cpu tensor shares memory with the tensor.
+    return tensor.numpy().__array_interface__["data"][0]
+
+
+def _test_graph_outputs_not_copied(test_case):
+    linear = flow.nn.Linear(3, 8, False)
+    graph_outputs = []
+    run_lazy_nn_graph = flow._oneflow_internal.nn.graph.RunLazyNNGraph
+
+    def record_run_lazy_nn_graph(inputs, outputs, states, nn_graph):
+        graph_outputs.append(outputs[0])
+        return run_lazy_nn_graph(inputs, outputs, states, nn_graph)
+
+    flow._oneflow_internal.nn.graph.RunLazyNNGraph = record_run_lazy_nn_graph
+    try:
+        for zero_copy in (False, True):
+            linear_g = _make_graph(linear, zero_copy)
+            y, _ = linear_g(flow.randn(4, 3))
+            # The output returned is the tensor the graph has written in zero copy
+            # mode, and a copy of it otherwise.
+            test_case.assertEqual(
+                _data_ptr(y) == _data_ptr(graph_outputs[-1]), zero_copy
+            )
+    finally:
+        flow._oneflow_internal.nn.graph.RunLazyNNGraph = run_lazy_nn_graph
+
+
+@flow.unittest.skip_unless_1n1d()
+class TestGraphZeroCopyOutputs(oneflow.unittest.TestCase):
+    def test_graph_zero_copy_outputs_cpu(test_case):
+        _test_graph_zero_copy_outputs(test_case, flow.device("cpu"))
+        _test_graph_outputs_not_copied(test_case)
+
+    @unittest.skipIf(os.getenv("ONEFLOW_TEST_CPU_ONLY"), "only test cpu cases")
+    def test_graph_zero_copy_outputs_gpu(test_case):
+        _test_graph_zero_copy_outputs(test_case, flow.device("cuda"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,50 @@
+"""
+Copyright 2020 The OneFlow Authors. All rights reserved.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+# Compares the time of small eager cpu ops with and without the cpu memory cache.
+# Usage: python3 benchmark_env_cpu_memory.py [iters]
+import sys
+import time
+
+import oneflow as flow
+
+
+def run_ops(iters):
+    x = flow.randn(64, 256)
+    for _ in range(iters):
+        y = flow.relu(x * 2 + 1).sum(dim=1)
+    y.numpy()
+
+
+def bench(iters):
+    limit_bytes = flow.env.cpu_memory_stats()["cache_limit_bytes"]
+    try:
+        for name, limit in [("without cache", 0), ("with cache", limit_bytes)]:
+            flow.env.set_cpu_cache_limit(limit)
+            run_ops(10)
+            start_t = time.perf_counter()
+            run_ops(iters)
+            cost = time.perf_counter() - start_t
+            print(
+                "{} iterations of eager cpu ops {}: {:.1f} ms".format(
+                    iters, name, cost * 1000
+                )
+            )
+    finally:
+        flow.env.set_cpu_cache_limit(limit_bytes)
+
+
+if __name__ == "__main__":
+    bench(int(sys.argv[1]) if len(sys.argv) > 1 else 1000)
@@ -0,0 +1,94 @@
+"""
+Copyright 2020 The OneFlow Authors. All rights reserved.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+import asyncio
+import unittest
+
+import numpy as np
+
+import oneflow as flow
+import oneflow.unittest
+
+
+class _FakeSession(object):
+    # Doubles the input "x" as output "y", like a job of batch size 8. The input
+    # "z" belongs to another job of the session.
+    def __init__(self, event_loop, fail=False):
+        self.event_loop_ = event_loop
+        self.batch_sizes = []
+        self.fail = fail
+
+    def list_inputs(self, job_name=None):
+        return {"job": ("x",), "other_job": ("z",), None: ("x", "z")}[job_name]
+
+    def input_info(self, input_name, job_name=None):
+        return {"shape": (8, 3), "dtype": np.float32}
+
+    async def async_run(self, job_name, **kwargs):
+        assert job_name == "job" and set(kwargs.keys()) == {"x"}
+        x = kwargs["x"]
+        assert x.shape == (8, 3)
+        self.batch_sizes.append(x.shape[0])
+        await asyncio.sleep(0)
+        if self.fail:
+            raise RuntimeError("job failed")
+        return (x * 2, np.array(x.shape[0]))
+
+
+def _test_coalesce(test_case):
+    loop = asyncio.new_event_loop()
+    session = _FakeSession(loop)
+    batcher = flow.serving.DynamicBatcher(session, "job", max_queue_delay_ms=50)
+    xs = [np.random.rand(n, 3).astype(np.float32) for n in (1, 3, 2, 2, 4)]
+
+    async def run_all():
+        return await asyncio.gather(*[batcher.async_run(x=x) for x in xs])
+
+    results = loop.run_until_complete(run_all())
+    for x, (y, batch_size) in zip(xs, results):
+        test_case.assertTrue(np.array_equal(y, x * 2))
+        test_case.assertEqual(batch_size, 8)
+    # 1 + 3 + 2 + 2 rows fill a batch, and 4 rows wait until the deadline
+    test_case.assertEqual(len(session.batch_sizes), 2)
+    metrics = batcher.metrics()
+    test_case.assertEqual(metrics["num_requests"], 5)
+    test_case.assertEqual(metrics["num_batches"], 2)
+    test_case.assertEqual(metrics["batch_size_histogram"], {4: 1, 8: 1})
+    test_case.assertGreaterEqual(metrics["queue_latency_ms"]["max"], 40)
+    loop.close()
+
+
+def _test_error(test_case):
+    loop = asyncio.new_event_loop()
+    session = _FakeSession(loop, fail=True)
+    batcher = flow.serving.DynamicBatcher(session, "job", max_queue_delay_ms=1)
+    with test_case.assertRaises(RuntimeError):
+        batcher.run(x=np.zeros((2, 3), dtype=np.float32))
+    with test_case.assertRaises(ValueError):
+        batcher.run(x=np.zeros((9, 3), dtype=np.float32))
+    loop.close()
+
+
+@flow.unittest.skip_unless_1n1d()
+class TestDynamicBatcher(flow.unittest.TestCase):
+    def test_coalesce(test_case):
+        _test_coalesce(test_case)
+
+    def test_error(test_case):
+        _test_error(test_case)
+
+
+if __name__ == "__main__":
+    unittest.main()
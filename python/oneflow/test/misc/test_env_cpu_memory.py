@@ -0,0 +1,66 @@
+"""
+Copyright 2020 The OneFlow Authors. All rights reserved.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+import unittest
+
+import oneflow as flow
+import oneflow.unittest
+
+
+@flow.unittest.skip_unless_1n1d()
+class TestEnvCpuMemory(flow.unittest.TestCase):
+    def test_cpu_memory_stats(test_case):
+        flow.env.empty_cpu_cache()
+        flow.env.reset_peak_cpu_memory_stats()
+        stats = flow.env.cpu_memory_stats()
+        num_allocs = stats["num_allocs"]
+        num_cache_hits = stats["num_cache_hits"]
+
+        x = flow.ones(1000, 1000)
+        stats = flow.env.cpu_memory_stats()
+        test_case.assertGreaterEqual(stats["allocated_bytes"], 4 * 1000 * 1000)
+        test_case.assertGreaterEqual(stats["in_use_bytes"], stats["allocated_bytes"])
+        test_case.assertGreaterEqual(stats["peak_in_use_bytes"], stats["in_use_bytes"])
+        test_case.assertGreater(stats["num_allocs"], num_allocs)
+        test_case.assertLess(stats["fragmentation"], 1.0)
+
+        del x
+        stats = flow.env.cpu_memory_stats()
+        test_case.assertGreaterEqual(stats["cached_bytes"], 4 * 1000 * 1000)
+
+        # the freed memory is reused
+        x = flow.ones(1000, 1000)
+        stats = flow.env.cpu_memory_stats()
+        test_case.assertGreater(stats["num_cache_hits"], num_cache_hits)
+        del x
+
+        flow.env.empty_cpu_cache()
+        test_case.assertEqual(flow.env.cpu_memory_stats()["cached_bytes"], 0)
+
+    def test_cpu_cache_limit(test_case):
+        limit_bytes = flow.env.cpu_memory_stats()["cache_limit_bytes"]
+        try:
+            flow.env.set_cpu_cache_limit(1 << 20)
+            x = flow.ones(1000, 1000)
+            del x
+            stats = flow.env.cpu_memory_stats()
+            test_case.assertEqual(stats["cache_limit_bytes"], 1 << 20)
+            test_case.assertLessEqual(stats["cached_bytes"], 1 << 20)
+        finally:
+            flow.env.set_cpu_cache_limit(limit_bytes)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,100 @@
+"""
+Copyright 2020 The OneFlow Authors. All rights reserved.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+import json
+import os
+import tempfile
+import unittest
+
+import oneflow as flow
+import oneflow.profiler
+import oneflow.unittest
+
+
+def _test_profile_eager_ops(test_case, device):
+    x = flow.ones(4, 8, device=device)
+    with flow.profiler.profile() as prof:
+        with flow.profiler.record_function("forward"):
+            for _ in range(3):
+                y = flow.relu(x)
+                z = flow.matmul(y, y.t())
+    names = [event.name for event in prof.events]
+    test_case.assertIn("relu", names)
+    test_case.assertIn("matmul", names)
+    test_case.assertIn("forward", names)
+    for event in prof.events:
+        test_case.assertGreaterEqual(event.end_ns, event.start_ns)
+        test_case.assertGreaterEqual(event.self_ns, 0)
+        if event.name == "relu":
+            test_case.assertEqual(event.category, "eager")
+            test_case.assertEqual(event.input_shapes, "[(4, 8)]")
+            test_case.assertGreaterEqual(event.queue_delay_ns, 0)
+            test_case.assertGreaterEqual(event.allocated_bytes, 0)
+
+    rows = prof.key_averages()
+    relu_row = [row for row in rows if row["name"] == "relu"][0]
+    test_case.assertEqual(relu_row["count"], 3)
+    table = prof.table(sort_by="self_time", row_limit=5)
+    test_case.assertIn("Self Time", table)
+    test_case.assertLessEqual(len(table.split("\n")), 5 + 5)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "trace.json")
+        prof.export_chrome_trace(path)
+        with open(path) as f:
+            trace = json.load(f)
+    test_case.assertEqual(len(trace["traceEvents"]), len(prof.events))
+    for trace_event in trace["traceEvents"]:
+        test_case.assertEqual(trace_event["ph"], "X")
+        test_case.assertGreaterEqual(trace_event["dur"], 0)
+
+
+def _test_profile_graph(test_case, device):
+    class ReluGraph(flow.nn.Graph):
+        def build(self, x):
+            return flow.relu(x)
+
+    graph = ReluGraph()
+    x = flow.ones(2, 3, device=device)
+    graph(x)
+    with flow.profiler.profile() as prof:
+        graph(x).numpy()
+    graph_events = [event for event in prof.events if event.category == "graph"]
+    test_case.assertTrue(any(event.name == "relu" for event in graph_events))
+
+
+def _test_profile_disabled(test_case, device):
+    x = flow.ones(4, 8, device=device)
+    with flow.profiler.profile() as prof:
+        pass
+    flow.relu(x).numpy()
+    test_case.assertEqual(len(prof.events), 0)
+
+
+@flow.unittest.skip_unless_1n1d()
+class TestHostProfiler(flow.unittest.TestCase):
+    def test_host_profiler_cpu(test_case):
+        _test_profile_eager_ops(test_case, "cpu")
+        _test_profile_graph(test_case, "cpu")
+        _test_profile_disabled(test_case, "cpu")
+
+    @unittest.skipIf(os.getenv("ONEFLOW_TEST_CPU_ONLY"), "only test cpu cases")
+    def test_host_profiler_gpu(test_case):
+        _test_profile_eager_ops(test_case, "cuda")
+        _test_profile_graph(test_case, "cuda")
+
+
+if __name__ == "__main__":
+    unittest.main()
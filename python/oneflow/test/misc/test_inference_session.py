@@ -0,0 +1,226 @@
+"""
+Copyright 2020 The OneFlow Authors. All rights reserved.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+import asyncio
+import types
+import unittest
+
+import numpy as np
+
+import oneflow as flow
+import oneflow.unittest
+from oneflow.serving.inference_session import InferenceSession, SessionOption
+
+
+class _FakeOfBlob(object):
+    def __init__(self, value=None):
+        self.value = value
+        self.pushed = None
+
+    @property
+    def shape(self):
+        return self.value.shape
+
+    @property
+    def dtype(self):
+        return flow.float32
+
+    def CopyFromNdarray(self, src_ndarray):
+        self.pushed = src_ndarray.copy()
+
+    def CopyToNdarray(self, out=None):
+        if out is None:
+            out = np.empty(self.value.shape, dtype=self.value.dtype)
+        out[...] = self.value
+        return out
+
+
+class _FakeRuntimeSession(InferenceSession):
+    # Runs the interface jobs of the real session on a fake runtime, in which the
+    # job "job" doubles the input "x" as the output "y", and the pulls of the
+    # outputs finish some time after the jobs are launched.
+    def __init__(self, option=None, output_shape=None):
+        self.output_shape = output_shape
+        self.pushed_values = []
+        self.num_in_flight_jobs = 0
+        self.max_num_in_flight_jobs = 0
+        super(_FakeRuntimeSession, self).__init__(option)
+
+    def init(self):
+        self.inter_user_job_info_ = types.SimpleNamespace(
+            input_or_var_op_name2push_job_name={"x": "push_x"},
+            output_or_var_op_name2pull_job_name={"y": "pull_y"},
+        )
+        self.status_ = self.SessionStatus.RUNNING
+
+    def close(self):
+        self.status_ = self.SessionStatus.CLOSED
+
+    def _get_interface_names(self, job_name):
+        assert job_name == "job"
+        return frozenset(["x", "y"])
+
+    def input_info(self, input_name, job_name=None):
+        return {"shape": (4,), "dtype": flow.float32}
+
+    def _run_job(self, job_inst):
+        if job_inst.push_cb_ is not None:
+            ofblob = _FakeOfBlob()
+            job_inst.push_cb_(ofblob)
+            self.pushed_values.append(ofblob.pushed)
+        elif job_inst.pull_cb_ is not None:
+            self.event_loop_.call_later(0.01, self._pull, job_inst)
+            return
+        else:
+            self.num_in_flight_jobs += 1
+            self.max_num_in_flight_jobs = max(
+                self.max_num_in_flight_jobs, self.num_in_flight_jobs
+            )
+        job_inst.Finish()
+
+    def _pull(self, job_inst):
+        value = self.pushed_values.pop(0) * 2
+        if self.output_shape is not None:
+            value = np.resize(value, self.output_shape)
+        job_inst.pull_cb_(_FakeOfBlob(value))
+        self.num_in_flight_jobs -= 1
+        job_inst.Finish()
+
+
+def _run_concurrently(session, num_jobs):
+    async def run_all():
+        return await asyncio.gather(
+            *[
+                session.async_run("job", x=np.full(4, i, dtype=np.float32))
+                for i in range(num_jobs)
+            ]
+        )
+
+    return session.event_loop_.run_until_complete(run_all())
+
+
+def _test_max_in_flight_jobs(test_case, max_in_flight_jobs):
+    option = SessionOption()
+    option.max_in_flight_jobs = max_in_flight_jobs
+    session = _FakeRuntimeSession(option)
+    results = _run_concurrently(session, 6)
+    for i, (y,) in enumerate(results):
+        test_case.assertTrue(np.array_equal(y, np.full(4, i * 2)))
+    test_case.assertEqual(session.max_num_in_flight_jobs, max_in_flight_jobs or 6)
+
+
+def _test_reuse_released_outputs(test_case):
+    session = _FakeRuntimeSession()
+    (y,) = session.run("job", x=np.ones(4, dtype=np.float32))
+    session.release_outputs([y], "job")
+    (reused_y,) = session.run("job", x=np.full(4, 2, dtype=np.float32))
+    test_case.assertTrue(reused_y is y)
+    test_case.assertTrue(np.array_equal(reused_y, np.full(4, 4)))
+    # the released buffer is handed out once
+    (new_y,) = session.run("job", x=np.ones(4, dtype=np.float32))
+    test_case.assertFalse(new_y is y)
+    test_case.assertEqual(session.copy_stats()["allocated_bytes"], 2 * y.nbytes)
+
+    # run_pipelined releases the outputs of the former iteration
+    outputs = session.run_pipelined(
+        "job", [{"x": np.full(4, i, dtype=np.float32)} for i in range(4)], 2
+    )
+    ys = []
+    for i, (y,) in enumerate(outputs):
+        test_case.assertTrue(np.array_equal(y, np.full(4, i * 2)))
+        ys.append(y)
+    test_case.assertLess(len(set(id(y) for y in ys)), 4)
+
+
+def _test_mismatched_released_outputs(test_case):
+    session = _FakeRuntimeSession(output_shape=(2, 2))
+    mismatched_buffers = [
+        np.zeros(4, dtype=np.float32),
+        np.zeros((2, 2), dtype=np.float64),
+    ]
+    for buffer in mismatched_buffers:
+        session.release_outputs([buffer], "job")
+        (y,) = session.run("job", x=np.ones(4, dtype=np.float32))
+        test_case.assertFalse(y is buffer)
+        test_case.assertEqual(y.shape, (2, 2))
+        test_case.assertEqual(y.dtype, np.float32)
+        test_case.assertTrue(np.array_equal(y, np.full((2, 2), 2)))
+    stats = session.copy_stats()
+    test_case.assertEqual(stats["allocated_bytes"], stats["pulled_bytes"])
+
+
+def _test_run_into(test_case):
+    session = _FakeRuntimeSession()
+    out = np.zeros(4, dtype=np.float32)
+    (y,) = session.run_into("job", [out], x=np.ones(4, dtype=np.float32))
+    test_case.assertTrue(y is out)
+    test_case.assertTrue(np.array_equal(out, np.full(4, 2)))
+    for mismatched_out in [
+        np.zeros(3, dtype=np.float32),
+        np.zeros(4, dtype=np.float64),
+    ]:
+        with test_case.assertRaises(ValueError):
+            session.run_into(
+                "job", {"y": mismatched_out}, x=np.ones(4, dtype=np.float32)
+            )
+    with test_case.assertRaises(ValueError):
+        session.run_into(
+            "job", [np.zeros(8, dtype=np.float32)[::2]], x=np.ones(4, dtype=np.float32)
+        )
+
+
+def _test_copy_stats(test_case):
+    session = _FakeRuntimeSession()
+    nbytes = 4 * 4
+    session.run("job", x=np.ones(4, dtype=np.float32))
+    # inputs of another dtype or not contiguous are staged in a converted copy
+    session.run("job", x=np.ones(4, dtype=np.float64))
+    session.run("job", x=np.ones(8, dtype=np.float32)[::2])
+    # outputs pulled into the caller's arrays are not allocated
+    session.run_into(
+        "job", [np.zeros(4, dtype=np.float32)], x=np.ones(4, dtype=np.float32)
+    )
+    stats = session.copy_stats()
+    test_case.assertEqual(stats["num_requests"], 4)
+    test_case.assertEqual(stats["pushed_bytes"], 4 * nbytes)
+    test_case.assertEqual(stats["pulled_bytes"], 4 * nbytes)
+    test_case.assertEqual(stats["staged_bytes"], 2 * nbytes)
+    test_case.assertEqual(stats["allocated_bytes"], 3 * nbytes)
+    test_case.assertEqual(stats["copied_bytes_per_request"], 10 * nbytes / 4)
+    test_case.assertEqual(stats["max_copied_bytes_per_request"], 3 * nbytes)
+
+
+@flow.unittest.skip_unless_1n1d()
+class TestInferenceSession(flow.unittest.TestCase):
+    def test_max_in_flight_jobs(test_case):
+        _test_max_in_flight_jobs(test_case, None)
+        _test_max_in_flight_jobs(test_case, 1)
+        _test_max_in_flight_jobs(test_case, 2)
+
+    def test_reuse_released_outputs(test_case):
+        _test_reuse_released_outputs(test_case)
+
+    def test_mismatched_released_outputs(test_case):
+        _test_mismatched_released_outputs(test_case)
+
+    def test_run_into(test_case):
+        _test_run_into(test_case)
+
+    def test_copy_stats(test_case):
+        _test_copy_stats(test_case)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,188 @@
+"""
+Copyright 2020 The OneFlow Authors. All rights reserved.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+import concurrent.futures
+import itertools
+import multiprocessing
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+import oneflow as flow
+import oneflow.unittest
+from oneflow.serving import model_registry
+
+_clock = itertools.count()
+
+
+class _FakeWorker(object):
+    # Answers a request with the version of the model and its inputs, instead of
+    # running a session in a worker process
+    def __init__(self, registry, model_version):
+        self.registry = registry
+        self.model_version = model_version
+        self.footprint_bytes = 1
+        self.last_used_time = next(_clock)
+        self.closed = False
+
+    def submit(self, inputs):
+        assert not self.registry.lock_.locked()
+        assert not self.closed
+        self.last_used_time = next(_clock)
+        future = concurrent.futures.Future()
+        future.set_result((self.model_version, inputs))
+        return future
+
+    def close(self):
+        self.closed = True
+
+
+class _FakeModelRegistry(flow.serving.ModelRegistry):
+    def __init__(self, **kwargs):
+        super(_FakeModelRegistry, self).__init__(**kwargs)
+        self.saved_model_dir = tempfile.mkdtemp()
+        self.version2worker = {}
+
+    def _make_worker(self, saved_model_dir, model_version, batch_size, load_kwargs):
+        worker = _FakeWorker(self, model_version)
+        self.version2worker[model_version] = worker
+        return worker
+
+    def load_version(self, model_version, **kwargs):
+        return self.load(
+            "model", self.saved_model_dir, model_version=model_version, **kwargs
+        ).result()
+
+
+def _test_load_and_activate(test_case):
+    registry = _FakeModelRegistry()
+    test_case.assertEqual(registry.load_version(1), 1)
+    test_case.assertEqual(registry.run("model", x=1), (1, {"x": 1}))
+    registry.load_version(2)
+    test_case.assertEqual(registry.run("model", x=2), (2, {"x": 2}))
+    # a version loaded without activation only serves the requests naming it
+    registry.load_version(3, activate=False)
+    test_case.assertEqual(
+        registry.list_models(), {"model": {"versions": [1, 2, 3], "active_version": 2}}
+    )
+    test_case.assertEqual(registry.run("model", x=3)[0], 2)
+    test_case.assertEqual(registry.run("model", model_version=3, x=3)[0], 3)
+    # loading a loaded version reuses its worker
+    worker = registry.version2worker[3]
+    registry.load_version(3)
+    test_case.assertTrue(registry.model_name2version2worker_["model"][3] is worker)
+    test_case.assertEqual(registry.run("model", x=4)[0], 3)
+    with test_case.assertRaises(ValueError):
+        registry.run("model", model_version=4)
+    with test_case.assertRaises(ValueError):
+        registry.run("other_model")
+    registry.close()
+    test_case.assertTrue(all(w.closed for w in registry.version2worker.values()))
+
+
+def _test_rollback(test_case):
+    registry = _FakeModelRegistry()
+    registry.load_version(1)
+    registry.load_version(2)
+    registry.activate("model", 1)
+    test_case.assertEqual(registry.run("model", x=1)[0], 1)
+    with test_case.assertRaises(ValueError):
+        registry.activate("model", 3)
+    with test_case.assertRaises(ValueError):
+        registry.unload("model", 1)
+    registry.unload("model", 2)
+    test_case.assertTrue(registry.version2worker[2].closed)
+    test_case.assertEqual(registry.list_models()["model"]["versions"], [1])
+    registry.close()
+
+
+def _test_evict(test_case):
+    registry = _FakeModelRegistry(memory_budget_bytes=2)
+    registry.load_version(1)
+    registry.load_version(2)
+    # version 1 is used after version 2 is loaded, so version 2 is the least
+    # recently used inactive version once version 3 is active
+    registry.run("model", model_version=1)
+    registry.load_version(3)
+    test_case.assertEqual(
+        registry.list_models(), {"model": {"versions": [1, 3], "active_version": 3}}
+    )
+    test_case.assertTrue(registry.version2worker[2].closed)
+    test_case.assertFalse(registry.version2worker[1].closed)
+    test_case.assertEqual(registry.memory_usage()["footprint_bytes"], 2)
+    # the active version is never evicted
+    registry.load_version(4, activate=False)
+    registry.load_version(5, activate=False)
+    test_case.assertEqual(
+        registry.list_models(), {"model": {"versions": [3, 5], "active_version": 3}}
+    )
+    registry.close()
+
+
+def _test_concurrent_loads(test_case):
+    # the first version loaded is activated even without activate, by one load
+    registry = _FakeModelRegistry(max_loading_workers=4)
+    futures = [
+        registry.load(
+            "model", registry.saved_model_dir, model_version=v, activate=False
+        )
+        for v in range(1, 9)
+    ]
+    test_case.assertEqual(sorted(f.result() for f in futures), list(range(1, 9)))
+    models = registry.list_models()
+    test_case.assertEqual(models["model"]["versions"], list(range(1, 9)))
+    test_case.assertIn(models["model"]["active_version"], range(1, 9))
+    registry.close()
+
+
+def _serve_forever(conn, *args):
+    time.sleep(600)
+
+
+def _test_load_timeout(test_case):
+    # fork, so that the worker runs the patched _serve
+    mp_context = multiprocessing.get_context("fork")
+    start_time = time.monotonic()
+    with mock.patch.object(model_registry, "_serve", _serve_forever):
+        with test_case.assertRaises(TimeoutError):
+            model_registry._ModelWorker(
+                mp_context, None, tempfile.mkdtemp(), 1, None, {}, load_timeout=1
+            )
+    test_case.assertLess(time.monotonic() - start_time, 60)
+    # the worker is terminated
+    test_case.assertEqual(mp_context.active_children(), [])
+
+
+@flow.unittest.skip_unless_1n1d()
+class TestModelRegistry(flow.unittest.TestCase):
+    def test_load_and_activate(test_case):
+        _test_load_and_activate(test_case)
+
+    def test_rollback(test_case):
+        _test_rollback(test_case)
+
+    def test_evict(test_case):
+        _test_evict(test_case)
+
+    def test_concurrent_loads(test_case):
+        _test_concurrent_loads(test_case)
+
+    def test_load_timeout(test_case):
+        _test_load_timeout(test_case)
+
+
+if __name__ == "__main__":
+    unittest.main()
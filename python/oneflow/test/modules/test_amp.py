@@ -0,0 +1,106 @@
+"""
+Copyright 2020 The OneFlow Authors. All rights reserved.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+import os
+import unittest
+import warnings
+
+import numpy as np
+
+import oneflow as flow
+import oneflow.unittest
+
+
+def _test_autocast(test_case):
+    linear = flow.nn.Linear(4, 4).to("cuda")
+    x = flow.randn(2, 4, device="cuda")
+    with flow.amp.autocast("cuda"):
+        test_case.assertTrue(flow.amp.is_autocast_enabled())
+        y = linear(x)
+        test_case.assertEqual(y.dtype, flow.float16)
+        # the clear list ops keep the type of their inputs
+        test_case.assertEqual(flow.relu(y).dtype, flow.float16)
+        # the gray list ops run in float if their inputs are mixed
+        test_case.assertEqual((y + x).dtype, flow.float32)
+        with flow.amp.autocast("cuda", enabled=False):
+            test_case.assertEqual(linear(x).dtype, flow.float32)
+        z = linear(y)
+    test_case.assertFalse(flow.amp.is_autocast_enabled())
+    test_case.assertEqual(linear(x).dtype, flow.float32)
+    z.float().sum().backward()
+    test_case.assertEqual(linear.weight.grad.dtype, flow.float32)
+
+
+def _test_autocast_cpu(test_case):
+    with warnings.catch_warnings(record=True) as w:
+        warnings.simplefilter("always")
+        with flow.amp.autocast("cpu"):
+            test_case.assertFalse(flow.amp.is_autocast_enabled())
+            y = flow.nn.Linear(4, 4)(flow.randn(2, 4))
+        test_case.assertEqual(len(w), 1)
+    test_case.assertEqual(y.dtype, flow.float32)
+
+
+def _test_grad_scaler(test_case):
+    linear = flow.nn.Linear(4, 1)
+    optimizer = flow.optim.SGD(linear.parameters(), lr=0.1)
+    scaler = flow.amp.GradScaler(init_scale=4.0, growth_interval=2)
+    x = flow.randn(8, 4)
+
+    weight = linear.weight.numpy()
+    scaler.scale(linear(x).sum()).backward()
+    grad = linear.weight.grad.numpy() / 4.0
+    scaler.step(optimizer)
+    scaler.update()
+    test_case.assertTrue(
+        np.allclose(linear.weight.numpy(), weight - 0.1 * grad, atol=1e-5)
+    )
+    test_case.assertEqual(scaler.get_scale(), 4.0)
+
+    # the step is skipped if any grad is inf or nan
+    optimizer.zero_grad()
+    scaler.scale(linear(x).sum()).backward()
+    linear.bias.grad.fill_(float("inf"))
+    weight = linear.weight.numpy()
+    scaler.step(optimizer)
+    scaler.update()
+    test_case.assertTrue(np.array_equal(linear.weight.numpy(), weight))
+    test_case.assertEqual(scaler.get_scale(), 2.0)
+
+    for _ in range(2):
+        optimizer.zero_grad()
+        scaler.scale(linear(x).sum()).backward()
+        scaler.unscale_(optimizer)
+        test_case.assertRaises(RuntimeError, scaler.unscale_, optimizer)
+        scaler.step(optimizer)
+        scaler.update()
+    test_case.assertEqual(scaler.get_scale(), 4.0)
+
+
+@flow.unittest.skip_unless_1n1d()
+class TestAmp(flow.unittest.TestCase):
+    @unittest.skipIf(os.getenv("ONEFLOW_TEST_CPU_ONLY"), "only test cpu cases")
+    def test_autocast(test_case):
+        _test_autocast(test_case)
+
+    def test_autocast_cpu(test_case):
+        _test_autocast_cpu(test_case)
+
+    def test_grad_scaler(test_case):
+        _test_grad_scaler(test_case)
+
+
+if __name__ == "__main__":
+    unittest.main()
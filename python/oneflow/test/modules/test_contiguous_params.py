@@ -0,0 +1,99 @@
+"""
+Copyright 2020 The OneFlow Authors. All rights reserved.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+import os
+import unittest
+
+import numpy as np
+
+import oneflow as flow
+import oneflow.unittest
+
+
+def _make_model(device):
+    flow.manual_seed(0)
+    return flow.nn.Sequential(
+        flow.nn.Linear(5, 7), flow.nn.ReLU(), flow.nn.Linear(7, 3)
+    ).to(device)
+
+
+def _train(model, parameters, params_for_clip, x, iters):
+    optimizer = flow.optim.Adam(parameters, lr=0.1)
+    for _ in range(iters):
+        model(x).sum().backward()
+        flow.nn.utils.clip_grad_norm_(params_for_clip, 0.5)
+        optimizer.step()
+        optimizer.zero_grad()
+    return optimizer
+
+
+def _test_contiguous_params_train(test_case, device):
+    x = flow.randn(4, 5, device=device)
+    model = _make_model(device)
+    _train(model, model.parameters(), model.parameters(), x, 3)
+
+    contiguous_model = _make_model(device)
+    params = flow.nn.utils.ContiguousParams(contiguous_model.parameters())
+    test_case.assertEqual(len(params.parameters()), 1)
+    optimizer = _train(contiguous_model, params.parameters(), params.parameters(), x, 3)
+    for p, q in zip(model.parameters(), contiguous_model.parameters()):
+        test_case.assertTrue(np.allclose(p.numpy(), q.numpy(), 1e-4, 1e-4))
+        test_case.assertTrue(np.allclose(q.grad.numpy(), 0))
+
+    # optimizer states are flat buffers too
+    flat_param = params.parameters()[0]
+    exp_avg = params.views([optimizer._state[flat_param]["exp_avg"]])
+    test_case.assertEqual(len(exp_avg), 4)
+    for param, state in exp_avg.items():
+        test_case.assertEqual(state.shape, param.shape)
+
+
+def _test_contiguous_params_view(test_case, device):
+    model = _make_model(device)
+    origin = [p.numpy() for p in model.parameters()]
+    params = flow.nn.utils.ContiguousParams(model.parameters())
+    for p, value in zip(model.parameters(), origin):
+        test_case.assertTrue(np.array_equal(p.numpy(), value))
+
+    # parameters share memory with the flat buffer
+    flat_param = params.parameters()[0]
+    with flow.no_grad():
+        flat_param.fill_(1.0)
+    for p in model.parameters():
+        test_case.assertTrue(np.array_equal(p.numpy(), np.ones(p.shape)))
+
+    # grads are accumulated into the flat buffer
+    model(flow.ones(2, 5, device=device)).sum().backward()
+    test_case.assertTrue(np.all(flat_param.grad.numpy() >= 0))
+    test_case.assertTrue(np.any(flat_param.grad.numpy() > 0))
+    params.zero_grad()
+    for p in model.parameters():
+        test_case.assertTrue(np.array_equal(p.grad.numpy(), np.zeros(p.shape)))
+
+
+@flow.unittest.skip_unless_1n1d()
+class TestContiguousParams(flow.unittest.TestCase):
+    def test_contiguous_params_cpu(test_case):
+        _test_contiguous_params_train(test_case, "cpu")
+        _test_contiguous_params_view(test_case, "cpu")
+
+    @unittest.skipIf(os.getenv("ONEFLOW_TEST_CPU_ONLY"), "only test cpu cases")
+    def test_contiguous_params_gpu(test_case):
+        _test_contiguous_params_train(test_case, "cuda")
+        _test_contiguous_params_view(test_case, "cuda")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -304,6 +304,47 @@ class TestDDP(flow.unittest.TestCase):
         for dev_type in test_device:
             test_case._test_broadcast_buffer(dev_type)
 
+    def _test_ddp_bucket_cap(test_case, dev_type, dtype):
+        class Mul(flow.nn.Module):
+            def __init__(self):
+                super().__init__()
+                for i in range(10):
+                    self.register_parameter(
+                        f"w{i}",
+                        flow.nn.Parameter(flow.ones(1000, dtype=dtype) * (i % 2 + 1)),
+                    )
+
+            def forward(self, x):
+                for i in range(10):
+                    x = x * getattr(self, f"w{i}")
+                return x
+
+        rank = flow.env.get_rank()
+        x = flow.ones(1000, dtype=dtype) * (rank + 1)
+        x = x.to(dev_type)
+        m = Mul().to(dev_type)
+        # about 3 params per bucket
+        m = ddp(m, bucket_cap_mb=3 * 1024 * m.w0.element_size() / 1024 / 1024)
+        test_case.assertEqual(len(m._buckets), 4)
+
+        for _ in range(2):
+            y = m(x)
+            y.sum().backward()
+
+        for i in range(10):
+            test_case.assertTrue(
+                np_allclose_with_shape(
+                    getattr(m, f"w{i}").grad.numpy().astype(np.float32),
+                    np.full(1000, 96) if i % 2 == 0 else np.full(1000, 48),
+                )
+            )
+
+    def test_ddp_bucket_cap(test_case):
+        for dev_type in test_device:
+            test_case._test_ddp_bucket_cap(dev_type, flow.float32)
+        if "cuda" in test_device:
+            test_case._test_ddp_bucket_cap("cuda", flow.float16)
+
 
 if __name__ == "__main__":
     unittest.main()
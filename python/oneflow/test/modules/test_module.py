@@ -15,6 +15,7 @@ limitations under the License.
 """
 
 import os
+import shutil
 import warnings
 import tempfile
 import unittest
@@ -201,6 +202,25 @@ class TestModule(flow.unittest.TestCase):
         res2 = m()
         test_case.assertTrue(np.array_equal(res1.numpy(), res2.numpy()))
 
+    @flow.unittest.skip_unless_1n1d()
+    def test_load_mmap(test_case):
+        m = flow.nn.Linear(128, 64)
+        with tempfile.TemporaryDirectory() as save_dir:
+            flow.save(m.state_dict(), save_dir)
+            loaded = flow.load(save_dir, mmap=True)
+            test_case.assertTrue(
+                np.array_equal(loaded["weight"].numpy(), m.weight.numpy())
+            )
+            # Writing a memory-mapped tensor doesn't modify the checkpoint.
+            loaded["weight"].add_(1)
+            reloaded = flow.load(save_dir, mmap=True)
+            test_case.assertTrue(
+                np.array_equal(reloaded["weight"].numpy(), m.weight.numpy())
+            )
+            m2 = flow.nn.Linear(128, 64)
+            m2.load_state_dict(reloaded)
+        test_case.assertTrue(np.array_equal(m2.bias.numpy(), m.bias.numpy()))
+
     @flow.unittest.skip_unless_1n4d()
     def test_save_and_load_global_from_nested_dict(test_case):
         class CustomModule(flow.nn.Module):
@@ -255,6 +275,186 @@ class TestModule(flow.unittest.TestCase):
 
         test_case.assertTrue(np.array_equal(res1.numpy(), res2.numpy()))
 
+    @flow.unittest.skip_unless_1n1d()
+    def test_save_and_load_sharded(test_case):
+        class CustomModule(flow.nn.Module):
+            def __init__(self):
+                super().__init__()
+                self.param1 = flow.nn.Parameter(flow.randn(32, 1024))
+                self.param2 = flow.nn.Parameter(flow.randn(1024, 3))
+                self.register_buffer("step", flow.tensor([7], dtype=flow.int64))
+
+            def forward(self):
+                return self.param1.sum() + self.param2.sum() + self.step
+
+        m = CustomModule()
+        res1 = m()
+        obj = {"model": m.state_dict(), "extra": [flow.ones(5, 5), 3]}
+        with tempfile.TemporaryDirectory() as save_dir:
+            # A small shard size makes tensors packed into several shard files.
+            flow.save(obj, save_dir, sharded=True, max_shard_size=64 * 1024)
+            shard_files = [f for f in os.listdir(save_dir) if "sharded_data" in f]
+            test_case.assertTrue(1 < len(shard_files) < 4)
+
+            loaded = flow.load(save_dir)
+            m2 = CustomModule()
+            m2.load_state_dict(loaded["model"])
+            test_case.assertEqual(loaded["extra"][1], 3)
+            test_case.assertTrue(
+                np.array_equal(loaded["extra"][0].numpy(), np.ones((5, 5)))
+            )
+            test_case.assertEqual(loaded["model"]["step"].dtype, flow.int64)
+        res2 = m2()
+        test_case.assertTrue(np.allclose(res1.numpy(), res2.numpy()))
+
+    @flow.unittest.skip_unless_1n1d()
+    def test_save_sharded_failed(test_case):
+        with tempfile.TemporaryDirectory() as save_dir:
+            # A lambda cannot be pickled, so nothing is published for the tensors
+            # already written.
+            with test_case.assertRaises(Exception):
+                flow.save([flow.ones(4), lambda: None], save_dir, sharded=True)
+            test_case.assertFalse(
+                any(
+                    "sharded_index" in f or "pickled_data" in f
+                    for f in os.listdir(save_dir)
+                )
+            )
+
+    @flow.unittest.skip_unless_1n1d()
+    def test_save_and_load_sharded_empty(test_case):
+        with tempfile.TemporaryDirectory() as save_dir:
+            # The shard file of empty tensors is empty.
+            flow.save([flow.ones(0), flow.ones(2, 0)], save_dir, sharded=True)
+            loaded = flow.load(save_dir)
+            test_case.assertEqual(loaded[0].shape, flow.Size([0]))
+            test_case.assertEqual(loaded[1].shape, flow.Size([2, 0]))
+
+    @flow.unittest.skip_unless_1n1d()
+    @unittest.skipIf(os.getenv("ONEFLOW_TEST_CPU_ONLY"), "only test cpu cases")
+    def test_save_async(test_case):
+        m = flow.nn.Linear(64, 32).to("cuda")
+        optimizer = flow.optim.SGD(m.parameters(), lr=0.1)
+        m(flow.randn(4, 64, device="cuda")).sum().backward()
+        optimizer.step()
+        optimizer.zero_grad()
+        weight = m.weight.numpy()
+        checkpointer = flow.framework.async_checkpoint.AsyncCheckpointer()
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            save_dir = os.path.join(tmp_dir, "checkpoint")
+            future = checkpointer.save(
+                {"model": m.state_dict(), "optimizer": optimizer.state_dict()},
+                save_dir,
+            )
+            # Updates after save() returns are not in the checkpoint.
+            m(flow.randn(4, 64, device="cuda")).sum().backward()
+            optimizer.step()
+            metrics = future.result()
+            test_case.assertGreater(metrics["bytes"], 64 * 32 * 4)
+            loaded = flow.load(save_dir)
+            test_case.assertTrue(
+                np.array_equal(loaded["model"]["weight"].numpy(), weight)
+            )
+            # The snapshot is taken in host memory, so tensors are loaded on cpu.
+            test_case.assertEqual(loaded["model"]["weight"].device, flow.device("cpu"))
+            test_case.assertEqual(
+                loaded["optimizer"]["param_groups"][0]["_options"]["lr"], 0.1
+            )
+
+            test_case.assertTrue(os.path.islink(save_dir))
+            test_case.assertEqual(os.readlink(save_dir), "checkpoint.v1")
+
+            # A new checkpoint of the same path replaces the old one.
+            checkpointer.save(m.state_dict(), save_dir, sharded=True)
+            checkpointer.wait()
+            loaded = flow.load(save_dir)
+            test_case.assertTrue(
+                np.array_equal(loaded["weight"].numpy(), m.weight.numpy())
+            )
+            test_case.assertEqual(os.readlink(save_dir), "checkpoint.v2")
+            test_case.assertEqual(
+                sorted(os.listdir(tmp_dir)), ["checkpoint", "checkpoint.v2"]
+            )
+            test_case.assertEqual(checkpointer.metrics()["num_saved"], 2)
+
+    @flow.unittest.skip_unless_1n1d()
+    def test_save_async_cpu(test_case):
+        m = flow.nn.Linear(8, 4)
+        weight = m.weight.numpy().copy()
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            save_dir = os.path.join(tmp_dir, "checkpoint")
+            future = flow.save_async(m.state_dict(), save_dir)
+            # The snapshot is a copy, so in-place updates after save_async returns
+            # are not in the checkpoint.
+            with flow.no_grad():
+                m.weight.fill_(0)
+            test_case.assertGreater(future.result()["bytes"], 8 * 4 * 4)
+            loaded = flow.load(save_dir)
+            test_case.assertTrue(np.array_equal(loaded["weight"].numpy(), weight))
+            test_case.assertTrue(os.path.islink(save_dir))
+
+            flow.save_async(m.state_dict(), save_dir, sharded=True).result()
+            loaded = flow.load(save_dir)
+            test_case.assertTrue(
+                np.array_equal(loaded["weight"].numpy(), np.zeros((4, 8)))
+            )
+            test_case.assertEqual(
+                sorted(os.listdir(tmp_dir)), ["checkpoint", "checkpoint.v2"]
+            )
+
+    @flow.unittest.skip_unless_1n2d()
+    @unittest.skipIf(os.getenv("ONEFLOW_TEST_CPU_ONLY"), "only test cpu cases")
+    def test_save_and_load_global_sharded(test_case):
+        placement = flow.placement("cuda", [0, 1])
+        split = flow.randn(4, 6).to_global(placement, flow.sbp.broadcast)
+        split = split.to_global(sbp=flow.sbp.split(0))
+        broadcast = flow.randn(3, 3).to_global(placement, flow.sbp.broadcast)
+        state_dict = {"split": split, "broadcast": broadcast}
+
+        # Every rank writes its own local components to the same directory.
+        f = os.path.join(tempfile.gettempdir(), "test_save_and_load_global_sharded")
+        flow.save(state_dict, f, sharded=True)
+        flow.comm.barrier()
+        loaded = flow.load(f)
+        test_case.assertEqual(loaded["split"].sbp, (flow.sbp.split(0),))
+        test_case.assertEqual(loaded["broadcast"].sbp, (flow.sbp.broadcast,))
+        test_case.assertTrue(np.array_equal(loaded["split"].numpy(), split.numpy()))
+        test_case.assertTrue(
+            np.array_equal(loaded["broadcast"].numpy(), broadcast.numpy())
+        )
+        flow.comm.barrier()
+        if flow.env.get_rank() == 0:
+            shutil.rmtree(f)
+
+    @flow.unittest.skip_unless_1n2d()
+    @unittest.skipIf(os.getenv("ONEFLOW_TEST_CPU_ONLY"), "only test cpu cases")
+    def test_save_and_load_local_sharded(test_case):
+        rank = flow.env.get_rank()
+        x = flow.full((3,), rank, dtype=flow.float32, device="cuda")
+        f = os.path.join(tempfile.gettempdir(), "test_save_and_load_local_sharded")
+        flow.save({"x": x}, f, sharded=True)
+        # The pickled object is written by rank 0, but each rank loads its own
+        # tensor onto its own device.
+        loaded = flow.load(f)
+        test_case.assertEqual(loaded["x"].device, x.device)
+        test_case.assertTrue(np.array_equal(loaded["x"].numpy(), x.numpy()))
+        flow.comm.barrier()
+        if rank == 0:
+            shutil.rmtree(f)
+
+    @flow.unittest.skip_unless_1n2d()
+    def test_save_sharded_failed_on_one_rank(test_case):
+        rank = flow.env.get_rank()
+        f = os.path.join(tempfile.gettempdir(), "test_save_sharded_failed_on_one_rank")
+        # A lambda cannot be pickled, the failure on rank 1 is raised on all ranks.
+        obj = [flow.ones(4), 1 if rank == 0 else (lambda: None)]
+        with test_case.assertRaises(Exception):
+            flow.save(obj, f, sharded=True)
+        test_case.assertFalse(os.path.exists(os.path.join(f, "pickled_data")))
+        flow.comm.barrier()
+        if rank == 0:
+            shutil.rmtree(f)
+
     @flow.unittest.skip_unless_1n1d()
     @unittest.skipIf(os.getenv("ONEFLOW_TEST_CPU_ONLY"), "only test cpu cases")
     def test_module_cpu_cuda(test_case):
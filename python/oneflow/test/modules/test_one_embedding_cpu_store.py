@@ -0,0 +1,116 @@
+"""
+Copyright 2020 The OneFlow Authors. All rights reserved.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+import os
+import tempfile
+import unittest
+
+import oneflow as flow
+import oneflow.unittest
+
+
+def _test_cpu_store(test_case, cache_policy):
+    with tempfile.TemporaryDirectory() as persistent_path:
+        store_options = flow.one_embedding.make_cpu_store_options(
+            persistent_path, cache_budget_mb=1, cache_policy=cache_policy
+        )
+        embedding = flow.one_embedding.MultiTableEmbedding(
+            "cpu_store_" + cache_policy,
+            embedding_dim=16,
+            dtype=flow.float,
+            key_type=flow.int64,
+            tables=None,
+            store_options=store_options,
+        )
+        stats = embedding.cache_stats()
+        test_case.assertEqual(len(stats), 1)
+        test_case.assertGreaterEqual(stats[0]["capacity"], 1024 * 1024 // (16 * 4))
+        test_case.assertEqual(stats[0]["num_queries"], 0)
+        test_case.assertEqual(stats[0]["size"], 0)
+        test_case.assertEqual(stats[0]["hit_rate"], 0.0)
+        # prefetching does not count as queries of the cache
+        embedding.prefetch(flow.tensor([1, 2, 3], dtype=flow.int64))
+        test_case.assertEqual(embedding.cache_stats()[0]["num_queries"], 0)
+        embedding.save_snapshot("init")
+        embedding.load_snapshot("init")
+        snapshots_dir = os.path.join(persistent_path, "0-1", "snapshots")
+        embedding.save_snapshot("delta", delta=True)
+        test_case.assertTrue(
+            os.path.exists(os.path.join(snapshots_dir, "delta", "PARENT"))
+        )
+        embedding.compact_snapshot("delta")
+        test_case.assertFalse(
+            os.path.exists(os.path.join(snapshots_dir, "delta", "PARENT"))
+        )
+        embedding.load_snapshot("delta")
+        state_dict = embedding.state_dict()
+        test_case.assertIn("OneEmbedding", state_dict)
+
+
+def _test_cpu_store_without_cache(test_case):
+    with tempfile.TemporaryDirectory() as persistent_path:
+        store_options = flow.one_embedding.make_cpu_store_options(persistent_path)
+        embedding = flow.one_embedding.MultiTableEmbedding(
+            "cpu_store_without_cache",
+            embedding_dim=16,
+            dtype=flow.float,
+            key_type=flow.int64,
+            tables=None,
+            store_options=store_options,
+        )
+        test_case.assertEqual(embedding.cache_stats(), [])
+        embedding.prefetch(flow.tensor([1, 2, 3], dtype=flow.int64))
+
+
+def _test_cpu_store_quantized(test_case, storage_dtype, value_size):
+    with tempfile.TemporaryDirectory() as persistent_path:
+        store_options = flow.one_embedding.make_cpu_store_options(
+            persistent_path,
+            cache_budget_mb=1,
+            size_factor=2,
+            storage_dtype=storage_dtype,
+            quantize_states=True,
+        )
+        embedding = flow.one_embedding.MultiTableEmbedding(
+            "cpu_store_quantized_" + str(value_size),
+            embedding_dim=16,
+            dtype=flow.float,
+            key_type=flow.int64,
+            tables=None,
+            store_options=store_options,
+        )
+        # the cache holds the lines at the storage width
+        stats = embedding.cache_stats()
+        test_case.assertGreaterEqual(stats[0]["capacity"], 1024 * 1024 // value_size)
+        embedding.save_snapshot("init")
+        embedding.load_snapshot("init")
+
+
+@flow.unittest.skip_unless_1n1d()
+class TestOneEmbeddingCpuStore(flow.unittest.TestCase):
+    def test_cpu_store(test_case):
+        _test_cpu_store(test_case, "lru")
+        _test_cpu_store(test_case, "clock")
+        _test_cpu_store_without_cache(test_case)
+
+    def test_cpu_store_float16(test_case):
+        _test_cpu_store_quantized(test_case, flow.float16, 2 * 16 * 2)
+
+    def test_cpu_store_int8(test_case):
+        _test_cpu_store_quantized(test_case, flow.int8, 2 * (4 + 16))
+
+
+if __name__ == "__main__":
+    unittest.main()
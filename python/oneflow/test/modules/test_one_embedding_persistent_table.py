@@ -0,0 +1,138 @@
+"""
+Copyright 2020 The OneFlow Authors. All rights reserved.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+import oneflow as flow
+import oneflow.unittest
+
+
+def _read_all(test_case, paths, snapshot_name, value_type, batch_size):
+    reader = flow.one_embedding.PersistentTableReader(
+        paths,
+        snapshot_name,
+        flow.int64,
+        value_type,
+        16,
+        batch_size=batch_size,
+        physical_block_size=512,
+    )
+    rows = {}
+    for keys, values in reader:
+        test_case.assertLessEqual(keys.shape[0], batch_size)
+        test_case.assertEqual(values.shape, (keys.shape[0], 16))
+        for key, value in zip(keys.tolist(), values):
+            test_case.assertNotIn(key, rows)
+            rows[key] = value
+    return rows
+
+
+def _test_write_and_read(test_case, num_shards):
+    with tempfile.TemporaryDirectory() as root:
+        src_paths = [os.path.join(root, "src", str(i)) for i in range(num_shards)]
+        keys = np.arange(10000, dtype=np.int64) * 7
+        values = np.random.rand(keys.shape[0], 16).astype(np.float32)
+        with flow.one_embedding.PersistentTableWriter(
+            src_paths,
+            "init",
+            flow.int64,
+            flow.float,
+            16,
+            batch_size=4096,
+            physical_block_size=512,
+        ) as writer:
+            writer.write(keys, values)
+            # the rows written again replace the former ones
+            writer.write(keys[:100], values[:100] + 1)
+        values[:100] += 1
+        for path in src_paths:
+            test_case.assertTrue(
+                os.path.exists(os.path.join(path, "snapshots", "init", "LIST"))
+            )
+
+        rows = _read_all(test_case, src_paths, "init", flow.float, 3000)
+        test_case.assertEqual(sorted(rows.keys()), keys.tolist())
+        for key, value in zip(keys.tolist(), values):
+            test_case.assertTrue(np.array_equal(rows[key], value))
+
+        # filter the even keys into a single float16 table
+        dst_path = os.path.join(root, "dst")
+        reader = flow.one_embedding.PersistentTableReader(
+            src_paths, "init", flow.int64, flow.float, 16, physical_block_size=512
+        )
+        with flow.one_embedding.PersistentTableWriter(
+            dst_path, "fp16", flow.int64, flow.float16, 16, physical_block_size=512
+        ) as writer:
+            for keys_chunk, values_chunk in reader:
+                mask = keys_chunk % 2 == 0
+                writer.write(keys_chunk[mask], values_chunk[mask])
+        rows = _read_all(test_case, dst_path, "fp16", flow.float16, 1024)
+        even_keys = keys[keys % 2 == 0]
+        test_case.assertEqual(sorted(rows.keys()), even_keys.tolist())
+        for key, value in zip(keys.tolist(), values):
+            if key % 2 == 0:
+                test_case.assertTrue(np.allclose(rows[key], value, atol=1e-3))
+
+
+def _test_default_physical_block_size(test_case):
+    with tempfile.TemporaryDirectory() as root:
+        keys = np.arange(100, dtype=np.int64)
+        values = np.random.rand(keys.shape[0], 16).astype(np.float32)
+        # the default block size of new tables is that of make_*_store_options
+        path = os.path.join(root, "default")
+        with flow.one_embedding.PersistentTableWriter(
+            path, "init", flow.int64, flow.float, 16
+        ) as writer:
+            writer.write(keys, values)
+        with open(os.path.join(path, "PHYSICAL_BLOCK_SIZE")) as f:
+            test_case.assertEqual(int(f.read()), 512)
+        # the block size of existing tables is read from them
+        path = os.path.join(root, "4096")
+        with flow.one_embedding.PersistentTableWriter(
+            path, "init", flow.int64, flow.float, 16, physical_block_size=4096
+        ) as writer:
+            writer.write(keys, values)
+        with flow.one_embedding.PersistentTableWriter(
+            path, "more", flow.int64, flow.float, 16
+        ) as writer:
+            writer.write(keys + 100, values)
+        reader = flow.one_embedding.PersistentTableReader(
+            path, "more", flow.int64, flow.float, 16
+        )
+        test_case.assertEqual(reader.physical_block_size, 4096)
+        test_case.assertEqual(
+            sorted(np.concatenate([k for k, _ in reader]).tolist()),
+            list(range(100, 200)),
+        )
+
+
+@flow.unittest.skip_unless_1n1d()
+class TestOneEmbeddingPersistentTable(flow.unittest.TestCase):
+    def test_write_and_read(test_case):
+        _test_write_and_read(test_case, 1)
+
+    def test_write_and_read_sharded(test_case):
+        _test_write_and_read(test_case, 3)
+
+    def test_default_physical_block_size(test_case):
+        _test_default_physical_block_size(test_case)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,111 @@
+"""
+Copyright 2020 The OneFlow Authors. All rights reserved.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+import unittest
+from collections import OrderedDict
+
+import numpy as np
+from oneflow.test_utils.test_util import GenArgList
+
+import oneflow as flow
+from oneflow.nn.parameter import Parameter
+
+
+def _make_params(init_values, device, dtype):
+    return [
+        Parameter(flow.tensor(value, dtype=dtype, device=flow.device(device)))
+        for value in init_values
+    ]
+
+
+def _train(optim_cls, optim_kwargs, init_values, grad_seq, device, dtype, foreach):
+    params = _make_params(init_values, device, dtype)
+    optim = optim_cls(params, foreach=foreach, **optim_kwargs)
+    for grads in grad_seq:
+        for param, grad in zip(params, grads):
+            param.grad = flow.tensor(grad, dtype=dtype, device=flow.device(device))
+        optim.step()
+        optim.zero_grad()
+    return params
+
+
+def compare_foreach_with_per_param(
+    test_case, device, dtype, optim_cls, optim_kwargs, num_params, train_iters
+):
+    shapes = [
+        (np.random.randint(1, 8), np.random.randint(1, 64)) for _ in range(num_params)
+    ]
+    init_values = [np.random.uniform(size=shape) for shape in shapes]
+    grad_seq = [
+        [np.random.uniform(size=shape) for shape in shapes] for _ in range(train_iters)
+    ]
+    per_param_res = _train(
+        optim_cls, optim_kwargs, init_values, grad_seq, device, dtype, False
+    )
+    foreach_res = _train(
+        optim_cls, optim_kwargs, init_values, grad_seq, device, dtype, True
+    )
+    for x, y in zip(per_param_res, foreach_res):
+        test_case.assertTrue(np.allclose(x.numpy(), y.numpy(), rtol=1e-5, atol=1e-5))
+
+
+def _optim_arg_list():
+    return [
+        (flow.optim.SGD, {"lr": 0.1, "weight_decay": 0.01}),
+        (flow.optim.SGD, {"lr": 0.1, "momentum": 0.9, "weight_decay": 0.01}),
+        (flow.optim.Adam, {"lr": 0.01, "weight_decay": 0.01}),
+        (flow.optim.Adam, {"lr": 0.01, "do_bias_correction": False}),
+        (flow.optim.Adam, {"lr": 0.01, "amsgrad": True}),
+        (flow.optim.AdamW, {"lr": 0.01, "weight_decay": 0.01}),
+    ]
+
+
+@flow.unittest.skip_unless_1n1d()
+class TestOptimForeach(flow.unittest.TestCase):
+    def test_foreach_step(test_case):
+        arg_dict = OrderedDict()
+        arg_dict["device"] = ["cpu", "cuda"]
+        arg_dict["dtype"] = [flow.float32, flow.float64]
+        arg_dict["optim"] = _optim_arg_list()
+        # more than one launch of multi-tensor kernel
+        arg_dict["num_params"] = [3, 100]
+        arg_dict["train_iters"] = [5]
+        for device, dtype, (optim_cls, optim_kwargs), num_params, iters in GenArgList(
+            arg_dict
+        ):
+            compare_foreach_with_per_param(
+                test_case, device, dtype, optim_cls, optim_kwargs, num_params, iters
+            )
+
+    def test_foreach_state_dict(test_case):
+        params = _make_params([np.ones((2, 3)), np.ones((4,))], "cpu", flow.float32)
+        adam = flow.optim.Adam(params, lr=0.1, foreach=True)
+        for param in params:
+            param.grad = flow.ones_like(param)
+        adam.step()
+        state_dict = adam.state_dict()
+        test_case.assertEqual(tuple(state_dict["state"][0]["exp_avg"].shape), (2, 3))
+        test_case.assertEqual(tuple(state_dict["state"][1]["exp_avg_sq"].shape), (4,))
+
+        # options of an older state_dict have no foreach
+        del state_dict["param_groups"][0]["_options"]["foreach"]
+        adam = flow.optim.Adam(params, lr=0.1, foreach=True)
+        adam.load_state_dict(state_dict)
+        test_case.assertTrue(adam.param_groups[0]["foreach"])
+        adam.step()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -22,8 +22,10 @@ static methods.
 import re
 import collections
 
-import oneflow as flow
+import numpy as np
 
+import oneflow as flow
+from oneflow.multiprocessing.ring_buffer import get_worker_ring
 
 string_classes = (str, bytes)
 
@@ -71,13 +73,39 @@ default_convert_err_msg_format = (
 )
 
 
+def _new_numpy_batch(shape, dtype):
+    # In a DataLoader worker with a shared memory ring, create the batch in the
+    # ring, from which the main process maps it without copying.
+    ring = get_worker_ring()
+    out = ring.new_array(shape, dtype) if ring is not None else None
+    if out is None:
+        out = np.empty(shape, dtype=dtype)
+    return out
+
+
+def _stack_numpy(arrays):
+    # stack homogeneous arrays into one preallocated batch, instead of
+    # converting them into tensors one by one
+    elem = arrays[0]
+    if any(a.shape != elem.shape or a.dtype != elem.dtype for a in arrays):
+        return None
+    out = _new_numpy_batch((len(arrays),) + elem.shape, elem.dtype)
+    np.stack(arrays, out=out)
+    return flow.from_numpy(out)
+
+
 def default_collate(batch):
     r"""Puts each data field into a tensor with outer dimension batch size"""
 
     elem = batch[0]
     elem_type = type(elem)
     if isinstance(elem, (flow.Tensor, flow._oneflow_internal.Tensor)):
-        # TODO: tensor.storage()._new_shared(numel)
+        if get_worker_ring() is not None and all(
+            b.is_local and b.device.type == "cpu" for b in batch
+        ):
+            out = _stack_numpy([b.numpy() for b in batch])
+            if out is not None:
+                return out
         return flow._C.stack(batch, dim=0)
     elif (
         elem_type.__module__ == "numpy"
@@ -89,13 +117,25 @@ def default_collate(batch):
             if np_str_obj_array_pattern.search(elem.dtype.str) is not None:
                 raise TypeError(default_collate_err_msg_format.format(elem.dtype))
 
+            out = _stack_numpy(batch)
+            if out is not None:
+                return out
             return default_collate([flow.tensor(b) for b in batch])
         elif elem.shape == ():  # scalars
+            out = _stack_numpy(batch)
+            if out is not None:
+                return out
             return flow.tensor(batch)
     elif isinstance(elem, float):
-        return flow.tensor(batch, dtype=flow.float64)
+        out = _new_numpy_batch((len(batch),), np.float64)
+        out[:] = batch
+        return flow.from_numpy(out)
     elif isinstance(elem, int):
-        return flow.tensor(batch)
+        if not all(type(b) is int for b in batch):  # e.g. bool
+            return flow.tensor(batch)
+        out = _new_numpy_batch((len(batch),), np.int64)
+        out[:] = batch
+        return flow.from_numpy(out)
     elif isinstance(elem, string_classes):
         return batch
     elif isinstance(elem, collections.abc.Mapping):
@@ -17,6 +17,7 @@ limitations under the License.
 data from an iterable-style or map-style dataset. This logic is shared in both
 single- and multi-processing data loading.
 """
+from .collate import default_collate, default_convert
 
 
 class _BaseDatasetFetcher(object):
@@ -59,10 +60,22 @@ class _MapDatasetFetcher(_BaseDatasetFetcher):
         super(_MapDatasetFetcher, self).__init__(
             dataset, auto_collation, collate_fn, drop_last
         )
+        self.dataset_getitems = getattr(dataset, "__getitems__", None)
 
     def fetch(self, possibly_batched_index):
         if self.auto_collation:
-            data = [self.dataset[idx] for idx in possibly_batched_index]
+            data = None
+            if self.dataset_getitems is not None:
+                data = self.dataset_getitems(possibly_batched_index)
+                if not isinstance(data, list):
+                    # an already collated batch
+                    if self.collate_fn is default_collate:
+                        return default_convert(data)
+                    # a custom collate_fn expects a list of samples
+                    self.dataset_getitems = None
+                    data = None
+            if data is None:
+                data = [self.dataset[idx] for idx in possibly_batched_index]
         else:
             data = self.dataset[possibly_batched_index]
         return self.collate_fn(data)
@@ -0,0 +1,135 @@
+"""
+Copyright 2020 The OneFlow Authors. All rights reserved.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+r"""Contains definitions of the methods used by the _BaseDataLoaderIter to stage
+batches in host buffers and to prefetch them to device.
+
+These **needs** to be in global scope since Py2 doesn't support serializing
+static methods.
+"""
+import collections
+import queue
+import threading
+
+import oneflow as flow
+
+from . import MP_STATUS_CHECK_INTERVAL
+from .worker import ExceptionWrapper
+
+string_classes = (str, bytes)
+
+
+class StagingBufferPool(object):
+    r"""A bounded pool of host staging buffers, recycled by shape and dtype.
+
+    The buffers come from the eager host allocator, which aligns them to 64
+    bytes. Eager tensors can't be allocated in page-locked host memory yet, so
+    the buffers are pageable. Reusing them keeps the allocation of a batch out
+    of the staging loop, and a released buffer can be reused without waiting for
+    its copy to the device, as the eager runtime orders the next write into the
+    buffer after that copy.
+
+    At most ``capacity`` free buffers are kept. Releasing one more drops the
+    least recently released buffer.
+    """
+
+    def __init__(self, capacity=16):
+        assert capacity > 0
+        self._capacity = capacity
+        self._lock = threading.Lock()
+        self._free_buffers = []
+        self._num_allocated = 0
+        self._num_reused = 0
+
+    def acquire(self, shape, dtype):
+        shape = flow.Size(shape)
+        with self._lock:
+            for i in range(len(self._free_buffers) - 1, -1, -1):
+                buffer = self._free_buffers[i]
+                if buffer.shape == shape and buffer.dtype == dtype:
+                    del self._free_buffers[i]
+                    self._num_reused += 1
+                    return buffer
+            self._num_allocated += 1
+        return flow.empty(shape, dtype=dtype, device="cpu")
+
+    def release(self, buffer):
+        with self._lock:
+            self._free_buffers.append(buffer)
+            if len(self._free_buffers) > self._capacity:
+                del self._free_buffers[0]
+
+    def stats(self):
+        with self._lock:
+            return {
+                "num_allocated": self._num_allocated,
+                "num_reused": self._num_reused,
+                "num_free": len(self._free_buffers),
+            }
+
+
+def stage(data, buffer_pool, device):
+    r"""Copies the tensors in ``data`` to ``device`` through the pooled host
+    buffers, keeping the structure of ``data``."""
+    if isinstance(data, (flow.Tensor, flow._oneflow_internal.Tensor)):
+        if device is None or data.is_global or data.device == device:
+            return data
+        buffer = buffer_pool.acquire(data.shape, data.dtype)
+        buffer.copy_(data)
+        out = buffer.to(device)
+        buffer_pool.release(buffer)
+        return out
+    elif isinstance(data, string_classes):
+        return data
+    elif isinstance(data, collections.abc.Mapping):
+        return {k: stage(sample, buffer_pool, device) for k, sample in data.items()}
+    elif isinstance(data, tuple) and hasattr(data, "_fields"):  # namedtuple
+        return type(data)(*(stage(sample, buffer_pool, device) for sample in data))
+    elif isinstance(data, collections.abc.Sequence):
+        return [stage(sample, buffer_pool, device) for sample in data]
+    else:
+        return data
+
+
+def _pin_memory_loop(in_queue, out_queue, device, done_event, buffer_pool):
+    def do_one_step():
+        try:
+            r = in_queue.get(timeout=MP_STATUS_CHECK_INTERVAL)
+        except queue.Empty:
+            return
+        idx, data = r
+        if not done_event.is_set() and not isinstance(data, ExceptionWrapper):
+            try:
+                data = stage(data, buffer_pool, device)
+            except Exception:
+                data = ExceptionWrapper(
+                    where="in pin memory thread for device {}".format(device)
+                )
+            r = (idx, data)
+        # out_queue is bounded by the prefetch depth, so that staging does not
+        # run too far ahead of the consumer.
+        while not done_event.is_set():
+            try:
+                out_queue.put(r, timeout=MP_STATUS_CHECK_INTERVAL)
+                break
+            except queue.Full:
+                continue
+
+    # See NOTE [ Data Loader Multiprocessing Shutdown Logic ] for details on the
+    # logic of this function.
+    while not done_event.is_set():
+        # Make sure that we don't preserve any object from one iteration
+        # to the next
+        do_one_step()
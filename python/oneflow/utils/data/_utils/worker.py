@@ -26,6 +26,7 @@ from dataclasses import dataclass
 from typing import Union
 from oneflow.multiprocessing import _prctl_pr_set_pdeathsig  # type: ignore[attr-defined]
 from oneflow.multiprocessing import unlink_all_shared_memory
+from oneflow.multiprocessing.ring_buffer import _set_worker_ring
 import signal
 
 import oneflow as flow
@@ -284,6 +285,7 @@ def _worker_loop(
     worker_id,
     num_workers,
     persistent_workers,
+    shared_memory_ring=None,
 ):
     # See NOTE [ Data Loader Multiprocessing Shutdown Logic ] for details on the
     # logic of this function.
@@ -319,6 +321,7 @@ def _worker_loop(
         _worker_info = WorkerInfo(
             id=worker_id, num_workers=num_workers, seed=seed, dataset=dataset
         )
+        _set_worker_ring(shared_memory_ring)
 
         from oneflow.utils.data import _DatasetKind
 
@@ -383,6 +386,8 @@ def _worker_loop(
                 init_exception = None
             else:
                 try:
+                    if shared_memory_ring is not None:
+                        shared_memory_ring.begin_batch()
                     data = fetcher.fetch(index)
                 except Exception as e:
                     if (
@@ -401,6 +406,8 @@ def _worker_loop(
                         data = ExceptionWrapper(
                             where="in DataLoader worker process {}".format(worker_id)
                         )
+                if shared_memory_ring is not None:
+                    shared_memory_ring.end_batch(data)
             data_queue.put((idx, data))
             del data, idx, index, r  # save memory
     except KeyboardInterrupt:
@@ -25,6 +25,7 @@ from typing import Any, Callable, TypeVar, Generic, Sequence, List, Optional
 import multiprocessing as python_multiprocessing
 
 import oneflow.multiprocessing as multiprocessing
+from oneflow.multiprocessing.ring_buffer import SharedMemoryRing
 import oneflow as flow
 from oneflow.utils.data import _utils
 
@@ -168,6 +169,21 @@ class DataLoader(Generic[T_co]):
         persistent_workers (bool, optional): If ``True``, the data loader will not shutdown
             the worker processes after a dataset has been consumed once. This allows to
             maintain the workers `Dataset` instances alive. (default: ``False``)
+        pin_memory (bool, optional): If ``True``, batches are staged through recycled host
+            buffers and copied to ``prefetch_device`` ahead of use, which defaults to the
+            current cuda device if cuda is available. In multi-process loading this runs
+            in a staging thread. The buffers are kept across epochs. (default: ``False``)
+        prefetch_device (flow.device or str, optional, keyword-only arg): the device to
+            which batches are prefetched. Setting it implies :attr:`pin_memory`.
+            (default: ``None``)
+        prefetch_device_depth (int, optional, keyword-only arg): Number of batches staged
+            in advance by the staging thread. (default: ``2``)
+        use_shared_memory_ring (bool, optional, keyword-only arg): If ``True``, every worker
+            collates its batches into a ring of ``prefetch_factor + 2`` slots in one shared
+            memory segment, sized by its first batch, and the main process maps them without
+            copying. The slots are recycled when the tensors are deleted. Batches that do not
+            fit into a free slot fall back to a shared memory segment per tensor.
+            (default: ``False``)
 
 
     .. warning:: If the ``spawn`` start method is used, :attr:`worker_init_fn`
@@ -212,9 +228,13 @@ class DataLoader(Generic[T_co]):
         worker_init_fn: Optional[_worker_init_fn_t] = None,
         multiprocessing_context=None,
         generator=flow.Generator("cpu"),
+        pin_memory: bool = False,
         *,
         prefetch_factor: int = 2,
-        persistent_workers: bool = False
+        persistent_workers: bool = False,
+        prefetch_device=None,
+        prefetch_device_depth: int = 2,
+        use_shared_memory_ring: bool = False
     ):
 
         if num_workers < 0:
@@ -238,11 +258,22 @@ class DataLoader(Generic[T_co]):
         if persistent_workers and num_workers == 0:
             raise ValueError("persistent_workers option needs num_workers > 0")
 
+        if prefetch_device_depth <= 0:
+            raise ValueError("prefetch_device_depth option should be positive")
+        if prefetch_device is None and pin_memory and flow.cuda.is_available():
+            prefetch_device = "cuda:{}".format(flow.cuda.current_device())
+        if isinstance(prefetch_device, str):
+            prefetch_device = flow.device(prefetch_device)
+
         self.dataset = dataset
         self.prefetch_factor = prefetch_factor
         self.timeout = timeout
         self.worker_init_fn = worker_init_fn
         self.multiprocessing_context = multiprocessing_context
+        self.pin_memory = pin_memory or prefetch_device is not None
+        self.prefetch_device = prefetch_device
+        self.prefetch_device_depth = prefetch_device_depth
+        self._staging_buffer_pool = _utils.pin_memory.StagingBufferPool()
 
         # Arg-check dataset related before checking samplers because we want to
         # tell users that iterable-style datasets are incompatible with custom
@@ -348,6 +379,7 @@ class DataLoader(Generic[T_co]):
 
         self.collate_fn = collate_fn
         self.persistent_workers = persistent_workers
+        self.use_shared_memory_ring = use_shared_memory_ring
 
         self.__initialized = True
         self._IterableDataset_len_called = (
@@ -519,7 +551,10 @@ class _BaseDataLoaderIter(object):
         self._index_sampler = loader._index_sampler
         self._num_workers = loader.num_workers
         self._prefetch_factor = loader.prefetch_factor
-        self._pin_memory = False
+        self._pin_memory = loader.pin_memory
+        self._prefetch_device = loader.prefetch_device
+        self._prefetch_device_depth = loader.prefetch_device_depth
+        self._staging_buffer_pool = loader._staging_buffer_pool
         self._timeout = loader.timeout
         self._collate_fn = loader.collate_fn
         self._sampler_iter = iter(self._index_sampler)
@@ -590,9 +625,12 @@ class _SingleProcessDataLoaderIter(_BaseDataLoaderIter):
 
     def _next_data(self):
         index = self._next_index()  # may raise StopIteration
+        data = self._dataset_fetcher.fetch(index)  # may raise StopIteration
         if self._pin_memory:
-            raise NotImplementedError("Dataloader pin memory is not support yet!")
-        return self._dataset_fetcher.fetch(index)
+            data = _utils.pin_memory.stage(
+                data, self._staging_buffer_pool, self._prefetch_device
+            )
+        return data
 
 
 class _MultiProcessingDataLoaderIter(_BaseDataLoaderIter):
@@ -926,6 +964,7 @@ class _MultiProcessingDataLoaderIter(_BaseDataLoaderIter):
 
         self._index_queues = []
         self._workers = []
+        self._shared_memory_rings = []
         for i in range(self._num_workers):
             # No certainty which module multiprocessing_context is
             index_queue = multiprocessing_context.Queue()  # type: ignore[var-annotated]
@@ -933,6 +972,16 @@ class _MultiProcessingDataLoaderIter(_BaseDataLoaderIter):
             # See sections (2) and (3b) above.
             index_queue.cancel_join_thread()
 
+            shared_memory_ring = None
+            if loader.use_shared_memory_ring:
+                free_slots = multiprocessing_context.Queue()  # type: ignore[var-annotated]
+                free_slots.cancel_join_thread()
+                shared_memory_ring = SharedMemoryRing(
+                    self._prefetch_factor + 2, free_slots
+                )
+                shared_memory_ring.register()
+                self._shared_memory_rings.append(shared_memory_ring)
+
             w = multiprocessing_context.Process(
                 target=_utils.worker._worker_loop,
                 args=(
@@ -950,6 +999,7 @@ class _MultiProcessingDataLoaderIter(_BaseDataLoaderIter):
                     i,
                     self._num_workers,
                     self._persistent_workers,
+                    shared_memory_ring,
                 ),
             )
             w.daemon = True
@@ -964,18 +1014,18 @@ class _MultiProcessingDataLoaderIter(_BaseDataLoaderIter):
             self._workers.append(w)
 
         if self._pin_memory:
-            raise NotImplementedError("Dataloader pin memory is not support yet!")
             self._pin_memory_thread_done_event = threading.Event()
 
             # Queue is not type-annotated
-            self._data_queue = queue.Queue()  # type: ignore[var-annotated]
+            self._data_queue = queue.Queue(maxsize=self._prefetch_device_depth)  # type: ignore[var-annotated]
             pin_memory_thread = threading.Thread(
                 target=_utils.pin_memory._pin_memory_loop,
                 args=(
                     self._worker_result_queue,
                     self._data_queue,
-                    flow.cuda.current_device(),  # TODO:flow.cuda.current_device()
+                    self._prefetch_device,
                     self._pin_memory_thread_done_event,
+                    self._staging_buffer_pool,
                 ),
             )
             pin_memory_thread.daemon = True
@@ -1187,7 +1237,7 @@ class _MultiProcessingDataLoaderIter(_BaseDataLoaderIter):
     def _process_data(self, data):
         self._rcvd_idx += 1
         self._try_put_index()
-        if isinstance(data, ExceptionWrapper):
+        if isinstance(data, (ExceptionWrapper, _utils.worker.ExceptionWrapper)):
             data.reraise()
         return data
 
@@ -1280,6 +1330,9 @@ class _MultiProcessingDataLoaderIter(_BaseDataLoaderIter):
                 if self._worker_pids_set:
                     _utils.signal_handling._remove_worker_pids(id(self))
                     self._worker_pids_set = False
+                # Tensors still alive keep the segments of their rings mapped.
+                for shared_memory_ring in self._shared_memory_rings:
+                    shared_memory_ring.unregister()
                 for w in self._workers:
                     if w.is_alive():
                         # Existing mechanisms try to make the workers exit
@@ -62,7 +62,12 @@ class Dataset(Generic[T_co]):
     data sample for a given key. Subclasses could also optionally overwrite
     :meth:`__len__`, which is expected to return the size of the dataset by many
     :class:`~flow.utils.data.Sampler` implementations and the default options
-    of :class:`~flow.utils.data.DataLoader`.
+    of :class:`~flow.utils.data.DataLoader`. Subclasses could also optionally
+    implement :meth:`__getitems__`, to fetch a batch of samples for a list of keys
+    in one call. It returns either a list of samples, which are collated by the
+    ``collate_fn`` of :class:`~flow.utils.data.DataLoader`, or an already collated
+    batch, whose NumPy arrays are only converted to tensors. A custom ``collate_fn``
+    is given samples fetched by :meth:`__getitem__` instead of such a batch.
 
     .. note::
       :class:`~flow.utils.data.DataLoader` by default constructs a index
@@ -205,6 +210,14 @@ class TensorDataset(Dataset[Tuple[Tensor, ...]]):
     def __getitem__(self, index):
         return tuple(tensor[index] for tensor in self.tensors)
 
+    def __getitems__(self, indices):
+        return tuple(
+            flow.index_select(
+                tensor, 0, flow.tensor(indices, dtype=flow.int64, device=tensor.device)
+            )
+            for tensor in self.tensors
+        )
+
     def __len__(self):
         return self.tensors[0].size(0)
 
@@ -310,6 +323,11 @@ class Subset(Dataset[T_co]):
     def __getitem__(self, idx):
         return self.dataset[self.indices[idx]]
 
+    def __getitems__(self, indices):
+        if hasattr(self.dataset, "__getitems__"):
+            return self.dataset.__getitems__([self.indices[idx] for idx in indices])
+        return [self.dataset[self.indices[idx]] for idx in indices]
+
     def __len__(self):
         return len(self.indices)
 